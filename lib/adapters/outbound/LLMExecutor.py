@@ -5,23 +5,135 @@ This module provides a singleton LLMExecutor class for interacting with Large La
 It abstracts the underlying LLM provider and configuration, allowing simple chat and tool-enabled interactions.
 
 The executor uses environment variables and constants to configure the LLM provider, model, and behavior.
+
+Calls honor the current :class:`Deadline`: a call is not sent once it expired, the provider request
+times out with it, and a stream stops (and closes the provider stream) at the first chunk after it.
 """
 
+import time
+
 from lib.commons.Constants import Constants
+from lib.commons.Deadline import current_deadline
 from lib.commons.EnvironmentVariables import EnvironmentVariables
+from lib.commons.Metrics import Metrics, SIZE_BUCKETS
+from lib.commons.Profiler import profiled
+from lib.commons.StructuredLogging import get_logger
+from lib.commons.Tracer import Tracer
 from lib.core.providers.LLMProviderFactory import LLMProviderFactory
 from lib.core.providers.model.LLMProviderConfiguration import ProviderConfiguration
+from lib.core.providers.model.LLMResponse import LLMResponse
+from lib.core.service.TokenCounter import estimate_tokens
+from lib.core.service.UsageLedger import UsageLedger
 
 # Initialize environment and constants
 env = EnvironmentVariables()
 const = Constants.get_instance()
 current_provider = LLMProviderFactory.get_instance()
+tracer = Tracer.get_instance()
+metrics = Metrics.get_instance()
+ledger = UsageLedger.get_instance()
+logger = get_logger(__name__)
 
 # Retrieve configuration from environment
 think = env.get_thinking_mode()  # Whether the model should "think" before responding
 llm = env.get_language_model()  # The primary language model to use
 embedding_llm = env.get_embedding_model()  # The embedding model (not used in this class)
 
+llm_requests = metrics.counter("llm_requests_total", "LLMExecutor calls.", ("method", "model"))
+llm_errors = metrics.counter("llm_errors_total", "LLMExecutor calls that raised an error, streams included.",
+                             ("method", "model", "error"))
+llm_tokens = metrics.counter("llm_tokens_total", "Tokens reported by the provider.", ("model", "direction"))
+llm_seconds = metrics.histogram("llm_request_seconds", "Duration of LLMExecutor calls, streams until exhausted.",
+                                ("method", "model"))
+llm_ttft = metrics.histogram("llm_time_to_first_token_seconds", "Time to first token of streamed answers.",
+                             ("model",))
+llm_completion_size = metrics.histogram("llm_completion_tokens", "Completion tokens per answer.", ("model",),
+                                        buckets=SIZE_BUCKETS)
+
+
+def _record_usage(tenant, model: str, response) -> None:
+    """Record a completed response (the final chunk of a stream) in the ledger and count its tokens."""
+    usage = getattr(response, "usage", None)
+    if not isinstance(usage, dict):
+        ledger.record(tenant, model)
+        return
+    ledger.record(tenant, model, usage)
+    if usage.get("prompt_tokens"):
+        llm_tokens.inc(model, "input", amount=usage["prompt_tokens"])
+    if usage.get("completion_tokens") is not None:
+        llm_tokens.inc(model, "output", amount=usage["completion_tokens"])
+        llm_completion_size.observe(usage["completion_tokens"], model)
+    timings = getattr(response, "timings", None)
+    if isinstance(timings, dict) and timings.get("time_to_first_token") is not None:
+        llm_ttft.observe(timings["time_to_first_token"], model)
+
+
+def _partial_response(prompt: str, chunks) -> LLMResponse:
+    """Return a response with the estimated usage of a stream that ended before its final chunk."""
+    content = "".join(chunks)
+    prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(content)
+    usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+             "total_tokens": prompt_tokens + completion_tokens}
+    return LLMResponse(content, usage=usage, done=False)
+
+
+def _measure(method: str, tenant, model: str, started: float, response, deadline=None, prompt: str = ""):
+    """Record the usage and metrics of a call once its response is complete (a stream when it ends)."""
+    if hasattr(response, "__next__"):
+        return _measure_stream(method, tenant, model, started, response, deadline, prompt)
+    _record_usage(tenant, model, response)
+    llm_seconds.observe(time.perf_counter() - started, method, model)
+    return response
+
+
+def _measure_stream(method: str, tenant, model: str, started: float, stream, deadline=None, prompt: str = ""):
+    """
+    Yield the chunks of a stream, recording the usage and metrics of the call when the stream ends:
+    exhausted, failed, or closed by the consumer. Without the final chunk (and the usage reported
+    with it), the usage is estimated from the prompt and the content streamed so far. The stream is
+    closed, and DeadlineExceeded raised, when a chunk arrives after the deadline of the call.
+    """
+    final = None
+    chunks = []
+    try:
+        for chunk in stream:
+            if deadline is not None and deadline.expired:
+                if hasattr(stream, "close"):
+                    stream.close()
+                deadline.check()
+            if getattr(chunk, "done", False):
+                final = chunk
+            elif isinstance(getattr(chunk, "content", None), str):
+                chunks.append(chunk.content)
+            yield chunk
+    except Exception as error:
+        llm_errors.inc(method, model, type(error).__name__)
+        logger.warning("LLM stream failed: %s", error, extra={"method": method, "model": model})
+        raise
+    finally:
+        llm_seconds.observe(time.perf_counter() - started, method, model)
+        _record_usage(tenant, model, final if final is not None else _partial_response(prompt, chunks))
+
+
+def _call(method: str, span, tenant, **kwargs):
+    """Call the provider, counting the request and its errors, unless the current deadline expired."""
+    deadline = current_deadline()
+    if deadline is not None:
+        deadline.check()
+    model = str(kwargs["model"])
+    llm_requests.inc(method, model)
+    logger.debug("LLM call", extra={"method": method, "model": model, "stream": kwargs["config"].get_stream()})
+    started = time.perf_counter()
+    try:
+        response = current_provider.chat(**kwargs)
+    except Exception as error:
+        llm_errors.inc(method, model, type(error).__name__)
+        logger.warning("LLM call failed: %s", error, extra={"method": method, "model": model})
+        llm_seconds.observe(time.perf_counter() - started, method, model)
+        raise
+    prompt = "\n".join(text for text in (kwargs.get("system_prompt"), kwargs["prompt"]) if text)
+    return tracer.trace_response(span, _measure(method, tenant, model, started, response, deadline, prompt))
+
 
 class LLMExecutor(object):
     """
@@ -61,7 +173,9 @@ class LLMExecutor(object):
         else:
             LLMExecutor.__instance = self
 
-    def ask(self, prompt: str, system_prompt: str = None, chatbot_mode: bool = False, disable_think: bool = False):
+    @profiled("llm.ask")
+    def ask(self, prompt: str, system_prompt: str = None, chatbot_mode: bool = False, disable_think: bool = False,
+            tenant: str = None):
         """
         Perform a simple chat interaction with the LLM.
 
@@ -72,16 +186,27 @@ class LLMExecutor(object):
             system_prompt (str, optional): The system prompt to guide the model's behavior. Defaults to None.
             chatbot_mode (bool, optional): Enables streaming mode if True. Defaults to False.
             disable_think (bool, optional): Disables the model's thinking mode. Defaults to False.
+            tenant (str, optional): The tenant the call is accounted to (see :class:`UsageLedger`).
+                Defaults to None (the default tenant).
 
         Returns:
             The response from the language model.
+
+        Raises:
+            BudgetExceededError: If the tenant is over budget and has no fallback model.
+            DeadlineExceeded: If the current deadline expired before or during the call.
         """
+        model = ledger.admit(tenant, llm)
         enable_think = False if disable_think else think
 
         config: ProviderConfiguration = ProviderConfiguration(think=bool(enable_think), stream=chatbot_mode)
-        return current_provider.chat(prompt=prompt, system_prompt=system_prompt, model=llm, config=config)
+        # The span ends with the response, i.e. when a stream is exhausted.
+        with tracer.span("llm.ask", {"model": model, "stream": bool(chatbot_mode)}, end_on_exit=False) as span:
+            return _call("ask", span, tenant, prompt=prompt, system_prompt=system_prompt, model=model, config=config)
 
-    def chat(self, prompt: str, chatbot_mode: bool = True, tools: dict = None, system_prompt: str = None, disable_think: bool = False):
+    @profiled("llm.chat")
+    def chat(self, prompt: str, chatbot_mode: bool = True, tools: dict = None, system_prompt: str = None, disable_think: bool = False,
+             tenant: str = None):
         """
         Perform a chat interaction with the LLM, optionally incorporating tool calls.
 
@@ -94,10 +219,17 @@ class LLMExecutor(object):
             tools (dict, optional): A dictionary of available tool functions. Defaults to None.
             system_prompt (str, optional): The system prompt to guide the model's behavior. Defaults to None.
             disable_think (bool, optional): Disables the model's thinking mode. Defaults to False.
+            tenant (str, optional): The tenant the call is accounted to (see :class:`UsageLedger`).
+                Defaults to None (the default tenant).
 
         Returns:
             The response from the language model.
+
+        Raises:
+            BudgetExceededError: If the tenant is over budget and has no fallback model.
+            DeadlineExceeded: If the current deadline expired before or during the call.
         """
+        model = ledger.admit(tenant, llm)
         functions = {}
         if tools:
             functions.update(tools)
@@ -105,4 +237,9 @@ class LLMExecutor(object):
         enable_think = False if disable_think else think
 
         config: ProviderConfiguration = ProviderConfiguration(think=bool(enable_think), stream=chatbot_mode)
-        return current_provider.chat(prompt=prompt, model=llm, system_prompt=system_prompt, tools=functions, config=config)
+        attributes = None
+        if tracer.enabled:
+            attributes = {"model": model, "stream": bool(chatbot_mode), "tools": list(functions)}
+        with tracer.span("llm.chat", attributes, end_on_exit=False) as span:
+            return _call("chat", span, tenant, prompt=prompt, model=model, system_prompt=system_prompt, tools=functions,
+                         config=config)
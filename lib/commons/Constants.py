@@ -4,7 +4,7 @@ Constants Module
 This module defines a singleton Constants class that holds application-wide constant values.
 It ensures that only one instance of the class exists, providing a centralized place for constants.
 
-Currently, it defines the LLM provider names for Ollama and LiteLLM.
+Currently, it defines the LLM provider names for Ollama, LiteLLM and the simulated (fake) provider.
 """
 
 class Constants(object):
@@ -17,10 +17,12 @@ class Constants(object):
     Attributes:
         llm_provider_ollama (str): The string identifier for the Ollama LLM provider.
         llm_provider_litellm (str): The string identifier for the LiteLLM provider.
+        llm_provider_fake (str): The string identifier for the simulated provider used in load tests.
     """
 
     llm_provider_ollama = "ollama"
     llm_provider_litellm = "litellm"
+    llm_provider_fake = "fake"
 
     __instance = None
 
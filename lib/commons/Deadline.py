@@ -0,0 +1,145 @@
+"""
+Deadline Module
+
+This module provides request-scoped deadlines: a :class:`Deadline` is entered as a context
+manager, and the code running in that context (in the same thread or task, or in a thread
+started with :func:`contextvars.copy_context`) reads it with :func:`current_deadline`, so that a
+deadline set by a runner flows into the steps, the LLM calls and the tool executions without
+being passed around.
+
+Deadlines are cooperative: the providers pass the remaining time as the timeout of their HTTP
+requests, and long operations (streams, tool calls, simulated waits) call :meth:`Deadline.check`
+between units of work, which raises :class:`DeadlineExceeded` once the deadline expired or was
+cancelled with :meth:`Deadline.cancel`. Cancellation is not propagated to a request already
+sent: it ends at its timeout, and a stream is closed at its next chunk.
+
+A deadline created inside another one never expires after it, and is cancelled with it:
+
+    >>> with Deadline(timeout=30):
+    ...     with Deadline(timeout=60) as step:   # still expires 30 seconds from now
+    ...         step.remaining()
+
+Expiry times are on :func:`time.monotonic`, the default clock of :class:`PostRetrievalStage`.
+"""
+
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+_current_deadline: ContextVar[Optional["Deadline"]] = ContextVar("current_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Error raised when the deadline of a request expired or was cancelled."""
+
+
+class Deadline:
+    """
+    A point in time after which a request is abandoned.
+
+    Attributes:
+        timeout (Optional[float]): The timeout the deadline was created with, in seconds.
+        expires_at (Optional[float]): Expiry time on :func:`time.monotonic`, None if the
+            deadline never expires (it can still be cancelled).
+        parent (Optional[Deadline]): The enclosing deadline, cancelled with it.
+    """
+
+    __slots__ = ("timeout", "expires_at", "parent", "_cancelled", "_token")
+
+    def __init__(self, timeout: Optional[float] = None, parent: Optional["Deadline"] = None) -> None:
+        """
+        Create a deadline expiring ``timeout`` seconds from now, and not after its parent.
+
+        Args:
+            timeout (Optional[float], optional): Time left, in seconds. Defaults to None (no
+                expiry of its own).
+            parent (Optional[Deadline], optional): The enclosing deadline. Defaults to the
+                current deadline.
+        """
+        self.timeout = timeout
+        self.parent = parent if parent is not None else _current_deadline.get()
+        self.expires_at = None if timeout is None else time.monotonic() + timeout
+        if self.parent is not None and self.parent.expires_at is not None:
+            self.expires_at = self.parent.expires_at if self.expires_at is None \
+                else min(self.expires_at, self.parent.expires_at)
+        self._cancelled = threading.Event()
+        self._token = None
+
+    @property
+    def cancelled(self) -> bool:
+        """bool: True if the deadline or one of its parents was cancelled."""
+        return self._cancelled.is_set() or (self.parent is not None and self.parent.cancelled)
+
+    @property
+    def expired(self) -> bool:
+        """bool: True if the deadline passed or was cancelled."""
+        return self.cancelled or self.remaining() == 0.0
+
+    def remaining(self) -> Optional[float]:
+        """
+        Return the time left before the deadline.
+
+        Returns:
+            Optional[float]: The seconds left (0 once expired), or None if it never expires.
+        """
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def cancel(self) -> None:
+        """Cancel the deadline: the work running under it stops at its next :meth:`check`."""
+        self._cancelled.set()
+
+    def check(self) -> None:
+        """
+        Raise if the deadline expired or was cancelled.
+
+        Raises:
+            DeadlineExceeded: If the deadline expired or was cancelled.
+        """
+        if self.cancelled:
+            raise DeadlineExceeded("Request cancelled")
+        if self.remaining() == 0.0:
+            raise DeadlineExceeded("Deadline exceeded")
+
+    def __enter__(self) -> "Deadline":
+        self._token = _current_deadline.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        _current_deadline.reset(self._token)
+        self._token = None
+
+
+def current_deadline() -> Optional[Deadline]:
+    """
+    Return the deadline of the current context.
+
+    Returns:
+        Optional[Deadline]: The innermost entered deadline, or None.
+    """
+    return _current_deadline.get()
+
+
+def remaining_time() -> Optional[float]:
+    """
+    Return the time left before the current deadline.
+
+    Returns:
+        Optional[float]: The seconds left, or None without a deadline (or one that never expires).
+    """
+    deadline = _current_deadline.get()
+    return None if deadline is None else deadline.remaining()
+
+
+def check_deadline() -> None:
+    """
+    Raise if the current deadline expired or was cancelled; do nothing without a deadline.
+
+    Raises:
+        DeadlineExceeded: If the current deadline expired or was cancelled.
+    """
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.check()
@@ -132,3 +132,87 @@ class EnvironmentVariables:
             str: The LLM provider name or the default value.
         """
         return os.getenv("LLM_PROVIDER", default)
+
+    def get_log_level(self, default: str = None) -> str:
+        """
+        Get the log level of the application loggers from environment variables.
+
+        Args:
+            default (str, optional): Default value if LOG_LEVEL is not set. Defaults to None.
+
+        Returns:
+            str: The log level name (e.g. "INFO") or the default value.
+        """
+        return os.getenv("LOG_LEVEL", default)
+
+    def get_log_format(self, default: str = None) -> str:
+        """
+        Get the log output format ("text" or "json") from environment variables.
+
+        Args:
+            default (str, optional): Default value if LOG_FORMAT is not set. Defaults to None.
+
+        Returns:
+            str: The log format or the default value.
+        """
+        return os.getenv("LOG_FORMAT", default)
+
+    def get_profile_sample_rate(self, default: str = None) -> str:
+        """
+        Get the fraction of the profiled calls to sample (0 disables profiling) from environment variables.
+
+        Args:
+            default (str, optional): Default value if PROFILE_SAMPLE_RATE is not set. Defaults to None.
+
+        Returns:
+            str: The sample rate (e.g. "0.01") or the default value.
+        """
+        return os.getenv("PROFILE_SAMPLE_RATE", default)
+
+    def get_profile_mode(self, default: str = None) -> str:
+        """
+        Get the profiler ("cprofile" or "wall") from environment variables.
+
+        Args:
+            default (str, optional): Default value if PROFILE_MODE is not set. Defaults to None.
+
+        Returns:
+            str: The profiler mode or the default value.
+        """
+        return os.getenv("PROFILE_MODE", default)
+
+    def get_profile_directory(self, default: str = None) -> str:
+        """
+        Get the directory the aggregated profiles are written to from environment variables.
+
+        Args:
+            default (str, optional): Default value if PROFILE_DIRECTORY is not set. Defaults to None.
+
+        Returns:
+            str: The profile directory or the default value.
+        """
+        return os.getenv("PROFILE_DIRECTORY", default)
+
+    def get_usage_ledger_path(self, default: str = None) -> str:
+        """
+        Get the file the usage ledger is flushed to (SQLite or JSON lines) from environment variables.
+
+        Args:
+            default (str, optional): Default value if USAGE_LEDGER_PATH is not set. Defaults to None.
+
+        Returns:
+            str: The ledger path or the default value.
+        """
+        return os.getenv("USAGE_LEDGER_PATH", default)
+
+    def get_usage_flush_interval(self, default: str = None) -> str:
+        """
+        Get the number of seconds between two flushes of the usage ledger from environment variables.
+
+        Args:
+            default (str, optional): Default value if USAGE_FLUSH_INTERVAL is not set. Defaults to None.
+
+        Returns:
+            str: The flush interval (e.g. "60") or the default value.
+        """
+        return os.getenv("USAGE_FLUSH_INTERVAL", default)
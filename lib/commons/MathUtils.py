@@ -2,6 +2,8 @@
 Module providing mathematical utility functions.
 """
 
+import numpy as np
+
 class MathUtils(object):
     """
     Singleton class for mathematical utility functions.
@@ -86,3 +88,231 @@ class MathUtils(object):
         norm_b = sum([x ** 2 for x in b]) ** 0.5          # Compute the L2 norm of the second vector
         return dot_product / (norm_a * norm_b)            # Return the cosine similarity
 
+    @staticmethod
+    def normalize_rows(matrix):
+        """
+        Scale every row of a matrix to unit L2 norm.
+
+        Rows with a zero norm are left as zeros instead of producing NaNs.
+
+        Args:
+            matrix (array-like): A 2-D array or a sequence of equally long vectors.
+
+        Returns:
+            numpy.ndarray: A new float32 array of the same shape with unit-norm rows.
+        """
+        matrix = MathUtils.as_matrix(matrix)
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    @staticmethod
+    def as_matrix(vectors):
+        """
+        Convert vectors to a C-contiguous float32 NumPy array without copying when possible.
+
+        A C-contiguous float32 array is returned as is, so kernels called in a loop on the
+        same matrix pay no conversion cost; other arrays (e.g. transposed or strided views)
+        are copied.
+
+        Args:
+            vectors (array-like): A vector, a 2-D array or a sequence of equally long vectors.
+
+        Returns:
+            numpy.ndarray: The C-contiguous float32 array.
+        """
+        if isinstance(vectors, np.ndarray) and vectors.dtype == np.float32 and vectors.flags.c_contiguous:
+            return vectors
+        return np.asarray(vectors, dtype=np.float32, order="C")
+
+    @staticmethod
+    def dot_product(a, b):
+        """
+        Compute the dot product of two vectors.
+
+        Args:
+            a (array-like): The first vector.
+            b (array-like): The second vector, of the same size.
+
+        Returns:
+            float: The dot product.
+        """
+        return float(MathUtils.as_matrix(a) @ MathUtils.as_matrix(b))
+
+    @staticmethod
+    def dot_product_matrix(a, b):
+        """
+        Compute the dot product between every row of ``a`` and every row of ``b``.
+
+        Args:
+            a (array-like): An ``(n, d)`` matrix (or a single vector of size ``d``).
+            b (array-like): An ``(m, d)`` matrix (or a single vector of size ``d``).
+
+        Returns:
+            numpy.ndarray: An ``(n, m)`` float32 matrix (one dimension less per vector argument).
+        """
+        return MathUtils.as_matrix(a) @ MathUtils.as_matrix(b).T
+
+    @staticmethod
+    def cosine_similarity_many(query, matrix, normalized=False):
+        """
+        Compute the cosine similarity between one vector and every row of a matrix.
+
+        Args:
+            query (array-like): A vector of size ``d``.
+            matrix (array-like): An ``(m, d)`` matrix.
+            normalized (bool, optional): The rows of ``matrix`` already have unit norm (e.g.
+                :meth:`normalize_rows` was applied once when the matrix was built), so only
+                the query is normalized. Defaults to False.
+
+        Returns:
+            numpy.ndarray: The ``m`` float32 similarities. Zero vectors have a similarity of 0.
+        """
+        matrix = MathUtils.as_matrix(matrix) if normalized else MathUtils.normalize_rows(matrix)
+        return matrix @ MathUtils.normalize_rows(query)
+
+    @staticmethod
+    def cosine_similarity_matrix(a, b, normalized=False):
+        """
+        Compute the cosine similarity between every row of ``a`` and every row of ``b``.
+
+        Args:
+            a (array-like): An ``(n, d)`` matrix (or a single vector of size ``d``).
+            b (array-like): An ``(m, d)`` matrix (or a single vector of size ``d``).
+            normalized (bool, optional): Both arguments already have unit-norm rows, so the
+                similarity is a plain matrix product. Defaults to False.
+
+        Returns:
+            numpy.ndarray: An ``(n, m)`` float32 matrix of similarities (one dimension less per
+                vector argument).
+
+        Example:
+            >>> MathUtils.cosine_similarity_matrix([[1.0, 0.0]], [[1.0, 0.0], [0.0, 1.0]])
+            array([[1., 0.]], dtype=float32)
+        """
+        if normalized:
+            return MathUtils.dot_product_matrix(a, b)
+        return MathUtils.normalize_rows(a) @ MathUtils.normalize_rows(b).T
+
+    @staticmethod
+    def euclidean_distance(a, b):
+        """
+        Compute the Euclidean (L2) distance between two vectors.
+
+        Args:
+            a (array-like): The first vector.
+            b (array-like): The second vector, of the same size.
+
+        Returns:
+            float: The distance.
+        """
+        return float(np.linalg.norm(MathUtils.as_matrix(a) - MathUtils.as_matrix(b)))
+
+    @staticmethod
+    def euclidean_distance_matrix(a, b):
+        """
+        Compute the Euclidean distance between every row of ``a`` and every row of ``b``.
+
+        Uses ``|x - y|^2 = |x|^2 + |y|^2 - 2 x.y`` so that the work is one matrix product
+        instead of an ``(n, m, d)`` difference tensor.
+
+        Args:
+            a (array-like): An ``(n, d)`` matrix (or a single vector of size ``d``).
+            b (array-like): An ``(m, d)`` matrix (or a single vector of size ``d``).
+
+        Returns:
+            numpy.ndarray: An ``(n, m)`` float32 matrix of distances (one dimension less per
+                vector argument).
+        """
+        a, b = MathUtils.as_matrix(a), MathUtils.as_matrix(b)
+        a_norms = np.einsum("...i,...i->...", a, a)
+        if a.ndim > 1:
+            a_norms = a_norms[:, None]
+        squared = a_norms + np.einsum("...i,...i->...", b, b) - 2.0 * (a @ b.T)
+        # Rounding can make the distance of (nearly) identical vectors slightly negative.
+        return np.sqrt(np.maximum(squared, 0.0))
+
+    @staticmethod
+    def top_k(queries, corpus, k, metric="cosine", block_size=4096, normalized=False):
+        """
+        Find the ``k`` nearest rows of ``corpus`` for every query.
+
+        The corpus is scored one block of ``block_size`` rows at a time with
+        :meth:`top_k_blocked`, so the score matrix never exceeds ``len(queries) * block_size``.
+
+        Args:
+            queries (array-like): An ``(n, d)`` matrix (or a single vector of size ``d``).
+            corpus (array-like): An ``(m, d)`` matrix.
+            k (int): Number of rows per query.
+            metric (str, optional): ``"cosine"``, ``"dot"`` or ``"euclidean"``. Defaults to ``"cosine"``.
+            block_size (int, optional): Corpus rows scored per block. Defaults to 4096.
+            normalized (bool, optional): With the cosine metric, queries and corpus already have
+                unit-norm rows. Defaults to False.
+
+        Returns:
+            tuple[numpy.ndarray, numpy.ndarray]: The ``(n, min(k, m))`` row indices and scores,
+                best first: similarities for cosine and dot, distances (ascending) for euclidean.
+
+        Raises:
+            ValueError: If the metric is unknown or ``k`` is smaller than 1.
+        """
+        if metric not in ("cosine", "dot", "euclidean"):
+            raise ValueError(f"Unknown metric: {metric}")
+        queries = np.atleast_2d(MathUtils.as_matrix(queries))
+        corpus = MathUtils.as_matrix(corpus)
+        if metric == "cosine" and not normalized:
+            queries, corpus = MathUtils.normalize_rows(queries), MathUtils.normalize_rows(corpus)
+
+        def score_blocks():
+            for start in range(0, len(corpus), block_size):
+                block = corpus[start:start + block_size]
+                if metric == "euclidean":
+                    yield -MathUtils.euclidean_distance_matrix(queries, block)
+                else:
+                    yield queries @ block.T
+
+        indices, scores = MathUtils.top_k_blocked(score_blocks(), k)
+        return indices, (-scores if metric == "euclidean" else scores)
+
+    @staticmethod
+    def top_k_blocked(score_blocks, k):
+        """
+        Select the ``k`` largest scores of every row of a score matrix given in column blocks.
+
+        Only the current block and the best ``k`` candidates of every row are kept, so the
+        memory used is bounded by the block size whatever the total number of columns.
+
+        Args:
+            score_blocks (Iterable[array-like]): ``(q, b)`` score matrices of consecutive
+                column blocks (e.g. query-by-corpus similarities, one corpus block at a time).
+            k (int): Number of scores to keep per row.
+
+        Returns:
+            tuple[numpy.ndarray, numpy.ndarray]: The ``(q, min(k, columns))`` column indices and
+                scores, by descending score. Both are empty if no block was given.
+
+        Raises:
+            ValueError: If ``k`` is smaller than 1.
+        """
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        best_scores = best_indices = None
+        offset = 0
+        for block in score_blocks:
+            scores = np.asarray(block, dtype=np.float32)
+            width = scores.shape[1]
+            indices = np.broadcast_to(np.arange(offset, offset + width), scores.shape)
+            offset += width
+            if best_scores is not None:
+                scores = np.concatenate((best_scores, scores), axis=1)
+                indices = np.concatenate((best_indices, indices), axis=1)
+            if scores.shape[1] > k:
+                keep = np.argpartition(scores, scores.shape[1] - k, axis=1)[:, -k:]
+                scores = np.take_along_axis(scores, keep, axis=1)
+                indices = np.take_along_axis(indices, keep, axis=1)
+            best_scores, best_indices = scores, indices
+
+        if best_scores is None:
+            return np.empty((0, 0), dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        return np.take_along_axis(best_indices, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
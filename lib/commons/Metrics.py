@@ -0,0 +1,478 @@
+"""
+Metrics Module
+
+This module provides counters and histograms for the LLM and retrieval call paths (requests,
+errors, tokens, time to first token, tool latency, cache hit rates, embedding batch sizes)
+and their exposition in the Prometheus text format.
+
+Metrics are updated on the request path, so updates take no lock: every thread writes to its
+own shard of a metric (a plain dictionary reached through a ``threading.local``) and shards
+are only merged when the metrics are collected. A collection folds the shards of finished
+threads into a retired total, so no observation is lost; it may miss the observations being made
+at that instant. The shards of finished threads are also folded whenever a thread creates its
+shard, so the number of shards stays bounded by the number of live threads even if the metrics
+are never collected.
+
+Example:
+    >>> metrics = Metrics.get_instance()
+    >>> requests = metrics.counter("app_requests_total", "Requests served.", ("route",))
+    >>> requests.inc("/search")
+    >>> latency = metrics.histogram("app_request_seconds", "Request duration.", ("route",))
+    >>> latency.observe(0.12, "/search")
+    >>> print(metrics.exposition())
+"""
+
+import math
+import os
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Default histogram buckets (seconds), from 5 ms to 1 minute.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Buckets for sizes (tokens, batch sizes, ...).
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Metric(ABC):
+    """Base class of the metrics: label validation and per-thread shards."""
+
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        """
+        Initialize the metric. Use :meth:`Metrics.counter` or :meth:`Metrics.histogram` instead.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text.
+            labelnames (Sequence[str], optional): Names of the labels. Defaults to no labels.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, Dict[Tuple[str, ...], object]]] = []
+        # Observations of the finished threads, folded by _prune.
+        self._retired: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _shard(self) -> Dict[Tuple[str, ...], object]:
+        """Return the shard of the calling thread, creating it on its first update."""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._prune()
+                self._shards.append((threading.current_thread(), shard))
+            return shard
+
+    def _prune(self) -> None:
+        """Fold the shards of the finished threads into the retired total. Call with the lock held."""
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                self._fold(self._retired, shard)
+        self._shards = live
+
+    def _key(self, labels: Tuple) -> Tuple[str, ...]:
+        """Validate label values and return them as strings."""
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return tuple(str(label) for label in labels)
+
+    @abstractmethod
+    def _fold(self, total: Dict[Tuple[str, ...], object], shard: Dict[Tuple[str, ...], object]) -> None:
+        """Add the observations of a shard to ``total``, replacing (never mutating) its values."""
+        pass
+
+    def _snapshots(self) -> List[Dict[Tuple[str, ...], object]]:
+        """
+        Fold the shards of the finished threads into the retired total, then copy it and the
+        shards of the live threads (a dictionary copy is atomic under the GIL).
+        """
+        with self._lock:
+            self._prune()
+            live = self._shards
+            snapshots = [self._retired.copy()]
+        return snapshots + [shard.copy() for _, shard in live]
+
+    def clear(self) -> None:
+        """Drop every observation."""
+        with self._lock:
+            self._retired = {}
+            for _, shard in self._shards:
+                shard.clear()
+
+
+class Counter(_Metric):
+    """
+    A monotonically increasing value per label set.
+    """
+
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        """
+        Increase the counter of a label set.
+
+        Args:
+            *labels: The label values, in :attr:`labelnames` order.
+            amount (float, optional): The increment. Defaults to 1.
+
+        Raises:
+            ValueError: If the number of label values is wrong or the amount is negative.
+        """
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        shard = self._shard()
+        shard[key] = shard.get(key, 0.0) + amount
+
+    def _fold(self, total: Dict[Tuple[str, ...], float], shard: Dict[Tuple[str, ...], float]) -> None:
+        """Add the values of a shard to ``total``."""
+        for key, value in shard.items():
+            total[key] = total.get(key, 0.0) + value
+
+    def collect(self) -> Dict[Tuple[str, ...], float]:
+        """
+        Merge the shards.
+
+        Returns:
+            Dict[Tuple[str, ...], float]: The value of every label set.
+        """
+        values: Dict[Tuple[str, ...], float] = {}
+        for shard in self._snapshots():
+            for key, value in shard.items():
+                values[key] = values.get(key, 0.0) + value
+        return values
+
+    def value(self, *labels) -> float:
+        """
+        Return the value of a label set.
+
+        Args:
+            *labels: The label values.
+
+        Returns:
+            float: The value, 0 if never increased.
+        """
+        return self.collect().get(self._key(labels), 0.0)
+
+
+class Histogram(_Metric):
+    """
+    Counts of observations per bucket, with their sum, per label set.
+
+    Attributes:
+        buckets (Tuple[float, ...]): Sorted upper bounds of the buckets (``+Inf`` is implicit).
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS) -> None:
+        """
+        Initialize the histogram.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text.
+            labelnames (Sequence[str], optional): Names of the labels. Defaults to no labels.
+            buckets (Iterable[float], optional): Upper bounds of the buckets. Defaults to
+                :data:`DEFAULT_BUCKETS`.
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(bucket for bucket in buckets if bucket != math.inf))
+
+    def observe(self, value: float, *labels) -> None:
+        """
+        Record an observation.
+
+        Args:
+            value (float): The observed value.
+            *labels: The label values, in :attr:`labelnames` order.
+
+        Raises:
+            ValueError: If the number of label values is wrong.
+        """
+        key = self._key(labels)
+        shard = self._shard()
+        # Per-bucket (not cumulative) counts, the last one for +Inf, then the sum.
+        state = shard.get(key)
+        if state is None:
+            state = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def _fold(self, total: Dict[Tuple[str, ...], list], shard: Dict[Tuple[str, ...], list]) -> None:
+        """Add the bucket counts and sums of a shard to ``total``, as new lists."""
+        for key, state in shard.items():
+            previous = total.get(key)
+            total[key] = list(state) if previous is None else [a + b for a, b in zip(previous, state)]
+
+    def collect(self) -> Dict[Tuple[str, ...], Tuple[List[int], float]]:
+        """
+        Merge the shards.
+
+        Returns:
+            Dict[Tuple[str, ...], Tuple[List[int], float]]: For every label set, the cumulative
+            bucket counts (the last one, ``+Inf``, is the number of observations) and the sum.
+        """
+        merged: Dict[Tuple[str, ...], List[float]] = {}
+        for shard in self._snapshots():
+            for key, state in shard.items():
+                total = merged.setdefault(key, [0] * len(state))
+                for i, value in enumerate(list(state)):
+                    total[i] += value
+        values = {}
+        for key, state in merged.items():
+            cumulative, running = [], 0
+            for count in state[:-1]:
+                running += count
+                cumulative.append(running)
+            values[key] = (cumulative, state[-1])
+        return values
+
+    def count(self, *labels) -> int:
+        """
+        Return the number of observations of a label set.
+
+        Args:
+            *labels: The label values.
+
+        Returns:
+            int: The number of observations.
+        """
+        counts, _ = self.collect().get(self._key(labels), ([0], 0.0))
+        return counts[-1]
+
+    def sum(self, *labels) -> float:
+        """
+        Return the sum of the observations of a label set.
+
+        Args:
+            *labels: The label values.
+
+        Returns:
+            float: The sum of the observations.
+        """
+        return self.collect().get(self._key(labels), ([0], 0.0))[1]
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value as in the Prometheus text format."""
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Format a label set, escaping backslashes, quotes and newlines."""
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pairs.append(f"{name}=\"{value}\"")
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metrics(object):
+    """
+    Singleton registry of the metrics.
+
+    Attributes:
+        __instance: The singleton instance of the class.
+    """
+
+    __instance = None
+
+    @classmethod
+    def get_instance(cls):
+        """
+        Get the singleton instance of Metrics.
+
+        Returns:
+            Metrics: The singleton instance.
+        """
+        if cls.__instance is None:
+            cls()
+        return cls.__instance
+
+    def __init__(self):
+        """
+        Initialize the singleton instance with an empty registry.
+
+        Raises:
+            Exception: If an instance already exists (singleton violation).
+        """
+        if Metrics.__instance is not None:
+            raise Exception("This class is a singleton!")
+        else:
+            Metrics.__instance = self
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _register(self, metric_class, name: str, documentation: str, labelnames: Sequence[str], **options):
+        """Return the metric called ``name``, creating it if needed."""
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, documentation, labelnames, **options)
+            elif type(metric) is not metric_class or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered with another type or labels")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """
+        Get or create a counter.
+
+        Args:
+            name (str): The metric name, conventionally ending with ``_total``.
+            documentation (str): The help text.
+            labelnames (Sequence[str], optional): Names of the labels. Defaults to no labels.
+
+        Returns:
+            Counter: The counter.
+
+        Raises:
+            ValueError: If the name is registered with another type or labels.
+        """
+        return self._register(Counter, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        """
+        Get or create a histogram.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text.
+            labelnames (Sequence[str], optional): Names of the labels. Defaults to no labels.
+            buckets (Iterable[float], optional): Upper bounds of the buckets (ignored when the
+                histogram exists). Defaults to :data:`DEFAULT_BUCKETS`.
+
+        Returns:
+            Histogram: The histogram.
+
+        Raises:
+            ValueError: If the name is registered with another type or labels.
+        """
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        """
+        Return a registered metric.
+
+        Args:
+            name (str): The metric name.
+
+        Returns:
+            Optional[Union[Counter, Histogram]]: The metric, or None.
+        """
+        return self._metrics.get(name)
+
+    def clear(self) -> None:
+        """
+        Drop the observations of every metric (the metrics stay registered).
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+    def exposition(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format (version 0.0.4).
+
+        Returns:
+            str: The exposition, metrics sorted by name.
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for key, value in sorted(metric.collect().items()):
+                if metric.kind == "counter":
+                    lines.append(f"{metric.name}{_format_labels(metric.labelnames, key)} {_format_value(value)}")
+                    continue
+                counts, total = value
+                names = metric.labelnames + ("le",)
+                for bound, count in zip(metric.buckets + (math.inf,), counts):
+                    labels = _format_labels(names, key + (_format_value(bound),))
+                    lines.append(f"{metric.name}_bucket{labels} {count}")
+                labels = _format_labels(metric.labelnames, key)
+                lines.append(f"{metric.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{metric.name}_count{labels} {counts[-1]}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def write(self, path: str) -> None:
+        """
+        Write the exposition to a file atomically (e.g. for the node exporter textfile collector).
+
+        Args:
+            path (str): The destination file.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+                file.write(self.exposition())
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def serve(self, port: int = 9464, host: str = "127.0.0.1") -> int:
+        """
+        Serve the exposition over HTTP from a daemon thread (any path answers).
+
+        Args:
+            port (int, optional): The port, 0 for any free port. Defaults to 9464.
+            host (str, optional): The interface. Defaults to "127.0.0.1".
+
+        Returns:
+            int: The port the server listens on.
+        """
+        if self._server is None:
+            registry = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    body = registry.exposition().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", CONTENT_TYPE)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer((host, port), Handler)
+            threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+        return self._server.server_address[1]
+
+    def shutdown(self) -> None:
+        """
+        Stop the HTTP server started by :meth:`serve`, if any.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
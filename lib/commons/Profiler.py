@@ -0,0 +1,439 @@
+"""
+Profiler Module
+
+This module provides opt-in profiling of the hot paths (LLMExecutor calls, knowledge base
+queries) in production: a fraction of the calls of the :func:`profiled` functions is profiled
+and the profiles are aggregated per function, then written to disk.
+
+Two profilers are available:
+
+- ``cprofile``: deterministic profiling of the sampled calls with :mod:`cProfile`. Profiles
+  are written as ``<name>.<time>.<pid>.prof`` files (the :mod:`pstats` format, readable by
+  snakeviz and similar tools). The overhead applies to the sampled calls only.
+- ``wall``: a background thread records the stack of the threads running sampled calls every
+  few milliseconds. Time spent waiting (network, locks, sleeps) is measured too, which cProfile
+  attributes poorly. Profiles are written as ``<name>.<time>.<pid>.collapsed`` files (one
+  ``frame;frame;frame count`` line per stack, the input of flame graph tools).
+
+Profiling is configured with the environment variables PROFILE_SAMPLE_RATE (fraction of the
+calls, 0 disables profiling), PROFILE_MODE (``cprofile`` or ``wall``) and PROFILE_DIRECTORY,
+or with :meth:`Profiler.configure`. Profiles are written every ``dump_every`` samples and at
+exit; :func:`summarize` (and ``scripts/profiling/profile_summary.py``) reports the hottest
+functions of a set of profiles.
+
+Streams returned by a sampled call are profiled while they produce their chunks. A call
+sampled while another sampled call runs in the same thread is not profiled separately.
+
+Since Python 3.12, cProfile relies on :mod:`sys.monitoring`, which admits a single profiler per
+interpreter: in ``cprofile`` mode, one thread is profiled at a time, and the calls (or stream
+chunks) sampled while another thread is profiled run without profiling. Profiler errors are
+logged and never reach the profiled call.
+"""
+
+import atexit
+import cProfile
+import functools
+import glob
+import io
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from lib.commons.EnvironmentVariables import EnvironmentVariables
+from lib.commons.StructuredLogging import get_logger
+
+env = EnvironmentVariables()
+logger = get_logger(__name__)
+
+MODES = ("cprofile", "wall")
+
+# Held while a cProfile profile is enabled: only one can be active in the interpreter.
+_cprofile_lock = threading.Lock()
+
+
+class _WallClockSampler:
+    """Background thread recording the stacks of the threads running sampled calls."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.stacks: Dict[str, Counter] = {}
+        self._active: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def resume(self, name: str) -> None:
+        """Start sampling the calling thread under ``name``."""
+        with self._lock:
+            self._active[threading.get_ident()] = name
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+
+    def pause(self) -> None:
+        """Stop sampling the calling thread."""
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+
+    def take(self) -> Dict[str, Counter]:
+        """Return and reset the recorded stacks."""
+        with self._lock:
+            stacks, self.stacks = self.stacks, {}
+        return stacks
+
+    @staticmethod
+    def stack(frame) -> str:
+        """Render a stack, outermost frame first, as ``function (file:line);...``."""
+        frames = []
+        while frame is not None and len(frames) < 128:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(frames))
+
+    def _run(self) -> None:
+        """Sample the active threads until none is left."""
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                for ident, name in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        self.stacks.setdefault(name, Counter())[self.stack(frame)] += 1
+
+
+class Profiler(object):
+    """
+    Singleton sampling profiler.
+
+    Attributes:
+        __instance: The singleton instance of the class.
+        enabled (bool): Whether calls are sampled.
+        sample_rate (float): Fraction of the calls profiled.
+        mode (str): ``"cprofile"`` or ``"wall"``.
+        directory (str): Directory the profiles are written to.
+        dump_every (int): Number of samples after which the profiles are written (0: only at exit).
+        samples (Counter): Number of sampled calls per profile name.
+        sampler (_WallClockSampler): The wall-clock sampler; its ``interval`` is in seconds.
+    """
+
+    __instance = None
+
+    @classmethod
+    def get_instance(cls):
+        """
+        Get the singleton instance of Profiler.
+
+        Returns:
+            Profiler: The singleton instance.
+        """
+        if cls.__instance is None:
+            cls()
+        return cls.__instance
+
+    def __init__(self):
+        """
+        Initialize the singleton instance from the environment variables.
+
+        Raises:
+            Exception: If an instance already exists (singleton violation).
+        """
+        if Profiler.__instance is not None:
+            raise Exception("This class is a singleton!")
+        else:
+            Profiler.__instance = self
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats: Dict[str, pstats.Stats] = {}
+        self._pending = 0
+        self.samples: Counter = Counter()
+        self.sampler = _WallClockSampler(0.005)
+        self.configure(sample_rate=float(env.get_profile_sample_rate("0")), mode=env.get_profile_mode("cprofile"),
+                       directory=env.get_profile_directory("profiles"))
+
+    def configure(self, sample_rate: float = None, mode: str = None, directory: str = None, interval: float = None,
+                  dump_every: int = 100) -> "Profiler":
+        """
+        Change the profiling settings.
+
+        Args:
+            sample_rate (float, optional): Fraction of the calls profiled, 0 to disable. Defaults to the current one.
+            mode (str, optional): ``"cprofile"`` or ``"wall"``. Defaults to the current one.
+            directory (str, optional): Directory of the profiles. Defaults to the current one.
+            interval (float, optional): Wall-clock sampling interval in seconds. Defaults to the current one.
+            dump_every (int, optional): Samples between two dumps, 0 to dump only at exit. Defaults to 100.
+
+        Returns:
+            Profiler: Self for method chaining.
+
+        Raises:
+            ValueError: If the sample rate is not between 0 and 1 or the mode is unknown.
+        """
+        if sample_rate is not None:
+            if not 0.0 <= sample_rate <= 1.0:
+                raise ValueError(f"The profile sample rate must be between 0 and 1, got {sample_rate}")
+            self.sample_rate = sample_rate
+        if mode is not None:
+            if mode not in MODES:
+                raise ValueError(f"Unknown profile mode: {mode} (expected one of {', '.join(MODES)})")
+            self.mode = mode
+        if directory is not None:
+            self.directory = directory
+        if interval is not None:
+            self.sampler.interval = interval
+        self.dump_every = dump_every
+        self.enabled = self.sample_rate > 0
+        return self
+
+    def call(self, name: str, function: Callable, args: tuple, kwargs: dict):
+        """
+        Run a call of a :func:`profiled` function, profiling it if it is sampled.
+
+        Args:
+            name (str): The name of the profile.
+            function (Callable): The function.
+            args (tuple): The positional arguments.
+            kwargs (dict): The keyword arguments.
+
+        Returns:
+            The result of the call (a profiled stream when the call returns an iterator).
+        """
+        if getattr(self._local, "active", False) or random.random() >= self.sample_rate:
+            return function(*args, **kwargs)
+        if self.mode == "cprofile" and _cprofile_lock.locked():
+            return function(*args, **kwargs)
+        session = _Session(self, name)
+        session.resume()
+        try:
+            result = function(*args, **kwargs)
+        except BaseException:
+            session.pause()
+            session.finish()
+            raise
+        session.pause()
+        if hasattr(result, "__next__"):
+            return self._profile_stream(session, result)
+        session.finish()
+        return result
+
+    @staticmethod
+    def _profile_stream(session: "_Session", stream: Iterator) -> Iterator:
+        """Yield the chunks of a stream, profiling their production."""
+        try:
+            while True:
+                session.resume()
+                try:
+                    chunk = next(stream)
+                except StopIteration:
+                    return
+                finally:
+                    session.pause()
+                yield chunk
+        finally:
+            session.finish()
+
+    def _record(self, name: str, profile: Optional[cProfile.Profile]) -> None:
+        """Aggregate a finished sample, and write the profiles every ``dump_every`` samples."""
+        with self._lock:
+            if profile is not None:
+                if name in self._stats:
+                    self._stats[name].add(profile)
+                else:
+                    self._stats[name] = pstats.Stats(profile)
+            self.samples[name] += 1
+            self._pending += 1
+            due = self.dump_every and self._pending >= self.dump_every
+        if due:
+            self.dump()
+
+    def dump(self, directory: str = None) -> List[str]:
+        """
+        Write the aggregated profiles and reset them.
+
+        Args:
+            directory (str, optional): The destination directory. Defaults to :attr:`directory`.
+
+        Returns:
+            List[str]: The paths of the written files.
+        """
+        with self._lock:
+            stats, self._stats = self._stats, {}
+            self._pending = 0
+        stacks = self.sampler.take()
+        if not stats and not stacks:
+            return []
+        directory = directory or self.directory
+        os.makedirs(directory, exist_ok=True)
+        suffix = f"{time.strftime('%Y%m%dT%H%M%S')}.{os.getpid()}"
+        paths = []
+        for name, stat in stats.items():
+            path = os.path.join(directory, f"{name}.{suffix}.prof")
+            stat.dump_stats(path)
+            paths.append(path)
+        for name, counter in stacks.items():
+            path = os.path.join(directory, f"{name}.{suffix}.collapsed")
+            with open(path, "w", encoding="utf-8") as file:
+                file.writelines(f"{stack} {count}\n" for stack, count in counter.most_common())
+            paths.append(path)
+        return paths
+
+
+class _Session:
+    """
+    Profile of one sampled call: resumed and paused around the call and each stream chunk.
+
+    Errors of the profiler are logged, and the call goes on without profiling.
+    """
+
+    def __init__(self, profiler: Profiler, name: str) -> None:
+        self.profiler = profiler
+        self.name = name
+        self.profile = cProfile.Profile() if profiler.mode == "cprofile" else None
+        self.profiled = False
+        self._enabled = False
+
+    def resume(self) -> None:
+        self.profiler._local.active = True
+        try:
+            if self.profile is None:
+                self.profiler.sampler.resume(self.name)
+                self.profiled = True
+            elif _cprofile_lock.acquire(blocking=False):
+                # Another thread being profiled skips this part of the call.
+                try:
+                    self.profile.enable()
+                except BaseException:
+                    _cprofile_lock.release()
+                    raise
+                self._enabled = self.profiled = True
+        except Exception as error:
+            logger.warning("Profiling of %s failed: %s", self.name, error, extra={"profile": self.name})
+
+    def pause(self) -> None:
+        try:
+            if self.profile is None:
+                self.profiler.sampler.pause()
+            elif self._enabled:
+                self._enabled = False
+                try:
+                    self.profile.disable()
+                finally:
+                    _cprofile_lock.release()
+        except Exception as error:
+            logger.warning("Profiling of %s failed: %s", self.name, error, extra={"profile": self.name})
+        finally:
+            self.profiler._local.active = False
+
+    def finish(self) -> None:
+        if not self.profiled:
+            return
+        try:
+            self.profiler._record(self.name, self.profile)
+        except Exception as error:
+            logger.warning("Profiling of %s failed: %s", self.name, error, extra={"profile": self.name})
+
+
+def profiled(name: str) -> Callable:
+    """
+    Decorator sampling the calls of a function for profiling (see :class:`Profiler`).
+
+    Args:
+        name (str): The name of the profile, used in the file names.
+
+    Returns:
+        Callable: The decorator.
+    """
+    profiler = Profiler.get_instance()
+
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return function(*args, **kwargs)
+            return profiler.call(name, function, args, kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _expand(paths: Iterable[str]) -> List[str]:
+    """Replace directories by the profile files they contain."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.prof")) + glob.glob(os.path.join(path, "*.collapsed"))))
+        else:
+            files.append(path)
+    return files
+
+
+def _profile_name(path: str) -> str:
+    """Return the profile name of a file (its name without time, pid and extension)."""
+    return os.path.basename(path).rsplit(".", 3)[0]
+
+
+def summarize(paths: Iterable[str], limit: int = 20, sort: str = "cumulative") -> str:
+    """
+    Aggregate profile files per name and report their hottest functions.
+
+    Args:
+        paths (Iterable[str]): Profile files, or directories containing them.
+        limit (int, optional): Number of functions reported per profile. Defaults to 20.
+        sort (str, optional): pstats sort key of the cProfile profiles (``"cumulative"``,
+            ``"tottime"``, ``"calls"``, ...). Defaults to ``"cumulative"``.
+
+    Returns:
+        str: The report.
+    """
+    profiles: Dict[str, List[str]] = {}
+    stacks: Dict[str, Counter] = {}
+    for path in _expand(paths):
+        name = _profile_name(path)
+        if path.endswith(".collapsed"):
+            counter = stacks.setdefault(name, Counter())
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    stack, _, count = line.rstrip("\n").rpartition(" ")
+                    counter[stack] += int(count)
+        else:
+            profiles.setdefault(name, []).append(path)
+
+    report = io.StringIO()
+    for name, files in sorted(profiles.items()):
+        report.write(f"== {name} (cProfile, {len(files)} file(s))\n")
+        stats = pstats.Stats(*files, stream=report)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    for name, counter in sorted(stacks.items()):
+        total = sum(counter.values())
+        own, inclusive = Counter(), Counter()
+        for stack, count in counter.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                inclusive[frame] += count
+        report.write(f"== {name} (wall clock, {total} samples)\n")
+        for title, values in (("self", own), ("total", inclusive)):
+            report.write(f"{title:>8}  function\n")
+            for frame, count in values.most_common(limit):
+                report.write(f"{100.0 * count / total:>7.1f}%  {frame}\n")
+        report.write("\n")
+    return report.getvalue()
+
+
+def _dump_at_exit() -> None:
+    """Write the profiles aggregated since the last dump."""
+    profiler = Profiler.get_instance()
+    if profiler.enabled:
+        profiler.dump()
+
+
+atexit.register(_dump_at_exit)
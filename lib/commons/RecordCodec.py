@@ -0,0 +1,179 @@
+"""
+RecordCodec Module
+
+This module provides encoders and decoders for the compact record types of the library
+(e.g. :class:`LLMResponse` and :class:`StepResult`). Two formats are supported:
+
+    - JSON lines: one compact JSON object per line, built from ``record.to_dict()``.
+      Human readable and safe to load from untrusted sources.
+    - Binary: a stream of pickled positional tuples, built from ``record.to_tuple()``.
+      Much smaller and faster than JSON, but must only be loaded from trusted sources.
+
+Any record type exposing ``to_dict``/``from_dict`` and ``to_tuple``/``from_tuple`` can be used.
+"""
+
+import io
+import json
+import pickle
+import uuid
+from typing import Any, BinaryIO, Iterable, Iterator, TextIO, Type
+
+
+def _json_default(value: Any) -> Any:
+    """Fallback JSON conversion for values that the json module cannot encode natively."""
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    return str(value)
+
+
+class RecordCodec(object):
+    """
+    Static helpers to encode and decode records as JSON lines or compact binary streams.
+
+    All methods are static; the class only groups them under a single namespace,
+    like :class:`MathUtils`.
+    """
+
+    @staticmethod
+    def encode_jsonl(records: Iterable[Any]) -> Iterator[str]:
+        """
+        Encode records as JSON lines.
+
+        Args:
+            records (Iterable[Any]): The records to encode.
+
+        Yields:
+            str: One compact JSON document per record, terminated by a newline.
+        """
+        dumps = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=_json_default).encode
+        for record in records:
+            yield dumps(record.to_dict()) + "\n"
+
+    @staticmethod
+    def decode_jsonl(lines: Iterable[str], record_type: Type) -> Iterator[Any]:
+        """
+        Decode JSON lines produced by :meth:`encode_jsonl`.
+
+        Blank lines are skipped.
+
+        Args:
+            lines (Iterable[str]): The lines to decode (e.g. an open text file).
+            record_type (Type): The record class, which must provide ``from_dict``.
+
+        Yields:
+            Any: The decoded records.
+        """
+        loads = json.JSONDecoder().decode
+        for line in lines:
+            if line.strip():
+                yield record_type.from_dict(loads(line))
+
+    @staticmethod
+    def write_jsonl(records: Iterable[Any], fp: TextIO) -> int:
+        """
+        Write records to a text file as JSON lines.
+
+        Args:
+            records (Iterable[Any]): The records to write.
+            fp (TextIO): A file opened in text mode.
+
+        Returns:
+            int: The number of records written.
+        """
+        count = 0
+        for line in RecordCodec.encode_jsonl(records):
+            fp.write(line)
+            count += 1
+        return count
+
+    @staticmethod
+    def read_jsonl(fp: TextIO, record_type: Type) -> Iterator[Any]:
+        """
+        Lazily read records from a JSON-lines text file.
+
+        Args:
+            fp (TextIO): A file opened in text mode.
+            record_type (Type): The record class, which must provide ``from_dict``.
+
+        Yields:
+            Any: The decoded records.
+        """
+        return RecordCodec.decode_jsonl(fp, record_type)
+
+    @staticmethod
+    def write_binary(records: Iterable[Any], fp: BinaryIO) -> int:
+        """
+        Write records to a binary file as a stream of pickled positional tuples.
+
+        Args:
+            records (Iterable[Any]): The records to write.
+            fp (BinaryIO): A file opened in binary mode.
+
+        Returns:
+            int: The number of records written.
+        """
+        pickler = pickle.Pickler(fp, protocol=pickle.HIGHEST_PROTOCOL)
+        count = 0
+        for record in records:
+            pickler.dump(record.to_tuple())
+            # The memo would otherwise grow with every record of the stream.
+            pickler.clear_memo()
+            count += 1
+        return count
+
+    @staticmethod
+    def read_binary(fp: BinaryIO, record_type: Type) -> Iterator[Any]:
+        """
+        Lazily read records written by :meth:`write_binary`.
+
+        Warning:
+            The binary format is based on pickle: only read data from trusted sources.
+
+        Args:
+            fp (BinaryIO): A file opened in binary mode.
+            record_type (Type): The record class, which must provide ``from_tuple``.
+
+        Yields:
+            Any: The decoded records.
+        """
+        unpickler = pickle.Unpickler(fp)
+        while True:
+            try:
+                values = unpickler.load()
+            except EOFError:
+                return
+            yield record_type.from_tuple(values)
+
+    @staticmethod
+    def encode_binary(records: Iterable[Any]) -> bytes:
+        """
+        Encode records into a single binary blob.
+
+        Args:
+            records (Iterable[Any]): The records to encode.
+
+        Returns:
+            bytes: The encoded records.
+        """
+        buffer = io.BytesIO()
+        RecordCodec.write_binary(records, buffer)
+        return buffer.getvalue()
+
+    @staticmethod
+    def decode_binary(data: bytes, record_type: Type) -> list:
+        """
+        Decode a binary blob produced by :meth:`encode_binary`.
+
+        Warning:
+            The binary format is based on pickle: only decode data from trusted sources.
+
+        Args:
+            data (bytes): The encoded records.
+            record_type (Type): The record class, which must provide ``from_tuple``.
+
+        Returns:
+            list: The decoded records.
+        """
+        return list(RecordCodec.read_binary(io.BytesIO(data), record_type))
@@ -0,0 +1,273 @@
+"""
+SpanExporter Module
+
+This module provides the exporters receiving the spans finished by the
+:class:`~lib.commons.Tracer.Tracer`:
+
+- :class:`InMemorySpanExporter` keeps the spans in a list, for tests and interactive analysis;
+- :class:`JsonLinesSpanExporter` writes one JSON object per span (see :meth:`Span.to_dict`);
+- :class:`OTLPJsonSpanExporter` writes the OpenTelemetry protocol JSON encoding
+  (``ExportTraceServiceRequest`` objects, one per line), which OpenTelemetry collectors
+  (``otlpjsonfile`` receiver) and most tracing backends can ingest.
+
+Exporters are called synchronously when a span ends, possibly from several threads.
+"""
+
+import json
+import threading
+from abc import ABC, abstractmethod
+from typing import IO, Any, Dict, List, Union
+
+
+class SpanExporter(ABC):
+    """
+    Abstract base class for span exporters.
+    """
+
+    @abstractmethod
+    def export(self, span) -> None:
+        """
+        Export a finished span.
+
+        Args:
+            span (Span): The finished span.
+        """
+        pass
+
+    def flush(self) -> None:
+        """
+        Write the buffered spans, if any.
+        """
+        pass
+
+    def shutdown(self) -> None:
+        """
+        Flush and release the resources of the exporter. Called by :meth:`Tracer.disable`.
+        """
+        self.flush()
+
+
+class InMemorySpanExporter(SpanExporter):
+    """
+    Exporter keeping the finished spans in memory.
+
+    Attributes:
+        spans (List[Span]): The finished spans, in end order.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize the exporter with an empty list of spans.
+        """
+        self.spans: List = []
+        self._lock = threading.Lock()
+
+    def export(self, span) -> None:
+        """
+        Append a finished span.
+
+        Args:
+            span (Span): The finished span.
+        """
+        with self._lock:
+            self.spans.append(span)
+
+    def get(self, name: str) -> List:
+        """
+        Return the spans with a given name.
+
+        Args:
+            name (str): The span name.
+
+        Returns:
+            List[Span]: The matching spans, in end order.
+        """
+        with self._lock:
+            return [span for span in self.spans if span.name == name]
+
+    def clear(self) -> None:
+        """
+        Remove every span.
+        """
+        with self._lock:
+            self.spans.clear()
+
+
+class _FileSpanExporter(SpanExporter):
+    """Base class of the exporters writing one line per record to a file."""
+
+    def __init__(self, destination: Union[str, IO[str]]) -> None:
+        """
+        Initialize the exporter.
+
+        Args:
+            destination (Union[str, IO[str]]): A path, opened in append mode, or a text stream
+                (not closed by the exporter).
+        """
+        if isinstance(destination, str):
+            self._file = open(destination, "a", encoding="utf-8")
+            self._owned = True
+        else:
+            self._file = destination
+            self._owned = False
+        self._lock = threading.Lock()
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        """Write a record as one JSON line."""
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def flush(self) -> None:
+        """
+        Flush the file.
+        """
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+
+    def shutdown(self) -> None:
+        """
+        Flush the file, and close it when the exporter opened it.
+        """
+        self.flush()
+        if self._owned:
+            with self._lock:
+                self._file.close()
+
+
+class JsonLinesSpanExporter(_FileSpanExporter):
+    """
+    Exporter writing every finished span as a JSON line (see :meth:`Span.to_dict`).
+    """
+
+    def export(self, span) -> None:
+        """
+        Write a finished span.
+
+        Args:
+            span (Span): The finished span.
+        """
+        self._write(span.to_dict())
+
+
+class OTLPJsonSpanExporter(_FileSpanExporter):
+    """
+    Exporter writing the finished spans in the OTLP/JSON encoding of OpenTelemetry.
+
+    Spans are buffered and written by batches of ``batch_size`` as one
+    ``ExportTraceServiceRequest`` line.
+
+    Attributes:
+        service_name (str): Value of the ``service.name`` resource attribute.
+        batch_size (int): Number of spans per written line.
+    """
+
+    STATUS_UNSET = 0
+    STATUS_ERROR = 2
+    SPAN_KIND_INTERNAL = 1
+
+    def __init__(self, destination: Union[str, IO[str]], service_name: str = "oaia",
+                 batch_size: int = 64) -> None:
+        """
+        Initialize the exporter.
+
+        Args:
+            destination (Union[str, IO[str]]): A path, opened in append mode, or a text stream.
+            service_name (str, optional): The ``service.name`` resource attribute. Defaults to
+                ``"oaia"``, the name of this project.
+            batch_size (int, optional): Number of spans per written line. Defaults to 64.
+        """
+        super().__init__(destination)
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self._buffer: List[Dict[str, Any]] = []
+
+    @staticmethod
+    def attribute_value(value: Any) -> Dict[str, Any]:
+        """
+        Encode an attribute value as an OTLP ``AnyValue``.
+
+        Args:
+            value (Any): A string, boolean, number or list of those; other values are converted
+                to strings.
+
+        Returns:
+            Dict[str, Any]: The encoded value.
+        """
+        if isinstance(value, bool):
+            return {"boolValue": value}
+        if isinstance(value, int):
+            # 64-bit integers are strings in the protobuf JSON mapping.
+            return {"intValue": str(value)}
+        if isinstance(value, float):
+            return {"doubleValue": value}
+        if isinstance(value, (list, tuple)):
+            return {"arrayValue": {"values": [OTLPJsonSpanExporter.attribute_value(item) for item in value]}}
+        return {"stringValue": str(value)}
+
+    @classmethod
+    def attributes(cls, attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Encode attributes as a list of OTLP ``KeyValue``.
+
+        Args:
+            attributes (Dict[str, Any]): The attributes.
+
+        Returns:
+            List[Dict[str, Any]]: The encoded attributes.
+        """
+        return [{"key": key, "value": cls.attribute_value(value)} for key, value in attributes.items()]
+
+    def encode(self, span) -> Dict[str, Any]:
+        """
+        Encode a span as an OTLP ``Span``.
+
+        Args:
+            span (Span): The finished span.
+
+        Returns:
+            Dict[str, Any]: The encoded span.
+        """
+        encoded = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": self.SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(span.start_time),
+            "endTimeUnixNano": str(span.end_time),
+            "attributes": self.attributes(span.attributes),
+            "status": {"code": self.STATUS_UNSET},
+        }
+        if span.parent_id is not None:
+            encoded["parentSpanId"] = span.parent_id
+        if span.error is not None:
+            encoded["status"] = {"code": self.STATUS_ERROR, "message": span.error}
+        return encoded
+
+    def export(self, span) -> None:
+        """
+        Buffer a finished span, writing the buffer when it is full.
+
+        Args:
+            span (Span): The finished span.
+        """
+        encoded = self.encode(span)
+        with self._lock:
+            self._buffer.append(encoded)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write the buffered spans as one ``ExportTraceServiceRequest`` line and flush the file.
+        """
+        with self._lock:
+            spans, self._buffer = self._buffer, []
+        if spans:
+            self._write({"resourceSpans": [{
+                "resource": {"attributes": self.attributes({"service.name": self.service_name})},
+                "scopeSpans": [{"scope": {"name": "lib.commons.Tracer"}, "spans": spans}],
+            }]})
+        super().flush()
@@ -0,0 +1,226 @@
+"""
+StructuredLogging Module
+
+This module configures the logging of the application: leveled, structured log records
+written off the request threads.
+
+Modules get their logger with :func:`get_logger` (``logger = get_logger(__name__)``) and log
+with the standard :mod:`logging` API; structured fields are passed with ``extra``:
+
+    >>> logger = get_logger(__name__)
+    >>> logger.info("embedding batch failed, retrying", extra={"attempt": 2, "batch_size": 32})
+
+Importing or logging from a module has no side effect on the logging configuration: without
+handlers, the records propagate to the handlers of the host application, as for any library.
+The entry points (``main.py``, the scripts) call :func:`configure`, which installs a
+:class:`~logging.handlers.QueueHandler` on the application logger (``lib``). The request thread
+then only formats the message and appends the record to an in-memory queue; a
+:class:`~logging.handlers.QueueListener` thread writes the records to the output stream, so log
+I/O never blocks a request. Records are rendered as text (``key=value`` fields) or as JSON
+lines, depending on ``LOG_FORMAT``, and the level of the application loggers (``lib.*``)
+comes from ``LOG_LEVEL`` (INFO by default).
+"""
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import IO, Any, Dict, Optional, Union
+
+from lib.commons.EnvironmentVariables import EnvironmentVariables
+
+env = EnvironmentVariables()
+
+# Name of the parent logger of every module of the application.
+APPLICATION_LOGGER = "lib"
+
+FORMATS = ("text", "json")
+
+# Attributes of every LogRecord: the other attributes come from ``extra`` and are the fields.
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_lock = threading.Lock()
+_handler: Optional[QueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+
+def record_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    """
+    Return the structured fields of a record (the ``extra`` of the logging call).
+
+    Args:
+        record (logging.LogRecord): The record.
+
+    Returns:
+        Dict[str, Any]: The fields, in insertion order.
+    """
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+def _timestamp(record: logging.LogRecord) -> str:
+    """Return the creation time of a record in ISO 8601 format, UTC, with milliseconds."""
+    return datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds")
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formatter rendering a record as one JSON object: time, level, logger, message, thread,
+    the structured fields and the exception, if any.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        Render a record.
+
+        Args:
+            record (logging.LogRecord): The record.
+
+        Returns:
+            str: The JSON line (without newline).
+        """
+        entry = {
+            "time": _timestamp(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        entry.update(record_fields(record))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class KeyValueFormatter(logging.Formatter):
+    """
+    Formatter rendering a record as ``<time> <LEVEL> <logger>: <message> key=value ...``,
+    followed by the exception, if any.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        Render a record.
+
+        Args:
+            record (logging.LogRecord): The record.
+
+        Returns:
+            str: The line, and the traceback lines of the exception.
+        """
+        line = f"{_timestamp(record)} {record.levelname} {record.name}: {record.getMessage()}"
+        for key, value in record_fields(record).items():
+            text = str(value)
+            if not text or any(character.isspace() or character in "\"=" for character in text):
+                text = json.dumps(text)
+            line += f" {key}={text}"
+        exception = self.formatException(record.exc_info) if record.exc_info else record.exc_text
+        return f"{line}\n{exception}" if exception else line
+
+
+class _QueueHandler(QueueHandler):
+    """Queue handler keeping the structured fields of the records it enqueues."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Merge the message arguments and render the exception in the calling thread (the
+        arguments and the traceback may change or be freed before the listener runs), but leave
+        the formatting to the listener.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure(level: Union[str, int, None] = None, fmt: Optional[str] = None, stream: Optional[IO[str]] = None,
+              force: bool = False) -> bool:
+    """
+    Configure the logging of the application. Called by the entry points, never on import.
+
+    The level applies to the application loggers. The queue handler is installed on the
+    application logger, which then stops propagating its records to the root logger: the
+    handlers of the root logger (and the records of other libraries) are left alone. It is
+    installed only when the application logger has no handler yet, or with ``force``, which
+    replaces the handler installed by a previous call.
+
+    Args:
+        level (Union[str, int, None], optional): Level of the application loggers. Defaults to
+            the LOG_LEVEL environment variable, then INFO.
+        fmt (Optional[str], optional): ``"text"`` or ``"json"``. Defaults to the LOG_FORMAT
+            environment variable, then text.
+        stream (Optional[IO[str]], optional): The output stream. Defaults to standard error.
+        force (bool, optional): Install the handler even if the application logger has handlers.
+            Defaults to False.
+
+    Returns:
+        bool: True if the queue handler was installed.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    global _handler, _listener
+    fmt = (fmt or env.get_log_format("text")).lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown log format: {fmt} (expected one of {', '.join(FORMATS)})")
+    level = level if level is not None else env.get_log_level("INFO")
+    application = logging.getLogger(APPLICATION_LOGGER)
+    application.setLevel(level.upper() if isinstance(level, str) else level)
+
+    with _lock:
+        if not force and application.handlers:
+            return False
+        _stop()
+        output = logging.StreamHandler(stream if stream is not None else sys.stderr)
+        output.setFormatter(JsonFormatter() if fmt == "json" else KeyValueFormatter())
+        records = queue.SimpleQueue()
+        _handler = _QueueHandler(records)
+        _listener = QueueListener(records, output, respect_handler_level=True)
+        application.addHandler(_handler)
+        application.propagate = False
+        _listener.start()
+        return True
+
+
+def _stop() -> None:
+    """Remove the installed queue handler and stop its listener after it writes the queued records."""
+    global _handler, _listener
+    if _handler is not None:
+        application = logging.getLogger(APPLICATION_LOGGER)
+        application.removeHandler(_handler)
+        application.propagate = True
+        _listener.stop()
+        _handler = _listener = None
+
+
+def shutdown() -> None:
+    """
+    Write the queued records and remove the handler installed by :func:`configure`. Called at exit.
+    """
+    with _lock:
+        _stop()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Return the logger of a module: :func:`logging.getLogger`, without configuring anything.
+
+    Args:
+        name (str): The module name (``__name__``).
+
+    Returns:
+        logging.Logger: The logger.
+    """
+    return logging.getLogger(name)
+
+
+atexit.register(shutdown)
@@ -0,0 +1,422 @@
+"""
+Tracer Module
+
+This module provides a lightweight tracing surface for the LLM and retrieval call paths.
+A span measures one operation (an executor call, a provider request, a tool call, a
+knowledge base query) with its start and end times, attributes (model, tokens, tool name,
+...) and error status. Spans opened while another span is active become its children, so a
+trace shows where the time of a request goes: prompt formatting and normalization (the
+provider span minus its children), network and model (request spans) and tool execution.
+
+Finished spans are handed to the exporters (see :mod:`lib.commons.SpanExporter`).
+
+Tracing is disabled by default. While disabled, :meth:`Tracer.span` returns a shared no-op
+span and :func:`traced` functions call straight through, so instrumented code pays one
+attribute check per call.
+
+Example:
+    >>> from lib.commons.SpanExporter import InMemorySpanExporter
+    >>> exporter = InMemorySpanExporter()
+    >>> tracer = Tracer.get_instance().enable(exporter)
+    >>> with tracer.span("work", {"items": 3}) as span:
+    ...     span.set_attribute("done", True)
+"""
+
+import functools
+import inspect
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    A timed operation of a trace.
+
+    Identifiers follow the OpenTelemetry sizes: 128-bit trace ids and 64-bit span ids, as
+    lowercase hexadecimal strings.
+
+    Attributes:
+        name (str): The operation name, e.g. ``"llm.ask"``.
+        trace_id (str): Identifier shared by all spans of a trace.
+        span_id (str): Identifier of the span.
+        parent_id (Optional[str]): Identifier of the parent span, None for a root span.
+        start_time (int): Start, in nanoseconds since the epoch.
+        end_time (Optional[int]): End, in nanoseconds since the epoch, None while running.
+        attributes (Dict[str, Any]): Attributes of the operation.
+        error (Optional[str]): Description of the error that ended the span, or None.
+    """
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_time", "end_time", "attributes", "error",
+                 "_started", "_tracer")
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"] = None,
+                 attributes: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Start a span. Use :meth:`Tracer.span` or :meth:`Tracer.start_span` instead.
+
+        Args:
+            tracer (Tracer): The tracer exporting the span when it ends.
+            name (str): The operation name.
+            parent (Optional[Span], optional): The parent span. Defaults to None (root span).
+            attributes (Optional[Dict[str, Any]], optional): Initial attributes. Defaults to None.
+        """
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = dict(attributes) if attributes else {}
+        self.error = None
+        self.end_time = None
+        self.start_time = time.time_ns()
+        self._started = time.perf_counter_ns()
+        self._tracer = tracer
+
+    @property
+    def recording(self) -> bool:
+        """bool: True for real spans, False for the no-op span returned while tracing is disabled."""
+        return True
+
+    @property
+    def duration(self) -> Optional[float]:
+        """Optional[float]: Duration in seconds, None while running."""
+        return None if self.end_time is None else (self.end_time - self.start_time) / 1e9
+
+    def set_attribute(self, key: str, value: Any) -> "Span":
+        """
+        Set an attribute.
+
+        Args:
+            key (str): The attribute name.
+            value (Any): The value (a string, number, boolean or a list of those).
+
+        Returns:
+            Span: Self for method chaining.
+        """
+        self.attributes[key] = value
+        return self
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> "Span":
+        """
+        Set several attributes.
+
+        Args:
+            attributes (Dict[str, Any]): The attributes.
+
+        Returns:
+            Span: Self for method chaining.
+        """
+        self.attributes.update(attributes)
+        return self
+
+    def record_error(self, error: BaseException) -> "Span":
+        """
+        Mark the span as failed.
+
+        Args:
+            error (BaseException): The error.
+
+        Returns:
+            Span: Self for method chaining.
+        """
+        self.error = f"{type(error).__name__}: {error}"
+        return self
+
+    def end(self) -> None:
+        """End the span and export it. Ending a span twice has no effect."""
+        if self.end_time is not None:
+            return
+        # Durations come from the monotonic clock, the start from the wall clock.
+        self.end_time = self.start_time + time.perf_counter_ns() - self._started
+        self._tracer.export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize the span into a plain dictionary.
+
+        Returns:
+            Dict[str, Any]: The span fields and its duration in seconds.
+        """
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration": self.duration,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+    def __repr__(self) -> str:
+        return f"Span(name={self.name!r}, duration={self.duration!r}, error={self.error!r})"
+
+
+class _NoopSpan:
+    """Span returned while tracing is disabled: every method does nothing."""
+
+    __slots__ = ()
+
+    recording = False
+    error = None
+
+    def set_attribute(self, key: str, value: Any) -> "_NoopSpan":
+        return self
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> "_NoopSpan":
+        return self
+
+    def record_error(self, error: BaseException) -> "_NoopSpan":
+        return self
+
+    def end(self) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer(object):
+    """
+    Singleton entry point of tracing.
+
+    Attributes:
+        __instance: The singleton instance of the class.
+        enabled (bool): Whether spans are recorded.
+        exporters (List[SpanExporter]): The exporters receiving the finished spans.
+    """
+
+    __instance = None
+
+    @classmethod
+    def get_instance(cls):
+        """
+        Get the singleton instance of Tracer.
+
+        Returns:
+            Tracer: The singleton instance.
+        """
+        if cls.__instance is None:
+            cls()
+        return cls.__instance
+
+    def __init__(self):
+        """
+        Initialize the singleton instance, with tracing disabled.
+
+        Raises:
+            Exception: If an instance already exists (singleton violation).
+        """
+        if Tracer.__instance is not None:
+            raise Exception("This class is a singleton!")
+        else:
+            Tracer.__instance = self
+        self.enabled = False
+        self.exporters: List = []
+
+    def enable(self, *exporters) -> "Tracer":
+        """
+        Start recording spans.
+
+        Args:
+            *exporters (SpanExporter): Exporters added to the current ones.
+
+        Returns:
+            Tracer: Self for method chaining.
+        """
+        self.exporters.extend(exporters)
+        self.enabled = True
+        return self
+
+    def disable(self) -> "Tracer":
+        """
+        Stop recording spans, and flush and remove the exporters.
+
+        Returns:
+            Tracer: Self for method chaining.
+        """
+        self.enabled = False
+        exporters, self.exporters = self.exporters, []
+        for exporter in exporters:
+            exporter.shutdown()
+        return self
+
+    def export(self, span: Span) -> None:
+        """
+        Hand a finished span to every exporter. Exporter errors never reach the traced code.
+
+        Args:
+            span (Span): The finished span.
+        """
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception:
+                pass
+
+    def current_span(self):
+        """
+        Return the active span of the current context.
+
+        Returns:
+            Span: The active span, or the no-op span when there is none or tracing is disabled.
+        """
+        span = _current_span.get() if self.enabled else None
+        return NOOP_SPAN if span is None else span
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        """
+        Start a span, child of the active span, without activating it. End it with :meth:`Span.end`.
+
+        Args:
+            name (str): The operation name.
+            attributes (Optional[Dict[str, Any]], optional): Initial attributes. Defaults to None.
+
+        Returns:
+            Span: The span (the no-op span when tracing is disabled).
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, _current_span.get(), attributes)
+
+    def span(self, name: str, attributes: Optional[Dict[str, Any]] = None, end_on_exit: bool = True):
+        """
+        Context manager running its block in a new active span.
+
+        An error raised in the block is recorded on the span, which is then ended and the error
+        re-raised.
+
+        Args:
+            name (str): The operation name.
+            attributes (Optional[Dict[str, Any]], optional): Initial attributes. Defaults to None.
+            end_on_exit (bool, optional): End the span when the block completes. Pass False when
+                the operation continues after the block (e.g. a returned stream) and end it with
+                :meth:`trace_response`. Defaults to True.
+
+        Returns:
+            ContextManager[Span]: The span (the no-op span when tracing is disabled).
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        return self._activate(Span(self, name, _current_span.get(), attributes), end_on_exit)
+
+    @contextmanager
+    def _activate(self, span: Span, end_on_exit: bool):
+        """Make ``span`` the active span for the duration of the block."""
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as error:
+            span.record_error(error)
+            span.end()
+            raise
+        finally:
+            _current_span.reset(token)
+        if end_on_exit:
+            span.end()
+
+    @staticmethod
+    def record_usage(span, response) -> None:
+        """
+        Copy the token usage and streaming timings of an LLMResponse onto a span.
+
+        Args:
+            span (Span): The span.
+            response (LLMResponse): The response, or the final chunk of a stream.
+        """
+        usage = getattr(response, "usage", None)
+        if isinstance(usage, dict):
+            for key in ("prompt_tokens", "completion_tokens"):
+                if usage.get(key) is not None:
+                    span.set_attribute(f"tokens.{key.split('_')[0]}", usage[key])
+        timings = getattr(response, "timings", None)
+        if isinstance(timings, dict) and timings.get("time_to_first_token") is not None:
+            span.set_attribute("time_to_first_token", timings["time_to_first_token"])
+        finish_reason = getattr(response, "finish_reason", None)
+        if isinstance(finish_reason, str):
+            span.set_attribute("finish_reason", finish_reason)
+
+    def trace_response(self, span, response):
+        """
+        End a span opened with ``end_on_exit=False`` once its response is complete.
+
+        A response is complete immediately; a stream (iterator) when it is exhausted, closed or
+        fails, so that the span covers the whole generation.
+
+        Args:
+            span (Span): The span of the call.
+            response: The LLMResponse, stream of LLMResponse chunks, or any other result.
+
+        Returns:
+            The response, or a stream yielding the same chunks.
+        """
+        if not span.recording:
+            return response
+        if hasattr(response, "__next__"):
+            return self._trace_stream(span, response)
+        self.record_usage(span, response)
+        span.end()
+        return response
+
+    def _trace_stream(self, span: Span, stream: Iterator) -> Iterator:
+        """Yield the chunks of ``stream``, then end ``span`` with the usage of the final chunk."""
+        chunks = 0
+        try:
+            for chunk in stream:
+                chunks += 1
+                if getattr(chunk, "done", False):
+                    self.record_usage(span, chunk)
+                yield chunk
+        except BaseException as error:
+            span.record_error(error)
+            raise
+        finally:
+            span.set_attribute("chunks", chunks)
+            span.end()
+
+
+def traced(name: str, *arguments: str) -> Callable:
+    """
+    Decorator running every call of a function in a span.
+
+    The span ends with the result of the call (see :meth:`Tracer.trace_response`): a returned
+    stream is covered until it is exhausted, closed or fails, and the usage of a returned
+    :class:`LLMResponse` (or of the final chunk of a stream) is recorded on the span.
+
+    Args:
+        name (str): The span name.
+        *arguments (str): Names of parameters recorded as span attributes (e.g. ``"top_n"``).
+
+    Returns:
+        Callable: The decorator.
+    """
+    def decorator(function: Callable) -> Callable:
+        signature = inspect.signature(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            tracer = Tracer.get_instance()
+            if not tracer.enabled:
+                return function(*args, **kwargs)
+            attributes = None
+            if arguments:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                attributes = {argument: bound.arguments[argument] for argument in arguments}
+            with tracer.span(name, attributes, end_on_exit=False) as span:
+                return tracer.trace_response(span, function(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
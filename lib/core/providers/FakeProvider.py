@@ -0,0 +1,332 @@
+"""
+FakeProvider Module
+
+This module provides the FakeProvider class, a local stand-in implementing the Provider
+interface without any model, for load tests and benchmarks of the LLM stack. It is selected
+with ``LLM_PROVIDER=fake``.
+
+Every call simulates a model server:
+
+- a time to first token drawn from a configurable latency distribution (constant, uniform,
+  log-normal or exponential), covering queuing and prompt processing;
+- a number of output tokens generated at a configurable rate, streamed one token per chunk
+  when streaming is enabled;
+- tool calls in agentic chats (the tools are really invoked, after a simulated round trip);
+- errors raised with a configurable probability.
+
+Simulated waits honor the current :class:`Deadline`: a wait that would end after it is cut short
+and raises :class:`DeadlineExceeded`, like a request timing out.
+
+Responses are deterministic for a given seed and call order: the text is made of
+pseudo-random words, and embeddings are derived from the hashes of the words of the text,
+so that texts sharing words have similar embeddings.
+"""
+
+import hashlib
+import math
+import random
+import threading
+import time
+from typing import Callable, Iterator, List, Optional, Union
+
+from lib.commons.Deadline import Deadline, DeadlineExceeded, current_deadline
+from lib.commons.StructuredLogging import get_logger
+from lib.commons.Tracer import traced
+from lib.core.providers.LLMProvider import Provider, measured
+from lib.core.providers.model.LLMProviderConfiguration import ProviderConfiguration
+from lib.core.providers.model.LLMResponse import LLMResponse
+from lib.core.providers.model.StreamAggregator import StreamAggregator
+
+logger = get_logger(__name__)
+
+DISTRIBUTIONS = ("constant", "uniform", "lognormal", "exponential")
+
+WORDS = ("the", "model", "answer", "data", "request", "token", "latency", "result", "system", "value",
+         "service", "query", "context", "user", "step", "output", "input", "cache", "batch", "stream")
+
+
+class FakeProviderError(RuntimeError):
+    """Error raised by the FakeProvider to simulate a failing backend."""
+
+
+class FakeProvider(Provider):
+    """
+    Singleton provider simulating an LLM backend.
+
+    The simulation parameters are set with :meth:`configure` and apply to every later call.
+
+    Attributes:
+        __instance: The singleton instance of the class.
+        distribution (str): Distribution of the time to first token: ``"constant"``,
+            ``"uniform"`` (between 0 and twice the mean), ``"lognormal"`` or ``"exponential"``.
+        latency (float): Mean (median for ``"lognormal"``) time to first token, in seconds.
+        jitter (float): Standard deviation of the log of the latency (``"lognormal"`` only).
+        tokens_per_second (float): Generation rate after the first token (0 for instant output).
+        output_tokens (int): Number of tokens of every answer.
+        error_rate (float): Probability that a call raises :class:`FakeProviderError`.
+        tool_call_rate (float): Probability that an agentic chat calls its tools.
+        tool_latency (float): Simulated round trip of the tool-calling request, in seconds.
+        tool_arguments (Optional[dict]): Keyword arguments per tool name; tools missing from
+            it are called without arguments. None calls every tool without arguments.
+        embedding_dimensions (int): Size of the embeddings.
+        embed_latency (float): Duration of an embedding request, in seconds.
+        seed (int): Seed of the simulation.
+        calls (int): Number of chat calls made.
+    """
+
+    __instance = None
+
+    DEFAULTS = {
+        "distribution": "lognormal",
+        "latency": 0.2,
+        "jitter": 0.5,
+        "tokens_per_second": 50.0,
+        "output_tokens": 64,
+        "error_rate": 0.0,
+        "tool_call_rate": 1.0,
+        "tool_latency": 0.1,
+        "tool_arguments": None,
+        "embedding_dimensions": 64,
+        "embed_latency": 0.0,
+        "seed": 0,
+    }
+
+    @classmethod
+    def get_instance(cls):
+        """
+        Get the singleton instance of FakeProvider.
+
+        Returns:
+            FakeProvider: The singleton instance.
+        """
+        if cls.__instance is None:
+            cls()
+        return cls.__instance
+
+    def __init__(self):
+        """
+        Initialize the singleton instance of FakeProvider with the default simulation parameters.
+
+        Raises:
+            Exception: If an instance already exists (singleton violation).
+        """
+        if FakeProvider.__instance is not None:
+            raise Exception("This class is a singleton!")
+        else:
+            FakeProvider.__instance = self
+        self.sleep: Callable[[float], None] = time.sleep
+        self._lock = threading.Lock()
+        self.configure(**self.DEFAULTS)
+
+    def configure(self, sleep: Callable[[float], None] = None, **settings) -> "FakeProvider":
+        """
+        Change simulation parameters (see the class attributes) and restart the call sequence.
+
+        Args:
+            sleep (Callable[[float], None], optional): Function used to wait, e.g. a no-op in
+                tests. Defaults to the current one (``time.sleep`` initially).
+            **settings: New values of the simulation parameters.
+
+        Returns:
+            FakeProvider: Self for method chaining.
+
+        Raises:
+            ValueError: If a parameter or the distribution is unknown.
+        """
+        unknown = set(settings) - set(self.DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown FakeProvider settings: {', '.join(sorted(unknown))}")
+        if "distribution" in settings and settings["distribution"] not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {settings['distribution']}")
+        for name, value in settings.items():
+            setattr(self, name, value)
+        if sleep is not None:
+            self.sleep = sleep
+        with self._lock:
+            self.calls = 0
+        return self
+
+    def _next_random(self) -> random.Random:
+        """Return the random generator of the next call (deterministic for a seed and call order)."""
+        with self._lock:
+            self.calls += 1
+            return random.Random(f"{self.seed}:{self.calls}")
+
+    def sample_latency(self, rng: random.Random) -> float:
+        """
+        Draw a time to first token.
+
+        Args:
+            rng (random.Random): The random generator of the call.
+
+        Returns:
+            float: The latency in seconds.
+        """
+        if self.latency <= 0:
+            return 0.0
+        if self.distribution == "constant":
+            return self.latency
+        if self.distribution == "uniform":
+            return rng.uniform(0.0, 2.0 * self.latency)
+        if self.distribution == "exponential":
+            return rng.expovariate(1.0 / self.latency)
+        return rng.lognormvariate(math.log(self.latency), self.jitter)
+
+    def _wait(self, seconds: float, deadline: Optional[Deadline]) -> None:
+        """Wait for a simulated duration, or until the deadline and raise DeadlineExceeded."""
+        if deadline is not None:
+            deadline.check()
+            remaining = deadline.remaining()
+            if remaining is not None and remaining < seconds:
+                self.sleep(remaining)
+                raise DeadlineExceeded(f"Deadline exceeded during a simulated wait of {seconds:.3f}s")
+        self.sleep(seconds)
+
+    def _start(self, rng: random.Random, deadline: Optional[Deadline]) -> None:
+        """Raise the simulated error, if drawn, then wait for the first token."""
+        if rng.random() < self.error_rate:
+            logger.debug("Simulating a provider error", extra={"call": self.calls})
+            raise FakeProviderError("Simulated provider error")
+        self._wait(self.sample_latency(rng), deadline)
+
+    def _tokens(self, rng: random.Random) -> List[str]:
+        """Return the output tokens of a call."""
+        return [(" " if i else "") + rng.choice(WORDS) for i in range(self.output_tokens)]
+
+    @staticmethod
+    def _usage(prompt_tokens: int, completion_tokens: int) -> dict:
+        """Build the usage dictionary of a response."""
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def _respond(self, rng: random.Random, prompt_tokens: int,
+                 stream: bool) -> Union[LLMResponse, Iterator[LLMResponse]]:
+        """Generate the answer of a call, streamed or not."""
+        started_at = time.perf_counter()
+        deadline = current_deadline()
+        self._start(rng, deadline)
+        tokens = self._tokens(rng)
+        if stream:
+            return self._stream(tokens, prompt_tokens, started_at, deadline)
+        if self.tokens_per_second > 0 and len(tokens) > 1:
+            self._wait((len(tokens) - 1) / self.tokens_per_second, deadline)
+        return LLMResponse(content="".join(tokens), finish_reason="stop",
+                           usage=self._usage(prompt_tokens, len(tokens)))
+
+    def _stream(self, tokens: List[str], prompt_tokens: int, started_at: float,
+                deadline: Optional[Deadline] = None) -> Iterator[LLMResponse]:
+        """Yield one chunk per token at the configured rate, then the final chunk with usage and timings."""
+        aggregator = StreamAggregator(started_at)
+        for i, token in enumerate(tokens):
+            if i and self.tokens_per_second > 0:
+                self._wait(1.0 / self.tokens_per_second, deadline)
+            aggregator.observe(token)
+            yield LLMResponse(content=token, done=False)
+        usage = self._usage(prompt_tokens, len(tokens))
+        yield LLMResponse(content="", finish_reason="stop", usage=usage, done=True,
+                          timings=aggregator.timings(len(tokens)))
+
+    @staticmethod
+    def _count(*texts: Optional[str]) -> int:
+        """Approximate the number of prompt tokens by counting words."""
+        return sum(len(text.split()) for text in texts if text)
+
+    @traced("fake.simple_chat", "model")
+    @measured("fake", "simple_chat")
+    def simple_chat(self, prompt: str, model: str, system_prompt: str = None, config: ProviderConfiguration = None) -> \
+            Union[LLMResponse, Iterator[LLMResponse]]:
+        """
+        Simulate a simple chat.
+
+        Args:
+            prompt (str): The user prompt.
+            model (str): The model name (ignored).
+            system_prompt (str, optional): The system prompt.
+            config (ProviderConfiguration, optional): Configuration for the chat.
+
+        Returns:
+            Union[LLMResponse, Iterator[LLMResponse]]: The response or streaming generator.
+
+        Raises:
+            FakeProviderError: With probability :attr:`error_rate`.
+        """
+        stream = bool(config.get_stream()) if config is not None else False
+        return self._respond(self._next_random(), self._count(system_prompt, prompt), stream)
+
+    @traced("fake.agentic_chat", "model")
+    @measured("fake", "agentic_chat")
+    def agentic_chat(self, prompt: str, model: str, system_prompt: str, assistant_prompt: str, tools: dict,
+                     config: ProviderConfiguration = None) -> Union[LLMResponse, Iterator[LLMResponse]]:
+        """
+        Simulate an agentic chat: a tool-calling round trip, then the final answer.
+
+        Args:
+            prompt (str): The user prompt.
+            model (str): The model name (ignored).
+            system_prompt (str): The system prompt.
+            assistant_prompt (str): The assistant prompt.
+            tools (dict): Dictionary mapping tool name to callable.
+            config (ProviderConfiguration, optional): Configuration for the chat.
+
+        Returns:
+            Union[LLMResponse, Iterator[LLMResponse]]: The response or streaming generator.
+
+        Raises:
+            FakeProviderError: With probability :attr:`error_rate`.
+        """
+        rng = self._next_random()
+        stream = bool(config.get_stream()) if config is not None else False
+        prompt_tokens = self._count(system_prompt, prompt, assistant_prompt)
+        if tools and rng.random() < self.tool_call_rate:
+            self._wait(self.tool_latency, current_deadline())
+            arguments = self.tool_arguments or {}
+            for name, tool in tools.items():
+                result = self.call_tool(name, tool, arguments.get(name, {}))
+                prompt_tokens += self._count(str(result))
+        return self._respond(rng, prompt_tokens, stream)
+
+    def _embedding(self, text: str) -> List[float]:
+        """Compute the normalized sum of the pseudo-random vectors of the words of a text."""
+        vector = [0.0] * self.embedding_dimensions
+        for word in text.lower().split():
+            digest = hashlib.blake2b(f"{self.seed}:{word}".encode("utf-8"), digest_size=8).digest()
+            word_rng = random.Random(int.from_bytes(digest, "little"))
+            for i in range(self.embedding_dimensions):
+                vector[i] += word_rng.gauss(0.0, 1.0)
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    @traced("fake.embed")
+    @measured("fake", "embed")
+    def embed(self, text: str, embedding_model: str = None) -> List[float]:
+        """
+        Return a deterministic embedding: texts sharing words have similar embeddings.
+
+        Args:
+            text (str): The text to embed.
+            embedding_model (str, optional): The embedding model (ignored).
+
+        Returns:
+            List[float]: The embedding vector.
+        """
+        if self.embed_latency > 0:
+            self._wait(self.embed_latency, current_deadline())
+        return self._embedding(text)
+
+    @traced("fake.embed_batch")
+    @measured("fake", "embed_batch")
+    def embed_batch(self, texts: List[str], embedding_model: str = None) -> List[List[float]]:
+        """
+        Embed several texts in one simulated request.
+
+        Args:
+            texts (List[str]): The texts to embed.
+            embedding_model (str, optional): The embedding model (ignored).
+
+        Returns:
+            List[List[float]]: One embedding vector per text, in input order.
+        """
+        self.record_batch("fake", texts)
+        if self.embed_latency > 0 and texts:
+            self._wait(self.embed_latency, current_deadline())
+        return [self._embedding(text) for text in texts]
@@ -1,5 +1,54 @@
+import functools
+import time
 from abc import abstractmethod, ABC
-from typing import List, Any
+from typing import Any, Callable, List
+
+from lib.commons.Deadline import check_deadline
+from lib.commons.Metrics import Metrics, SIZE_BUCKETS
+from lib.commons.Tracer import Tracer
+
+metrics = Metrics.get_instance()
+tracer = Tracer.get_instance()
+
+provider_requests = metrics.counter("provider_requests_total", "Provider calls.", ("provider", "operation"))
+provider_errors = metrics.counter("provider_errors_total", "Provider calls that raised an error.",
+                                  ("provider", "operation", "error"))
+provider_seconds = metrics.histogram("provider_request_seconds",
+                                     "Duration of provider calls, until the response or the stream is returned.",
+                                     ("provider", "operation"))
+embedding_batch_size = metrics.histogram("embedding_batch_size", "Number of texts per embedding request.",
+                                         ("provider",), buckets=SIZE_BUCKETS)
+tool_calls = metrics.counter("tool_calls_total", "Tool calls made for agentic chats.", ("tool",))
+tool_errors = metrics.counter("tool_errors_total", "Tool calls that raised an error.", ("tool", "error"))
+tool_seconds = metrics.histogram("tool_call_seconds", "Duration of tool calls.", ("tool",))
+
+
+def measured(provider: str, operation: str) -> Callable:
+    """
+    Decorator counting the calls, errors and duration of a provider method.
+
+    :param provider: The provider label, e.g. "ollama".
+    :param operation: The operation label, e.g. "simple_chat".
+
+    :return: the decorator.
+    """
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            provider_requests.inc(provider, operation)
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            except Exception as error:
+                provider_errors.inc(provider, operation, type(error).__name__)
+                raise
+            finally:
+                provider_seconds.observe(time.perf_counter() - started, provider, operation)
+
+        return wrapper
+
+    return decorator
+
 
 class Provider(ABC):
     """
@@ -102,3 +151,59 @@ class Provider(ABC):
         :return: the embedding vector generated by the embedding model.
         """
         pass
+
+    def embed_batch(
+            self,
+            texts: List[str],
+            embedding_model: str = None
+    ) -> List[List[float]]:
+        """
+        Embed several strings, in the same order.
+
+        The default implementation calls :meth:`embed` once per text; providers whose backend
+        accepts several inputs per request override it to embed the whole batch at once.
+
+        :param texts: The input strings to be embedded.
+        :param embedding_model: Optional, the embedding model identifier (provider default if None).
+
+        :return: one embedding vector per input string.
+        """
+        kwargs = {} if embedding_model is None else {"embedding_model": embedding_model}
+        return [self.embed(text=text, **kwargs) for text in texts]
+
+    @staticmethod
+    def call_tool(name: str, tool: Callable, arguments: dict) -> Any:
+        """
+        Call a tool requested by the model, in a ``tool.call`` span, recording its latency and errors.
+
+        The tool is not called once the current deadline (see :class:`Deadline`) expired.
+
+        :param name: The tool name.
+        :param tool: The tool function.
+        :param arguments: The keyword arguments chosen by the model.
+
+        :return: the result of the tool.
+        """
+        check_deadline()
+        tool_calls.inc(name)
+        started = time.perf_counter()
+        try:
+            with tracer.span("tool.call", {"tool": name}):
+                return tool(**arguments)
+        except Exception as error:
+            tool_errors.inc(name, type(error).__name__)
+            raise
+        finally:
+            tool_seconds.observe(time.perf_counter() - started, name)
+
+    @staticmethod
+    def record_batch(provider: str, texts: List[str]) -> None:
+        """
+        Record the size of an embedding request on the active span and in the batch size histogram.
+
+        :param provider: The provider label.
+        :param texts: The texts of the request.
+        """
+        tracer.current_span().set_attribute("batch_size", len(texts))
+        if texts:
+            embedding_batch_size.observe(len(texts), provider)
@@ -2,14 +2,15 @@
 LLMProviderFactory Module
 
 This module provides a factory class for creating instances of LLM providers based on
-environment configuration. It supports different providers like Ollama and LiteLLM and returns
-the appropriate singleton instance.
+environment configuration. It supports different providers like Ollama and LiteLLM (plus a
+simulated provider for load tests) and returns the appropriate singleton instance.
 """
 
 from lib.commons.Constants import Constants
 from lib.commons.EnvironmentVariables import EnvironmentVariables
 from lib.core.providers.OllamaProvider import OllamaProvider
 from lib.core.providers.LiteLLMProvider import LiteLLMProvider
+from lib.core.providers.FakeProvider import FakeProvider
 
 env = EnvironmentVariables()
 LLM_PROVIDER = env.get_llm_provider('ollama')
@@ -17,13 +18,14 @@ LLM_PROVIDER = env.get_llm_provider('ollama')
 const = Constants.get_instance()
 ollama_provider = OllamaProvider.get_instance()
 litellm_provider = LiteLLMProvider.get_instance()
+fake_provider = FakeProvider.get_instance()
 
 class LLMProviderFactory:
     """
     Factory class to get the appropriate LLM provider instance based on configuration.
 
     This class uses the LLM_PROVIDER environment variable to determine which provider
-    to instantiate. Supports Ollama and LiteLLM providers.
+    to instantiate. Supports Ollama and LiteLLM providers, and the FakeProvider (``fake``).
     """
     @classmethod
     def get_instance(cls):
@@ -34,11 +36,14 @@ class LLMProviderFactory:
         is not recognized, returns None.
 
         Returns:
-            OllamaProvider, LiteLLMProvider, or None: The LLM provider instance or None if unsupported.
+            OllamaProvider, LiteLLMProvider, FakeProvider, or None: The LLM provider instance or None
+                if unsupported.
         """
         if LLM_PROVIDER == const.llm_provider_ollama:
             return ollama_provider
         elif LLM_PROVIDER == const.llm_provider_litellm:
             return litellm_provider
+        elif LLM_PROVIDER == const.llm_provider_fake:
+            return fake_provider
         else:
             return None
\ No newline at end of file
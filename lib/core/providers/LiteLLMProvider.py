@@ -27,13 +27,22 @@ Model strings use the LiteLLM format: "<provider>/<model>", e.g.:
 
 import os
 import json
+import time
 from typing import Iterator, Union, List, Any
 
 import litellm
 
-from lib.core.providers.LLMProvider import Provider
+from lib.commons.Deadline import check_deadline, remaining_time
+from lib.commons.EnvironmentVariables import EnvironmentVariables
+from lib.commons.StructuredLogging import get_logger
+from lib.commons.Tracer import traced
+from lib.core.providers.LLMProvider import Provider, measured
 from lib.core.providers.model.LLMProviderConfiguration import ProviderConfiguration
 from lib.core.providers.model.LLMResponse import LLMResponse
+from lib.core.providers.model.StreamAggregator import StreamAggregator
+
+env = EnvironmentVariables()
+logger = get_logger(__name__)
 
 
 class LiteLLMProvider(Provider):
@@ -91,6 +100,63 @@ class LiteLLMProvider(Provider):
         """
         return os.getenv("LITELLM_API_BASE", None)
 
+    @staticmethod
+    def _request_stream_usage(kwargs: dict) -> dict:
+        """
+        Ask for the token usage in the last event of a stream, if the model accepts ``stream_options``.
+
+        Some OpenAI-compatible backends reject unknown parameters with a 400, so the option is
+        only sent when LiteLLM lists it among the supported parameters of the model.
+
+        Args:
+            kwargs (dict): The keyword arguments of the LiteLLM call, with the ``model``.
+
+        Returns:
+            dict: The keyword arguments.
+        """
+        if "stream_options" in (litellm.get_supported_openai_params(model=kwargs["model"]) or []):
+            kwargs["stream_options"] = {"include_usage": True}
+        return kwargs
+
+    @staticmethod
+    def _with_deadline(kwargs: dict) -> dict:
+        """
+        Set the ``timeout`` of a request to the time left before the current deadline, if any.
+
+        Args:
+            kwargs (dict): The keyword arguments of the LiteLLM call.
+
+        Returns:
+            dict: The keyword arguments.
+
+        Raises:
+            DeadlineExceeded: If the current deadline already expired.
+        """
+        remaining = remaining_time()
+        if remaining is not None:
+            check_deadline()
+            kwargs["timeout"] = remaining
+        return kwargs
+
+    @staticmethod
+    def _normalize_usage(usage_data) -> Union[dict, None]:
+        """
+        Normalize a LiteLLM Usage object to the LLMResponse usage dictionary.
+
+        Args:
+            usage_data: A LiteLLM Usage object, or None.
+
+        Returns:
+            dict or None: The token usage, or None if the backend did not report it.
+        """
+        if not usage_data:
+            return None
+        return {
+            "prompt_tokens": getattr(usage_data, 'prompt_tokens', None),
+            "completion_tokens": getattr(usage_data, 'completion_tokens', None),
+            "total_tokens": getattr(usage_data, 'total_tokens', None),
+        }
+
     @staticmethod
     def _normalize_response(raw) -> LLMResponse:
         """
@@ -103,40 +169,66 @@ class LiteLLMProvider(Provider):
             LLMResponse: The normalized response.
         """
         msg = raw.choices[0].message
-        usage_data = getattr(raw, 'usage', None)
         return LLMResponse(
             content=msg.content or "",
             role=msg.role or "assistant",
             finish_reason=raw.choices[0].finish_reason,
-            usage={
-                "prompt_tokens": getattr(usage_data, 'prompt_tokens', None),
-                "completion_tokens": getattr(usage_data, 'completion_tokens', None),
-                "total_tokens": getattr(usage_data, 'total_tokens', None),
-            } if usage_data else None,
+            usage=LiteLLMProvider._normalize_usage(getattr(raw, 'usage', None)),
         )
 
     @staticmethod
-    def _normalize_stream(raw_stream) -> Iterator[LLMResponse]:
+    def _normalize_stream(raw_stream, started_at: float = None) -> Iterator[LLMResponse]:
         """
         Wrap a streaming LiteLLM response in a generator that yields LLMResponse chunks.
 
+        With ``stream_options={"include_usage": True}`` (sent when the model supports it, see
+        :meth:`_request_stream_usage`) the backend reports token usage in the last event, which
+        may come after the event carrying ``finish_reason`` and may have no choices at all. The
+        finishing chunk is therefore held back until the stream is exhausted, and is yielded with
+        the reported ``usage`` and the measured ``timings``.
+
         Args:
             raw_stream: An iterable of LiteLLM streaming chunk objects.
+            started_at (float, optional): ``time.perf_counter()`` value at which the request was
+                sent, used for the time to first token. Defaults to the start of iteration.
 
         Yields:
             LLMResponse: One normalized chunk per streaming event.
         """
+        aggregator = StreamAggregator(started_at)
+        final = None
+        usage = None
         for chunk in raw_stream:
+            chunk_usage = LiteLLMProvider._normalize_usage(getattr(chunk, 'usage', None))
+            if chunk_usage is not None:
+                usage = chunk_usage
+            if not chunk.choices:
+                continue
             choice = chunk.choices[0]
             delta = choice.delta
-            done = choice.finish_reason is not None
-            yield LLMResponse(
-                content=getattr(delta, 'content', None) or "",
+            content = getattr(delta, 'content', None) or ""
+            aggregator.observe(content)
+            response = LLMResponse(
+                content=content,
                 role=getattr(delta, 'role', None) or "assistant",
-                done=done,
+                done=choice.finish_reason is not None,
                 finish_reason=choice.finish_reason,
             )
-
+            if response.done:
+                final = response
+            else:
+                yield response
+
+        if final is None and usage is None:
+            return
+        if final is None:
+            final = LLMResponse(content="", done=True)
+        final.usage = usage
+        final.timings = aggregator.timings((usage or {}).get("completion_tokens"))
+        yield final
+
+    @traced("litellm.simple_chat", "model")
+    @measured("litellm", "simple_chat")
     def simple_chat(
         self,
         prompt: str,
@@ -173,16 +265,21 @@ class LiteLLMProvider(Provider):
             "messages": _messages,
             "stream": stream,
         }
+        if stream:
+            self._request_stream_usage(kwargs)
         api_base = self._get_api_base()
         if api_base:
             kwargs["api_base"] = api_base
 
-        print(f"LiteLLMProvider: calling model='{model}' stream={stream}")
-        raw = litellm.completion(**kwargs)
+        logger.debug("LiteLLM completion", extra={"model": model, "stream": stream})
+        started_at = time.perf_counter()
+        raw = litellm.completion(**self._with_deadline(kwargs))
         if stream:
-            return self._normalize_stream(raw)
+            return self._normalize_stream(raw, started_at)
         return self._normalize_response(raw)
 
+    @traced("litellm.agentic_chat", "model")
+    @measured("litellm", "agentic_chat")
     def agentic_chat(
         self,
         prompt: str,
@@ -232,7 +329,7 @@ class LiteLLMProvider(Provider):
         if api_base:
             base_kwargs["api_base"] = api_base
 
-        print(f"LiteLLMProvider: agentic call model='{model}' stream={stream}")
+        logger.debug("LiteLLM agentic completion", extra={"model": model, "stream": stream, "tools": list(tools or ())})
 
         # Initial (non-streaming) call to detect tool invocations
         initial_kwargs = dict(base_kwargs)
@@ -241,7 +338,7 @@ class LiteLLMProvider(Provider):
             initial_kwargs["tools"] = list(tools.values())
             initial_kwargs["tool_choice"] = "auto"
 
-        response = litellm.completion(**initial_kwargs)
+        response = litellm.completion(**self._with_deadline(initial_kwargs))
         response_message = response.choices[0].message
         _messages.append(response_message)
 
@@ -252,7 +349,7 @@ class LiteLLMProvider(Provider):
                     arguments = tc.function.arguments
                     if isinstance(arguments, str):
                         arguments = json.loads(arguments)
-                    result = tools[name](**arguments)
+                    result = self.call_tool(name, tools[name], arguments)
                     _messages.append(
                         {
                             "role": "tool",
@@ -261,17 +358,22 @@ class LiteLLMProvider(Provider):
                         }
                     )
                 else:
-                    print(f"LiteLLMProvider: no tool available for '{name}'")
+                    logger.warning("No tool available for %s", name, extra={"tool": name, "model": model})
 
         # Final response with streaming control
         final_kwargs = dict(base_kwargs)
         final_kwargs["messages"] = _messages
         final_kwargs["stream"] = stream
-        raw_final = litellm.completion(**final_kwargs)
         if stream:
-            return self._normalize_stream(raw_final)
+            self._request_stream_usage(final_kwargs)
+        started_at = time.perf_counter()
+        raw_final = litellm.completion(**self._with_deadline(final_kwargs))
+        if stream:
+            return self._normalize_stream(raw_final, started_at)
         return self._normalize_response(raw_final)
 
+    @traced("litellm.embed", "embedding_model")
+    @measured("litellm", "embed")
     def embed(self, text: str, embedding_model: str) -> List[float]:
         """
         Generate embeddings for the given text using LiteLLM.
@@ -293,5 +395,34 @@ class LiteLLMProvider(Provider):
         if api_base:
             kwargs["api_base"] = api_base
 
-        response = litellm.embedding(**kwargs)
+        response = litellm.embedding(**self._with_deadline(kwargs))
         return response.data[0]["embedding"]
+
+    @traced("litellm.embed_batch", "embedding_model")
+    @measured("litellm", "embed_batch")
+    def embed_batch(self, texts: List[str], embedding_model: str = None) -> List[List[float]]:
+        """
+        Generate embeddings for several texts with a single LiteLLM request.
+
+        Args:
+            texts (List[str]): The texts to embed.
+            embedding_model (str, optional): The LiteLLM embedding model string. Defaults to the
+                EMBEDDING_MODEL environment variable.
+
+        Returns:
+            List[List[float]]: One embedding vector per text, in input order.
+
+        Raises:
+            litellm.AuthenticationError: When API key is missing or invalid.
+            litellm.APIError: For other API-level errors.
+        """
+        self.record_batch("litellm", texts)
+        if not texts:
+            return []
+        kwargs = {"model": embedding_model or env.get_embedding_model(), "input": list(texts)}
+        api_base = self._get_api_base()
+        if api_base:
+            kwargs["api_base"] = api_base
+
+        response = litellm.embedding(**self._with_deadline(kwargs))
+        return [item["embedding"] for item in response.data]
@@ -7,16 +7,47 @@ and text embedding. All chat responses are normalized to LLMResponse so that cal
 receive a consistent, provider-agnostic payload regardless of the underlying backend.
 """
 
+import time
 from typing import Iterator, Union, List
 
+import httpx
 import ollama as OllamaClient
 
+from lib.commons.Deadline import check_deadline, remaining_time
 from lib.commons.EnvironmentVariables import EnvironmentVariables
-from lib.core.providers.LLMProvider import Provider
+from lib.commons.StructuredLogging import get_logger
+from lib.commons.Tracer import traced
+from lib.core.providers.LLMProvider import Provider, measured
 from lib.core.providers.model.LLMProviderConfiguration import ProviderConfiguration
 from lib.core.providers.model.LLMResponse import LLMResponse
+from lib.core.providers.model.StreamAggregator import StreamAggregator
 
 env = EnvironmentVariables()
+logger = get_logger(__name__)
+
+
+def _apply_deadline(request: httpx.Request) -> None:
+    """
+    Time an HTTP request out when the current deadline (see :class:`Deadline`) expires.
+
+    Installed as a request event hook of the shared client, so that every request gets the
+    remaining time of its caller as its own timeout, without a client per deadline. A request
+    already sent is not interrupted when its deadline is cancelled: it ends at this timeout.
+
+    Args:
+        request (httpx.Request): The request about to be sent.
+
+    Raises:
+        DeadlineExceeded: If the current deadline already expired.
+    """
+    remaining = remaining_time()
+    if remaining is not None:
+        check_deadline()
+        request.extensions["timeout"] = httpx.Timeout(remaining).as_dict()
+
+
+# Client shared by all requests (and its connection pool), with the deadline of each request.
+client = OllamaClient.Client(event_hooks={"request": [_apply_deadline]})
 
 
 class OllamaProvider(Provider):
@@ -60,6 +91,25 @@ class OllamaProvider(Provider):
         else:
             OllamaProvider.__instance = self
 
+    @staticmethod
+    def _normalize_usage(raw) -> dict:
+        """
+        Build the LLMResponse usage dictionary from Ollama's evaluation counters.
+
+        Args:
+            raw: An Ollama ChatResponse (or the final streaming chunk).
+
+        Returns:
+            dict: The token usage.
+        """
+        prompt_tokens = getattr(raw, 'prompt_eval_count', None)
+        completion_tokens = getattr(raw, 'eval_count', None)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": (prompt_tokens or 0) + (completion_tokens or 0),
+        }
+
     @staticmethod
     def _normalize_response(raw) -> LLMResponse:
         """
@@ -71,41 +121,49 @@ class OllamaProvider(Provider):
         Returns:
             LLMResponse: The normalized response.
         """
-        prompt_tokens = getattr(raw, 'prompt_eval_count', None)
-        completion_tokens = getattr(raw, 'eval_count', None)
         return LLMResponse(
             content=raw.message.content or "",
             role=raw.message.role or "assistant",
             finish_reason=getattr(raw, 'done_reason', None),
-            usage={
-                "prompt_tokens": prompt_tokens,
-                "completion_tokens": completion_tokens,
-                "total_tokens": (prompt_tokens or 0) + (completion_tokens or 0),
-            },
+            usage=OllamaProvider._normalize_usage(raw),
             thinking=getattr(raw.message, 'thinking', None),
             done=getattr(raw, 'done', True),
         )
 
     @staticmethod
-    def _normalize_stream(raw_stream) -> Iterator[LLMResponse]:
+    def _normalize_stream(raw_stream, started_at: float = None) -> Iterator[LLMResponse]:
         """
         Wrap a streaming Ollama response in a generator that yields LLMResponse chunks.
 
+        Ollama reports ``prompt_eval_count``/``eval_count`` on the final (``done``) chunk; they
+        are exposed as ``usage`` on the final LLMResponse together with the measured ``timings``.
+
         Args:
             raw_stream: An iterable of Ollama ChatResponse streaming chunks.
+            started_at (float, optional): ``time.perf_counter()`` value at which the request was
+                sent, used for the time to first token. Defaults to the start of iteration.
 
         Yields:
             LLMResponse: One normalized chunk per Ollama streaming event.
         """
+        aggregator = StreamAggregator(started_at)
         for chunk in raw_stream:
             chunk_done = getattr(chunk, 'done', False)
-            yield LLMResponse(
-                content=chunk.message.content or "",
+            content = chunk.message.content or ""
+            aggregator.observe(content)
+            response = LLMResponse(
+                content=content,
                 role=chunk.message.role or "assistant",
                 done=chunk_done,
                 finish_reason=getattr(chunk, 'done_reason', None) if chunk_done else None,
             )
+            if chunk_done:
+                response.usage = OllamaProvider._normalize_usage(chunk)
+                response.timings = aggregator.timings(response.usage["completion_tokens"])
+            yield response
 
+    @traced("ollama.agentic_chat", "model")
+    @measured("ollama", "agentic_chat")
     def agentic_chat(self, prompt: str, model: str, system_prompt: str, assistant_prompt: str, tools: dict,
                      config: ProviderConfiguration = None) -> Union[LLMResponse, Iterator[LLMResponse]]:
         """
@@ -138,26 +196,30 @@ class OllamaProvider(Provider):
         if assistant_prompt is not None:
             _messages.append({'role': 'assistant', 'content': assistant_prompt})
 
-        response = OllamaClient.chat(model=model, messages=_messages, tools=tools.values(),
-                                     think=think)
+        response = client.chat(model=model, messages=_messages, tools=tools.values(),
+                               think=think)
         _messages.append(response.message)
 
         if response.message.tool_calls:
             for tc in response.message.tool_calls:
                 if tc.function.name in tools:
-                    result = tools[tc.function.name](**tc.function.arguments)
+                    result = self.call_tool(tc.function.name, tools[tc.function.name], tc.function.arguments)
                     # add the tool result to the messages
                     _messages.append({'role': 'tool', 'tool_name': tc.function.name, 'content': str(result)})
                 else:
-                    print(f"No tool available for {tc.function.name}")
+                    logger.warning("No tool available for %s", tc.function.name,
+                                   extra={"tool": tc.function.name, "model": model})
 
         # generate the final response
-        raw_final = OllamaClient.chat(model=model, messages=_messages, stream=stream,
-                                      think=False)
+        started_at = time.perf_counter()
+        raw_final = client.chat(model=model, messages=_messages, stream=stream,
+                                think=False)
         if stream:
-            return self._normalize_stream(raw_final)
+            return self._normalize_stream(raw_final, started_at)
         return self._normalize_response(raw_final)
 
+    @traced("ollama.simple_chat", "model")
+    @measured("ollama", "simple_chat")
     def simple_chat(self, prompt: str, model: str, system_prompt: str = None, config: ProviderConfiguration = None) -> \
             Union[LLMResponse, Iterator[LLMResponse]]:
         """
@@ -178,16 +240,19 @@ class OllamaProvider(Provider):
         _messages.append({'role': 'user', 'content': prompt})
 
         stream = config.get_stream() if config is not None else False
-        raw = OllamaClient.chat(
+        started_at = time.perf_counter()
+        raw = client.chat(
             model=model,
             messages=_messages,
             stream=stream,
             think=config.get_think() if config is not None else False,
         )
         if stream:
-            return self._normalize_stream(raw)
+            return self._normalize_stream(raw, started_at)
         return self._normalize_response(raw)
 
+    @traced("ollama.embed", "embedding_model")
+    @measured("ollama", "embed")
     def embed(self, text: str, embedding_model: str = env.get_embedding_model()) -> List[float]:
         """
         Generate embeddings for the given text.
@@ -199,4 +264,23 @@ class OllamaProvider(Provider):
         Returns:
             List[float]: The embedding vector.
         """
-        return OllamaClient.embed(model=embedding_model, input=text)['embeddings'][0]
+        return client.embed(model=embedding_model, input=text)['embeddings'][0]
+
+    @traced("ollama.embed_batch", "embedding_model")
+    @measured("ollama", "embed_batch")
+    def embed_batch(self, texts: List[str], embedding_model: str = None) -> List[List[float]]:
+        """
+        Generate embeddings for several texts with a single Ollama request.
+
+        Args:
+            texts (List[str]): The texts to embed.
+            embedding_model (str, optional): The embedding model to use. Defaults to the configured model.
+
+        Returns:
+            List[List[float]]: One embedding vector per text, in input order.
+        """
+        self.record_batch("ollama", texts)
+        if not texts:
+            return []
+        model = embedding_model or env.get_embedding_model()
+        return list(client.embed(model=model, input=list(texts))['embeddings'])
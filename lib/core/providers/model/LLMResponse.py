@@ -4,9 +4,13 @@ LLMResponse Module
 This module defines the LLMResponse class, a provider-agnostic response model returned
 by all OAIA LLM providers. Using a single normalized type ensures that downstream code
 works identically regardless of which provider (Ollama, LiteLLM, etc.) is configured.
+
+Instances are slotted (no per-instance ``__dict__``) because batch jobs and conversation
+logs keep very large numbers of them in memory. Use :class:`RecordCodec` to persist them
+as JSON lines or compact binary records.
 """
 
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 
 
 class LLMResponse:
@@ -34,14 +38,21 @@ class LLMResponse:
             ``None`` when not applicable.
         done (bool): ``True`` when the response is complete; ``False`` for
             intermediate streaming chunks.
+        timings (Optional[Dict]): Client-side latency metrics of a streamed response
+            (see :class:`StreamAggregator`), set on the final chunk only: ``"time_to_first_token"``,
+            ``"inter_token_latency"``, ``"total_time"`` (seconds), ``"chunks"`` and
+            ``"tokens_per_second"``. ``None`` for non-streaming responses and intermediate chunks.
     """
 
+    __slots__ = ("content", "role", "finish_reason", "usage", "thinking", "done", "timings")
+
     content: str
     role: str
     finish_reason: Optional[str]
     usage: Optional[Dict[str, Any]]
     thinking: Optional[str]
     done: bool
+    timings: Optional[Dict[str, Any]]
 
     def __init__(
         self,
@@ -51,6 +62,7 @@ class LLMResponse:
         usage: Optional[Dict[str, Any]] = None,
         thinking: Optional[str] = None,
         done: bool = True,
+        timings: Optional[Dict[str, Any]] = None,
     ) -> None:
         """
         Initialize an LLMResponse.
@@ -62,6 +74,7 @@ class LLMResponse:
             usage (Optional[Dict], optional): Token usage metadata. Defaults to ``None``.
             thinking (Optional[str], optional): Thinking content. Defaults to ``None``.
             done (bool, optional): Whether the response is complete. Defaults to ``True``.
+            timings (Optional[Dict], optional): Streaming latency metrics. Defaults to ``None``.
         """
         self.content = content
         self.role = role
@@ -69,6 +82,7 @@ class LLMResponse:
         self.usage = usage
         self.thinking = thinking
         self.done = done
+        self.timings = timings
 
     def to_dict(self) -> Dict[str, Any]:
         """
@@ -84,4 +98,90 @@ class LLMResponse:
             "usage": self.usage,
             "thinking": self.thinking,
             "done": self.done,
+            "timings": self.timings,
         }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LLMResponse":
+        """
+        Build an LLMResponse from a dictionary produced by :meth:`to_dict`.
+
+        Args:
+            data (Dict[str, Any]): The serialized response. Missing keys fall back to defaults.
+
+        Returns:
+            LLMResponse: The deserialized response.
+        """
+        return cls(
+            content=data.get("content", ""),
+            role=data.get("role", "assistant"),
+            finish_reason=data.get("finish_reason"),
+            usage=data.get("usage"),
+            thinking=data.get("thinking"),
+            done=data.get("done", True),
+            timings=data.get("timings"),
+        )
+
+    def to_tuple(self) -> Tuple:
+        """
+        Serialize the LLMResponse into a positional tuple.
+
+        This is the compact form used by the binary encoder: field names are not repeated
+        for every record.
+
+        Returns:
+            Tuple: ``(content, role, finish_reason, usage, thinking, done, timings)``.
+        """
+        return self.content, self.role, self.finish_reason, self.usage, self.thinking, self.done, self.timings
+
+    @classmethod
+    def from_tuple(cls, values: Tuple) -> "LLMResponse":
+        """
+        Build an LLMResponse from a tuple produced by :meth:`to_tuple`.
+
+        Args:
+            values (Tuple): The positional field values. Tuples written before ``timings``
+                existed (six fields) are accepted as well.
+
+        Returns:
+            LLMResponse: The deserialized response.
+        """
+        return cls(*values)
+
+    def __reduce__(self):
+        """Pickle as a positional tuple so that slotted instances stay compact on disk."""
+        return self.__class__.from_tuple, (self.to_tuple(),)
+
+    def __eq__(self, other: object) -> bool:
+        """
+        Compare two responses field by field.
+
+        Args:
+            other (object): The object to compare with.
+
+        Returns:
+            bool: True if ``other`` is an LLMResponse with the same fields.
+        """
+        if not isinstance(other, LLMResponse):
+            return NotImplemented
+        return self.to_tuple() == other.to_tuple()
+
+    def __hash__(self) -> int:
+        """
+        Hash the text fields, leaving out the ``usage`` and ``timings`` dictionaries, so that equal
+        responses hash alike.
+
+        Returns:
+            int: The hash.
+        """
+        return hash((self.content, self.role, self.finish_reason, self.thinking, self.done))
+
+    def __repr__(self) -> str:
+        """
+        Return a short representation: the content, role, finish reason and completion flag.
+
+        Returns:
+            str: The representation.
+        """
+        return (f"LLMResponse(content={self.content!r}, role={self.role!r}, "
+                f"finish_reason={self.finish_reason!r}, done={self.done!r})")
@@ -0,0 +1,128 @@
+"""
+StreamAggregator Module
+
+This module defines the StreamAggregator class, which providers use while normalizing a
+streamed response to measure client-side latency: time to first token, inter-token
+latency and throughput. The resulting metrics are attached to the final
+:class:`LLMResponse` chunk of the stream as ``timings``.
+"""
+
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from lib.core.providers.model.LLMResponse import LLMResponse
+
+
+class StreamAggregator:
+    """
+    Collects timing information for a single streamed response.
+
+    The clock starts when the request is issued (``started_at``) so that the time to first
+    token includes connection setup and prompt processing. Only chunks carrying content
+    count as tokens.
+
+    Attributes:
+        chunks (int): Number of content-bearing chunks observed so far.
+    """
+
+    __slots__ = ("_clock", "_started_at", "_first_at", "_last_at", "_gap_total", "chunks")
+
+    def __init__(self, started_at: Optional[float] = None, clock: Callable[[], float] = time.perf_counter) -> None:
+        """
+        Initialize a StreamAggregator.
+
+        Args:
+            started_at (Optional[float], optional): Clock value at which the request was sent.
+                Defaults to the current clock value.
+            clock (Callable[[], float], optional): Monotonic clock returning seconds.
+                Defaults to :func:`time.perf_counter`.
+        """
+        self._clock = clock
+        self._started_at = clock() if started_at is None else started_at
+        self._first_at = None
+        self._last_at = None
+        self._gap_total = 0.0
+        self.chunks = 0
+
+    def observe(self, content: Optional[str]) -> None:
+        """
+        Record the arrival of a streamed chunk.
+
+        Args:
+            content (Optional[str]): The chunk text. Empty chunks are ignored.
+        """
+        if not content:
+            return
+        now = self._clock()
+        if self._first_at is None:
+            self._first_at = now
+        else:
+            self._gap_total += now - self._last_at
+        self._last_at = now
+        self.chunks += 1
+
+    def timings(self, completion_tokens: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Compute the latency metrics of the stream observed so far.
+
+        Args:
+            completion_tokens (Optional[int], optional): Number of generated tokens as reported
+                by the backend, used for ``tokens_per_second``. When unknown, the number of
+                content chunks is used instead.
+
+        Returns:
+            Dict[str, Any]: ``time_to_first_token``, ``inter_token_latency`` and ``total_time``
+            in seconds (``None`` when not measurable), ``chunks`` and ``tokens_per_second``.
+        """
+        total_time = self._clock() - self._started_at
+        ttft = None if self._first_at is None else self._first_at - self._started_at
+        itl = self._gap_total / (self.chunks - 1) if self.chunks > 1 else None
+
+        tokens = completion_tokens if isinstance(completion_tokens, int) else self.chunks
+        generation_time = None if self._first_at is None else self._last_at - self._first_at
+        tokens_per_second = None
+        if generation_time:
+            # The first token is attributed to the prefill phase (time to first token).
+            tokens_per_second = max(tokens - 1, 0) / generation_time
+
+        return {
+            "time_to_first_token": ttft,
+            "inter_token_latency": itl,
+            "total_time": total_time,
+            "chunks": self.chunks,
+            "tokens_per_second": tokens_per_second,
+        }
+
+    @staticmethod
+    def collect(stream: Iterable[LLMResponse]) -> LLMResponse:
+        """
+        Consume a stream of chunks and merge it into a single LLMResponse.
+
+        Content and thinking are concatenated; ``finish_reason``, ``usage`` and ``timings``
+        are taken from the final chunk.
+
+        Args:
+            stream (Iterable[LLMResponse]): The streamed chunks.
+
+        Returns:
+            LLMResponse: The aggregated response.
+        """
+        content = []
+        thinking = []
+        last = None
+        for chunk in stream:
+            content.append(chunk.content)
+            if chunk.thinking:
+                thinking.append(chunk.thinking)
+            last = chunk
+        if last is None:
+            return LLMResponse(content="")
+        return LLMResponse(
+            content="".join(content),
+            role=last.role,
+            finish_reason=last.finish_reason,
+            usage=last.usage,
+            thinking="".join(thinking) if thinking else None,
+            done=True,
+            timings=last.timings,
+        )
@@ -0,0 +1,205 @@
+"""
+BM25Index Module
+
+This module provides the BM25Index class, an incremental inverted index scoring text rows
+with Okapi BM25. It complements embedding similarity: exact identifiers such as SKUs,
+error codes or function names rarely end up close in embedding space, but are matched
+exactly by a lexical index.
+
+Posting lists are stored as two parallel typed arrays per term (row ids as ``uint32`` and
+term frequencies as ``uint16``), about 6 bytes per posting instead of ~100 for a dict entry.
+"""
+
+import heapq
+import math
+import re
+from array import array
+from typing import Container, Dict, Iterable, List, Optional, Set, Tuple
+
+# Words, and identifiers made of words joined by "-", "_", "." or "/" (e.g. "ERR-404", "v1.2").
+_TOKEN = re.compile(r"\w+(?:[-_./]\w+)*", re.UNICODE)
+_PART = re.compile(r"[^\W_]+", re.UNICODE)
+_MAX_TF = 0xFFFF
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split a text into lowercase index terms.
+
+    Compound identifiers are indexed both whole and by their parts, so that ``"ERR-404"``
+    is found by the queries ``"ERR-404"`` and ``"404"``.
+
+    Args:
+        text (str): The text to split.
+
+    Returns:
+        List[str]: The terms, in order, with repetitions.
+    """
+    terms = []
+    for token in _TOKEN.findall(text.lower()):
+        terms.append(token)
+        parts = _PART.findall(token)
+        if len(parts) > 1 or (parts and parts[0] != token):
+            terms.extend(parts)
+    return terms
+
+
+class BM25Index:
+    """
+    Incremental Okapi BM25 inverted index over integer row ids.
+
+    Rows are added with :meth:`add` and removed with :meth:`remove`; removing a row updates
+    the collection statistics immediately and skips its postings at query time until
+    :meth:`clear` (e.g. on store compaction) drops them.
+
+    Attributes:
+        k1 (float): Term frequency saturation parameter.
+        b (float): Document length normalization parameter.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize an empty BM25Index.
+
+        Args:
+            k1 (float, optional): Term frequency saturation. Defaults to 1.5.
+            b (float, optional): Length normalization in [0, 1]. Defaults to 0.75.
+        """
+        self.k1 = k1
+        self.b = b
+        self.clear()
+
+    def clear(self) -> None:
+        """Remove all rows from the index."""
+        self._rows: Dict[str, array] = {}
+        self._freqs: Dict[str, array] = {}
+        self._df: Dict[str, int] = {}
+        self._lengths = array("I")
+        self._removed: Set[int] = set()
+        self._documents = 0
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return self._documents
+
+    @property
+    def average_length(self) -> float:
+        """float: Average number of terms per indexed row."""
+        return self._total_length / self._documents if self._documents else 0.0
+
+    def add(self, row: int, text: str) -> None:
+        """
+        Index a row. Rows are numbered consecutively from 0.
+
+        Args:
+            row (int): The row id.
+            text (str): The row text.
+
+        Raises:
+            ValueError: If ``row`` is not the next row id.
+        """
+        if row != len(self._lengths):
+            raise ValueError(f"Expected row {len(self._lengths)}, got {row}")
+
+        terms = tokenize(text)
+        counts: Dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, count in counts.items():
+            rows = self._rows.get(term)
+            if rows is None:
+                rows = self._rows[term] = array("I")
+                self._freqs[term] = array("H")
+            rows.append(row)
+            self._freqs[term].append(min(count, _MAX_TF))
+            self._df[term] = self._df.get(term, 0) + 1
+        self._lengths.append(len(terms))
+        self._documents += 1
+        self._total_length += len(terms)
+
+    def remove(self, row: int, text: str) -> None:
+        """
+        Remove a row from the index.
+
+        Args:
+            row (int): The row id.
+            text (str): The text the row was indexed with.
+        """
+        if row in self._removed or row >= len(self._lengths):
+            return
+        self._removed.add(row)
+        for term in set(tokenize(text)):
+            self._df[term] -= 1
+        self._documents -= 1
+        self._total_length -= self._lengths[row]
+
+    def idf(self, term: str) -> float:
+        """
+        Compute the inverse document frequency of a term.
+
+        Args:
+            term (str): The index term.
+
+        Returns:
+            float: The (always non-negative) BM25 IDF.
+        """
+        df = self._df.get(term, 0)
+        return math.log(1.0 + (self._documents - df + 0.5) / (df + 0.5))
+
+    def scores(self, query: str, allowed: Optional[Container[int]] = None) -> Dict[int, float]:
+        """
+        Score all rows containing at least one query term.
+
+        Args:
+            query (str): The query text.
+            allowed (Optional[Container[int]], optional): Only score these rows. Defaults to all rows.
+
+        Returns:
+            Dict[int, float]: The BM25 score of every matching row.
+        """
+        scores: Dict[int, float] = {}
+        if not self._documents:
+            return scores
+        k1, b = self.k1, self.b
+        average = self.average_length or 1.0
+        lengths, removed = self._lengths, self._removed
+        for term in set(tokenize(query)):
+            rows = self._rows.get(term)
+            if rows is None or not self._df[term]:
+                continue
+            idf = self.idf(term)
+            for row, tf in zip(rows, self._freqs[term]):
+                if row in removed or (allowed is not None and row not in allowed):
+                    continue
+                norm = k1 * (1.0 - b + b * lengths[row] / average)
+                scores[row] = scores.get(row, 0.0) + idf * tf * (k1 + 1.0) / (tf + norm)
+        return scores
+
+    def search(self, query: str, top_k: Optional[int] = None,
+               allowed: Optional[Container[int]] = None) -> List[Tuple[int, float]]:
+        """
+        Return the best matching rows of a query.
+
+        Args:
+            query (str): The query text.
+            top_k (Optional[int], optional): Maximum number of rows. Defaults to all matches.
+            allowed (Optional[Container[int]], optional): Only return these rows. Defaults to all rows.
+
+        Returns:
+            List[Tuple[int, float]]: ``(row, score)`` pairs by descending score.
+        """
+        scores = self.scores(query, allowed)
+        if top_k is None:
+            return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def rebuild(self, texts: Iterable[str]) -> None:
+        """
+        Clear the index and add ``texts`` as rows ``0..n-1``.
+
+        Args:
+            texts (Iterable[str]): The row texts, in row order.
+        """
+        self.clear()
+        for row, text in enumerate(texts):
+            self.add(row, text)
@@ -0,0 +1,146 @@
+"""
+ContextPacker Module
+
+This module provides the ContextPacker class, which fills a prompt's context section with
+as many retrieved chunks as fit in the model's context window. Chunks are taken greedily
+by descending relevance score; chunks that fully or largely repeat already selected text
+(e.g. the overlapping windows produced by chunking) are skipped so that no tokens are
+spent twice on the same content.
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+from lib.core.service.TokenCounter import TokenCounter
+
+
+class ContextPacker:
+    """
+    Greedy, token-budgeted packer for retrieved chunks.
+
+    The available budget is ``context_window - reserved_tokens - prompt overhead``, where
+    ``reserved_tokens`` is kept free for the model's answer and the overhead is the size of
+    the rest of the prompt (system prompt, template, question).
+
+    Attributes:
+        context_window (int): The model's context size in tokens.
+        reserved_tokens (int): Tokens kept free for the completion.
+        model (Optional[str]): The model used to count tokens.
+        separator (str): Text inserted between packed chunks.
+        overlap_threshold (float): Fraction of a chunk's shingles already present in the
+            selected chunks above which the chunk is considered a duplicate.
+        shingle_size (int): Number of words per shingle used for overlap detection.
+    """
+
+    def __init__(self, context_window: int = None, reserved_tokens: int = 512, model: Optional[str] = None,
+                 separator: str = "\n\n", overlap_threshold: float = 0.8, shingle_size: int = 5,
+                 token_counter: TokenCounter = None):
+        """
+        Initialize a ContextPacker.
+
+        Args:
+            context_window (int, optional): The model's context size. Defaults to the size known
+                for ``model`` (see :meth:`TokenCounter.get_context_window`).
+            reserved_tokens (int, optional): Tokens kept free for the completion. Defaults to 512.
+            model (Optional[str], optional): The model used to count tokens. Defaults to None.
+            separator (str, optional): Text between packed chunks. Defaults to a blank line.
+            overlap_threshold (float, optional): Duplicate threshold in [0, 1]. Defaults to 0.8.
+            shingle_size (int, optional): Words per shingle. Defaults to 5.
+            token_counter (TokenCounter, optional): Counter to use. Defaults to the singleton.
+        """
+        self.token_counter = token_counter or TokenCounter.get_instance()
+        self.model = model
+        self.context_window = context_window if context_window is not None \
+            else TokenCounter.get_context_window(model)
+        self.reserved_tokens = reserved_tokens
+        self.separator = separator
+        self.overlap_threshold = overlap_threshold
+        self.shingle_size = shingle_size
+
+    def count(self, text: str) -> int:
+        """
+        Count the tokens of a text with the packer's model.
+
+        Args:
+            text (str): The text to measure.
+
+        Returns:
+            int: The number of tokens.
+        """
+        return self.token_counter.count(text, self.model)
+
+    def budget(self, prompt_overhead: int = 0) -> int:
+        """
+        Compute the number of tokens available for context.
+
+        Args:
+            prompt_overhead (int, optional): Tokens used by the rest of the prompt. Defaults to 0.
+
+        Returns:
+            int: The context budget, never negative.
+        """
+        return max(self.context_window - self.reserved_tokens - prompt_overhead, 0)
+
+    def _shingles(self, text: str) -> set:
+        """Return the set of word n-grams of a text (the whole text if it is shorter)."""
+        words = text.lower().split()
+        size = self.shingle_size
+        if len(words) <= size:
+            return {tuple(words)} if words else set()
+        return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+    def pack(self, scored_chunks: Sequence[Tuple[str, float]], max_tokens: int = None,
+             prompt_overhead: int = 0) -> List[Tuple[str, float]]:
+        """
+        Select the highest-scoring chunks that fit in the budget.
+
+        Chunks are considered by descending score; a chunk that does not fit is skipped and
+        smaller, lower-scoring chunks may still be selected. Duplicates and near-duplicates
+        of already selected chunks are skipped.
+
+        Args:
+            scored_chunks (Sequence[Tuple[str, float]]): ``(chunk, score)`` pairs, e.g. the
+                output of :meth:`KnowledgeService.get_most_relevant_chunks`.
+            max_tokens (int, optional): Explicit token budget. Defaults to :meth:`budget`.
+            prompt_overhead (int, optional): Tokens used by the rest of the prompt, only used
+                when ``max_tokens`` is not given. Defaults to 0.
+
+        Returns:
+            List[Tuple[str, float]]: The selected pairs, by descending score.
+        """
+        remaining = self.budget(prompt_overhead) if max_tokens is None else max_tokens
+        separator_tokens = self.count(self.separator)
+        selected = []
+        seen = set()
+
+        for chunk, score in sorted(scored_chunks, key=lambda item: item[1], reverse=True):
+            if remaining <= 0:
+                break
+            shingles = self._shingles(chunk)
+            if not shingles:
+                continue
+            if len(shingles & seen) >= self.overlap_threshold * len(shingles):
+                continue
+            cost = self.count(chunk) + (separator_tokens if selected else 0)
+            if cost > remaining:
+                continue
+            selected.append((chunk, score))
+            seen |= shingles
+            remaining -= cost
+
+        return selected
+
+    def pack_text(self, scored_chunks: Sequence[Tuple[str, float]], max_tokens: int = None,
+                  prompt_overhead: int = 0) -> str:
+        """
+        Pack chunks (see :meth:`pack`) and join them into a single context string.
+
+        Args:
+            scored_chunks (Sequence[Tuple[str, float]]): ``(chunk, score)`` pairs.
+            max_tokens (int, optional): Explicit token budget. Defaults to :meth:`budget`.
+            prompt_overhead (int, optional): Tokens used by the rest of the prompt. Defaults to 0.
+
+        Returns:
+            str: The packed context.
+        """
+        packed = self.pack(scored_chunks, max_tokens=max_tokens, prompt_overhead=prompt_overhead)
+        return self.separator.join(chunk for chunk, _ in packed)
@@ -0,0 +1,184 @@
+"""
+EmbeddingProjection Module
+
+This module provides projections reducing the size of embeddings before they are stored in
+a :class:`KnowledgeStore` and before queries are compared with them. Vector search scans
+every stored embedding, so its cost (and the store's memory) is proportional to the number
+of dimensions: projecting 1536-dimensional vectors to 256 makes a scan about six times
+cheaper, at the price of some recall.
+
+Two projections are available:
+
+- :class:`MatryoshkaProjection` keeps the first ``dimensions`` components. Models trained
+  with Matryoshka representation learning (e.g. OpenAI ``text-embedding-3-*``,
+  ``nomic-embed-text``) put the most important information first, so their prefixes are
+  usable embeddings. Nothing has to be fitted.
+- :class:`PCAProjection` projects on the principal components of the corpus, which works
+  for any model but must be fitted on (a sample of) the corpus embeddings first.
+
+A store created with ``KnowledgeStore(projection=...)`` records its projection, and
+:class:`KnowledgeService` applies it to the embeddings it writes and to query embeddings.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import numpy as np
+
+from lib.commons.MathUtils import MathUtils
+
+
+class EmbeddingProjection(ABC):
+    """
+    Abstract base class for embedding projections.
+
+    Attributes:
+        dimensions (int): Size of the projected embeddings.
+    """
+
+    dimensions: int
+
+    @property
+    def fitted(self) -> bool:
+        """
+        Tell whether the projection can transform embeddings.
+
+        Returns:
+            bool: True once fitted (always True for projections without parameters).
+        """
+        return True
+
+    def fit(self, embeddings) -> "EmbeddingProjection":
+        """
+        Learn the projection from corpus embeddings. Projections without parameters ignore them.
+
+        Args:
+            embeddings (array-like): The ``(n, d)`` corpus embeddings.
+
+        Returns:
+            EmbeddingProjection: The projection itself.
+        """
+        return self
+
+    @abstractmethod
+    def transform(self, embeddings) -> np.ndarray:
+        """
+        Project embeddings.
+
+        Args:
+            embeddings (array-like): A vector of size ``d`` or an ``(n, d)`` matrix.
+
+        Returns:
+            np.ndarray: The float32 projected vector(s), of size :attr:`dimensions`.
+        """
+        pass
+
+
+class MatryoshkaProjection(EmbeddingProjection):
+    """
+    Matryoshka-style truncation keeping the first ``dimensions`` components.
+    """
+
+    def __init__(self, dimensions: int):
+        """
+        Initialize a MatryoshkaProjection.
+
+        Args:
+            dimensions (int): Number of leading components kept.
+
+        Raises:
+            ValueError: If ``dimensions`` is smaller than 1.
+        """
+        if dimensions < 1:
+            raise ValueError(f"dimensions must be at least 1, got {dimensions}")
+        self.dimensions = dimensions
+
+    def transform(self, embeddings) -> np.ndarray:
+        embeddings = MathUtils.as_matrix(embeddings)
+        if embeddings.shape[-1] < self.dimensions:
+            raise ValueError(f"Cannot truncate embeddings of size {embeddings.shape[-1]} to {self.dimensions}")
+        return np.ascontiguousarray(embeddings[..., :self.dimensions])
+
+
+class PCAProjection(EmbeddingProjection):
+    """
+    Projection on the principal components of the corpus embeddings.
+
+    Attributes:
+        mean (Optional[np.ndarray]): The mean corpus embedding, None until fitted.
+        components (Optional[np.ndarray]): The ``(dimensions, d)`` principal axes, None until fitted.
+        explained_variance_ratio (float): Fraction of the corpus variance kept (0 until fitted).
+    """
+
+    def __init__(self, dimensions: int, sample_size: Optional[int] = 20000, seed: int = 0):
+        """
+        Initialize a PCAProjection.
+
+        Args:
+            dimensions (int): Number of principal components kept.
+            sample_size (Optional[int], optional): Fit on a random sample of at most this many
+                embeddings (None fits on all of them). Defaults to 20000.
+            seed (int, optional): Seed of the sampling. Defaults to 0.
+
+        Raises:
+            ValueError: If ``dimensions`` is smaller than 1.
+        """
+        if dimensions < 1:
+            raise ValueError(f"dimensions must be at least 1, got {dimensions}")
+        self.dimensions = dimensions
+        self.sample_size = sample_size
+        self.seed = seed
+        self.mean: Optional[np.ndarray] = None
+        self.components: Optional[np.ndarray] = None
+        self.explained_variance_ratio = 0.0
+
+    @property
+    def fitted(self) -> bool:
+        return self.components is not None
+
+    def fit(self, embeddings) -> "PCAProjection":
+        """
+        Compute the principal components of the corpus embeddings.
+
+        Args:
+            embeddings (array-like): The ``(n, d)`` corpus embeddings.
+
+        Returns:
+            PCAProjection: The projection itself.
+
+        Raises:
+            ValueError: If there are fewer embeddings or components than ``dimensions``.
+        """
+        matrix = np.atleast_2d(MathUtils.as_matrix(embeddings))
+        if self.sample_size is not None and len(matrix) > self.sample_size:
+            sample = np.random.default_rng(self.seed).choice(len(matrix), self.sample_size, replace=False)
+            matrix = matrix[np.sort(sample)]
+        if self.dimensions > min(matrix.shape):
+            raise ValueError(f"Cannot fit {self.dimensions} components on {matrix.shape[0]} embeddings "
+                             f"of size {matrix.shape[1]}")
+        mean = matrix.mean(axis=0)
+        # The right singular vectors of the centered data are the principal axes, by decreasing variance.
+        _, singular_values, axes = np.linalg.svd(matrix - mean, full_matrices=False)
+        variances = singular_values.astype(np.float64) ** 2
+        self.mean = mean.astype(np.float32)
+        self.components = np.ascontiguousarray(axes[:self.dimensions], dtype=np.float32)
+        self.explained_variance_ratio = float(variances[:self.dimensions].sum() / variances.sum()) \
+            if variances.sum() else 1.0
+        return self
+
+    def transform(self, embeddings) -> np.ndarray:
+        """
+        Project embeddings on the principal components.
+
+        Args:
+            embeddings (array-like): A vector of size ``d`` or an ``(n, d)`` matrix.
+
+        Returns:
+            np.ndarray: The float32 projected vector(s).
+
+        Raises:
+            ValueError: If the projection is not fitted.
+        """
+        if not self.fitted:
+            raise ValueError("The PCA projection must be fitted before transforming embeddings")
+        return (MathUtils.as_matrix(embeddings) - self.mean) @ self.components.T
@@ -0,0 +1,299 @@
+"""
+IngestionPipeline Module
+
+This module provides the IngestionPipeline class, a generator-based pipeline that indexes
+document corpora too large to fit in memory:
+
+    files -> text blocks (HTML sanitized) -> overlapping token-aware chunks
+          -> embedding batches -> KnowledgeStore
+
+Every stage is a generator, so at any time only the current text block, the chunk being
+built and one embedding batch are held in memory. Plain text and Markdown files are
+streamed line by line, lines longer than a block being read in block-sized pieces and cut at
+whitespace.
+HTML documents are sanitized one document at a time: the sanitizer needs the whole markup of
+a document, so memory is bounded by the largest HTML file rather than by a block.
+
+:meth:`IngestionPipeline.refresh` re-indexes a corpus incrementally: files whose bytes did
+not change since the previous refresh are not even read, and only new or changed chunks of
+the other files are embedded.
+"""
+
+import hashlib
+import html
+import os
+import re
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+from html_sanitizer import Sanitizer
+
+from lib.core.service.KnowledgeService import KnowledgeService
+from lib.core.service.KnowledgeStore import KnowledgeStore
+from lib.core.service.TextChunker import TextChunker
+from lib.core.service.model.IngestionStats import IngestionStats
+from lib.core.service.model.RefreshReport import RefreshReport
+
+_BLOCK_TAGS = {"p", "div", "h1", "h2", "h3", "h4", "h5", "h6", "li", "pre", "blockquote", "tr"}
+_BLOCK_BREAK = re.compile(r"<br\s*/?>|</(?:%s)>" % "|".join(sorted(_BLOCK_TAGS)), re.IGNORECASE)
+_TAG = re.compile(r"<[^>]+>")
+# Text up to its last whitespace (greedy), used to cut long lines between words.
+_UP_TO_SPACE = re.compile(r".*\s", re.DOTALL)
+
+
+def _cut(text: str, limit: int) -> Tuple[List[str], str]:
+    """
+    Cut segments off the start of a text while it is longer than ``limit`` characters, at the
+    last whitespace before the limit, or at the limit inside a longer word.
+
+    Returns:
+        Tuple[List[str], str]: The stripped non-empty segments, and the rest of the text (at
+        most ``limit`` characters).
+    """
+    segments = []
+    while len(text) > limit:
+        match = _UP_TO_SPACE.match(text, 0, limit + 1)
+        if match is None:
+            segment, text = text[:limit], text[limit:]
+        else:
+            segment, text = text[:match.end() - 1], text[match.end():]
+        segment = segment.strip()
+        if segment:
+            segments.append(segment)
+    return segments, text
+
+
+class IngestionPipeline:
+    """
+    Streaming ingestion of text, Markdown and HTML files into a KnowledgeStore.
+
+    Attributes:
+        SUPPORTED_EXTENSIONS (dict): File extensions handled by the pipeline and their format.
+        chunker (TextChunker): The chunker splitting documents into chunks.
+        batch_size (int): Number of chunks per embedding request.
+        concurrency (int): Number of embedding requests in flight.
+        retries (int): Retries of an embedding request failing with a transient error.
+        max_block_chars (int): Maximum size of a text block; longer lines are cut.
+    """
+
+    SUPPORTED_EXTENSIONS = {
+        ".txt": "text",
+        ".md": "markdown",
+        ".markdown": "markdown",
+        ".html": "html",
+        ".htm": "html",
+    }
+
+    def __init__(self, chunker: TextChunker = None, batch_size: int = 32, max_block_chars: int = 65536,
+                 sanitizer: Sanitizer = None, concurrency: int = 1, retries: int = 0):
+        """
+        Initialize an IngestionPipeline.
+
+        Args:
+            chunker (TextChunker, optional): The chunker. Defaults to ``TextChunker()``.
+            batch_size (int, optional): Chunks per embedding request. Defaults to 32.
+            max_block_chars (int, optional): Maximum characters per block; longer paragraphs
+                and lines are cut. Defaults to 65536.
+            sanitizer (Sanitizer, optional): HTML sanitizer. Defaults to one keeping only
+                block-level structure.
+            concurrency (int, optional): Embedding requests in flight during :meth:`run`. Defaults to 1.
+            retries (int, optional): Retries of an embedding request failing with a transient
+                error. Defaults to 0.
+        """
+        self.chunker = chunker or TextChunker()
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.retries = retries
+        self.max_block_chars = max_block_chars
+        self.sanitizer = sanitizer or Sanitizer({
+            "tags": _BLOCK_TAGS | {"br"},
+            "attributes": {},
+            "empty": {"br"},
+            "separate": set(_BLOCK_TAGS),
+            "whitespace": set(),
+            "keep_typographic_whitespace": False,
+            "add_nofollow": False,
+            "autolink": False,
+        })
+
+    def iter_files(self, paths: Union[str, Iterable[str]]) -> Iterator[str]:
+        """
+        Expand files and directories (recursively) into the supported files they contain.
+
+        Args:
+            paths (Union[str, Iterable[str]]): A path or several paths.
+
+        Yields:
+            str: The supported file paths, directories being walked in sorted order.
+        """
+        if isinstance(paths, str):
+            paths = [paths]
+        for path in paths:
+            if os.path.isdir(path):
+                for root, dirs, files in os.walk(path):
+                    dirs.sort()
+                    for name in sorted(files):
+                        if self._format(name) is not None:
+                            yield os.path.join(root, name)
+            elif self._format(path) is not None:
+                yield path
+
+    def _format(self, path: str) -> Optional[str]:
+        """Return the format of a file from its extension, or None if unsupported."""
+        return self.SUPPORTED_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+    def html_to_text(self, markup: str) -> str:
+        """
+        Sanitize HTML and convert it to plain text, one block element per line.
+
+        Scripts, styles and all inline markup are removed.
+
+        Args:
+            markup (str): The HTML document.
+
+        Returns:
+            str: The plain text.
+        """
+        cleaned = self.sanitizer.sanitize(markup)
+        return html.unescape(_TAG.sub("", _BLOCK_BREAK.sub("\n", cleaned)))
+
+    def read_blocks(self, path: str) -> Iterator[str]:
+        """
+        Stream the text blocks (paragraphs) of a document.
+
+        Lines longer than ``max_block_chars`` are cut at whitespace (inside a word only when it
+        is longer than a block). Text files are read in pieces of at most ``max_block_chars``
+        characters; an HTML file is read whole, since the sanitizer needs its complete markup.
+
+        Args:
+            path (str): The document path.
+
+        Yields:
+            str: The non-empty text blocks of the document, of at most ``max_block_chars``
+            characters.
+        """
+        limit = self.max_block_chars
+        with open(path, "r", encoding="utf-8", errors="replace") as file:
+            if self._format(path) == "html":
+                pieces = (line + "\n" for line in self.html_to_text(file.read()).splitlines())
+            else:
+                pieces = iter(lambda: file.readline(limit), "")
+
+            block, size = [], 0
+            for line in self._lines(pieces):
+                if not line or size + len(line) > limit:
+                    if block:
+                        yield " ".join(block)
+                    block, size = [], 0
+                if line:
+                    block.append(line)
+                    size += len(line) + 1
+            if block:
+                yield " ".join(block)
+
+    def _lines(self, pieces: Iterable[str]) -> Iterator[str]:
+        """
+        Join pieces of text (ending with a newline at the end of a line) into lines, cutting the
+        lines longer than ``max_block_chars``; the unfinished word of a piece is kept for the
+        next one. Yield the stripped segments, and an empty string for every blank line.
+        """
+        rest, blank = "", True
+        for piece in pieces:
+            segments, rest = _cut(rest + piece, self.max_block_chars)
+            if piece.endswith("\n"):
+                if rest.strip():
+                    segments.append(rest.strip())
+                rest = ""
+            yield from segments
+            blank = blank and not segments
+            if piece.endswith("\n"):
+                if blank:
+                    yield ""
+                blank = True
+        if rest.strip():
+            yield rest.strip()
+
+    def iter_chunks(self, paths: Union[str, Iterable[str]], stats: IngestionStats = None) -> Iterator[str]:
+        """
+        Stream the chunks of all documents found under ``paths``.
+
+        Args:
+            paths (Union[str, Iterable[str]]): A path or several paths.
+            stats (IngestionStats, optional): Counters updated as documents are read.
+
+        Yields:
+            str: The chunks, document by document.
+        """
+        for path in self.iter_files(paths):
+            yield from self.chunker.split(self.read_blocks(path))
+            if stats is not None:
+                stats.documents += 1
+                stats.bytes_read += os.path.getsize(path)
+
+    def run(self, paths: Union[str, Iterable[str]], store: KnowledgeStore,
+            progress: Callable[[IngestionStats], None] = None, metadata: Optional[dict] = None) -> IngestionStats:
+        """
+        Ingest all documents found under ``paths`` into a store.
+
+        Args:
+            paths (Union[str, Iterable[str]]): A path or several paths.
+            store (KnowledgeStore): The destination store.
+            progress (Callable[[IngestionStats], None], optional): Called after every embedded
+                batch with the (live) run counters. Defaults to None.
+            metadata (Optional[dict], optional): Metadata attached to every chunk, e.g.
+                ``{"tenant": "acme"}``. Defaults to None.
+
+        Returns:
+            IngestionStats: The final counters of the run.
+        """
+        stats = IngestionStats()
+        KnowledgeService().build_knowledge(self.iter_chunks(paths, stats), store=store, batch_size=self.batch_size,
+                                           progress=None if progress is None else lambda count: progress(stats),
+                                           metadata=metadata, concurrency=self.concurrency, retries=self.retries,
+                                           stats=stats)
+        return stats
+
+    @staticmethod
+    def file_hash(path: str, block_size: int = 1 << 20) -> bytes:
+        """
+        Hash the bytes of a file, reading it in blocks.
+
+        Args:
+            path (str): The file path.
+            block_size (int, optional): Bytes read at a time. Defaults to 1 MiB.
+
+        Returns:
+            bytes: A 16-byte BLAKE2b digest.
+        """
+        hasher = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(block_size), b""):
+                hasher.update(block)
+        return hasher.digest()
+
+    def refresh(self, paths: Union[str, Iterable[str]], store: KnowledgeStore, compact_threshold: float = 0.25,
+                delete_missing: bool = True, metadata: Optional[dict] = None) -> RefreshReport:
+        """
+        Incrementally re-index the documents found under ``paths`` into a store.
+
+        Documents are identified by their path. Unchanged files are skipped, changed files are
+        re-chunked and only their new chunks are embedded, and (with ``delete_missing``) the
+        documents of the store that no longer exist are tombstoned.
+
+        Args:
+            paths (Union[str, Iterable[str]]): A path or several paths.
+            store (KnowledgeStore): The store to update, previously filled by ``refresh``.
+            compact_threshold (float, optional): Tombstone ratio triggering compaction. Defaults to 0.25.
+            delete_missing (bool, optional): Delete the stored documents not found. Defaults to True.
+            metadata (Optional[dict], optional): Metadata attached to the new chunks. Defaults to None.
+
+        Returns:
+            RefreshReport: The counters of the run.
+        """
+        documents = ((path, self._lazy_chunks(path), self.file_hash(path)) for path in self.iter_files(paths))
+        return KnowledgeService().refresh_knowledge(documents, store, batch_size=self.batch_size,
+                                                    compact_threshold=compact_threshold,
+                                                    delete_missing=delete_missing, metadata=metadata)
+
+    def _lazy_chunks(self, path: str) -> Iterator[str]:
+        """Yield the chunks of a document; nothing is read until the generator is iterated."""
+        yield from self.chunker.split(self.read_blocks(path))
@@ -3,10 +3,92 @@ Knowledge Service Module
 Provides functions to build a knowledge graph from a dataset and retrieve relevant chunks based on a query.
 """
 
+import contextvars
+import functools
+import hashlib
+import heapq
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import httpx
+
+from lib.commons.Deadline import DeadlineExceeded, current_deadline
 from lib.commons.MathUtils import MathUtils as MathUtils
+from lib.commons.Metrics import Metrics
+from lib.commons.Profiler import profiled
+from lib.commons.StructuredLogging import get_logger
+from lib.commons.Tracer import traced
 from lib.core.providers.LLMProviderFactory import LLMProviderFactory
+from lib.core.service.ContextPacker import ContextPacker
+from lib.core.service.KnowledgeStore import KnowledgeStore, content_hash
+from lib.core.service.PostRetrievalStage import PostRetrievalStage
+from lib.core.service.ShardedKnowledgeStore import ShardedKnowledgeStore
+from lib.core.service.model.IngestionStats import IngestionStats
+from lib.core.service.model.RefreshReport import RefreshReport
 
 current_provider = LLMProviderFactory.get_instance()
+metrics = Metrics.get_instance()
+logger = get_logger(__name__)
+
+knowledge_queries = metrics.counter("knowledge_queries_total", "Knowledge base queries.", ("mode",))
+knowledge_errors = metrics.counter("knowledge_errors_total", "Knowledge base operations that raised an error.",
+                                   ("operation", "error"))
+knowledge_seconds = metrics.histogram("knowledge_operation_seconds", "Duration of knowledge base operations.",
+                                      ("operation",))
+cache_lookups = metrics.counter("cache_lookups_total", "Cache lookups by cache and result (hit or miss).",
+                                ("cache", "result"))
+
+
+def _measured(operation):
+    """Decorator recording the duration and errors of a KnowledgeService operation."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            except Exception as error:
+                knowledge_errors.inc(operation, type(error).__name__)
+                raise
+            finally:
+                knowledge_seconds.observe(time.perf_counter() - started, operation)
+
+        return wrapper
+
+    return decorator
+
+
+def _batched(iterable, size):
+    """Yield lists of at most ``size`` consecutive items of ``iterable``."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class _IncompleteBatchError(ValueError):
+    """Error raised when the provider returned fewer (or more) embeddings than chunks."""
+
+
+def _is_transient(error):
+    """Tells whether a failed embedding request may succeed when retried.
+
+    Timeouts (other than an expired deadline), connection errors, incomplete batches and HTTP
+    408, 429 and 5xx responses are transient; other errors, e.g. a rejected request, are not.
+    """
+    if isinstance(error, DeadlineExceeded):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError, httpx.TransportError, _IncompleteBatchError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return isinstance(status, int) and (status in (408, 429) or status >= 500)
+
 
 class KnowledgeService(object):
     """
@@ -24,41 +106,501 @@ class KnowledgeService(object):
             cls._instance = super(KnowledgeService, cls).__new__(cls)
         return cls._instance
 
-    def build_knowledge(self, dataset):
+    @traced("knowledge.build", "batch_size", "concurrency")
+    @_measured("build")
+    def build_knowledge(self, dataset, store: KnowledgeStore = None, batch_size=32, progress=None, metadata=None,
+                        concurrency=1, retries=0, retry_delay=1.0, stats: IngestionStats = None):
         """Builds a knowledge graph from a dataset.
-        Args: dataset (list): A list of lines.
+
+        Without a store, every chunk is embedded individually and a list of (chunk, embedding)
+        tuples is returned. With a store, the dataset is consumed lazily (it may be a generator)
+        and embedded in batches that are written straight into the store, so memory stays
+        bounded by one batch.
+
+        With ``concurrency`` greater than 1, the dataset is embedded in batches (also without a
+        store) by a thread pool keeping up to ``concurrency`` embedding requests in flight.
+        Batches are still written in dataset order, and at most ``concurrency`` batches are
+        buffered. A batch failing with a transient error (timeout, connection error, HTTP 429
+        or 5xx) is retried ``retries`` times with exponential backoff, as long as the current
+        deadline leaves time for the delay; other errors are raised at once.
+
+        When the store has a projection (see :class:`EmbeddingProjection`), the embeddings are
+        projected before being written. A projection that still has to be fitted (PCA) is
+        fitted on the whole corpus once it is stored, and the store is then reduced in place.
+
+        Args:
+            dataset (iterable): The chunks (lines) to embed.
+            store (KnowledgeStore, optional): Store receiving the entries. Defaults to None.
+            batch_size (int, optional): Chunks per embedding request in store mode. Defaults to 32.
+            progress (callable, optional): Called with the number of chunks of every batch
+                written to the store. Defaults to None.
+            metadata (dict, optional): Metadata attached to every chunk in store mode, e.g.
+                ``{"tenant": "acme"}``. Defaults to None.
+            concurrency (int, optional): Embedding requests in flight. Defaults to 1.
+            retries (int, optional): Retries of an embedding batch failing with a transient error.
+                Defaults to 0.
+            retry_delay (float, optional): Seconds before the first retry, doubled at every
+                further retry. Defaults to 1.0.
+            stats (IngestionStats, optional): Counters (chunks, batches, retries, throughput)
+                updated after every batch and finished at the end. Defaults to None.
+
+        Returns:
+            list or KnowledgeStore: The (chunk, embedding) list, or the store when given.
         """
+        if store is not None or concurrency > 1:
+            knowledge = store if store is not None else []
+            batches = self._embed_batches(dataset, batch_size, concurrency, retries, retry_delay)
+            for batch, embeddings, attempts in batches:
+                if store is not None:
+                    store.add_batch(batch, self._project(store, embeddings), metadata=metadata)
+                else:
+                    knowledge.extend(zip(batch, embeddings))
+                if stats is not None:
+                    stats.chunks += len(batch)
+                    stats.batches += 1
+                    stats.retries += attempts - 1
+                if progress is not None:
+                    progress(len(batch))
+            if store is not None and store.projection is not None and not store.projection.fitted:
+                store.reduce()
+            if stats is not None:
+                stats.finish()
+            return knowledge
+
         knowledge = []
         for i, chunk in enumerate(dataset):
             embedding = current_provider.embed(text=chunk)
             knowledge.append((chunk, embedding))
         return knowledge
 
-    def get_most_relevant_chunks(self, query, knowledge, top_n=3):
+    def _embed_batches(self, dataset, batch_size, concurrency, retries, retry_delay):
+        """Yields ``(batch, embeddings, attempts)`` for the batches of ``dataset``, in order."""
+        batches = _batched(dataset, batch_size)
+        if concurrency <= 1:
+            for batch in batches:
+                yield (batch,) + self._embed_with_retry(batch, retries, retry_delay)
+            return
+
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embed") as pool:
+            pending = deque()
+            for batch in batches:
+                # Each batch runs in a copy of the current context, with the span and deadline of the caller.
+                pending.append((batch, pool.submit(contextvars.copy_context().run, self._embed_with_retry, batch,
+                                                   retries, retry_delay)))
+                if len(pending) >= concurrency:
+                    batch, future = pending.popleft()
+                    yield (batch,) + future.result()
+            while pending:
+                batch, future = pending.popleft()
+                yield (batch,) + future.result()
+
+    @staticmethod
+    def _embed_with_retry(batch, retries, retry_delay):
+        """Embeds a batch, retrying transient failures with exponential backoff.
+
+        The error is raised without retry when it is not transient, or when the current
+        deadline was cancelled or would expire during the backoff.
+
+        Returns:
+            tuple: The embeddings and the number of attempts made.
+        """
+        for attempt in range(retries + 1):
+            try:
+                embeddings = current_provider.embed_batch(batch)
+                if len(embeddings) != len(batch):
+                    raise _IncompleteBatchError(f"Got {len(embeddings)} embeddings for a batch of {len(batch)} chunks")
+                return embeddings, attempt + 1
+            except Exception as error:
+                delay = retry_delay * 2 ** attempt
+                deadline = current_deadline()
+                remaining = deadline.remaining() if deadline is not None else None
+                if attempt == retries or not _is_transient(error) or (deadline is not None and deadline.cancelled) \
+                        or (remaining is not None and remaining <= delay):
+                    raise
+                logger.warning("Embedding batch failed (%s), retrying in %.1fs", error, delay,
+                               extra={"attempt": attempt + 1, "batch_size": len(batch)})
+                time.sleep(delay)
+
+    @traced("knowledge.update_document", "doc_id")
+    @_measured("update_document")
+    def update_document(self, doc_id, chunks, store: KnowledgeStore, batch_size=32, report: RefreshReport = None,
+                        metadata=None):
+        """Re-indexes one document, embedding only its new or changed chunks.
+
+        Chunks whose content hash is already stored for the document keep their row; new chunks
+        identical to a chunk stored elsewhere reuse its embedding; the remaining new chunks are
+        embedded in batches. Rows of the document that are no longer present are tombstoned.
+
+        Args:
+            doc_id (str): The document id.
+            chunks (iterable): The current chunks of the document.
+            store (KnowledgeStore): The store to update.
+            batch_size (int, optional): Chunks per embedding request. Defaults to 32.
+            report (RefreshReport, optional): Report to update. Defaults to a new report.
+            metadata (dict, optional): Metadata attached to the newly added chunks. Defaults to None.
+
+        Returns:
+            RefreshReport: The updated report.
+        """
+        report = report if report is not None else RefreshReport()
+        existing = {}
+        for row in store.document_rows(doc_id):
+            existing.setdefault(store.row_hash(row), []).append(row)
+
+        reused = []
+        pending = {}
+        unchanged = 0
+        for chunk in chunks:
+            digest = content_hash(chunk)
+            rows = existing.get(digest)
+            if rows:
+                rows.pop()
+                if not rows:
+                    del existing[digest]
+                unchanged += 1
+                continue
+            embedding = store.find_embedding(digest)
+            if embedding is not None:
+                reused.append((chunk, embedding))
+            else:
+                pending.setdefault(digest, []).append(chunk)
+
+        # Add before deleting so that chunks moved within the document can still be reused.
+        for chunk, embedding in reused:
+            store.add(chunk, embedding, doc_id, metadata)
+        report.chunks_unchanged += unchanged
+        report.chunks_reused += len(reused)
+
+        for batch in _batched(pending.values(), batch_size):
+            embeddings = self._project(store, current_provider.embed_batch([copies[0] for copies in batch]))
+            for copies, embedding in zip(batch, embeddings):
+                store.add_batch(copies, [embedding] * len(copies), doc_id, metadata)
+            report.chunks_embedded += len(batch)
+
+        for rows in existing.values():
+            for row in rows:
+                store.delete(row)
+                report.chunks_deleted += 1
+
+        # Unchanged and reused chunks are embedding cache hits, the embedded chunks misses.
+        cache_lookups.inc("embedding", "hit", amount=unchanged + len(reused))
+        cache_lookups.inc("embedding", "miss", amount=sum(len(copies) for copies in pending.values()))
+        return report
+
+    def refresh_knowledge(self, documents, store: KnowledgeStore, batch_size=32, compact_threshold=0.25,
+                          delete_missing=True, metadata=None):
+        """Incrementally re-indexes a corpus into a store.
+
+        Documents whose hash equals the one recorded by the previous refresh are skipped without
+        reading their chunks; changed documents are updated with :meth:`update_document`.
+        The store is compacted when the fraction of tombstoned rows exceeds ``compact_threshold``.
+
+        Args:
+            documents (iterable): ``(doc_id, chunks)`` or ``(doc_id, chunks, digest)`` tuples, or a
+                mapping of doc_id to chunks. ``digest`` is a hash of the document source (e.g. of the
+                file bytes); when omitted it is derived from the chunks. ``chunks`` may be lazy: it is
+                only consumed when the document changed.
+            store (KnowledgeStore): The store to update.
+            batch_size (int, optional): Chunks per embedding request. Defaults to 32.
+            compact_threshold (float, optional): Tombstone ratio triggering compaction. Defaults to 0.25.
+            delete_missing (bool, optional): Delete the stored documents absent from ``documents``.
+                Defaults to True.
+            metadata (dict, optional): Metadata attached to the newly added chunks. Defaults to None.
+
+        Returns:
+            RefreshReport: The counters of the run.
+        """
+        report = RefreshReport()
+        if isinstance(documents, dict):
+            documents = documents.items()
+
+        seen = set()
+        for document in documents:
+            doc_id, chunks = document[0], document[1]
+            seen.add(doc_id)
+            if len(document) > 2:
+                digest = document[2]
+            else:
+                chunks = list(chunks)
+                hasher = hashlib.blake2b(digest_size=16)
+                for chunk in chunks:
+                    hasher.update(content_hash(chunk))
+                digest = hasher.digest()
+
+            if store.get_document_hash(doc_id) == digest:
+                report.documents_unchanged += 1
+                continue
+            self.update_document(doc_id, chunks, store, batch_size=batch_size, report=report, metadata=metadata)
+            store.set_document_hash(doc_id, digest)
+            report.documents_updated += 1
+
+        if delete_missing:
+            for doc_id in store.document_ids():
+                if doc_id not in seen:
+                    report.chunks_deleted += store.delete_document(doc_id)
+                    report.documents_deleted += 1
+
+        if store.tombstone_ratio > compact_threshold:
+            report.rows_compacted = store.compact()
+        return report
+
+    @traced("knowledge.query", "top_n", "mode")
+    @_measured("query")
+    @profiled("knowledge.query")
+    def get_most_relevant_chunks(self, query, knowledge, top_n=3, mode="vector", candidate_pool=None, rrf_k=60,
+                                 where=None, post_retrieval: PostRetrievalStage = None, deadline=None):
             """Finds the most relevant chunks from a knowledge base based on a query.
 
+            Three retrieval modes are available:
+
+            - ``"vector"``: cosine similarity between the query and every chunk embedding.
+            - ``"lexical"``: BM25 scores from the store's inverted index (no embedding call).
+            - ``"hybrid"``: reciprocal-rank fusion of the BM25 and cosine rankings. The lexical
+              side runs first and only its ``candidate_pool`` best rows are compared with the
+              query embedding; when fewer than ``top_n`` rows match lexically, every row is
+              compared, as in vector mode.
+
+            With a ``where`` filter expression (see :class:`KnowledgeStore`), the matching rows are
+            resolved from the store's metadata index first and only those rows are scored.
+
+            A :class:`KnowledgeStore` is scored with one matrix-vector product against its cached
+            unit-norm embedding matrix (see :meth:`KnowledgeStore.matrix`) instead of one Python
+            cosine computation per chunk.
+
+            A :class:`ShardedKnowledgeStore` is searched in vector mode by its worker processes,
+            all shards in parallel.
+
+            With a ``post_retrieval`` stage, ``post_retrieval.candidate_pool`` candidates are
+            retrieved and the stage reranks and/or diversifies them (MMR) down to ``top_n``.
+
             Args:
                 query (str): The input query string to find relevant chunks for.
                 knowledge (list): A list of tuples where each tuple contains a chunk (str)
-                    and its corresponding embedding (list or array).
+                    and its corresponding embedding (list or array), a KnowledgeStore or a
+                    ShardedKnowledgeStore.
                 top_n (int, optional): The number of most relevant chunks to return. Defaults to 3.
+                mode (str, optional): ``"vector"``, ``"lexical"`` or ``"hybrid"``. Defaults to ``"vector"``.
+                candidate_pool (int, optional): Lexical candidates re-ranked in hybrid mode.
+                    Defaults to ``max(10 * top_n, 50)``.
+                rrf_k (int, optional): Reciprocal-rank fusion constant. Defaults to 60.
+                where (dict, optional): Metadata filter expression, e.g. ``{"tenant": "acme"}``.
+                    Requires a KnowledgeStore. Defaults to None.
+                post_retrieval (PostRetrievalStage, optional): Rerank/diversification stage. Defaults to None.
+                deadline (float, optional): Absolute request deadline on the stage's clock; reranking
+                    is skipped when it would not finish in time. Defaults to the expiry of the
+                    current :class:`Deadline`, if any.
 
             Returns:
                 list: A list of the top N most relevant chunks, each represented as a tuple
-                    containing the chunk (str) and its similarity score (float).
+                    containing the chunk (str) and its score (float): the cosine similarity,
+                    the BM25 score or the fused score depending on ``mode`` (or the rerank score).
+
+            Raises:
+                ValueError: If the mode is unknown, lexical/hybrid retrieval is requested on a
+                    knowledge base without a lexical index, or a filter on a plain list.
             """
-            query_embedding = current_provider.embed(text=query)
-            # Temporary list to store (chunk, similarity) pairs
-            similarities = []
-            for chunk, embedding in knowledge:
-                similarity = MathUtils.cosine_similarity(query_embedding, embedding)
-                similarities.append((chunk, similarity))
+            knowledge_queries.inc(mode)
+            if where is not None and not isinstance(knowledge, KnowledgeStore):
+                raise ValueError("Metadata filtering needs a KnowledgeStore")
+            size = top_n if post_retrieval is None else max(top_n, post_retrieval.candidate_pool)
+            if mode != "vector":
+                candidates, query_embedding = self._get_lexical_chunks(query, knowledge, size, mode, candidate_pool,
+                                                                       rrf_k, where)
+            elif isinstance(knowledge, ShardedKnowledgeStore):
+                query_embedding = self._embed_query(query, knowledge)
+                candidates = self._candidates(knowledge, knowledge.search(query_embedding, size))
+            elif isinstance(knowledge, KnowledgeStore):
+                query_embedding = self._embed_query(query, knowledge)
+                rows = self._live_rows(knowledge, where)
+                candidates = self._candidates(knowledge, self._nearest_rows(knowledge, query_embedding, rows, size))
+            else:
+                query_embedding = current_provider.embed(text=query)
+                entries = knowledge
+                # Temporary list to store (chunk, similarity, embedding) triples
+                similarities = []
+                for chunk, embedding in entries:
+                    similarity = MathUtils.cosine_similarity(query_embedding, embedding)
+                    similarities.append((chunk, similarity, embedding))
+
+                # Sort by similarity in descending order, because higher similarity means more relevant chunks
+                similarities.sort(key=lambda x: x[1], reverse=True)
+                candidates = similarities[:size]
 
-            # Sort by similarity in descending order, because higher similarity means more relevant chunks
-            similarities.sort(key=lambda x: x[1], reverse=True)
+            if post_retrieval is not None:
+                if query_embedding is None:
+                    query_embedding = self._embed_query(query, knowledge)
+                if deadline is None and current_deadline() is not None:
+                    deadline = current_deadline().expires_at
+                return post_retrieval.apply(query, query_embedding, candidates, top_n, deadline=deadline)
 
             # Finally, return the top N most relevant chunks
-            return similarities[:top_n]
+            return [(chunk, score) for chunk, score, _ in candidates]
+
+    @traced("knowledge.query_batch", "top_n")
+    @_measured("query_batch")
+    @profiled("knowledge.query_batch")
+    def get_most_relevant_chunks_batch(self, queries, knowledge, top_n=3, block_size=4096, where=None):
+        """Finds the most relevant chunks of several queries at once.
+
+        All queries are embedded in one batch request, and the knowledge base is scanned once:
+        the query-by-corpus cosine similarity matrix is computed one block of ``block_size``
+        chunks at a time and only the best ``top_n`` candidates per query are kept between
+        blocks, so memory stays bounded by ``len(queries) * block_size`` scores. The blocks of a
+        KnowledgeStore are slices of its cached unit-norm matrix and need no normalization.
+
+        Args:
+            queries (list): The query strings.
+            knowledge (list): A list of (chunk, embedding) tuples, a KnowledgeStore or a
+                ShardedKnowledgeStore.
+            top_n (int, optional): The number of most relevant chunks per query. Defaults to 3.
+            block_size (int, optional): Chunks scored per block. Defaults to 4096.
+            where (dict, optional): Metadata filter expression. Requires a KnowledgeStore. Defaults to None.
+
+        Returns:
+            list: For every query, in order, the list of its top N (chunk, similarity) tuples.
+
+        Raises:
+            ValueError: If a filter is given on a plain list.
+        """
+        queries = list(queries)
+        knowledge_queries.inc("batch", amount=len(queries))
+        if where is not None and not isinstance(knowledge, KnowledgeStore):
+            raise ValueError("Metadata filtering needs a KnowledgeStore")
+        if not queries:
+            return []
+        query_embeddings = self._project(knowledge, current_provider.embed_batch(queries))
+        if top_n <= 0:
+            return [[] for _ in queries]
+
+        if isinstance(knowledge, ShardedKnowledgeStore):
+            return [[(knowledge.get(row)[0], score) for row, score in hits]
+                    for hits in knowledge.search_batch(query_embeddings, top_n)]
+
+        query_matrix = MathUtils.normalize_rows(query_embeddings)
+        if isinstance(knowledge, KnowledgeStore):
+            rows = self._live_rows(knowledge, where)
+            matrix = knowledge.matrix()
+            count = len(matrix) if rows is None else len(rows)
+            blocks = (matrix[start:start + block_size] if rows is None else matrix[rows[start:start + block_size]]
+                      for start in range(0, count, block_size))
+            indices, scores = MathUtils.top_k_blocked((query_matrix @ block.T for block in blocks), top_n)
+            if not count:
+                return [[] for _ in queries]
+            return [[(knowledge.get(i if rows is None else rows[i])[0], float(score))
+                     for i, score in zip(row_indices, row_scores)]
+                    for row_indices, row_scores in zip(indices.tolist(), scores.tolist())]
+
+        entries = knowledge
+        chunks = []
+
+        def score_blocks():
+            for block in _batched(entries, block_size):
+                chunks.extend(chunk for chunk, _ in block)
+                yield query_matrix @ MathUtils.normalize_rows([embedding for _, embedding in block]).T
+
+        indices, scores = MathUtils.top_k_blocked(score_blocks(), top_n)
+        if not chunks:
+            return [[] for _ in queries]
+        return [[(chunks[i], float(score)) for i, score in zip(row_indices, row_scores)]
+                for row_indices, row_scores in zip(indices.tolist(), scores.tolist())]
+
+    def _get_lexical_chunks(self, query, knowledge, top_n, mode, candidate_pool, rrf_k, where=None):
+        """Runs a lexical or hybrid query (see :meth:`get_most_relevant_chunks`).
+
+        Returns:
+            tuple: The ``(chunk, score, embedding)`` candidates, and the query embedding (None
+                in lexical mode, which does not embed the query).
+        """
+        if mode not in ("lexical", "hybrid"):
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+        index = getattr(knowledge, "lexical_index", None)
+        if index is None:
+            raise ValueError(f"The {mode} mode needs a KnowledgeStore with a lexical index")
+
+        allowed = None if where is None else knowledge.filter_rows(where)
+        allowed_set = None if allowed is None else set(allowed)
+        if mode == "lexical":
+            return self._candidates(knowledge, index.search(query, top_n, allowed_set)), None
+
+        lexical = index.search(query, candidate_pool or max(10 * top_n, 50), allowed_set)
+        # Too few lexical matches to fill the result: rank every (allowed) row by similarity instead.
+        if len(lexical) >= top_n:
+            rows = [row for row, _ in lexical]
+        else:
+            rows = self._live_rows(knowledge, None) if allowed is None else allowed
+
+        query_embedding = self._embed_query(query, knowledge)
+        similarities = self._nearest_rows(knowledge, query_embedding, rows, len(knowledge))
+
+        fused = {}
+        for ranking in (lexical, similarities):
+            for rank, (row, _) in enumerate(ranking, start=1):
+                fused[row] = fused.get(row, 0.0) + 1.0 / (rrf_k + rank)
+        best = heapq.nlargest(top_n, fused.items(), key=lambda item: item[1])
+        return self._candidates(knowledge, best), query_embedding
+
+    @staticmethod
+    def _project(knowledge, embeddings):
+        """Applies the fitted projection of a knowledge base, if any, to provider embeddings."""
+        projection = getattr(knowledge, "projection", None)
+        if projection is None or not projection.fitted:
+            return embeddings
+        return projection.transform(embeddings)
+
+    def _embed_query(self, query, knowledge):
+        """Embeds a query in the (possibly projected) space of a knowledge base."""
+        return self._project(knowledge, current_provider.embed(text=query))
+
+    @staticmethod
+    def _live_rows(store, where):
+        """Returns the rows of a KnowledgeStore to score, or None when every stored row is live and wanted."""
+        if where is None and len(store) == len(store.matrix()):
+            return None
+        return store.filter_rows(where)
+
+    @staticmethod
+    def _nearest_rows(store, query_embedding, rows, top_n):
+        """Ranks rows of a KnowledgeStore (all of them if ``rows`` is None) by cosine similarity
+        with the query, returning the best ``top_n`` ``(row, similarity)`` pairs."""
+        matrix = store.matrix()
+        if rows is not None:
+            matrix = matrix[rows]
+        if not len(matrix) or top_n <= 0:
+            return []
+        similarities = MathUtils.cosine_similarity_many(query_embedding, matrix, normalized=True)
+        indices, scores = MathUtils.top_k_blocked([similarities[None, :]], top_n)
+        return [(i if rows is None else rows[i], score) for i, score in zip(indices[0].tolist(), scores[0].tolist())]
+
+    @staticmethod
+    def _candidates(store, scored_rows):
+        """Turns ``(row, score)`` pairs into ``(chunk, score, embedding)`` candidates."""
+        candidates = []
+        for row, score in scored_rows:
+            chunk, embedding = store.get(row)
+            candidates.append((chunk, score, embedding))
+        return candidates
+
+    def get_packed_context(self, query, knowledge, packer: ContextPacker, candidate_pool=20, prompt_overhead=0,
+                           mode="vector", where=None, post_retrieval: PostRetrievalStage = None, deadline=None):
+        """Retrieves the most relevant chunks that fit in a model's context budget.
+
+        Args:
+            query (str): The input query string to find relevant chunks for.
+            knowledge (list): A list of (chunk, embedding) tuples.
+            packer (ContextPacker): The packer holding the model's context budget.
+            candidate_pool (int, optional): Number of top chunks considered for packing. Defaults to 20.
+            prompt_overhead (int, optional): Tokens used by the rest of the prompt. Defaults to 0.
+            mode (str, optional): Retrieval mode (see :meth:`get_most_relevant_chunks`). Defaults to ``"vector"``.
+            where (dict, optional): Metadata filter expression. Defaults to None.
+            post_retrieval (PostRetrievalStage, optional): Rerank/diversification stage. Defaults to None.
+            deadline (float, optional): Absolute request deadline for the stage. Defaults to None.
+
+        Returns:
+            list: The packed (chunk, score) tuples, by descending score.
+        """
+        candidates = self.get_most_relevant_chunks(query, knowledge, top_n=candidate_pool, mode=mode,
+                                                   where=where, post_retrieval=post_retrieval, deadline=deadline)
+        return packer.pack(candidates, prompt_overhead=prompt_overhead)
 
     def get_best_matching_chunk(self, query, chunks):
         """Finds the best matching chunk from a list of chunks based on a query.
@@ -0,0 +1,538 @@
+"""
+KnowledgeStore Module
+
+This module provides the KnowledgeStore class, a memory-compact container for knowledge
+chunks and their embeddings. Embeddings are stored as float32 arrays (about 4 bytes per
+dimension instead of ~32 for a list of Python floats).
+
+Every row records the content hash of its chunk and, optionally, the document it belongs
+to, so that a changed corpus can be re-indexed incrementally: unchanged chunks keep their
+embeddings, removed chunks are tombstoned and the store is compacted from time to time
+(see :meth:`KnowledgeService.update_document`).
+
+Unless disabled, the chunks are also indexed in a :class:`BM25Index` as they are added, so
+that lexical and hybrid queries need no separate indexing pass.
+
+Rows may carry a metadata dict (e.g. tenant, document type). Every metadata field has an
+inverted index from value to the list of rows having it, turned into a numpy boolean mask when
+a filter references it, so that adding a row is O(1) and a filter expression is resolved with a
+few vectorized boolean operations before any vector is scored:
+
+    {"tenant": "acme"}                                   equality
+    {"type": {"$in": ["faq", "manual"]}}                 membership
+    {"lang": {"$ne": "de"}}                              inequality
+    {"$or": [{...}, {...}]}, {"$and": [...]}, {"$not": {...}}
+
+Several fields in one dict are combined with AND. List values (e.g. tags) are indexed per
+element, so ``{"tags": "billing"}`` matches rows tagged with ``"billing"``.
+
+For vector search, :meth:`matrix` keeps a contiguous copy of the embeddings scaled to unit
+norm, so that scoring a query is one matrix-vector product. The copy grows with the store
+(amortized, like a list) and is only renormalized for the rows added since the last query.
+Concurrent queries may call it: the copy is updated under a lock.
+
+A store may carry an :class:`EmbeddingProjection` (PCA or Matryoshka truncation) reducing
+the embedding size; :meth:`reduce` fits it on the stored corpus and projects the rows in
+place, and :class:`KnowledgeService` projects the embeddings it adds and its query embeddings.
+
+A KnowledgeStore iterates as ``(chunk, embedding)`` tuples over its live rows, so it can be
+passed anywhere the list returned by :meth:`KnowledgeService.build_knowledge` is accepted.
+"""
+
+import hashlib
+import threading
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from lib.commons.MathUtils import MathUtils
+from lib.core.service.BM25Index import BM25Index
+from lib.core.service.EmbeddingProjection import EmbeddingProjection
+
+
+def content_hash(text: str) -> bytes:
+    """
+    Compute the content hash used to recognize unchanged chunks.
+
+    Args:
+        text (str): The chunk text.
+
+    Returns:
+        bytes: A 16-byte BLAKE2b digest.
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class KnowledgeStore:
+    """
+    Store of text chunks and float32 embeddings with tombstones and compaction.
+
+    Rows are identified by their insertion index. Deleting a row only tombstones it; row ids
+    stay stable until :meth:`compact` renumbers the live rows.
+
+    Attributes:
+        dimensions (int): Embedding size, fixed by the first inserted row (0 while empty).
+        lexical_index (Optional[BM25Index]): The BM25 index of the chunks, or None if disabled.
+        projection (Optional[EmbeddingProjection]): The projection applied to the embeddings of
+            the store and of its queries, or None. The stored rows are projected once it is fitted.
+    """
+
+    def __init__(self, lexical: bool = True, projection: Optional[EmbeddingProjection] = None):
+        """
+        Initialize an empty KnowledgeStore.
+
+        Args:
+            lexical (bool, optional): Maintain a BM25 index of the chunks. Defaults to True.
+            projection (Optional[EmbeddingProjection], optional): Dimensionality reduction of the
+                embeddings. Defaults to None.
+        """
+        self._chunks: List[str] = []
+        self._embeddings: List[array] = []
+        self._hashes: List[bytes] = []
+        self._doc_ids: List[Optional[str]] = []
+        self._deleted = set()
+        # Rows per content hash and per document, as insertion-ordered dicts for O(1) deletes.
+        self._hash_rows: Dict[bytes, Dict[int, None]] = {}
+        self._doc_rows: Dict[str, Dict[int, None]] = {}
+        self._doc_hashes: Dict[str, bytes] = {}
+        self.dimensions = 0
+        self.lexical_index = BM25Index() if lexical else None
+        self._metadata: List[Optional[dict]] = []
+        self._postings: Dict[str, Dict[Any, List[int]]] = {}
+        self._live = np.zeros(0, dtype=bool)
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_rows = 0
+        self._matrix_lock = threading.Lock()
+        self.projection = projection
+
+    def add(self, chunk: str, embedding: Sequence[float], doc_id: Optional[str] = None,
+            metadata: Optional[dict] = None) -> int:
+        """
+        Append a chunk and its embedding.
+
+        Args:
+            chunk (str): The chunk text.
+            embedding (Sequence[float]): The chunk embedding.
+            doc_id (Optional[str], optional): The document the chunk belongs to. Defaults to None.
+            metadata (Optional[dict], optional): Filterable attributes of the chunk. Defaults to None.
+
+        Returns:
+            int: The row id of the new entry.
+
+        Raises:
+            ValueError: If the embedding size differs from the one of the stored rows.
+        """
+        vector = array("f", embedding)
+        if not self._embeddings:
+            self.dimensions = len(vector)
+        elif len(vector) != self.dimensions:
+            raise ValueError(f"Expected an embedding of size {self.dimensions}, got {len(vector)}")
+        row = len(self._chunks)
+        digest = content_hash(chunk)
+        self._chunks.append(chunk)
+        self._embeddings.append(vector)
+        self._hashes.append(digest)
+        self._doc_ids.append(doc_id)
+        self._hash_rows.setdefault(digest, {})[row] = None
+        if doc_id is not None:
+            self._doc_rows.setdefault(doc_id, {})[row] = None
+        if self.lexical_index is not None:
+            self.lexical_index.add(row, chunk)
+        self._metadata.append(metadata)
+        self._index_metadata(row, metadata)
+        if row == len(self._live):
+            # Grow the live mask geometrically, like a list, so that adding stays amortized O(1).
+            self._live = np.concatenate([self._live, np.zeros(max(16, row), dtype=bool)])
+        self._live[row] = True
+        return row
+
+    def add_batch(self, chunks: Sequence[str], embeddings: Sequence[Sequence[float]],
+                  doc_id: Optional[str] = None,
+                  metadata: Union[None, dict, Sequence[Optional[dict]]] = None) -> List[int]:
+        """
+        Append several chunks and their embeddings.
+
+        Args:
+            chunks (Sequence[str]): The chunk texts.
+            embeddings (Sequence[Sequence[float]]): One embedding per chunk.
+            doc_id (Optional[str], optional): The document the chunks belong to. Defaults to None.
+            metadata (Union[None, dict, Sequence[Optional[dict]]], optional): Metadata shared by
+                all chunks, or one metadata dict per chunk. Defaults to None.
+
+        Returns:
+            List[int]: The row ids of the new entries.
+
+        Raises:
+            ValueError: If the number of chunks, embeddings and metadata dicts differ.
+        """
+        if len(chunks) != len(embeddings):
+            raise ValueError(f"Got {len(chunks)} chunks but {len(embeddings)} embeddings")
+        if metadata is None or isinstance(metadata, dict):
+            metadata = [metadata] * len(chunks)
+        elif len(metadata) != len(chunks):
+            raise ValueError(f"Got {len(chunks)} chunks but {len(metadata)} metadata dicts")
+        return [self.add(chunk, embedding, doc_id, meta)
+                for chunk, embedding, meta in zip(chunks, embeddings, metadata)]
+
+    def _index_metadata(self, row: int, metadata: Optional[dict]) -> None:
+        """Append ``row`` to the rows of every (field, value) pair of its metadata."""
+        if not metadata:
+            return
+        for field, value in metadata.items():
+            values = self._postings.setdefault(field, {})
+            for item in (value if isinstance(value, (list, tuple, set, frozenset)) else (value,)):
+                values.setdefault(item, []).append(row)
+
+    def get_metadata(self, row: int) -> Optional[dict]:
+        """
+        Return the metadata of a row.
+
+        Args:
+            row (int): The row id.
+
+        Returns:
+            Optional[dict]: The metadata, or None if the row has none.
+        """
+        return self._metadata[row]
+
+    def metadata_values(self, field: str) -> List[Any]:
+        """
+        Return the values indexed for a metadata field (including values of deleted rows
+        until the next :meth:`compact`).
+
+        Args:
+            field (str): The metadata field.
+
+        Returns:
+            List[Any]: The distinct values.
+        """
+        return list(self._postings.get(field, ()))
+
+    def filter_mask(self, where: Optional[dict]) -> np.ndarray:
+        """
+        Resolve a filter expression into a boolean mask of the matching live rows.
+
+        Args:
+            where (Optional[dict]): The filter expression (see the module documentation).
+                None matches every live row.
+
+        Returns:
+            np.ndarray: A boolean array with one entry per stored row, True for every matching row.
+
+        Raises:
+            ValueError: If the expression uses an unknown operator.
+        """
+        live = self._live[:len(self._chunks)]
+        if where is None:
+            return live.copy()
+        return self._match(where) & live
+
+    def _match(self, where: dict) -> np.ndarray:
+        """Evaluate a filter expression, ignoring deletions."""
+        mask = self._universe()
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self._match(clause)
+            elif key == "$or":
+                union = self._mask(())
+                for clause in condition:
+                    union |= self._match(clause)
+                mask &= union
+            elif key == "$not":
+                mask &= ~self._match(condition)
+            elif key.startswith("$"):
+                raise ValueError(f"Unknown filter operator: {key}")
+            else:
+                mask &= self._match_field(key, condition)
+        return mask
+
+    def _match_field(self, field: str, condition: Any) -> np.ndarray:
+        """Evaluate the condition on one metadata field."""
+        values = self._postings.get(field, {})
+        if not isinstance(condition, dict):
+            return self._mask(values.get(condition, ()))
+        mask = self._universe()
+        for operator, operand in condition.items():
+            if operator == "$eq":
+                mask &= self._mask(values.get(operand, ()))
+            elif operator == "$ne":
+                mask &= ~self._mask(values.get(operand, ()))
+            elif operator == "$in":
+                mask &= self._mask([row for value in operand for row in values.get(value, ())])
+            elif operator == "$nin":
+                mask &= ~self._mask([row for value in operand for row in values.get(value, ())])
+            elif operator == "$exists":
+                present = self._mask([row for rows in values.values() for row in rows])
+                mask &= present if operand else ~present
+            else:
+                raise ValueError(f"Unknown filter operator: {operator}")
+        return mask
+
+    def _mask(self, rows: Sequence[int]) -> np.ndarray:
+        """Return the boolean mask of the given rows over all stored rows."""
+        mask = np.zeros(len(self._chunks), dtype=bool)
+        mask[np.asarray(rows, dtype=np.intp)] = True
+        return mask
+
+    def _universe(self) -> np.ndarray:
+        """Return the mask of all stored rows, live or deleted."""
+        return np.ones(len(self._chunks), dtype=bool)
+
+    def filter_rows(self, where: Optional[dict]) -> List[int]:
+        """
+        Return the live rows matching a filter expression.
+
+        Args:
+            where (Optional[dict]): The filter expression (see :meth:`filter_mask`).
+
+        Returns:
+            List[int]: The matching row ids, in increasing order.
+        """
+        return np.flatnonzero(self.filter_mask(where)).tolist()
+
+    def matrix(self) -> np.ndarray:
+        """
+        Return the unit-norm float32 embeddings of all stored rows, tombstoned rows included.
+
+        Row ``i`` of the matrix is the normalized embedding of row id ``i``; callers select the
+        live (or filtered) rows themselves. The returned array is a view of a buffer reused by
+        later calls: do not modify it, and call :meth:`matrix` again after adding rows.
+
+        Returns:
+            np.ndarray: The ``(rows, dimensions)`` matrix.
+        """
+        with self._matrix_lock:
+            count = len(self._embeddings)
+            if not count:
+                return np.empty((0, self.dimensions), dtype=np.float32)
+            if self._matrix is None or count > len(self._matrix):
+                capacity = max(count, 2 * self._matrix_rows, 16)
+                buffer = np.empty((capacity, self.dimensions), dtype=np.float32)
+                if self._matrix is not None:
+                    buffer[:self._matrix_rows] = self._matrix[:self._matrix_rows]
+                self._matrix = buffer
+            if self._matrix_rows < count:
+                rows = self._embeddings[self._matrix_rows:count]
+                self._matrix[self._matrix_rows:count] = MathUtils.normalize_rows(rows)
+                self._matrix_rows = count
+            return self._matrix[:count]
+
+    def reduce(self, projection: Optional[EmbeddingProjection] = None) -> None:
+        """
+        Project the stored embeddings, fitting the projection on the live rows first if needed.
+
+        Args:
+            projection (Optional[EmbeddingProjection], optional): The projection. Defaults to
+                :attr:`projection`.
+
+        Raises:
+            ValueError: If there is no projection, or the rows were already projected.
+        """
+        projection = projection or self.projection
+        if projection is None:
+            raise ValueError("No projection to reduce the embeddings with")
+        if self.projection is not None and self.projection.fitted:
+            raise ValueError("The embeddings of this store are already projected")
+        if self._embeddings:
+            if not projection.fitted:
+                projection.fit([self._embeddings[row] for row in self.rows()])
+            projected = projection.transform(self._embeddings)
+            self._embeddings = [array("f", vector.tobytes()) for vector in projected]
+            self.dimensions = projection.dimensions
+            with self._matrix_lock:
+                self._matrix = None
+                self._matrix_rows = 0
+        self.projection = projection
+
+    def get(self, row: int) -> Tuple[str, array]:
+        """
+        Return the entry stored at a row.
+
+        Args:
+            row (int): The row id.
+
+        Returns:
+            Tuple[str, array]: The chunk and its embedding.
+        """
+        return self._chunks[row], self._embeddings[row]
+
+    def find_embedding(self, digest: bytes) -> Optional[array]:
+        """
+        Return the embedding of a live chunk with the given content hash, if any.
+
+        Args:
+            digest (bytes): The content hash (see :func:`content_hash`).
+
+        Returns:
+            Optional[array]: The embedding, or None if no live row has this content.
+        """
+        rows = self._hash_rows.get(digest)
+        return None if not rows else self._embeddings[next(iter(rows))]
+
+    def document_rows(self, doc_id: str) -> List[int]:
+        """
+        Return the live rows of a document.
+
+        Args:
+            doc_id (str): The document id.
+
+        Returns:
+            List[int]: The row ids.
+        """
+        return list(self._doc_rows.get(doc_id, ()))
+
+    def row_hash(self, row: int) -> bytes:
+        """
+        Return the content hash of a row.
+
+        Args:
+            row (int): The row id.
+
+        Returns:
+            bytes: The content hash.
+        """
+        return self._hashes[row]
+
+    def document_ids(self) -> List[str]:
+        """
+        Return the ids of the documents having live rows or a recorded hash.
+
+        Returns:
+            List[str]: The document ids.
+        """
+        return list(self._doc_rows.keys() | self._doc_hashes.keys())
+
+    def get_document_hash(self, doc_id: str) -> Optional[bytes]:
+        """
+        Return the hash recorded for a document's content (see :meth:`set_document_hash`).
+
+        Args:
+            doc_id (str): The document id.
+
+        Returns:
+            Optional[bytes]: The recorded hash, or None.
+        """
+        return self._doc_hashes.get(doc_id)
+
+    def set_document_hash(self, doc_id: str, digest: bytes) -> None:
+        """
+        Record the hash of a document's content, to skip it when it has not changed.
+
+        Args:
+            doc_id (str): The document id.
+            digest (bytes): The document hash.
+        """
+        self._doc_hashes[doc_id] = digest
+
+    def delete(self, row: int) -> None:
+        """
+        Tombstone a row. It is skipped by iteration and removed by :meth:`compact`.
+
+        Args:
+            row (int): The row id.
+        """
+        if row in self._deleted:
+            return
+        self._deleted.add(row)
+        self._live[row] = False
+        digest = self._hashes[row]
+        rows = self._hash_rows[digest]
+        del rows[row]
+        if not rows:
+            del self._hash_rows[digest]
+        doc_id = self._doc_ids[row]
+        if doc_id is not None:
+            rows = self._doc_rows[doc_id]
+            del rows[row]
+            if not rows:
+                del self._doc_rows[doc_id]
+        if self.lexical_index is not None:
+            self.lexical_index.remove(row, self._chunks[row])
+
+    def delete_document(self, doc_id: str) -> int:
+        """
+        Tombstone all rows of a document and forget its hash.
+
+        Args:
+            doc_id (str): The document id.
+
+        Returns:
+            int: The number of tombstoned rows.
+        """
+        rows = self.document_rows(doc_id)
+        for row in rows:
+            self.delete(row)
+        self._doc_hashes.pop(doc_id, None)
+        return len(rows)
+
+    def is_deleted(self, row: int) -> bool:
+        """
+        Tell whether a row is tombstoned.
+
+        Args:
+            row (int): The row id.
+
+        Returns:
+            bool: True if the row was deleted.
+        """
+        return row in self._deleted
+
+    @property
+    def tombstone_ratio(self) -> float:
+        """float: Fraction of the stored rows that are tombstoned."""
+        return len(self._deleted) / len(self._chunks) if self._chunks else 0.0
+
+    def rows(self) -> Iterator[int]:
+        """
+        Iterate over the ids of the live rows.
+
+        Yields:
+            int: The live row ids, in insertion order.
+        """
+        deleted = self._deleted
+        return (row for row in range(len(self._chunks)) if row not in deleted)
+
+    def compact(self) -> int:
+        """
+        Physically remove the tombstoned rows and renumber the live ones.
+
+        Returns:
+            int: The number of removed rows.
+        """
+        removed = len(self._deleted)
+        if not removed:
+            return 0
+        live = list(self.rows())
+        self._chunks = [self._chunks[row] for row in live]
+        self._embeddings = [self._embeddings[row] for row in live]
+        self._hashes = [self._hashes[row] for row in live]
+        self._doc_ids = [self._doc_ids[row] for row in live]
+        self._metadata = [self._metadata[row] for row in live]
+        with self._matrix_lock:
+            if self._matrix is not None:
+                kept = [row for row in live if row < self._matrix_rows]
+                self._matrix = self._matrix[kept]
+                self._matrix_rows = len(kept)
+        self._deleted = set()
+        self._live = self._universe()
+        self._postings = {}
+        self._hash_rows = {}
+        self._doc_rows = {}
+        for row, (digest, doc_id, metadata) in enumerate(zip(self._hashes, self._doc_ids, self._metadata)):
+            self._hash_rows.setdefault(digest, {})[row] = None
+            if doc_id is not None:
+                self._doc_rows.setdefault(doc_id, {})[row] = None
+            self._index_metadata(row, metadata)
+        if self.lexical_index is not None:
+            self.lexical_index.rebuild(self._chunks)
+        return removed
+
+    def __len__(self) -> int:
+        return len(self._chunks) - len(self._deleted)
+
+    def __iter__(self) -> Iterator[Tuple[str, array]]:
+        if not self._deleted:
+            return zip(self._chunks, self._embeddings)
+        return ((self._chunks[row], self._embeddings[row]) for row in self.rows())
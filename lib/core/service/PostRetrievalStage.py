@@ -0,0 +1,191 @@
+"""
+PostRetrievalStage Module
+
+This module provides the PostRetrievalStage class, an optional stage run on the candidates
+returned by :meth:`KnowledgeService.get_most_relevant_chunks` before they are handed to a
+prompt:
+
+1. **Rerank** (optional): a :class:`Reranker` rescores a large candidate pool in batch. The
+   stage tracks how long reranking takes and skips it when the remaining time before the
+   request deadline is shorter than that, keeping the retrieval order instead.
+2. **Diversify** (optional): maximal marginal relevance (MMR) picks the final chunks one at
+   a time, trading relevance against similarity with the chunks already picked, so that
+   near-duplicate chunks do not waste context tokens. The selection is vectorized over the
+   candidate similarity matrix.
+"""
+
+import time
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from lib.commons.MathUtils import MathUtils
+from lib.core.service.Reranker import Reranker
+
+
+def maximal_marginal_relevance(query_embedding, embeddings, top_n: int, lambda_mult: float = 0.5,
+                               relevance=None) -> List[int]:
+    """
+    Select diverse and relevant candidates with maximal marginal relevance.
+
+    At every step the candidate maximizing
+    ``lambda_mult * relevance - (1 - lambda_mult) * max(similarity to selected)`` is picked.
+
+    Args:
+        query_embedding (array-like): The query embedding.
+        embeddings (array-like): The ``(n, d)`` candidate embeddings.
+        top_n (int): Number of candidates to select.
+        lambda_mult (float, optional): 1 favors relevance only, 0 diversity only. Defaults to 0.5.
+        relevance (array-like, optional): Relevance of every candidate. Defaults to the cosine
+            similarity with the query.
+
+    Returns:
+        List[int]: The indices of the selected candidates, in selection order.
+    """
+    candidates = MathUtils.normalize_rows(embeddings)
+    count = len(candidates)
+    top_n = min(top_n, count)
+    if top_n <= 0:
+        return []
+    if relevance is None:
+        relevance = candidates @ MathUtils.normalize_rows(query_embedding)
+    relevance = lambda_mult * np.asarray(relevance, dtype=np.float32)
+
+    selected = [int(np.argmax(relevance))]
+    redundancy = candidates @ candidates[selected[0]]
+    available = np.ones(count, dtype=bool)
+    available[selected[0]] = False
+    while len(selected) < top_n:
+        scores = relevance - (1.0 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, candidates @ candidates[best], out=redundancy)
+    return selected
+
+
+class PostRetrievalStage:
+    """
+    Rerank-then-diversify stage applied to retrieval candidates.
+
+    Attributes:
+        reranker (Optional[Reranker]): The rerank hook, or None.
+        diversify (bool): Whether MMR selects the final chunks.
+        mmr_lambda (float): MMR trade-off between relevance (1) and diversity (0).
+        candidate_pool (int): Number of candidates retrieved for the stage.
+        rerank_latency (float): Running estimate of the rerank duration, in seconds.
+        reranked (int): Number of reranked queries.
+        rerank_skipped (int): Number of queries whose rerank was skipped for lack of time.
+        rerank_failed (int): Number of queries whose rerank raised an error.
+    """
+
+    def __init__(self, reranker: Reranker = None, diversify: bool = True, mmr_lambda: float = 0.5,
+                 candidate_pool: int = 50, rerank_budget: float = 1.0, smoothing: float = 0.2,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize a PostRetrievalStage.
+
+        Args:
+            reranker (Reranker, optional): The rerank hook. Defaults to None (no reranking).
+            diversify (bool, optional): Apply MMR diversification. Defaults to True.
+            mmr_lambda (float, optional): MMR trade-off in [0, 1]. Defaults to 0.5.
+            candidate_pool (int, optional): Candidates retrieved for the stage. Defaults to 50.
+            rerank_budget (float, optional): Expected rerank duration in seconds until measured.
+                Defaults to 1.0.
+            smoothing (float, optional): Weight of the last measurement in the latency
+                estimate (exponential moving average). Defaults to 0.2.
+            clock (Callable[[], float], optional): Monotonic clock the deadlines refer to.
+                Defaults to ``time.monotonic``.
+        """
+        self.reranker = reranker
+        self.diversify = diversify
+        self.mmr_lambda = mmr_lambda
+        self.candidate_pool = candidate_pool
+        self.rerank_latency = rerank_budget
+        self.smoothing = smoothing
+        self.clock = clock
+        self.reranked = 0
+        self.rerank_skipped = 0
+        self.rerank_failed = 0
+
+    def should_rerank(self, deadline: Optional[float] = None) -> bool:
+        """
+        Tell whether there is enough time left to rerank.
+
+        Args:
+            deadline (Optional[float], optional): Absolute deadline on :attr:`clock`. Defaults
+                to None (no deadline).
+
+        Returns:
+            bool: True if a reranker is set and the expected rerank duration fits before the deadline.
+        """
+        if self.reranker is None:
+            return False
+        return deadline is None or deadline - self.clock() >= self.rerank_latency
+
+    def rerank(self, query: str, chunks: Sequence[str], deadline: Optional[float] = None) -> Optional[List[float]]:
+        """
+        Score the candidates with the reranker when time allows.
+
+        Args:
+            query (str): The query string.
+            chunks (Sequence[str]): The candidate chunks.
+            deadline (Optional[float], optional): Absolute deadline on :attr:`clock`. Defaults to None.
+
+        Returns:
+            Optional[List[float]]: The rerank scores, or None if reranking was skipped or failed.
+        """
+        if not self.should_rerank(deadline):
+            if self.reranker is not None:
+                self.rerank_skipped += 1
+            return None
+        started = self.clock()
+        try:
+            scores = self.reranker.score(query, chunks)
+        except Exception:
+            # Reranking is an optimization: a failing reranker must not fail the retrieval.
+            self.rerank_failed += 1
+            return None
+        finally:
+            elapsed = self.clock() - started
+            self.rerank_latency += self.smoothing * (elapsed - self.rerank_latency)
+        self.reranked += 1
+        return scores
+
+    def apply(self, query: str, query_embedding, candidates: Sequence[Tuple[str, float, Sequence[float]]],
+              top_n: int, deadline: Optional[float] = None) -> List[Tuple[str, float]]:
+        """
+        Rerank and diversify retrieval candidates.
+
+        Args:
+            query (str): The query string.
+            query_embedding (array-like): The query embedding.
+            candidates (Sequence[Tuple[str, float, Sequence[float]]]): ``(chunk, score, embedding)``
+                triples by descending retrieval score.
+            top_n (int): Number of chunks to return.
+            deadline (Optional[float], optional): Absolute deadline on :attr:`clock`. Defaults to None.
+
+        Returns:
+            List[Tuple[str, float]]: The selected ``(chunk, score)`` pairs, where the score is the
+                rerank score when reranking ran and the retrieval score otherwise.
+        """
+        candidates = list(candidates)
+        if not candidates:
+            return []
+
+        relevance = None
+        scores = self.rerank(query, [chunk for chunk, _, _ in candidates], deadline)
+        if scores is not None:
+            order = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)
+            candidates = [(candidates[i][0], scores[i], candidates[i][2]) for i in order]
+            # Min-max scale the rerank scores to be comparable with cosine redundancy in MMR.
+            values = np.asarray([score for _, score, _ in candidates], dtype=np.float32)
+            spread = float(values.max() - values.min())
+            relevance = (values - values.min()) / spread if spread else np.ones_like(values)
+
+        if not self.diversify or len(candidates) <= top_n:
+            return [(chunk, score) for chunk, score, _ in candidates[:top_n]]
+        selected = maximal_marginal_relevance(query_embedding, [embedding for _, _, embedding in candidates],
+                                              top_n, self.mmr_lambda, relevance)
+        return [(candidates[i][0], candidates[i][1]) for i in selected]
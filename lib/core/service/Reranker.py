@@ -0,0 +1,187 @@
+"""
+Reranker Module
+
+This module provides the rerank hook of the post-retrieval stage (see
+:class:`PostRetrievalStage`): a Reranker scores a batch of candidate chunks against a query
+with a model that reads both texts together, which is more precise than comparing
+independently computed embeddings but too slow to run over a whole knowledge base.
+
+Two implementations are available:
+
+- :class:`LLMReranker` asks the configured chat model to grade the candidates, a batch of
+  passages per request.
+- :class:`CrossEncoderReranker` scores ``(query, chunk)`` pairs with a cross-encoder, e.g. a
+  ``sentence_transformers.CrossEncoder`` (optional dependency).
+"""
+
+import json
+import re
+from abc import ABC, abstractmethod
+from typing import Any, List, Sequence
+
+from lib.commons.EnvironmentVariables import EnvironmentVariables
+from lib.core.providers.LLMProviderFactory import LLMProviderFactory
+from lib.core.providers.model.LLMProviderConfiguration import ProviderConfiguration
+
+_JSON_ARRAY = re.compile(r"\[[^\[\]]*\]", re.DOTALL)
+
+LLM_RERANK_SYSTEM_PROMPT = (
+    "You grade how well passages answer a search query. Reply only with a JSON array of "
+    "numbers between 0 (irrelevant) and 10 (fully answers the query), one per passage, in order."
+)
+
+
+class Reranker(ABC):
+    """
+    Abstract base class for rerankers.
+    """
+
+    @abstractmethod
+    def score(self, query: str, chunks: Sequence[str]) -> List[float]:
+        """
+        Score candidate chunks against a query, higher meaning more relevant.
+
+        Args:
+            query (str): The query string.
+            chunks (Sequence[str]): The candidate chunks.
+
+        Returns:
+            List[float]: One score per chunk, in the same order.
+        """
+        pass
+
+
+class LLMReranker(Reranker):
+    """
+    Reranker grading candidates with a chat model.
+
+    Candidates are sent ``batch_size`` at a time as a numbered list, and the model answers
+    with one grade per passage, so reranking ``n`` candidates costs ``ceil(n / batch_size)``
+    requests.
+
+    Attributes:
+        model (str): The chat model used for grading.
+        batch_size (int): Number of passages graded per request.
+        max_chars (int): Passages are cut to this many characters in the prompt.
+    """
+
+    def __init__(self, model: str = None, provider=None, batch_size: int = 20, max_chars: int = 1000):
+        """
+        Initialize an LLMReranker.
+
+        Args:
+            model (str, optional): The chat model. Defaults to the configured language model.
+            provider (Provider, optional): The provider. Defaults to the configured provider.
+            batch_size (int, optional): Passages per request. Defaults to 20.
+            max_chars (int, optional): Maximum characters per passage. Defaults to 1000.
+        """
+        self.model = model or EnvironmentVariables().get_language_model()
+        self.provider = provider or LLMProviderFactory.get_instance()
+        self.batch_size = batch_size
+        self.max_chars = max_chars
+
+    def build_prompt(self, query: str, chunks: Sequence[str]) -> str:
+        """
+        Build the grading prompt of one batch.
+
+        Args:
+            query (str): The query string.
+            chunks (Sequence[str]): The passages of the batch.
+
+        Returns:
+            str: The user prompt.
+        """
+        passages = "\n".join(f"[{i + 1}] {' '.join(chunk[:self.max_chars].split())}" for i, chunk in enumerate(chunks))
+        return f"Query: {query}\n\nPassages:\n{passages}\n\nGrades ({len(chunks)} numbers):"
+
+    @staticmethod
+    def parse_scores(content: str, expected: int) -> List[float]:
+        """
+        Extract the grades from the model's answer.
+
+        Args:
+            content (str): The answer text.
+            expected (int): The number of grades expected.
+
+        Returns:
+            List[float]: The grades.
+
+        Raises:
+            ValueError: If the answer does not contain a JSON array of ``expected`` numbers.
+        """
+        for candidate in _JSON_ARRAY.findall(content or ""):
+            try:
+                scores = [float(value) for value in json.loads(candidate)]
+            except (ValueError, TypeError):
+                continue
+            if len(scores) == expected:
+                return scores
+        raise ValueError(f"Expected a JSON array of {expected} grades, got: {content!r}")
+
+    def score(self, query: str, chunks: Sequence[str]) -> List[float]:
+        """
+        Grade the chunks with the chat model, ``batch_size`` chunks per request.
+
+        Args:
+            query (str): The query string.
+            chunks (Sequence[str]): The candidate chunks.
+
+        Returns:
+            List[float]: One grade per chunk, in the same order.
+
+        Raises:
+            ValueError: If an answer does not contain a JSON array with one grade per chunk.
+        """
+        scores = []
+        config = ProviderConfiguration(stream=False, think=False)
+        for start in range(0, len(chunks), self.batch_size):
+            batch = chunks[start:start + self.batch_size]
+            response = self.provider.chat(prompt=self.build_prompt(query, batch), model=self.model,
+                                          system_prompt=LLM_RERANK_SYSTEM_PROMPT, config=config)
+            scores.extend(self.parse_scores(getattr(response, "content", response), len(batch)))
+        return scores
+
+
+class CrossEncoderReranker(Reranker):
+    """
+    Reranker scoring ``(query, chunk)`` pairs with a cross-encoder model.
+
+    Attributes:
+        model: An object with a ``predict(pairs, batch_size=...)`` method, such as a
+            ``sentence_transformers.CrossEncoder``.
+        batch_size (int): Number of pairs per forward pass.
+    """
+
+    def __init__(self, model: Any = "cross-encoder/ms-marco-MiniLM-L-6-v2", batch_size: int = 32):
+        """
+        Initialize a CrossEncoderReranker.
+
+        Args:
+            model (Any, optional): A model object, or the name of a ``sentence_transformers``
+                cross-encoder to load. Defaults to ``"cross-encoder/ms-marco-MiniLM-L-6-v2"``.
+            batch_size (int, optional): Pairs per forward pass. Defaults to 32.
+
+        Raises:
+            ImportError: If a model name is given and ``sentence_transformers`` is not installed.
+        """
+        if isinstance(model, str):
+            from sentence_transformers import CrossEncoder  # optional dependency
+            model = CrossEncoder(model)
+        self.model = model
+        self.batch_size = batch_size
+
+    def score(self, query: str, chunks: Sequence[str]) -> List[float]:
+        """
+        Score the ``(query, chunk)`` pairs with the cross-encoder.
+
+        Args:
+            query (str): The query string.
+            chunks (Sequence[str]): The candidate chunks.
+
+        Returns:
+            List[float]: One score per chunk, in the same order.
+        """
+        if not chunks:
+            return []
+        scores = self.model.predict([(query, chunk) for chunk in chunks], batch_size=self.batch_size)
+        return [float(score) for score in scores]
@@ -0,0 +1,275 @@
+"""
+ShardedKnowledgeStore Module
+
+This module provides the ShardedKnowledgeStore class, a read-only knowledge base split into
+shards that are searched in parallel by a pool of worker processes, so that a single query
+uses several cores.
+
+Layout on disk (written by :meth:`ShardedKnowledgeStore.build`)::
+
+    manifest.json        shard files, row counts and embedding size
+    chunks.jsonl         one JSON-encoded chunk per line, in row order
+    shard-00000.npy      unit-norm float32 embeddings of the rows of shard 0
+    ...
+
+Workers open the shard files with ``numpy.load(..., mmap_mode="r")``: the vectors are
+paged in from the OS page cache, which all workers share, so adding workers does not
+multiply memory. A query is sent to every shard; each worker returns the top-k
+``(score, row)`` pairs of its shard (``argpartition``, linear time) and the parent merges
+them with a heap.
+"""
+
+import heapq
+import json
+import os
+import shutil
+import tempfile
+import weakref
+from contextlib import contextmanager
+from multiprocessing import get_context
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from lib.commons.MathUtils import MathUtils
+from lib.core.service.EmbeddingProjection import EmbeddingProjection
+
+MANIFEST = "manifest.json"
+CHUNKS = "chunks.jsonl"
+
+# Per-process cache of the memory-mapped shards, filled lazily by each worker.
+_shards: Dict[str, np.ndarray] = {}
+
+# Every worker is single-threaded: the parallelism comes from the processes, and BLAS
+# threads in every worker would oversubscribe the cores.
+_SINGLE_THREAD_ENV = {"OMP_NUM_THREADS": "1", "OPENBLAS_NUM_THREADS": "1", "MKL_NUM_THREADS": "1"}
+
+
+def _open_shard(path: str) -> np.ndarray:
+    """Return the memory-mapped matrix of a shard, opening it on first use."""
+    matrix = _shards.get(path)
+    if matrix is None:
+        matrix = _shards[path] = np.load(path, mmap_mode="r")
+    return matrix
+
+
+def _search_shard(path: str, offset: int, queries: np.ndarray, top_k: int) -> List[List[Tuple[float, int]]]:
+    """
+    Search one shard.
+
+    Args:
+        path (str): The shard file.
+        offset (int): Global row id of the first row of the shard.
+        queries (np.ndarray): ``(q, d)`` unit-norm query embeddings.
+        top_k (int): Number of results per query.
+
+    Returns:
+        List[List[Tuple[float, int]]]: Per query, the best ``(score, row)`` pairs of the shard.
+    """
+    indices, scores = MathUtils.top_k(queries, _open_shard(path), top_k, normalized=True)
+    return [[(score, offset + i) for i, score in zip(row_indices, row_scores)]
+            for row_indices, row_scores in zip(indices.tolist(), scores.tolist())]
+
+
+def _release(pool, paths: List[str], directory: Optional[str]) -> None:
+    """Stop the worker processes of a store, forget its shards and delete its directory, if given."""
+    if pool is not None:
+        pool.terminate()
+        pool.join()
+    for path in paths:
+        _shards.pop(path, None)
+    if directory is not None:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+@contextmanager
+def _environment(overrides: Dict[str, str]):
+    """Temporarily set environment variables (inherited by the processes started inside)."""
+    previous = {name: os.environ.get(name) for name in overrides}
+    os.environ.update(overrides)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+class ShardedKnowledgeStore:
+    """
+    Read-only knowledge base searched in parallel by worker processes.
+
+    Like :class:`KnowledgeStore`, it iterates as ``(chunk, embedding)`` tuples and can be
+    passed to :meth:`KnowledgeService.get_most_relevant_chunks`, which then fans the query
+    out to the shards. Close the store (or use it as a context manager) to stop the workers;
+    a store garbage collected (or still open at exit) without being closed is closed then.
+
+    Attributes:
+        directory (str): The directory holding the shard files.
+        dimensions (int): Embedding size.
+        workers (int): Number of worker processes (0 searches in the calling process).
+        projection (Optional[EmbeddingProjection]): The projection of the stored embeddings,
+            applied to query embeddings by KnowledgeService, or None.
+    """
+
+    def __init__(self, directory: str, workers: Optional[int] = None, start_method: str = "spawn",
+                 owns_directory: bool = False, projection: Optional[EmbeddingProjection] = None):
+        """
+        Open a sharded store written by :meth:`build`.
+
+        Args:
+            directory (str): The store directory.
+            workers (Optional[int], optional): Worker processes. Defaults to one per shard,
+                at most one per CPU. 0 searches the shards sequentially in this process.
+            start_method (str, optional): multiprocessing start method. Defaults to ``"spawn"``.
+            owns_directory (bool, optional): Delete the directory on :meth:`close`. Defaults to False.
+            projection (Optional[EmbeddingProjection], optional): The projection the shards were
+                built with (it is not saved in the directory). Defaults to None.
+        """
+        self.directory = directory
+        self.projection = projection
+        with open(os.path.join(directory, MANIFEST), "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+        self.dimensions = manifest["dimensions"]
+        self._paths: List[str] = []
+        self._offsets: List[int] = []
+        offset = 0
+        for shard in manifest["shards"]:
+            self._paths.append(os.path.join(directory, shard["file"]))
+            self._offsets.append(offset)
+            offset += shard["rows"]
+        with open(os.path.join(directory, CHUNKS), "r", encoding="utf-8") as file:
+            self._chunks = [json.loads(line) for line in file]
+
+        self.workers = min(len(self._paths), os.cpu_count() or 1) if workers is None else workers
+        self._pool = None
+        if self.workers > 0:
+            with _environment(_SINGLE_THREAD_ENV):
+                self._pool = get_context(start_method).Pool(self.workers)
+        # Holds no reference to the store, so that it runs when the store is garbage collected.
+        self._finalizer = weakref.finalize(self, _release, self._pool, self._paths,
+                                           directory if owns_directory else None)
+
+    @classmethod
+    def build(cls, knowledge: Iterable[Tuple[str, Sequence[float]]], directory: Optional[str] = None,
+              shards: Optional[int] = None, **kwargs) -> "ShardedKnowledgeStore":
+        """
+        Write a knowledge base as shards and open it.
+
+        Args:
+            knowledge (Iterable[Tuple[str, Sequence[float]]]): ``(chunk, embedding)`` pairs,
+                e.g. a KnowledgeStore or the list returned by ``build_knowledge``.
+            directory (Optional[str], optional): Destination directory. Defaults to a temporary
+                directory deleted on :meth:`close`.
+            shards (Optional[int], optional): Number of shards. Defaults to the number of CPUs.
+            **kwargs: Passed to the constructor (``workers``, ``start_method``, ``projection``).
+                The projection defaults to the one of ``knowledge``, if any.
+
+        Returns:
+            ShardedKnowledgeStore: The opened store.
+
+        Raises:
+            ValueError: If the knowledge base is empty.
+        """
+        chunks, embeddings = [], []
+        for chunk, embedding in knowledge:
+            chunks.append(chunk)
+            embeddings.append(embedding)
+        if not chunks:
+            raise ValueError("Cannot shard an empty knowledge base")
+
+        owns_directory = directory is None
+        directory = tempfile.mkdtemp(prefix="knowledge-shards-") if owns_directory else directory
+        os.makedirs(directory, exist_ok=True)
+        matrix = MathUtils.normalize_rows(embeddings)
+        shards = max(1, min(shards or os.cpu_count() or 1, len(chunks)))
+
+        manifest = {"dimensions": int(matrix.shape[1]), "shards": []}
+        for index, part in enumerate(np.array_split(matrix, shards)):
+            name = f"shard-{index:05d}.npy"
+            np.save(os.path.join(directory, name), np.ascontiguousarray(part))
+            manifest["shards"].append({"file": name, "rows": len(part)})
+        with open(os.path.join(directory, CHUNKS), "w", encoding="utf-8") as file:
+            for chunk in chunks:
+                file.write(json.dumps(chunk) + "\n")
+        with open(os.path.join(directory, MANIFEST), "w", encoding="utf-8") as file:
+            json.dump(manifest, file)
+        kwargs.setdefault("projection", getattr(knowledge, "projection", None))
+        return cls(directory, owns_directory=owns_directory, **kwargs)
+
+    @property
+    def shards(self) -> int:
+        """int: Number of shards."""
+        return len(self._paths)
+
+    def search_batch(self, query_embeddings, top_k: int = 3) -> List[List[Tuple[int, float]]]:
+        """
+        Find the most similar rows of several queries, searching all shards in parallel.
+
+        Args:
+            query_embeddings (array-like): The ``(q, d)`` query embeddings.
+            top_k (int, optional): Number of rows per query. Defaults to 3.
+
+        Returns:
+            List[List[Tuple[int, float]]]: Per query, ``(row, cosine similarity)`` pairs by
+                descending similarity.
+        """
+        queries = MathUtils.normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        if top_k <= 0:
+            return [[] for _ in queries]
+        tasks = [(path, offset, queries, top_k) for path, offset in zip(self._paths, self._offsets)]
+        if self._pool is None:
+            per_shard = [_search_shard(*task) for task in tasks]
+        else:
+            per_shard = self._pool.starmap(_search_shard, tasks, chunksize=1)
+
+        results = []
+        for query_index in range(len(queries)):
+            hits = heapq.nlargest(top_k, (hit for shard in per_shard for hit in shard[query_index]))
+            results.append([(row, score) for score, row in hits])
+        return results
+
+    def search(self, query_embedding, top_k: int = 3) -> List[Tuple[int, float]]:
+        """
+        Find the most similar rows of a query, searching all shards in parallel.
+
+        Args:
+            query_embedding (array-like): The query embedding.
+            top_k (int, optional): Number of rows. Defaults to 3.
+
+        Returns:
+            List[Tuple[int, float]]: ``(row, cosine similarity)`` pairs by descending similarity.
+        """
+        return self.search_batch([query_embedding], top_k)[0]
+
+    def get(self, row: int) -> Tuple[str, np.ndarray]:
+        """
+        Return the entry stored at a row.
+
+        Args:
+            row (int): The row id.
+
+        Returns:
+            Tuple[str, np.ndarray]: The chunk and its (unit-norm) embedding.
+        """
+        shard = int(np.searchsorted(self._offsets, row, side="right")) - 1
+        return self._chunks[row], _open_shard(self._paths[shard])[row - self._offsets[shard]]
+
+    def close(self) -> None:
+        """Stop the worker processes, and delete the directory if it is temporary."""
+        self._finalizer()
+        self._pool = None
+
+    def __enter__(self) -> "ShardedKnowledgeStore":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def __iter__(self) -> Iterator[Tuple[str, np.ndarray]]:
+        return (self.get(row) for row in range(len(self._chunks)))
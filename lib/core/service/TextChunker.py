@@ -0,0 +1,102 @@
+"""
+TextChunker Module
+
+This module provides the TextChunker class, which splits a stream of text blocks
+(paragraphs) into overlapping chunks of bounded token size. Text is split at sentence
+boundaries whenever possible, so that each chunk is self-contained, and consecutive chunks
+share up to ``overlap_tokens`` tokens so that no statement is cut in half at a boundary.
+"""
+
+import re
+from collections import deque
+from typing import Iterable, Iterator, Optional
+
+from lib.core.service.TokenCounter import TokenCounter
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+class TextChunker:
+    """
+    Token-aware, overlapping text chunker working on streams.
+
+    Only the sentences of the chunk being built are kept in memory, so arbitrarily long
+    documents can be chunked with bounded memory.
+
+    Attributes:
+        chunk_tokens (int): Maximum number of tokens per chunk.
+        overlap_tokens (int): Maximum number of tokens repeated from the previous chunk.
+        model (Optional[str]): The model used to count tokens.
+    """
+
+    def __init__(self, chunk_tokens: int = 256, overlap_tokens: int = 32, model: Optional[str] = None,
+                 token_counter: TokenCounter = None):
+        """
+        Initialize a TextChunker.
+
+        Args:
+            chunk_tokens (int, optional): Maximum tokens per chunk. Defaults to 256.
+            overlap_tokens (int, optional): Tokens shared by consecutive chunks. Defaults to 32.
+            model (Optional[str], optional): The model used to count tokens. Defaults to None.
+            token_counter (TokenCounter, optional): Counter to use. Defaults to the singleton.
+
+        Raises:
+            ValueError: If the sizes are not positive or the overlap is not smaller than the chunk.
+        """
+        if chunk_tokens <= 0 or overlap_tokens < 0 or overlap_tokens >= chunk_tokens:
+            raise ValueError("chunk_tokens must be positive and larger than overlap_tokens")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.model = model
+        self.token_counter = token_counter or TokenCounter.get_instance()
+
+    def _pieces(self, blocks: Iterable[str]) -> Iterator[tuple]:
+        """Yield ``(text, tokens)`` sentences, splitting sentences longer than a chunk by words."""
+        count = self.token_counter.count
+        for block in blocks:
+            for sentence in _SENTENCE_END.split(block.strip()):
+                tokens = count(sentence, self.model)
+                if tokens == 0:
+                    continue
+                if tokens <= self.chunk_tokens:
+                    yield sentence, tokens
+                    continue
+                words, words_tokens = [], 0
+                for word in sentence.split():
+                    word_tokens = count(word, self.model)
+                    if words and words_tokens + word_tokens > self.chunk_tokens:
+                        yield " ".join(words), words_tokens
+                        words, words_tokens = [], 0
+                    words.append(word)
+                    words_tokens += word_tokens
+                if words:
+                    yield " ".join(words), words_tokens
+
+    def split(self, blocks: Iterable[str]) -> Iterator[str]:
+        """
+        Split text blocks into overlapping chunks.
+
+        Args:
+            blocks (Iterable[str]): The text of one document, e.g. one paragraph per item.
+
+        Yields:
+            str: The chunks, in document order.
+        """
+        window = deque()
+        window_tokens = 0
+        pending = False  # whether the window holds text not yet emitted
+
+        for text, tokens in self._pieces(blocks):
+            if window and window_tokens + tokens > self.chunk_tokens:
+                if pending:
+                    yield " ".join(piece for piece, _ in window)
+                    pending = False
+                while window and (window_tokens > self.overlap_tokens or
+                                  window_tokens + tokens > self.chunk_tokens):
+                    window_tokens -= window.popleft()[1]
+            window.append((text, tokens))
+            window_tokens += tokens
+            pending = True
+
+        if pending:
+            yield " ".join(piece for piece, _ in window)
@@ -0,0 +1,174 @@
+"""
+TokenCounter Module
+
+This module provides the TokenCounter class, a fast token counter used to budget prompts
+against a model's context window. When ``tiktoken`` knows the model (OpenAI-style model
+names) its exact BPE encoding is used; otherwise a conservative regex-based estimator is
+used. Encoders are resolved once per model and token counts of recently seen texts are
+cached, since the same knowledge chunks are counted again for every query. The count cache is
+shared by the request threads and guarded by a lock; texts are encoded outside of it.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+import litellm
+
+from lib.commons.Metrics import Metrics
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken is an optional accelerator
+    tiktoken = None
+
+# Words, numbers and single punctuation marks, as split by most BPE pre-tokenizers.
+_PIECES = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+cache_lookups = Metrics.get_instance().counter("cache_lookups_total",
+                                               "Cache lookups by cache and result (hit or miss).", ("cache", "result"))
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text without a tokenizer.
+
+    Each punctuation mark counts as one token and each word as one token per started
+    group of four characters, which slightly over-estimates real BPE counts so that
+    packed prompts stay within budget.
+
+    Args:
+        text (str): The text to measure.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    return sum((len(piece) + 3) // 4 for piece in _PIECES.findall(text))
+
+
+class TokenCounter(object):
+    """
+    Singleton token counter with a per-model encoder cache and a bounded count cache.
+
+    Attributes:
+        __instance: The singleton instance of the class.
+        cache_size (int): Maximum number of ``(model, text)`` counts kept in the cache.
+    """
+
+    __instance = None
+
+    @classmethod
+    def get_instance(cls):
+        """
+        Get the singleton instance of TokenCounter.
+
+        Returns:
+            TokenCounter: The singleton instance.
+        """
+        if cls.__instance is None:
+            cls()
+        return cls.__instance
+
+    def __init__(self, cache_size: int = 65536):
+        """
+        Initialize the singleton instance of TokenCounter.
+
+        Args:
+            cache_size (int, optional): Maximum number of cached counts. Defaults to 65536.
+
+        Raises:
+            Exception: If an instance already exists (singleton violation).
+        """
+        if TokenCounter.__instance is not None:
+            raise Exception("This class is a singleton!")
+        else:
+            TokenCounter.__instance = self
+        self.cache_size = cache_size
+        self._encoders: Dict[Optional[str], Callable[[str], int]] = {}
+        self._counts: "OrderedDict[tuple, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _resolve_encoder(self, model: Optional[str]) -> Callable[[str], int]:
+        """
+        Resolve the counting function for a model, caching the result.
+
+        Args:
+            model (Optional[str]): The model name, optionally in LiteLLM ``provider/model`` form.
+
+        Returns:
+            Callable[[str], int]: A function returning the token count of a text.
+        """
+        encoder = self._encoders.get(model)
+        if encoder is not None:
+            return encoder
+
+        encoder = estimate_tokens
+        if model and tiktoken is not None:
+            try:
+                encoding = tiktoken.encoding_for_model(model.split("/")[-1])
+                encoder = lambda text: len(encoding.encode(text, disallowed_special=()))  # noqa: E731
+            except Exception:
+                # Unknown model or encoding files not available (e.g. offline): estimate.
+                encoder = estimate_tokens
+        self._encoders[model] = encoder
+        return encoder
+
+    def count(self, text: str, model: Optional[str] = None) -> int:
+        """
+        Count the tokens of a text for the given model.
+
+        Args:
+            text (str): The text to measure.
+            model (Optional[str], optional): The model name. Defaults to None (estimator).
+
+        Returns:
+            int: The number of tokens.
+        """
+        if not text:
+            return 0
+        key = (model, text)
+        with self._lock:
+            count = self._counts.get(key)
+            if count is not None:
+                self._counts.move_to_end(key)
+        if count is not None:
+            cache_lookups.inc("token_count", "hit")
+            return count
+        cache_lookups.inc("token_count", "miss")
+
+        count = self._resolve_encoder(model)(text)
+        with self._lock:
+            self._counts[key] = count
+            if len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+        return count
+
+    def clear_cache(self) -> None:
+        """Drop the cached encoders and token counts."""
+        with self._lock:
+            self._encoders.clear()
+            self._counts.clear()
+
+    @staticmethod
+    def get_context_window(model: Optional[str], default: int = 4096) -> int:
+        """
+        Look up the maximum number of input tokens of a model.
+
+        The LiteLLM model map is used; models it does not know (e.g. most local Ollama
+        models) fall back to ``default``.
+
+        Args:
+            model (Optional[str]): The model name in LiteLLM ``provider/model`` form.
+            default (int, optional): Value returned when the size is unknown. Defaults to 4096.
+
+        Returns:
+            int: The context window size in tokens.
+        """
+        if not model:
+            return default
+        try:
+            info = litellm.get_model_info(model)
+        except Exception:
+            return default
+        return info.get("max_input_tokens") or info.get("max_tokens") or default
@@ -0,0 +1,420 @@
+"""
+UsageLedger Module
+
+This module provides the usage ledger: the accounting of the tokens and cost of the LLM calls
+per tenant and per model, budgets, and per-model token throughput.
+
+:class:`LLMExecutor` asks the ledger to admit every call (:meth:`UsageLedger.admit`) and
+records every completed response, streams once they end (:meth:`UsageLedger.record`). The
+totals are aggregated in memory; when a destination is configured (USAGE_LEDGER_PATH), a
+background thread appends the usage recorded since the previous flush to it every
+``flush_interval`` seconds (USAGE_FLUSH_INTERVAL), and it is flushed at exit, one row per tenant
+and model, so that recording a call never waits for the disk:
+
+- a SQLite database (``.db``, ``.sqlite`` or ``.sqlite3`` path), table ``usage``;
+- JSON lines otherwise.
+
+A tenant with a budget whose token or cost limit is reached is downgraded to the fallback
+model of the budget, or rejected with :class:`BudgetExceededError` if it has none.
+"""
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import closing
+from typing import Deque, Dict, List, Optional, Tuple
+
+from lib.commons.EnvironmentVariables import EnvironmentVariables
+from lib.commons.Metrics import Metrics
+from lib.commons.StructuredLogging import get_logger
+from lib.core.service.model.UsageRecord import UsageRecord
+
+env = EnvironmentVariables()
+metrics = Metrics.get_instance()
+logger = get_logger(__name__)
+
+# Tenant of the calls made without one.
+DEFAULT_TENANT = "default"
+
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+budget_decisions = metrics.counter("llm_budget_decisions_total", "Calls of tenants over budget.",
+                                   ("tenant", "action"))
+
+
+class BudgetExceededError(RuntimeError):
+    """Error raised when a tenant over budget has no fallback model."""
+
+
+class Budget:
+    """
+    Token and cost limits of a tenant.
+
+    Attributes:
+        max_tokens (Optional[int]): Limit of input and output tokens, None for no limit.
+        max_cost (Optional[float]): Limit of the cost, None for no limit.
+        fallback_model (Optional[str]): Model used once a limit is reached; the calls are
+            rejected when None.
+        period (Optional[float]): Seconds after which the spent tokens and cost are reset, None
+            to never reset them.
+        tokens (int): Tokens spent in the current period.
+        cost (float): Cost spent in the current period.
+        started (float): Start of the current period (:func:`time.monotonic`).
+    """
+
+    __slots__ = ("max_tokens", "max_cost", "fallback_model", "period", "tokens", "cost", "started")
+
+    def __init__(self, max_tokens: Optional[int] = None, max_cost: Optional[float] = None,
+                 fallback_model: Optional[str] = None, period: Optional[float] = None) -> None:
+        """
+        Initialize a Budget with nothing spent.
+
+        Args:
+            max_tokens (Optional[int], optional): Token limit. Defaults to None.
+            max_cost (Optional[float], optional): Cost limit. Defaults to None.
+            fallback_model (Optional[str], optional): Model of the calls over budget. Defaults to None.
+            period (Optional[float], optional): Length of a budget period in seconds. Defaults to None.
+        """
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.fallback_model = fallback_model
+        self.period = period
+        self.tokens = 0
+        self.cost = 0.0
+        self.started = time.monotonic()
+
+    def renew(self, now: float) -> None:
+        """Reset the spent tokens and cost when the current period is over."""
+        if self.period is not None and now - self.started >= self.period:
+            self.tokens = 0
+            self.cost = 0.0
+            self.started = now
+
+    @property
+    def exceeded(self) -> bool:
+        """bool: Whether a limit is reached."""
+        return ((self.max_tokens is not None and self.tokens >= self.max_tokens)
+                or (self.max_cost is not None and self.cost >= self.max_cost))
+
+
+class UsageLedger(object):
+    """
+    Singleton ledger of the token usage and cost of the LLM calls.
+
+    Attributes:
+        __instance: The singleton instance of the class.
+        path (Optional[str]): Destination of the flushed usage, None to keep it in memory only.
+        flush_interval (float): Seconds between two flushes.
+        prices (Dict[str, Tuple[float, float]]): Price of a million input and output tokens per model.
+        throughput_window (float): Seconds of calls considered by :meth:`throughput`.
+    """
+
+    __instance = None
+
+    @classmethod
+    def get_instance(cls):
+        """
+        Get the singleton instance of UsageLedger.
+
+        Returns:
+            UsageLedger: The singleton instance.
+        """
+        if cls.__instance is None:
+            cls()
+        return cls.__instance
+
+    def __init__(self):
+        """
+        Initialize the singleton instance from the environment variables.
+
+        Raises:
+            Exception: If an instance already exists (singleton violation).
+        """
+        if UsageLedger.__instance is not None:
+            raise Exception("This class is a singleton!")
+        else:
+            UsageLedger.__instance = self
+        self._lock = threading.Lock()
+        self._totals: Dict[Tuple[str, str], UsageRecord] = {}
+        self._pending: Dict[Tuple[str, str], UsageRecord] = {}
+        self._budgets: Dict[str, Budget] = {}
+        self._recent: Deque[Tuple[float, str, int, int]] = deque()
+        self.prices: Dict[str, Tuple[float, float]] = {}
+        self.throughput_window = 60.0
+        self.path: Optional[str] = None
+        self._flusher: Optional[threading.Thread] = None
+        self._wakeup = threading.Event()
+        self.configure(path=env.get_usage_ledger_path(), flush_interval=float(env.get_usage_flush_interval("60")))
+
+    def configure(self, path: Optional[str] = None, flush_interval: Optional[float] = None,
+                  prices: Optional[Dict[str, Tuple[float, float]]] = None,
+                  throughput_window: Optional[float] = None) -> "UsageLedger":
+        """
+        Change the ledger settings, starting the flush thread when a destination is set.
+
+        Args:
+            path (Optional[str], optional): Destination of the flushed usage, SQLite or JSON lines
+                depending on the suffix, an empty string to keep the usage in memory only. Defaults
+                to the current one.
+            flush_interval (Optional[float], optional): Seconds between two flushes. Defaults to the current one.
+            prices (Optional[Dict[str, Tuple[float, float]]], optional): Price of a million input and
+                output tokens per model, merged into the current prices. Defaults to None.
+            throughput_window (Optional[float], optional): Seconds of calls considered by
+                :meth:`throughput`. Defaults to the current one.
+
+        Returns:
+            UsageLedger: Self for method chaining.
+        """
+        if path is not None:
+            self.path = path or None
+            self._flushed = time.monotonic()
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        if prices:
+            self.prices.update(prices)
+        if throughput_window is not None:
+            self.throughput_window = throughput_window
+        with self._lock:
+            if self.path is not None and self._flusher is None:
+                self._flusher = threading.Thread(target=self._run_flusher, name="usage-ledger", daemon=True)
+                self._flusher.start()
+        # Reschedule the next flush (or stop the thread) with the new settings.
+        self._wakeup.set()
+        return self
+
+    def _run_flusher(self) -> None:
+        """Flush the ledger every flush interval until it has no destination."""
+        while True:
+            with self._lock:
+                if self.path is None:
+                    self._flusher = None
+                    return
+                delay = self._flushed + self.flush_interval - time.monotonic()
+            if delay > 0:
+                self._wakeup.wait(delay)
+                self._wakeup.clear()
+            else:
+                self.flush()
+
+    def set_budget(self, tenant: str, max_tokens: Optional[int] = None, max_cost: Optional[float] = None,
+                   fallback_model: Optional[str] = None, period: Optional[float] = None) -> Budget:
+        """
+        Set (or replace) the budget of a tenant, with nothing spent.
+
+        Args:
+            tenant (str): The tenant.
+            max_tokens (Optional[int], optional): Limit of input and output tokens. Defaults to None.
+            max_cost (Optional[float], optional): Limit of the cost. Defaults to None.
+            fallback_model (Optional[str], optional): Model of the calls once a limit is reached;
+                they are rejected when None. Defaults to None.
+            period (Optional[float], optional): Seconds after which the spending is reset (e.g.
+                86400 for a daily budget). Defaults to None (never reset).
+
+        Returns:
+            Budget: The budget.
+        """
+        budget = Budget(max_tokens, max_cost, fallback_model, period)
+        with self._lock:
+            self._budgets[tenant] = budget
+        return budget
+
+    def remove_budget(self, tenant: str) -> None:
+        """
+        Remove the budget of a tenant, if any.
+
+        Args:
+            tenant (str): The tenant.
+        """
+        with self._lock:
+            self._budgets.pop(tenant, None)
+
+    def admit(self, tenant: Optional[str], model: str) -> str:
+        """
+        Check the budget of a tenant before a call.
+
+        Args:
+            tenant (Optional[str]): The tenant, None for the default tenant.
+            model (str): The requested model.
+
+        Returns:
+            str: The model to call: the requested one, or the fallback model of a tenant over budget.
+
+        Raises:
+            BudgetExceededError: If the tenant is over budget and has no fallback model.
+        """
+        tenant = tenant or DEFAULT_TENANT
+        with self._lock:
+            budget = self._budgets.get(tenant)
+            if budget is None:
+                return model
+            budget.renew(time.monotonic())
+            if not budget.exceeded:
+                return model
+            fallback = budget.fallback_model
+        if fallback is None:
+            budget_decisions.inc(tenant, "rejected")
+            raise BudgetExceededError(f"Tenant {tenant} is over budget")
+        budget_decisions.inc(tenant, "downgraded")
+        logger.debug("Tenant over budget, model downgraded", extra={"tenant": tenant, "model": fallback})
+        return fallback
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """
+        Compute the cost of tokens of a model (0 for a model without price).
+
+        Args:
+            model (str): The model.
+            prompt_tokens (int): Input tokens.
+            completion_tokens (int): Output tokens.
+
+        Returns:
+            float: The cost.
+        """
+        input_price, output_price = self.prices.get(model, (0.0, 0.0))
+        return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+    def record(self, tenant: Optional[str], model: str, usage: Optional[dict] = None) -> None:
+        """
+        Record a completed call. The ledger is flushed by its background thread.
+
+        Args:
+            tenant (Optional[str]): The tenant, None for the default tenant.
+            model (str): The model that answered.
+            usage (Optional[dict], optional): The ``usage`` of the response (``prompt_tokens``
+                and ``completion_tokens``). Defaults to None (a call without reported usage).
+        """
+        tenant = tenant or DEFAULT_TENANT
+        usage = usage or {}
+        prompt_tokens = usage.get("prompt_tokens") or 0
+        completion_tokens = usage.get("completion_tokens") or 0
+        cost = self.cost(model, prompt_tokens, completion_tokens)
+        now = time.monotonic()
+        key = (tenant, model)
+        with self._lock:
+            for records in (self._totals, self._pending):
+                if key not in records:
+                    records[key] = UsageRecord(tenant, model)
+                records[key].add(1, prompt_tokens, completion_tokens, cost)
+            budget = self._budgets.get(tenant)
+            if budget is not None:
+                budget.renew(now)
+                budget.tokens += prompt_tokens + completion_tokens
+                budget.cost += cost
+            self._recent.append((now, model, prompt_tokens, completion_tokens))
+            while now - self._recent[0][0] > self.throughput_window:
+                self._recent.popleft()
+
+    def usage(self, tenant: Optional[str] = None, model: Optional[str] = None) -> UsageRecord:
+        """
+        Return the totals of the recorded calls, all or those of a tenant and/or a model.
+
+        Args:
+            tenant (Optional[str], optional): Only the calls of this tenant. Defaults to None.
+            model (Optional[str], optional): Only the calls answered by this model. Defaults to None.
+
+        Returns:
+            UsageRecord: The totals (tenant or model None when not filtered).
+        """
+        total = UsageRecord(tenant, model)
+        with self._lock:
+            for record in self._totals.values():
+                if (tenant is None or record.tenant == tenant) and (model is None or record.model == model):
+                    total.merge(record)
+        return total
+
+    def records(self) -> List[UsageRecord]:
+        """
+        Return the totals of every tenant and model.
+
+        Returns:
+            List[UsageRecord]: Copies of the records, sorted by tenant and model.
+        """
+        with self._lock:
+            return [UsageRecord(*key).merge(self._totals[key]) for key in sorted(self._totals)]
+
+    def throughput(self) -> Dict[str, Dict[str, float]]:
+        """
+        Return the token throughput of each model over the last ``throughput_window`` seconds.
+
+        Returns:
+            Dict[str, Dict[str, float]]: Input and output tokens per second (``"input"``,
+            ``"output"``) per model.
+        """
+        now = time.monotonic()
+        rates: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            for started, model, prompt_tokens, completion_tokens in self._recent:
+                if now - started <= self.throughput_window:
+                    rate = rates.setdefault(model, {"input": 0.0, "output": 0.0})
+                    rate["input"] += prompt_tokens / self.throughput_window
+                    rate["output"] += completion_tokens / self.throughput_window
+        return rates
+
+    def flush(self) -> int:
+        """
+        Append the usage recorded since the previous flush to :attr:`path` (or drop it when the
+        ledger is kept in memory only).
+
+        A failed write is logged and its rows are kept for the next flush.
+
+        Returns:
+            int: Number of rows written.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed = time.monotonic()
+            path = self.path
+        if not pending or path is None:
+            return 0
+        rows = [(time.time(), record) for record in pending.values()]
+        try:
+            if path.endswith(SQLITE_SUFFIXES):
+                self._write_sqlite(path, rows)
+            else:
+                self._write_jsonl(path, rows)
+        except (OSError, sqlite3.Error) as error:
+            logger.warning("Usage ledger flush failed: %s", error, extra={"path": path, "rows": len(rows)})
+            with self._lock:
+                for key, record in pending.items():
+                    self._pending.setdefault(key, UsageRecord(*key)).merge(record)
+            return 0
+        return len(rows)
+
+    @staticmethod
+    def _write_sqlite(path: str, rows: List[Tuple[float, UsageRecord]]) -> None:
+        """Insert the rows into the ``usage`` table of a SQLite database."""
+        with closing(sqlite3.connect(path)) as connection, connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS usage (time REAL, tenant TEXT, model TEXT, "
+                               "requests INTEGER, prompt_tokens INTEGER, completion_tokens INTEGER, cost REAL)")
+            connection.executemany("INSERT INTO usage VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                   [(flushed, record.tenant, record.model, record.requests, record.prompt_tokens,
+                                     record.completion_tokens, record.cost) for flushed, record in rows])
+
+    @staticmethod
+    def _write_jsonl(path: str, rows: List[Tuple[float, UsageRecord]]) -> None:
+        """Append the rows to a JSON lines file."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as file:
+            file.writelines(json.dumps({"time": flushed, **record.to_dict()}) + "\n" for flushed, record in rows)
+
+    def clear(self) -> None:
+        """Drop the recorded usage and the budgets."""
+        with self._lock:
+            self._totals.clear()
+            self._pending.clear()
+            self._budgets.clear()
+            self._recent.clear()
+
+
+def _flush_at_exit() -> None:
+    """Write the usage recorded since the last flush."""
+    UsageLedger.get_instance().flush()
+
+
+atexit.register(_flush_at_exit)
@@ -0,0 +1,84 @@
+"""
+IngestionStats Module
+
+This module defines the IngestionStats class, the progress and throughput report of an
+ingestion run (see :class:`IngestionPipeline` and :meth:`KnowledgeService.build_knowledge`).
+The same instance is updated while the run progresses and handed to the progress callback
+after every embedded batch.
+"""
+
+import time
+from typing import Any, Callable, Dict
+
+
+class IngestionStats:
+    """
+    Counters of an ingestion run.
+
+    Attributes:
+        documents (int): Number of source documents read so far.
+        bytes_read (int): Size in bytes of the documents read so far.
+        chunks (int): Number of chunks embedded and stored so far.
+        batches (int): Number of embedding batches completed so far.
+        retries (int): Number of embedding requests retried after a failure.
+        started_at (float): Clock value at the start of the run.
+        finished_at (float): Clock value at the end of the run, ``None`` while running.
+    """
+
+    __slots__ = ("documents", "bytes_read", "chunks", "batches", "retries", "started_at", "finished_at", "_clock")
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        """
+        Initialize an IngestionStats, starting the clock.
+
+        Args:
+            clock (Callable[[], float], optional): Monotonic clock returning seconds.
+                Defaults to :func:`time.perf_counter`.
+        """
+        self._clock = clock
+        self.documents = 0
+        self.bytes_read = 0
+        self.chunks = 0
+        self.batches = 0
+        self.retries = 0
+        self.started_at = clock()
+        self.finished_at = None
+
+    def finish(self) -> "IngestionStats":
+        """
+        Stop the clock.
+
+        Returns:
+            IngestionStats: Self, for chaining.
+        """
+        self.finished_at = self._clock()
+        return self
+
+    @property
+    def elapsed(self) -> float:
+        """float: Seconds since the start of the run (until its end once finished)."""
+        end = self.finished_at if self.finished_at is not None else self._clock()
+        return end - self.started_at
+
+    @property
+    def chunks_per_second(self) -> float:
+        """float: Embedding throughput of the run so far."""
+        elapsed = self.elapsed
+        return self.chunks / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize the counters into a plain dictionary.
+
+        Returns:
+            Dict[str, Any]: The counters, elapsed seconds and throughput.
+        """
+        return {
+            "documents": self.documents,
+            "bytes_read": self.bytes_read,
+            "chunks": self.chunks,
+            "batches": self.batches,
+            "retries": self.retries,
+            "elapsed": self.elapsed,
+            "chunks_per_second": self.chunks_per_second,
+        }
@@ -0,0 +1,41 @@
+"""
+RefreshReport Module
+
+This module defines the RefreshReport class, the outcome of an incremental re-indexing
+run (see :meth:`KnowledgeService.refresh_knowledge`).
+"""
+
+from typing import Any, Dict
+
+
+class RefreshReport:
+    """
+    Counters of an incremental re-indexing run.
+
+    Attributes:
+        documents_unchanged (int): Documents skipped because their hash did not change.
+        documents_updated (int): New or changed documents that were re-chunked.
+        documents_deleted (int): Documents no longer present in the corpus.
+        chunks_unchanged (int): Chunks of updated documents that kept their row.
+        chunks_reused (int): New chunks whose embedding was copied from an identical chunk.
+        chunks_embedded (int): Chunks sent to the embedding model.
+        chunks_deleted (int): Rows tombstoned during the run.
+        rows_compacted (int): Rows physically removed by compaction (0 if not compacted).
+    """
+
+    __slots__ = ("documents_unchanged", "documents_updated", "documents_deleted", "chunks_unchanged",
+                 "chunks_reused", "chunks_embedded", "chunks_deleted", "rows_compacted")
+
+    def __init__(self) -> None:
+        """Initialize a RefreshReport with zero counters."""
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize the counters into a plain dictionary.
+
+        Returns:
+            Dict[str, Any]: The counters.
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
@@ -0,0 +1,84 @@
+"""
+UsageRecord Module
+
+This module defines the UsageRecord class, the token and cost totals of one tenant and one
+model (see :class:`UsageLedger`).
+"""
+
+from typing import Any, Dict
+
+
+class UsageRecord:
+    """
+    Token and cost totals of the LLM calls of a tenant with a model.
+
+    Attributes:
+        tenant (str): The tenant the calls were made for.
+        model (str): The model that answered.
+        requests (int): Number of completed calls.
+        prompt_tokens (int): Input tokens reported by the provider.
+        completion_tokens (int): Output tokens reported by the provider.
+        cost (float): Cost of the tokens, from the model prices of the ledger.
+    """
+
+    __slots__ = ("tenant", "model", "requests", "prompt_tokens", "completion_tokens", "cost")
+
+    def __init__(self, tenant: str, model: str) -> None:
+        """
+        Initialize a UsageRecord with zero totals.
+
+        Args:
+            tenant (str): The tenant.
+            model (str): The model.
+        """
+        self.tenant = tenant
+        self.model = model
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        """int: Input and output tokens."""
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, requests: int, prompt_tokens: int, completion_tokens: int, cost: float) -> "UsageRecord":
+        """
+        Add usage to the totals.
+
+        Args:
+            requests (int): Number of calls.
+            prompt_tokens (int): Input tokens.
+            completion_tokens (int): Output tokens.
+            cost (float): Cost of the tokens.
+
+        Returns:
+            UsageRecord: Self for method chaining.
+        """
+        self.requests += requests
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cost += cost
+        return self
+
+    def merge(self, other: "UsageRecord") -> "UsageRecord":
+        """
+        Add the totals of another record.
+
+        Args:
+            other (UsageRecord): The record to add.
+
+        Returns:
+            UsageRecord: Self for method chaining.
+        """
+        return self.add(other.requests, other.prompt_tokens, other.completion_tokens, other.cost)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize the record into a plain dictionary.
+
+        Returns:
+            Dict[str, Any]: The tenant, the model and the totals.
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
@@ -1,3 +1,6 @@
+from typing import Sequence, Tuple
+
+from lib.core.service.ContextPacker import ContextPacker
 from lib.use_case.prompts.PromptManager import PromptManager
 
 class FilePromptManager(PromptManager):
@@ -59,3 +62,28 @@ class FilePromptManager(PromptManager):
             str: The formatted user prompt.
         """
         return self.user_prompt_template.format(*args, **kwargs)
+
+    def get_packed_user_prompt(self, scored_chunks: Sequence[Tuple[str, float]], packer: ContextPacker,
+                               context_key: str = "context", system_prompt: str = None, **kwargs) -> str:
+        """
+        Get the formatted user prompt with as much retrieved context as fits the model.
+
+        The template is first rendered with an empty context to measure its overhead (plus the
+        system prompt, if given); the remaining budget is filled by ``packer`` with the
+        highest-scoring chunks, which are then substituted for ``{context_key}``.
+
+        Args:
+            scored_chunks (Sequence[Tuple[str, float]]): ``(chunk, score)`` pairs to pack.
+            packer (ContextPacker): The packer holding the model's context budget.
+            context_key (str, optional): Template placeholder receiving the context. Defaults to "context".
+            system_prompt (str, optional): The rendered system prompt, counted as overhead. Defaults to None.
+            **kwargs: Other keyword arguments for formatting.
+
+        Returns:
+            str: The formatted user prompt.
+        """
+        overhead = packer.count(self.get_user_prompt(**{context_key: ""}, **kwargs))
+        if system_prompt:
+            overhead += packer.count(system_prompt)
+        context = packer.pack_text(scored_chunks, prompt_overhead=overhead)
+        return self.get_user_prompt(**{context_key: context}, **kwargs)
@@ -0,0 +1,218 @@
+"""
+CheckpointStore Module
+
+This module provides the stores of the step results checkpointed and memoized by
+:class:`DagRunner`:
+
+- :class:`InMemoryCheckpointStore`: a dictionary, for memoization within a process;
+- :class:`SqliteCheckpointStore`: a SQLite database, which survives the process, so that a
+  failed workflow can be resumed.
+
+Both evict the entries older than ``ttl`` seconds, and the least recently used entries beyond
+``max_entries``.
+"""
+
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import closing
+from typing import Optional, Tuple
+
+from lib.commons.RecordCodec import RecordCodec
+from lib.use_case.steps.StepResult import StepResult
+
+
+class CheckpointStore(ABC):
+    """
+    Base class of the step result stores.
+
+    Attributes:
+        max_entries (Optional[int]): Number of entries kept, None for no limit.
+        ttl (Optional[float]): Seconds an entry is kept, None for no limit.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None) -> None:
+        """
+        Initialize the eviction policy.
+
+        Args:
+            max_entries (Optional[int], optional): Number of entries kept; the least recently
+                used ones are evicted. Defaults to None (no limit).
+            ttl (Optional[float], optional): Seconds after which an entry expires. Defaults to
+                None (no expiration).
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[StepResult]:
+        """
+        Return the result stored under a key.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            Optional[StepResult]: The result, or None if there is none or it expired.
+        """
+        pass
+
+    @abstractmethod
+    def put(self, key: str, result: StepResult) -> None:
+        """
+        Store a result, evicting entries if the store is full.
+
+        Args:
+            key (str): The key.
+            result (StepResult): The result.
+        """
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every entry."""
+        pass
+
+
+class InMemoryCheckpointStore(CheckpointStore):
+    """Store keeping the results in memory, in least recently used order."""
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None) -> None:
+        """
+        Create an empty store.
+
+        Args:
+            max_entries (Optional[int], optional): Number of entries kept. Defaults to None.
+            ttl (Optional[float], optional): Seconds after which an entry expires. Defaults to None.
+        """
+        super().__init__(max_entries, ttl)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, StepResult]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[StepResult]:
+        """
+        Return the result stored under a key, marking it as the most recently used.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            Optional[StepResult]: The result, or None if there is none or it expired (it is then removed).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self.ttl is not None and time.time() - entry[0] >= self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: str, result: StepResult) -> None:
+        """
+        Store a result, removing the expired entries and the least recently used ones beyond
+        ``max_entries``.
+
+        Args:
+            key (str): The key.
+            result (StepResult): The result.
+        """
+        now = time.time()
+        with self._lock:
+            if self.ttl is not None:
+                for expired in [key for key, (created, _) in self._entries.items() if now - created >= self.ttl]:
+                    del self._entries[expired]
+            self._entries[key] = (now, result)
+            self._entries.move_to_end(key)
+            if self.max_entries is not None:
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        """Return the number of entries, including the expired ones not removed yet."""
+        return len(self._entries)
+
+
+class SqliteCheckpointStore(CheckpointStore):
+    """
+    Store keeping the results in a SQLite database (table ``checkpoints``), encoded with the
+    binary :class:`RecordCodec` format.
+
+    Warning:
+        The binary format is based on pickle: only open databases written by trusted processes.
+    """
+
+    def __init__(self, path: str, max_entries: Optional[int] = None, ttl: Optional[float] = None) -> None:
+        """
+        Open (or create) the database.
+
+        Args:
+            path (str): The database file.
+            max_entries (Optional[int], optional): Number of entries kept. Defaults to None.
+            ttl (Optional[float], optional): Seconds after which an entry expires. Defaults to None.
+        """
+        super().__init__(max_entries, ttl)
+        self.path = path
+        self._lock = threading.Lock()
+        with self._lock, closing(sqlite3.connect(self.path)) as connection, connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS checkpoints (key TEXT PRIMARY KEY, result BLOB, "
+                               "created REAL, accessed REAL)")
+
+    def get(self, key: str) -> Optional[StepResult]:
+        """
+        Return the result stored under a key, marking it as the most recently used.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            Optional[StepResult]: The result, or None if there is none or it expired (it is then removed).
+        """
+        now = time.time()
+        with self._lock, closing(sqlite3.connect(self.path)) as connection, connection:
+            row = connection.execute("SELECT result, created FROM checkpoints WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl is not None and now - row[1] >= self.ttl:
+                connection.execute("DELETE FROM checkpoints WHERE key = ?", (key,))
+                return None
+            connection.execute("UPDATE checkpoints SET accessed = ? WHERE key = ?", (now, key))
+        return RecordCodec.decode_binary(row[0], StepResult)[0]
+
+    def put(self, key: str, result: StepResult) -> None:
+        """
+        Store a result, removing the expired entries and the least recently used ones beyond
+        ``max_entries``.
+
+        Args:
+            key (str): The key.
+            result (StepResult): The result.
+        """
+        now = time.time()
+        data = RecordCodec.encode_binary([result])
+        with self._lock, closing(sqlite3.connect(self.path)) as connection, connection:
+            connection.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?)", (key, data, now, now))
+            if self.ttl is not None:
+                connection.execute("DELETE FROM checkpoints WHERE created <= ?", (now - self.ttl,))
+            if self.max_entries is not None:
+                connection.execute("DELETE FROM checkpoints WHERE key NOT IN "
+                                   "(SELECT key FROM checkpoints ORDER BY accessed DESC, rowid DESC LIMIT ?)",
+                                   (self.max_entries,))
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock, closing(sqlite3.connect(self.path)) as connection, connection:
+            connection.execute("DELETE FROM checkpoints")
+
+    def __len__(self) -> int:
+        """Return the number of entries, including the expired ones not removed yet."""
+        with self._lock, closing(sqlite3.connect(self.path)) as connection:
+            return connection.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
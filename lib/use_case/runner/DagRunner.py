@@ -0,0 +1,355 @@
+"""
+DagRunner Module
+
+This module provides the DagRunner class, a runner executing workflow steps as a directed
+acyclic graph: each step declares the steps it depends on and starts as soon as they all
+succeeded, so independent steps (e.g. a retrieval and a classification call) run in parallel.
+
+Steps are :class:`AbstractStep` instances. A step whose ``execute`` is a coroutine function runs
+on the event loop; any other step runs in a thread pool, so blocking calls (LLMExecutor,
+KnowledgeService) do not block the other steps. A step receives the :class:`StepResult` of each
+of its dependencies, in declaration order; the steps without dependencies receive the inputs of
+the run.
+
+A step fails when its result has errors or when it raises (the error is then recorded in its
+result). The steps depending on a failed step are skipped; with ``fail_fast`` (the default), the
+whole run short-circuits: no other step starts and the running coroutine steps are cancelled.
+
+Successful results can be kept in :class:`CheckpointStore` instances, keyed by the step id and a
+hash of the step arguments:
+
+- checkpoints (``checkpoints`` store, runs with a ``workflow_id``): running a failed workflow
+  again with the same id skips the steps that already succeeded with the same arguments;
+- memoization (``memo`` store, steps marked ``deterministic``): the result is reused by any run.
+
+Both require steps with stable ids (e.g. :func:`uuid.uuid5` of a name) and hashable arguments
+(see :func:`input_hash`); steps with arguments that cannot be hashed are always executed.
+
+Each step runs under a :class:`Deadline`, the earliest of its own ``timeout``, the ``timeout``
+of the run and the deadline of the caller. The deadline is current while the step runs, so the
+LLM calls and tool executions of the step are bounded by it too. A step still running when its
+deadline expires is abandoned with a ``DeadlineExceeded`` error result: a coroutine step is
+cancelled, and the deadline of a synchronous step is cancelled, which stops its LLM calls and
+streams at their next deadline check (a thread cannot be interrupted otherwise).
+"""
+
+import asyncio
+import contextvars
+import functools
+import hashlib
+import inspect
+import json
+import pickle
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from lib.commons.Deadline import Deadline, DeadlineExceeded
+from lib.commons.Metrics import Metrics
+from lib.commons.StructuredLogging import get_logger
+from lib.commons.Tracer import Tracer
+from lib.use_case.runner.AbstractRunner import AbstractRunner
+from lib.use_case.runner.CheckpointStore import CheckpointStore
+from lib.use_case.steps.AbstractStep import AbstractStep
+from lib.use_case.steps.StepResult import StepResult
+
+tracer = Tracer.get_instance()
+logger = get_logger(__name__)
+
+cache_lookups = Metrics.get_instance().counter("cache_lookups_total",
+                                               "Cache lookups by cache and result (hit or miss).", ("cache", "result"))
+step_timeouts = Metrics.get_instance().counter("workflow_step_timeouts_total",
+                                               "Workflow steps abandoned when their deadline expired.", ("step",))
+
+
+def _canonical(value: Any) -> Any:
+    """Convert the values the json module cannot encode, the same way in every process."""
+    if isinstance(value, uuid.UUID):
+        return {"$uuid": str(value)}
+    if isinstance(value, (set, frozenset)):
+        # Set iteration order depends on the hash seed of the process.
+        return {"$set": sorted(_canonical_json(item) for item in value)}
+    if isinstance(value, bytes):
+        return {"$bytes": value.hex()}
+    if hasattr(value, "to_dict"):
+        return {"$" + type(value).__name__: value.to_dict()}
+    raise TypeError(f"No canonical encoding for {type(value).__name__}")
+
+
+def _canonical_json(value: Any) -> str:
+    """Encode a value as JSON with sorted keys, independent of the process."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=_canonical)
+
+
+def input_hash(args: Sequence[Any]) -> Optional[str]:
+    """
+    Hash the arguments of a step.
+
+    The arguments are encoded as JSON with sorted keys (UUIDs, sets, bytes and records with a
+    ``to_dict`` method included), so that the hash is the same in every process and a workflow
+    can be resumed by another process. Arguments without a JSON encoding (e.g. numpy arrays) are
+    pickled instead, which is only guaranteed to be stable within a process.
+
+    Args:
+        args (Sequence[Any]): The arguments (run inputs or dependency results).
+
+    Returns:
+        Optional[str]: The SHA-256 hex digest of their encoding, or None if they can be neither
+        encoded nor pickled.
+    """
+    try:
+        encoded = b"json:" + _canonical_json(list(args)).encode("utf-8")
+    except (TypeError, ValueError):
+        try:
+            encoded = b"pickle:" + pickle.dumps(tuple(args), protocol=4)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return None
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class _Node:
+    """A step of the graph, with the ids of the steps it depends on and of its dependents."""
+
+    __slots__ = ("step", "dependencies", "dependents")
+
+    def __init__(self, step: AbstractStep, dependencies: List[uuid.UUID]) -> None:
+        self.step = step
+        self.dependencies = dependencies
+        self.dependents: List[uuid.UUID] = []
+
+
+class DagRunner(AbstractRunner):
+    """
+    Runner executing steps as a DAG with maximum parallelism.
+
+    Steps are added with :meth:`add_step` after the steps they depend on, which keeps the graph
+    acyclic by construction.
+
+    Attributes:
+        max_workers (Optional[int]): Size of the thread pool of the synchronous steps.
+        fail_fast (bool): Whether a failed step stops the whole run.
+        checkpoints (Optional[CheckpointStore]): Store of the results of the runs with a workflow id.
+        memo (Optional[CheckpointStore]): Store of the results of the deterministic steps.
+        timeout (Optional[float]): Maximum duration of a run, in seconds.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, fail_fast: bool = True,
+                 checkpoints: Optional[CheckpointStore] = None, memo: Optional[CheckpointStore] = None,
+                 timeout: Optional[float] = None) -> None:
+        """
+        Initialize an empty runner.
+
+        Args:
+            max_workers (Optional[int], optional): Threads running the synchronous steps. Defaults
+                to None (the :class:`ThreadPoolExecutor` default).
+            fail_fast (bool, optional): Stop the run at the first failed step. When False, only
+                the steps depending on a failed step are skipped. Defaults to True.
+            checkpoints (Optional[CheckpointStore], optional): Store checkpointing the successful
+                results of the runs with a workflow id. Defaults to None.
+            memo (Optional[CheckpointStore], optional): Store memoizing the successful results of
+                the deterministic steps across runs. Defaults to None.
+            timeout (Optional[float], optional): Maximum duration of a run in seconds: the steps
+                still running or waiting when it expires fail with ``DeadlineExceeded``. Defaults
+                to None (no limit).
+        """
+        self.max_workers = max_workers
+        self.fail_fast = fail_fast
+        self.checkpoints = checkpoints
+        self.memo = memo
+        self.timeout = timeout
+        self._nodes: Dict[uuid.UUID, _Node] = {}
+
+    @property
+    def steps(self) -> List[AbstractStep]:
+        """List[AbstractStep]: The steps, in the order they were added."""
+        return [node.step for node in self._nodes.values()]
+
+    def add_step(self, step: AbstractStep,
+                 depends_on: Iterable[Union[AbstractStep, uuid.UUID]] = ()) -> AbstractStep:
+        """
+        Add a step to the graph.
+
+        A step without ``step_id`` gets a random one.
+
+        Args:
+            step (AbstractStep): The step.
+            depends_on (Iterable[Union[AbstractStep, uuid.UUID]], optional): The steps (or their
+                ids) whose results the step receives, already added to the runner. Defaults to none.
+
+        Returns:
+            AbstractStep: The step, to declare it as a dependency of the next ones.
+
+        Raises:
+            ValueError: If the step was already added or a dependency was not.
+        """
+        if getattr(step, "step_id", None) is None:
+            step.step_id = uuid.uuid4()
+        if step.step_id in self._nodes:
+            raise ValueError(f"Step {step.step_id} was already added")
+        dependencies = [getattr(dependency, "step_id", dependency) for dependency in depends_on]
+        for dependency in dependencies:
+            if dependency not in self._nodes:
+                raise ValueError(f"Dependency {dependency} of step {step.step_id} must be added before it")
+        self._nodes[step.step_id] = _Node(step, dependencies)
+        for dependency in dependencies:
+            self._nodes[dependency].dependents.append(step.step_id)
+        return step
+
+    def run(self, *inputs: Any, workflow_id: Optional[str] = None) -> Dict[uuid.UUID, StepResult]:
+        """
+        Execute the steps in a new event loop.
+
+        Use :meth:`run_async` from a running event loop.
+
+        Args:
+            *inputs: The arguments of the steps without dependencies.
+            workflow_id (Optional[str], optional): Id of the workflow, to checkpoint its results
+                and resume it. Defaults to None (no checkpoints).
+
+        Returns:
+            Dict[uuid.UUID, StepResult]: The result of every step by step id, in the order the
+            steps were added (skipped and cancelled steps have an error result).
+        """
+        return asyncio.run(self.run_async(*inputs, workflow_id=workflow_id))
+
+    async def run_async(self, *inputs: Any, workflow_id: Optional[str] = None) -> Dict[uuid.UUID, StepResult]:
+        """
+        Execute the steps in the running event loop.
+
+        Args:
+            *inputs: The arguments of the steps without dependencies.
+            workflow_id (Optional[str], optional): Id of the workflow, to checkpoint its results
+                and resume it. Defaults to None (no checkpoints).
+
+        Returns:
+            Dict[uuid.UUID, StepResult]: The result of every step by step id, in the order the
+            steps were added.
+        """
+        results: Dict[uuid.UUID, StepResult] = {}
+        waiting = {step_id: len(node.dependencies) for step_id, node in self._nodes.items()}
+        running: Dict[asyncio.Future, uuid.UUID] = {}
+        failed: Optional[uuid.UUID] = None
+
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="workflow")
+        deadline = Deadline(self.timeout)
+
+        def start(step_id: uuid.UUID) -> None:
+            node = self._nodes[step_id]
+            args = [results[dependency] for dependency in node.dependencies] if node.dependencies else inputs
+            running[asyncio.ensure_future(self._execute(node.step, args, pool, workflow_id, deadline))] = step_id
+
+        attributes = {"steps": len(self._nodes)}
+        if workflow_id is not None:
+            attributes["workflow_id"] = workflow_id
+        with tracer.span("workflow.run", attributes):
+            try:
+                for step_id, count in waiting.items():
+                    if count == 0:
+                        start(step_id)
+                while running:
+                    done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                    ready = []
+                    for future in done:
+                        step_id = running.pop(future)
+                        if future.cancelled():
+                            results[step_id] = StepResult(step_id, errors=[f"Cancelled: step {failed} failed"])
+                            continue
+                        results[step_id] = result = future.result()
+                        if not result.is_success():
+                            failed = failed or step_id
+                            continue
+                        for dependent in self._nodes[step_id].dependents:
+                            waiting[dependent] -= 1
+                            if waiting[dependent] == 0:
+                                ready.append(dependent)
+                    if self.fail_fast and failed is not None:
+                        for future in running:
+                            future.cancel()
+                        continue
+                    for step_id in ready:
+                        start(step_id)
+            finally:
+                for future in running:
+                    future.cancel()
+                # A cancelled synchronous step cannot be interrupted: its deadline is cancelled so that it
+                # stops at its next deadline check, and its thread finishes in the background.
+                deadline.cancel()
+                pool.shutdown(wait=False, cancel_futures=True)
+
+        for step_id, node in self._nodes.items():
+            if step_id not in results:
+                cause = failed if self.fail_fast else next(
+                    dependency for dependency in node.dependencies if not results[dependency].is_success())
+                results[step_id] = StepResult(step_id, errors=[f"Skipped: step {cause} failed"])
+        return {step_id: results[step_id] for step_id in self._nodes}
+
+    def _cache_keys(self, step: AbstractStep, args,
+                    workflow_id: Optional[str]) -> List[Tuple[str, CheckpointStore, str]]:
+        """Return the cache name, store and key of each store that may hold the result of a step."""
+        caches = []
+        if self.checkpoints is not None and workflow_id is not None:
+            caches.append(("checkpoint", self.checkpoints, f"{workflow_id}:{step.step_id}"))
+        if self.memo is not None and step.deterministic:
+            caches.append(("memo", self.memo, str(step.step_id)))
+        digest = input_hash(args) if caches else None
+        if digest is None:
+            return []
+        return [(cache, store, f"{prefix}:{digest}") for cache, store, prefix in caches]
+
+    async def _execute(self, step: AbstractStep, args, pool: ThreadPoolExecutor,
+                       workflow_id: Optional[str] = None, run_deadline: Optional[Deadline] = None) -> StepResult:
+        """
+        Execute one step, on the event loop or in the thread pool, under its deadline, and return
+        its result, unless it is already checkpointed or memoized.
+
+        An error raised by the step is recorded in its result; a plain return value is wrapped
+        in a :class:`StepResult`.
+        """
+        name = type(step).__name__
+        with tracer.span("workflow.step", {"step": name, "step_id": str(step.step_id)}) as span:
+            caches = self._cache_keys(step, args, workflow_id)
+            for cache, store, key in caches:
+                result = store.get(key)
+                cache_lookups.inc(cache, "miss" if result is None else "hit")
+                if result is not None:
+                    span.set_attributes({"success": True, "cache": cache})
+                    return result
+            deadline = Deadline(step.timeout, parent=run_deadline)
+            future = None
+            try:
+                # The step runs in a copy of the current context, with its deadline and this span.
+                with deadline:
+                    deadline.check()
+                    if inspect.iscoroutinefunction(step.execute):
+                        future = asyncio.ensure_future(step.execute(*args))
+                    else:
+                        call = functools.partial(contextvars.copy_context().run, step.execute, *args)
+                        future = asyncio.get_running_loop().run_in_executor(pool, call)
+                done, _ = await asyncio.wait({future}, timeout=deadline.remaining())
+                if not done:
+                    raise DeadlineExceeded(f"Step {name} exceeded its deadline")
+                result = future.result()
+            except asyncio.CancelledError:
+                deadline.cancel()
+                if future is not None:
+                    future.cancel()
+                raise
+            except DeadlineExceeded as error:
+                deadline.cancel()
+                if future is not None and not future.done():
+                    future.cancel()
+                    await asyncio.wait({future})
+                logger.warning("Step %s timed out: %s", name, error, extra={"step_id": str(step.step_id)})
+                step_timeouts.inc(name)
+                span.set_attribute("timed_out", True)
+                result = StepResult(step.step_id, errors=[f"DeadlineExceeded: {error}"])
+            except Exception as error:
+                logger.warning("Step %s failed: %s", name, error, extra={"step_id": str(step.step_id)})
+                result = StepResult(step.step_id, errors=[f"{type(error).__name__}: {error}"])
+            if not isinstance(result, StepResult):
+                result = StepResult(step.step_id, result=result)
+            if result.is_success():
+                for cache, store, key in caches:
+                    store.put(key, result)
+            span.set_attribute("success", result.is_success())
+            return result
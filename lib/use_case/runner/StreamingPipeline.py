@@ -0,0 +1,169 @@
+"""
+StreamingPipeline Module
+
+This module provides the StreamingPipeline class, a runner chaining :class:`StreamingStep`
+instances (e.g. generate → parse → enrich): every step runs in its own task and passes its
+output items to the next step through a bounded queue as soon as they are produced, so the
+steps overlap and the first output is available long before the input is exhausted.
+
+The queues provide backpressure: a step producing faster than the next one consumes waits when
+the queue between them is full, so memory stays bounded by ``buffer_size`` items per step. An
+error in any step cancels the other steps and is raised to the consumer, after the items
+already produced by the last step.
+"""
+
+import asyncio
+import uuid
+from typing import Any, AsyncIterator, Iterable, List
+
+from lib.commons.StructuredLogging import get_logger
+from lib.commons.Tracer import Tracer
+from lib.use_case.runner.AbstractRunner import AbstractRunner
+from lib.use_case.steps.StepResult import StepResult
+from lib.use_case.steps.StreamingStep import StreamingStep, iterate
+
+tracer = Tracer.get_instance()
+logger = get_logger(__name__)
+
+_END = object()
+
+
+async def _drain(queue: asyncio.Queue) -> AsyncIterator[Any]:
+    """Yield the items of a queue until the end marker."""
+    while True:
+        item = await queue.get()
+        if item is _END:
+            return
+        yield item
+
+
+class StreamingPipeline(AbstractRunner):
+    """
+    Runner executing streaming steps concurrently, connected by bounded queues.
+
+    Attributes:
+        steps (List[StreamingStep]): The steps, in pipeline order.
+        buffer_size (int): Capacity of the queue after each step.
+    """
+
+    def __init__(self, steps: Iterable[StreamingStep] = (), buffer_size: int = 16) -> None:
+        """
+        Initialize the pipeline.
+
+        Args:
+            steps (Iterable[StreamingStep], optional): The steps, in order. Defaults to none.
+            buffer_size (int, optional): Items buffered after each step before it waits for the
+                next one. Defaults to 16.
+
+        Raises:
+            ValueError: If the buffer size is not positive.
+        """
+        if buffer_size < 1:
+            raise ValueError(f"The buffer size must be positive, got {buffer_size}")
+        self.steps: List[StreamingStep] = []
+        self.buffer_size = buffer_size
+        for step in steps:
+            self.add_step(step)
+
+    def add_step(self, step: StreamingStep) -> StreamingStep:
+        """
+        Append a step to the pipeline. A step without ``step_id`` gets a random one.
+
+        Args:
+            step (StreamingStep): The step.
+
+        Returns:
+            StreamingStep: The step.
+        """
+        if getattr(step, "step_id", None) is None:
+            step.step_id = uuid.uuid4()
+        self.steps.append(step)
+        return step
+
+    async def stream(self, source: Any) -> AsyncIterator[Any]:
+        """
+        Run the pipeline over a source and yield the output items of the last step as they come.
+
+        Closing the iterator early cancels the steps.
+
+        Args:
+            source (Any): The input items: an iterable or an asynchronous iterator.
+
+        Yields:
+            Any: The output items.
+
+        Raises:
+            Exception: The first error raised by a step.
+        """
+        if not self.steps:
+            async for item in iterate(source):
+                yield item
+            return
+        queues = [asyncio.Queue(maxsize=self.buffer_size) for _ in self.steps]
+        tasks: List[asyncio.Task] = []
+        errors: List[Exception] = []
+
+        async def run(index: int, step: StreamingStep) -> None:
+            items = iterate(source) if index == 0 else _drain(queues[index - 1])
+            produced = 0
+            with tracer.span("workflow.stage", {"step": type(step).__name__, "index": index}) as span:
+                try:
+                    async for item in step.process(items):
+                        await queues[index].put(item)
+                        produced += 1
+                except Exception as error:
+                    logger.warning("Streaming step %s failed: %s", type(step).__name__, error,
+                                   extra={"step_id": str(step.step_id)})
+                    errors.append(error)
+                    for task in tasks:
+                        if task is not asyncio.current_task():
+                            task.cancel()
+                    await queues[-1].put(_END)
+                    raise
+                finally:
+                    span.set_attribute("items", produced)
+            await queues[index].put(_END)
+
+        tasks.extend(asyncio.ensure_future(run(index, step)) for index, step in enumerate(self.steps))
+        try:
+            async for item in _drain(queues[-1]):
+                yield item
+            if errors:
+                raise errors[0]
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def run(self, source: Any) -> StepResult:
+        """
+        Run the pipeline in a new event loop and collect its output.
+
+        Use :meth:`run_async` from a running event loop.
+
+        Args:
+            source (Any): The input items.
+
+        Returns:
+            StepResult: The result of the last step: the list of the output items, or the error
+            of the failed step (with the items produced before it).
+        """
+        return asyncio.run(self.run_async(source))
+
+    async def run_async(self, source: Any) -> StepResult:
+        """
+        Run the pipeline in the running event loop and collect its output.
+
+        Args:
+            source (Any): The input items.
+
+        Returns:
+            StepResult: The result of the last step.
+        """
+        result = StepResult(self.steps[-1].step_id if self.steps else None, result=[])
+        try:
+            async for item in self.stream(source):
+                result.result.append(item)
+        except Exception as error:
+            result.add_error(f"{type(error).__name__}: {error}")
+        return result
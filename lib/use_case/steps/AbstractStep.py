@@ -7,6 +7,7 @@ in the TotChef workflow. It provides a common interface and ensures each step ha
 
 import uuid
 from abc import ABC
+from typing import Optional
 from lib.use_case.steps.StepResult import StepResult
 
 class AbstractStep(ABC):
@@ -18,9 +19,16 @@ class AbstractStep(ABC):
 
     Attributes:
         step_id (uuid.UUID): A unique identifier for the step instance.
+        deterministic (bool): Whether the result only depends on the arguments, so that runners
+            may memoize it (see :class:`DagRunner`). Defaults to False.
+        timeout (Optional[float]): Maximum duration of the step in seconds, after which runners
+            abandon it with a ``DeadlineExceeded`` error (see :class:`DagRunner`). Defaults to
+            None (no limit of its own).
     """
 
     step_id: uuid.UUID
+    deterministic: bool = False
+    timeout: Optional[float] = None
 
     def execute(self, *args) -> StepResult:
         """
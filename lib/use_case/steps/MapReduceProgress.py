@@ -0,0 +1,88 @@
+"""
+MapReduceProgress Module
+
+This module defines the MapReduceProgress class, the progress report of a
+:class:`MapReduceStep` execution. The same instance is updated while the step runs and handed
+to the progress callback after every mapped piece and every reduce call.
+"""
+
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+class MapReduceProgress:
+    """
+    Counters of a map-reduce execution.
+
+    Attributes:
+        phase (str): ``"map"``, ``"reduce"`` or ``"done"``.
+        pieces (int): Number of pieces to map.
+        mapped (int): Number of pieces mapped successfully so far.
+        failed (int): Number of pieces whose map call failed so far.
+        level (int): Current level of the reduce tree (1 for the reduction of the mapped values).
+        reductions (int): Number of reduce calls completed so far.
+        started_at (float): Clock value at the start of the execution.
+        finished_at (Optional[float]): Clock value at the end of the execution, None while running.
+    """
+
+    __slots__ = ("phase", "pieces", "mapped", "failed", "level", "reductions", "started_at", "finished_at",
+                 "_clock")
+
+    def __init__(self, pieces: int = 0, clock: Callable[[], float] = time.perf_counter) -> None:
+        """
+        Initialize a MapReduceProgress in the map phase, starting the clock.
+
+        Args:
+            pieces (int, optional): Number of pieces to map. Defaults to 0.
+            clock (Callable[[], float], optional): Monotonic clock returning seconds.
+                Defaults to :func:`time.perf_counter`.
+        """
+        self._clock = clock
+        self.phase = "map"
+        self.pieces = pieces
+        self.mapped = 0
+        self.failed = 0
+        self.level = 0
+        self.reductions = 0
+        self.started_at = clock()
+        self.finished_at: Optional[float] = None
+
+    def finish(self) -> "MapReduceProgress":
+        """
+        Enter the ``done`` phase and stop the clock.
+
+        Returns:
+            MapReduceProgress: Self, for chaining.
+        """
+        self.phase = "done"
+        self.finished_at = self._clock()
+        return self
+
+    @property
+    def completed(self) -> float:
+        """float: Fraction of the pieces mapped or failed, between 0 and 1 (1 without pieces)."""
+        return (self.mapped + self.failed) / self.pieces if self.pieces else 1.0
+
+    @property
+    def elapsed(self) -> float:
+        """float: Seconds since the start of the execution (until its end once finished)."""
+        end = self.finished_at if self.finished_at is not None else self._clock()
+        return end - self.started_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize the counters into a plain dictionary.
+
+        Returns:
+            Dict[str, Any]: The phase, counters, completed fraction and elapsed seconds.
+        """
+        return {
+            "phase": self.phase,
+            "pieces": self.pieces,
+            "mapped": self.mapped,
+            "failed": self.failed,
+            "level": self.level,
+            "reductions": self.reductions,
+            "completed": self.completed,
+            "elapsed": self.elapsed,
+        }
@@ -0,0 +1,232 @@
+"""
+MapReduceStep Module
+
+This module provides the MapReduceStep class, a workflow step fanning out over an input too large
+for a single call, e.g. a document too long for one prompt. The input is split into pieces and
+every piece is mapped (e.g. summarized with :meth:`LLMExecutor.ask`) in a bounded thread pool.
+The mapped values are then reduced hierarchically: groups of ``fan_in`` values are reduced in
+parallel, then groups of those results, until a single value remains. The reducer therefore
+receives its own outputs on the upper levels (e.g. it combines summaries into a summary).
+
+Up to ``max_failure_rate`` of the pieces may fail: the other values are reduced and the errors
+are reported in the message of the result. Beyond that, the step fails with the error of every
+failed piece; the pieces not started are dropped and the running ones are stopped through the
+cancellation of their :class:`Deadline`.
+
+Progress is reported with a :class:`MapReduceProgress` handed to the ``progress`` callback after
+every mapped piece, every reduce call and at the end, from the thread executing the step.
+"""
+
+import contextvars
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from lib.commons.Deadline import Deadline
+from lib.commons.StructuredLogging import get_logger
+from lib.commons.Tracer import Tracer
+from lib.use_case.steps.AbstractStep import AbstractStep
+from lib.use_case.steps.MapReduceProgress import MapReduceProgress
+from lib.use_case.steps.StepResult import StepResult
+
+tracer = Tracer.get_instance()
+logger = get_logger(__name__)
+
+
+class MapReduceStep(AbstractStep):
+    """
+    Step splitting its input, mapping the pieces in parallel and reducing the values hierarchically.
+
+    The split, map and reduce functions are given to the constructor, or implemented by
+    overriding :meth:`split`, :meth:`map` and :meth:`reduce`. Give a stable ``step_id`` (e.g.
+    :func:`uuid.uuid5` of a name) to checkpoint the step in a :class:`DagRunner`.
+
+    Attributes:
+        step_id (uuid.UUID): The identifier of the step.
+        mapper (Optional[Callable[[Any], Any]]): Function mapping a piece to a value.
+        reducer (Optional[Callable[[List[Any]], Any]]): Function reducing a list of values (mapped
+            values or results of the reducer) to a value.
+        splitter (Optional[Callable[[Any], Iterable[Any]]]): Function splitting the input into pieces.
+        max_workers (int): Maximum number of concurrent map or reduce calls.
+        fan_in (int): Maximum number of values per reduce call.
+        max_failure_rate (float): Fraction of the pieces allowed to fail.
+        progress (Optional[Callable[[MapReduceProgress], None]]): Progress callback.
+    """
+
+    def __init__(self, mapper: Optional[Callable[[Any], Any]] = None,
+                 reducer: Optional[Callable[[List[Any]], Any]] = None,
+                 splitter: Optional[Callable[[Any], Iterable[Any]]] = None, max_workers: int = 4, fan_in: int = 8,
+                 max_failure_rate: float = 0.0,
+                 progress: Optional[Callable[[MapReduceProgress], None]] = None,
+                 step_id: Optional[uuid.UUID] = None) -> None:
+        """
+        Initialize the step.
+
+        Args:
+            mapper (Optional[Callable[[Any], Any]], optional): Function mapping a piece to a value.
+                Defaults to None (:meth:`map` is overridden).
+            reducer (Optional[Callable[[List[Any]], Any]], optional): Function reducing a list of
+                values to a value. Defaults to None (:meth:`reduce` is overridden).
+            splitter (Optional[Callable[[Any], Iterable[Any]]], optional): Function splitting the
+                input into pieces, e.g. ``lambda text: TextChunker(1024).split([text])``. Defaults
+                to None (the input is an iterable of pieces).
+            max_workers (int, optional): Maximum number of concurrent calls. Defaults to 4.
+            fan_in (int, optional): Maximum number of values per reduce call. Defaults to 8.
+            max_failure_rate (float, optional): Fraction of the pieces allowed to fail, between 0
+                and 1. Defaults to 0 (any failure fails the step).
+            progress (Optional[Callable[[MapReduceProgress], None]], optional): Called with the
+                progress after every mapped piece, every reduce call and at the end. Defaults to None.
+            step_id (Optional[uuid.UUID], optional): The identifier of the step. Defaults to None
+                (a random one).
+
+        Raises:
+            TypeError: If there is no mapper and :meth:`map` is not overridden, or no reducer and
+                :meth:`reduce` is not overridden.
+            ValueError: If ``max_workers`` is below 1, ``fan_in`` below 2 or ``max_failure_rate``
+                outside [0, 1].
+        """
+        if mapper is None and type(self).map is MapReduceStep.map:
+            raise TypeError("MapReduceStep needs a mapper or an override of map")
+        if reducer is None and type(self).reduce is MapReduceStep.reduce:
+            raise TypeError("MapReduceStep needs a reducer or an override of reduce")
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, got {max_workers}")
+        if fan_in < 2:
+            raise ValueError(f"fan_in must be at least 2, got {fan_in}")
+        if not 0.0 <= max_failure_rate <= 1.0:
+            raise ValueError(f"max_failure_rate must be between 0 and 1, got {max_failure_rate}")
+        self.step_id = step_id if step_id is not None else uuid.uuid4()
+        self.mapper = mapper
+        self.reducer = reducer
+        self.splitter = splitter
+        self.max_workers = max_workers
+        self.fan_in = fan_in
+        self.max_failure_rate = max_failure_rate
+        self.progress = progress
+
+    def split(self, source: Any) -> List[Any]:
+        """
+        Split the input into pieces.
+
+        Args:
+            source (Any): The input of the step.
+
+        Returns:
+            List[Any]: The pieces: the output of the splitter, or the items of the input.
+        """
+        return list(self.splitter(source) if self.splitter is not None else source)
+
+    def map(self, piece: Any) -> Any:
+        """
+        Map a piece to a value. Runs in a worker thread.
+
+        Args:
+            piece (Any): The piece.
+
+        Returns:
+            Any: The value of the mapper.
+        """
+        return self.mapper(piece)
+
+    def reduce(self, values: List[Any]) -> Any:
+        """
+        Reduce values to one value. Runs in a worker thread.
+
+        Args:
+            values (List[Any]): Mapped values on the first level, results of this method above,
+                in input order. Empty when the input has no piece (or no piece succeeded).
+
+        Returns:
+            Any: The value of the reducer.
+        """
+        return self.reducer(values)
+
+    def execute(self, *args) -> StepResult:
+        """
+        Split the input, map the pieces and reduce the values.
+
+        Args:
+            *args: The input: a value accepted by :meth:`split` or a :class:`StepResult` holding
+                one (e.g. the result of a previous step). No argument is an empty input.
+
+        Returns:
+            StepResult: The reduced value, with the errors of the failed pieces in its message;
+            or the errors of the failed pieces (or of the failed reduce call) if the step failed.
+        """
+        source = args[0] if args else ()
+        if isinstance(source, StepResult):
+            source = source.result
+        pieces = self.split(source)
+        progress = MapReduceProgress(len(pieces))
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="map_reduce")
+        try:
+            with tracer.span("workflow.map_reduce", {"step": type(self).__name__, "pieces": len(pieces)}) as span, \
+                    Deadline() as deadline:
+                values, errors = self._map(pieces, pool, progress, deadline)
+                span.set_attribute("failed", progress.failed)
+                if self._too_many_failures(progress):
+                    return StepResult(self.step_id, errors=errors)
+                try:
+                    result = self._reduce(values, pool, progress)
+                except Exception as error:
+                    deadline.cancel()
+                    logger.warning("Reduce of step %s failed: %s", type(self).__name__, error,
+                                   extra={"step_id": str(self.step_id)})
+                    return StepResult(self.step_id, errors=[f"Reduce: {type(error).__name__}: {error}"])
+                span.set_attribute("levels", progress.level)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            self._report(progress.finish())
+        message = f"{len(errors)} of {len(pieces)} pieces failed: {'; '.join(errors)}" if errors else None
+        return StepResult(self.step_id, result=result, message=message)
+
+    def _too_many_failures(self, progress: MapReduceProgress) -> bool:
+        """Tell whether the failed pieces exceed ``max_failure_rate`` (rates are compared, not counts)."""
+        return progress.pieces > 0 and progress.failed / progress.pieces > self.max_failure_rate
+
+    def _report(self, progress: MapReduceProgress) -> None:
+        """Hand the progress to the callback, if any."""
+        if self.progress is not None:
+            self.progress(progress)
+
+    def _map(self, pieces: List[Any], pool: ThreadPoolExecutor, progress: MapReduceProgress,
+             deadline: Deadline) -> Tuple[List[Any], List[str]]:
+        """
+        Map the pieces in the pool, stopping when too many failed. Return the values of the
+        mapped pieces and the errors of the failed ones, both in input order.
+        """
+        # Each call runs in a copy of the current context, with the deadline and span of the step.
+        futures = {pool.submit(contextvars.copy_context().run, self.map, piece): index
+                   for index, piece in enumerate(pieces)}
+        values, errors = {}, {}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                values[index] = future.result()
+                progress.mapped += 1
+            except Exception as error:
+                logger.warning("Piece %d of step %s failed: %s", index, type(self).__name__, error,
+                               extra={"step_id": str(self.step_id)})
+                errors[index] = f"Piece {index}: {type(error).__name__}: {error}"
+                progress.failed += 1
+            self._report(progress)
+            if self._too_many_failures(progress):
+                deadline.cancel()
+                break
+        return [values[index] for index in sorted(values)], [errors[index] for index in sorted(errors)]
+
+    def _reduce(self, values: List[Any], pool: ThreadPoolExecutor, progress: MapReduceProgress) -> Any:
+        """Reduce the values level by level, the groups of a level in parallel, down to one value."""
+        progress.phase = "reduce"
+        level = values
+        while True:
+            progress.level += 1
+            groups = [level[start:start + self.fan_in] for start in range(0, len(level), self.fan_in)] or [[]]
+            futures = [pool.submit(contextvars.copy_context().run, self.reduce, group) for group in groups]
+            level = []
+            for future in futures:
+                level.append(future.result())
+                progress.reductions += 1
+                self._report(progress)
+            if len(level) == 1:
+                return level[0]
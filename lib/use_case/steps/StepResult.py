@@ -1,18 +1,25 @@
 import uuid
-from typing import Any, List, Optional, Dict
+from typing import Any, List, Optional, Dict, Tuple
 
 
 class StepResult:
     """
     Represents the result of a step in a process, including its ID, result, message, and any errors encountered.
+
+    Instances are slotted (no per-instance ``__dict__``) so that long workflows and conversation logs
+    can keep many of them in memory. Use :class:`RecordCodec` to persist them as JSON lines or
+    compact binary records.
     """
 
+    __slots__ = ("step_id", "result", "message", "errors")
+
     step_id: uuid.UUID  # Unique identifier for the step result.
     message: Optional[str]  # Optional message providing additional context about the result.
-    result: Any = None  # The result of the step, can be of any type.
-    errors: List[str] = []  # List of error messages associated with the step.
+    result: Any  # The result of the step, can be of any type.
+    errors: List[str]  # List of error messages associated with the step.
 
-    def __init__(self, step_id: uuid.UUID, result: Any = None, message: Optional[str] = None) -> None:
+    def __init__(self, step_id: uuid.UUID, result: Any = None, message: Optional[str] = None,
+                 errors: Optional[List[str]] = None) -> None:
         """
         Initializes a StepResult instance.
 
@@ -20,11 +27,12 @@ class StepResult:
             step_id (uuid.UUID): The unique identifier for the step result.
             result (Any, optional): The result of the step. Defaults to None.
             message (Optional[str], optional): Additional context or message about the result. Defaults to None.
+            errors (Optional[List[str]], optional): Initial error messages. Defaults to an empty list.
         """
         self.step_id = step_id
         self.result = result
         self.message = message
-        self.errors = []
+        self.errors = list(errors) if errors else []
 
     def add_error(self, error: str) -> None:
         """
@@ -40,9 +48,9 @@ class StepResult:
         Checks if the step result is successful.
 
         Returns:
-            bool: True if there are no errors and a result is present, False otherwise.
+            bool: True if there are no errors, False otherwise.
         """
-        return len(self.errors) == 0 and self.errors is not None
+        return self.errors is not None and len(self.errors) == 0
 
     def to_dict(self) -> Dict[str, Any]:
         """
@@ -58,3 +66,91 @@ class StepResult:
             "errors": list(self.errors),
             "success": self.is_success(),
         }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StepResult":
+        """
+        Builds a StepResult from a dictionary produced by :meth:`to_dict`.
+
+        The ``step_id`` may be a UUID or its string form (as written by the JSON-lines encoder);
+        other step ids, e.g. strings that are not UUIDs, are kept as they are. The derived
+        ``success`` key is ignored.
+
+        Args:
+            data (Dict[str, Any]): The serialized step result.
+
+        Returns:
+            StepResult: The deserialized step result.
+        """
+        step_id = data["step_id"]
+        if isinstance(step_id, str):
+            try:
+                step_id = uuid.UUID(step_id)
+            except ValueError:
+                pass
+        return cls(step_id, result=data.get("result"), message=data.get("message"), errors=data.get("errors"))
+
+    def to_tuple(self) -> Tuple:
+        """
+        Serializes the StepResult into a positional tuple, as used by the binary encoder.
+
+        The step id is stored as its 16 raw bytes.
+
+        Returns:
+            Tuple: ``(step_id_bytes, result, message, errors)``.
+        """
+        step_id = self.step_id.bytes if isinstance(self.step_id, uuid.UUID) else self.step_id
+        return step_id, self.result, self.message, self.errors
+
+    @classmethod
+    def from_tuple(cls, values: Tuple) -> "StepResult":
+        """
+        Builds a StepResult from a tuple produced by :meth:`to_tuple`.
+
+        Args:
+            values (Tuple): The positional field values.
+
+        Returns:
+            StepResult: The deserialized step result.
+        """
+        step_id, result, message, errors = values
+        if isinstance(step_id, bytes):
+            step_id = uuid.UUID(bytes=step_id)
+        return cls(step_id, result=result, message=message, errors=errors)
+
+    def __reduce__(self):
+        """Pickle as a positional tuple so that slotted instances stay compact on disk."""
+        return self.__class__.from_tuple, (self.to_tuple(),)
+
+    def __eq__(self, other: object) -> bool:
+        """
+        Compares two step results field by field.
+
+        Args:
+            other (object): The object to compare with.
+
+        Returns:
+            bool: True if ``other`` is a StepResult with the same id, result, message and errors.
+        """
+        if not isinstance(other, StepResult):
+            return NotImplemented
+        return (self.step_id, self.result, self.message, self.errors) == \
+            (other.step_id, other.result, other.message, other.errors)
+
+    def __hash__(self) -> int:
+        """
+        Hashes the step id only, so that equal step results hash alike whatever their result.
+
+        Returns:
+            int: The hash of the step id.
+        """
+        return hash(self.step_id)
+
+    def __repr__(self) -> str:
+        """
+        Returns a short representation: the step id, the success flag and the message.
+
+        Returns:
+            str: The representation.
+        """
+        return f"StepResult(step_id={self.step_id!r}, success={self.is_success()!r}, message={self.message!r})"
@@ -0,0 +1,113 @@
+"""
+StreamingStep Module
+
+This module defines the StreamingStep class, a workflow step that transforms a stream of items
+(e.g. the :class:`LLMResponse` chunks of a streamed answer, or records) into another stream,
+item by item, instead of producing a single result.
+
+Streaming steps are chained by :class:`StreamingPipeline`, which runs them concurrently so that
+a step starts on the first items of the previous one. A streaming step can also run alone as a
+regular step (e.g. in a :class:`DagRunner`): :meth:`StreamingStep.execute` consumes its input
+and returns the list of the produced items.
+"""
+
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Iterable, Union
+
+from lib.use_case.steps.AbstractStep import AbstractStep
+from lib.use_case.steps.StepResult import StepResult
+
+_END = object()
+
+
+async def iterate(source: Union[Iterable[Any], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+    """
+    Iterate over a synchronous or asynchronous source from the event loop.
+
+    The items of a synchronous iterable are fetched in the default executor, so that a blocking
+    source (e.g. the stream returned by :meth:`LLMExecutor.ask`) does not block the event loop.
+    A source with a ``close`` method (a generator) is closed in the executor when the iteration
+    ends, including when the consumer stops early; if it stops while an item is being fetched,
+    the source is closed once that fetch returns.
+
+    Args:
+        source (Union[Iterable[Any], AsyncIterator[Any]]): The items.
+
+    Yields:
+        Any: The items of the source.
+    """
+    if hasattr(source, "__aiter__"):
+        async for item in source:
+            yield item
+        return
+    if isinstance(source, (list, tuple)):
+        for item in source:
+            yield item
+        return
+    iterator = iter(source)
+    loop = asyncio.get_running_loop()
+    # Serializes the fetches and the close: a generator cannot be closed while it runs.
+    lock = threading.Lock()
+
+    def fetch():
+        with lock:
+            return next(iterator, _END)
+
+    def close():
+        with lock:
+            iterator.close()
+
+    fetching = False
+    try:
+        while True:
+            fetching = True
+            item = await loop.run_in_executor(None, fetch)
+            fetching = False
+            if item is _END:
+                return
+            yield item
+    finally:
+        if hasattr(iterator, "close"):
+            closing = loop.run_in_executor(None, close)
+            if not fetching:
+                await closing
+
+
+class StreamingStep(AbstractStep):
+    """
+    Base class of the steps transforming a stream of items.
+
+    Subclasses implement :meth:`process` as an asynchronous generator; it may yield any number
+    of items per input item (filtering, splitting, aggregating).
+    """
+
+    async def process(self, items: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        """
+        Transform the input stream. The default implementation yields the items unchanged.
+
+        Args:
+            items (AsyncIterator[Any]): The input items.
+
+        Yields:
+            Any: The output items.
+        """
+        async for item in items:
+            yield item
+
+    async def execute(self, *args) -> StepResult:
+        """
+        Run the step alone: consume the input and collect the output items.
+
+        Args:
+            *args: The input: an iterable, an asynchronous iterator or a :class:`StepResult`
+                whose result is one of those (e.g. the result of a previous step). No argument
+                is an empty input.
+
+        Returns:
+            StepResult: The list of the output items.
+        """
+        source = args[0] if args else ()
+        if isinstance(source, StepResult):
+            source = source.result
+        return StepResult(self.step_id, result=[item async for item in self.process(iterate(source))])
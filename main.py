@@ -1,3 +1,6 @@
+from lib.commons.StructuredLogging import configure
+
 if __name__ == '__main__':
+    configure()
     raise NotImplementedError
 
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# Report the recall@k and query latency of vector search after reducing the embeddings
+# with PCA or Matryoshka truncation, against exact search on the full-size embeddings.
+# Without an embeddings file, synthetic vectors are used whose variance decays along the
+# dimensions, as with Matryoshka-trained models; pass a .npy matrix of real embeddings
+# (rows = chunks) for meaningful numbers. The first `queries` rows are used as queries.
+# Usage: python scripts/benchmarks/dimensionality_reduction.py [rows] [dimensions] [queries] [embeddings.npy]
+# Example: python scripts/benchmarks/dimensionality_reduction.py 50000 768 200
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from lib.commons.MathUtils import MathUtils  # noqa: E402
+from lib.core.service.EmbeddingProjection import MatryoshkaProjection, PCAProjection  # noqa: E402
+
+TOP_K = 10
+
+
+def synthetic_embeddings(rows, dimensions, seed=0):
+    """Return clustered vectors whose per-dimension scale decays, like Matryoshka embeddings."""
+    rng = np.random.default_rng(seed)
+    scale = 1.0 / np.sqrt(1.0 + np.arange(dimensions) / 16.0)
+    centers = rng.standard_normal((max(1, rows // 50), dimensions))
+    points = centers[rng.integers(len(centers), size=rows)] + 0.5 * rng.standard_normal((rows, dimensions))
+    return (points * scale).astype(np.float32)
+
+
+def search(queries, corpus):
+    """Return the top-k row indices of every query and the mean latency per query in ms."""
+    corpus = MathUtils.normalize_rows(corpus)
+    queries = MathUtils.normalize_rows(queries)
+    start = time.perf_counter()
+    indices = [MathUtils.top_k(query, corpus, TOP_K, normalized=True)[0][0] for query in queries]
+    return indices, 1000 * (time.perf_counter() - start) / len(queries)
+
+
+def recall(found, exact):
+    """Return the mean fraction of the exact top-k found."""
+    return float(np.mean([len(set(f.tolist()) & set(e.tolist())) / len(e) for f, e in zip(found, exact)]))
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    dimensions = int(sys.argv[2]) if len(sys.argv) > 2 else 768
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    if len(sys.argv) > 4:
+        embeddings = np.load(sys.argv[4]).astype(np.float32)
+        rows, dimensions = embeddings.shape
+    else:
+        embeddings = synthetic_embeddings(rows, dimensions)
+    queries, corpus = embeddings[:count], embeddings[count:]
+
+    exact, baseline = search(queries, corpus)
+    print(f"rows: {len(corpus)}, dimensions: {dimensions}, queries: {count}, k: {TOP_K}")
+    print(f"{'projection':<12} {'dims':>5} {'recall@k':>9} {'ms/query':>9} {'speedup':>8} {'fit s':>6}")
+    print(f"{'none':<12} {dimensions:>5} {1.0:>9.3f} {baseline:>9.2f} {1.0:>8.2f} {0.0:>6.2f}")
+    sizes = [size for size in (dimensions // 2, dimensions // 4, dimensions // 8, dimensions // 16) if size >= 8]
+    for size in sizes:
+        for name, projection in (("matryoshka", MatryoshkaProjection(size)), ("pca", PCAProjection(size))):
+            start = time.perf_counter()
+            projection.fit(corpus)
+            fit = time.perf_counter() - start
+            found, latency = search(projection.transform(queries), projection.transform(corpus))
+            print(f"{name:<12} {size:>5} {recall(found, exact):>9.3f} {latency:>9.2f} "
+                  f"{baseline / latency:>8.2f} {fit:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# Compare the query latency of vector (brute-force cosine), lexical (BM25) and hybrid
+# (BM25-prefiltered, rank-fused) retrieval on a synthetic KnowledgeStore.
+# Embeddings are random vectors, so no provider or network access is needed.
+# Usage: python scripts/benchmarks/hybrid_retrieval.py [chunks] [dimensions] [queries]
+# Example: python scripts/benchmarks/hybrid_retrieval.py 20000 384 50
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import lib.core.service.KnowledgeService as knowledge_service_module  # noqa: E402
+from lib.core.service.KnowledgeService import KnowledgeService  # noqa: E402
+from lib.core.service.KnowledgeStore import KnowledgeStore  # noqa: E402
+
+WORDS = ["order", "invoice", "payment", "refund", "shipping", "error", "login", "account", "password",
+         "delivery", "warehouse", "customer", "ticket", "update", "failure", "timeout", "export", "report"]
+
+
+class RandomEmbedder:
+    """Provider stand-in returning seeded random embeddings."""
+
+    def __init__(self, dimensions, seed=0):
+        self.dimensions = dimensions
+        self.random = random.Random(seed)
+
+    def embed(self, text):
+        return [self.random.random() - 0.5 for _ in range(self.dimensions)]
+
+    def embed_batch(self, texts):
+        return [self.embed(text) for text in texts]
+
+
+def main():
+    chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    dimensions = int(sys.argv[2]) if len(sys.argv) > 2 else 384
+    queries = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+    rng = random.Random(42)
+    knowledge_service_module.current_provider = RandomEmbedder(dimensions)
+    service = KnowledgeService()
+    texts = (" ".join(rng.choice(WORDS) for _ in range(30)) + f" SKU-{i:06d}" for i in range(chunks))
+
+    start = time.perf_counter()
+    store = service.build_knowledge(texts, store=KnowledgeStore(), batch_size=256)
+    print(f"chunks: {chunks}, dimensions: {dimensions}, build: {time.perf_counter() - start:.2f}s")
+
+    workload = [f"{rng.choice(WORDS)} SKU-{rng.randrange(chunks):06d}" for _ in range(queries)]
+    print(f"{'mode':<8} {'ms/query':>9}")
+    for mode in ("vector", "lexical", "hybrid"):
+        start = time.perf_counter()
+        for query in workload:
+            service.get_most_relevant_chunks(query, store, top_n=5, mode=mode)
+        print(f"{mode:<8} {1000 * (time.perf_counter() - start) / queries:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# Load generator for LLMExecutor.ask / LLMExecutor.chat: keeps `concurrency` requests in
+# flight (closed loop) and reports throughput, time to first token (TTFT) and latency
+# percentiles. By default the simulated FakeProvider (LLM_PROVIDER=fake) answers, so the
+# numbers measure the LLM stack itself; use --provider to drive a real backend instead.
+# Usage: python scripts/benchmarks/llm_load.py [--mode ask|chat] [--concurrency C] [--requests N]
+#            [--stream] [--distribution lognormal] [--latency 0.2] [--jitter 0.5] [--tps 50]
+#            [--tokens 64] [--error-rate 0.0] [--tool-rate 1.0] [--provider fake] [--output load.json]
+# Example: python scripts/benchmarks/llm_load.py --mode chat --concurrency 32 --requests 500 --stream
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+def lookup_order(order_id="A-1"):
+    """Tool used by the chat mode."""
+    return f"order {order_id}: shipped"
+
+
+def one_request(executor, mode, stream, prompt):
+    """Run one request and return its (ttft, latency, completion tokens), in seconds."""
+    start = time.perf_counter()
+    if mode == "ask":
+        response = executor.ask(prompt, chatbot_mode=stream)
+    else:
+        response = executor.chat(prompt, chatbot_mode=stream, tools={"lookup_order": lookup_order})
+    if not stream:
+        latency = time.perf_counter() - start
+        return latency, latency, (response.usage or {}).get("completion_tokens") or 0
+    ttft, tokens = None, 0
+    for chunk in response:
+        if chunk.content and ttft is None:
+            ttft = time.perf_counter() - start
+        if chunk.done and chunk.usage:
+            tokens = chunk.usage.get("completion_tokens") or 0
+    return ttft, time.perf_counter() - start, tokens
+
+
+def percentiles(values):
+    """Return the mean and p50/p90/p95/p99 of a list of seconds, in milliseconds."""
+    if not values:
+        return None
+    values = 1000 * np.asarray(values)
+    return {"mean": round(float(values.mean()), 3),
+            **{f"p{p}": round(float(np.percentile(values, p)), 3) for p in (50, 90, 95, 99)}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test LLMExecutor.ask/chat.")
+    parser.add_argument("--mode", choices=("ask", "chat"), default="ask")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--provider", default="fake", help="LLM_PROVIDER to load (default: the FakeProvider)")
+    parser.add_argument("--distribution", default="lognormal")
+    parser.add_argument("--latency", type=float, default=0.2, help="mean/median time to first token, seconds")
+    parser.add_argument("--jitter", type=float, default=0.5)
+    parser.add_argument("--tps", type=float, default=50.0, help="simulated tokens per second")
+    parser.add_argument("--tokens", type=int, default=64, help="simulated output tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tool-rate", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    os.environ["LLM_PROVIDER"] = args.provider
+    from lib.adapters.outbound.LLMExecutor import LLMExecutor  # noqa: E402 (reads LLM_PROVIDER at import)
+    from lib.core.providers.FakeProvider import FakeProvider  # noqa: E402
+    from lib.commons.StructuredLogging import configure  # noqa: E402
+
+    configure()
+
+    if args.provider == "fake":
+        FakeProvider.get_instance().configure(
+            distribution=args.distribution, latency=args.latency, jitter=args.jitter,
+            tokens_per_second=args.tps, output_tokens=args.tokens, error_rate=args.error_rate,
+            tool_call_rate=args.tool_rate, seed=args.seed)
+    executor = LLMExecutor.get_instance()
+
+    ttfts, latencies, errors = [], [], {}
+    tokens = 0
+    lock = threading.Lock()
+
+    def worker(index):
+        nonlocal tokens
+        try:
+            ttft, latency, completion = one_request(executor, args.mode, args.stream, f"request {index}: status?")
+        except Exception as error:
+            with lock:
+                errors[type(error).__name__] = errors.get(type(error).__name__, 0) + 1
+            return
+        with lock:
+            ttfts.append(ttft)
+            latencies.append(latency)
+            tokens += completion
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(worker, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "duration_seconds": round(elapsed, 3),
+        "requests": args.requests,
+        "succeeded": len(latencies),
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / elapsed, 2),
+        "tokens_per_second": round(tokens / elapsed, 1),
+        "ttft_ms": percentiles([ttft for ttft in ttfts if ttft is not None]),
+        "latency_ms": percentiles(latencies),
+    }
+    print(f"mode: {args.mode}, stream: {args.stream}, concurrency: {args.concurrency}, provider: {args.provider}")
+    print(f"requests: {report['succeeded']}/{args.requests} ok, errors: {sum(errors.values())}, "
+          f"{report['requests_per_second']} req/s, {report['tokens_per_second']} tokens/s")
+    for name in ("ttft_ms", "latency_ms"):
+        if report[name]:
+            print(f"{name:<11} " + "  ".join(f"{key} {value:.1f}" for key, value in report[name].items()))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# Compare the pure-Python MathUtils.cosine_similarity loop with the NumPy kernels on the
+# same vectors: one-to-many cosine on Python lists, on a pre-normalized float32 matrix (the
+# fast path used by KnowledgeStore) and blocked top-k for a batch of queries.
+# Usage: python scripts/benchmarks/math_kernels.py [rows] [dimensions] [queries]
+# Example: python scripts/benchmarks/math_kernels.py 20000 384 32
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from lib.commons.MathUtils import MathUtils  # noqa: E402
+
+
+def per_query(function, queries):
+    """Return the mean duration of ``function(query)`` over the queries, in milliseconds."""
+    start = time.perf_counter()
+    for query in queries:
+        function(query)
+    return 1000 * (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    dimensions = int(sys.argv[2]) if len(sys.argv) > 2 else 384
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 32
+
+    rng = np.random.default_rng(0)
+    corpus = rng.standard_normal((rows, dimensions), dtype=np.float32)
+    queries = rng.standard_normal((count, dimensions), dtype=np.float32)
+    corpus_lists, query_lists = corpus.tolist(), queries.tolist()
+    normalized = MathUtils.normalize_rows(corpus)
+
+    def python_loop(query):
+        scores = [MathUtils.cosine_similarity(query, vector) for vector in corpus_lists]
+        return sorted(range(rows), key=scores.__getitem__, reverse=True)[:10]
+
+    def numpy_lists(query):
+        return MathUtils.top_k(query, corpus_lists, 10)
+
+    def numpy_normalized(query):
+        return MathUtils.top_k(query, normalized, 10, normalized=True)
+
+    # The pure-Python loop is slow: time it on a few queries only.
+    baseline = per_query(python_loop, query_lists[:max(1, count // 8)])
+    print(f"rows: {rows}, dimensions: {dimensions}, queries: {count}")
+    print(f"{'kernel':<28} {'ms/query':>9} {'speedup':>8}")
+    print(f"{'python cosine loop':<28} {baseline:>9.2f} {1.0:>8.2f}")
+    for name, function, workload in (("numpy, list input", numpy_lists, query_lists[:max(1, count // 8)]),
+                                     ("numpy, normalized float32", numpy_normalized, queries)):
+        duration = per_query(function, workload)
+        print(f"{name:<28} {duration:>9.2f} {baseline / duration:>8.2f}")
+
+    start = time.perf_counter()
+    MathUtils.top_k(queries, normalized, 10, normalized=True)
+    duration = 1000 * (time.perf_counter() - start) / count
+    print(f"{'numpy, batched top-k':<28} {duration:>9.2f} {baseline / duration:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# Compare the per-instance memory footprint of the compact (slotted) LLMResponse and
+# StepResult models against their previous __dict__-based layout, and time the
+# JSON-lines and binary encoders of RecordCodec.
+# Usage: python scripts/benchmarks/model_memory.py [instances]
+# Example: python scripts/benchmarks/model_memory.py 200000
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from lib.commons.RecordCodec import RecordCodec  # noqa: E402
+from lib.core.providers.model.LLMResponse import LLMResponse  # noqa: E402
+from lib.use_case.steps.StepResult import StepResult  # noqa: E402
+
+
+class LegacyLLMResponse:
+    """LLMResponse layout before slots (one __dict__ per instance)."""
+
+    def __init__(self, content, role="assistant", finish_reason=None, usage=None, thinking=None, done=True):
+        self.content = content
+        self.role = role
+        self.finish_reason = finish_reason
+        self.usage = usage
+        self.thinking = thinking
+        self.done = done
+
+
+class LegacyStepResult:
+    """StepResult layout before slots (one __dict__ per instance)."""
+
+    def __init__(self, step_id, result=None, message=None):
+        self.step_id = step_id
+        self.result = result
+        self.message = message
+        self.errors = []
+
+
+def measure(factory, count):
+    """Return the average number of bytes allocated per instance created by factory."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    instances = [factory(i) for i in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    # Exclude the list holding the instances, which is identical for both layouts.
+    allocated -= sys.getsizeof(instances)
+    return allocated / count, instances
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    step_id = uuid.uuid4()
+    cases = [
+        ("LLMResponse", LLMResponse,
+         lambda i: LegacyLLMResponse("", done=False), lambda i: LLMResponse("", done=False)),
+        ("StepResult", StepResult,
+         lambda i: LegacyStepResult(step_id, result=i), lambda i: StepResult(step_id, result=i)),
+    ]
+
+    print(f"instances per case: {count}")
+    print(f"{'model':<12} {'legacy B/inst':>14} {'slotted B/inst':>15} {'saving':>8}")
+    for name, record_type, legacy_factory, compact_factory in cases:
+        legacy_size, _ = measure(legacy_factory, count)
+        compact_size, records = measure(compact_factory, count)
+        saving = 100.0 * (legacy_size - compact_size) / legacy_size
+        print(f"{name:<12} {legacy_size:>14.1f} {compact_size:>15.1f} {saving:>7.1f}%")
+
+        start = time.perf_counter()
+        jsonl = "".join(RecordCodec.encode_jsonl(records))
+        jsonl_encode = time.perf_counter() - start
+        start = time.perf_counter()
+        binary = RecordCodec.encode_binary(records)
+        binary_encode = time.perf_counter() - start
+        start = time.perf_counter()
+        RecordCodec.decode_binary(binary, record_type)
+        binary_decode = time.perf_counter() - start
+        print(f"{'':<12} jsonl: {len(jsonl.encode()) / count:.1f} B/rec, encode {jsonl_encode:.3f}s | "
+              f"binary: {len(binary) / count:.1f} B/rec, encode {binary_encode:.3f}s, decode {binary_decode:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
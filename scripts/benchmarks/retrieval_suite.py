@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# Retrieval benchmark suite: build time, memory, query latency percentiles and recall@k
+# (against exact cosine search) of every KnowledgeService backend on a synthetic corpus.
+# Embeddings come from a deterministic hashing embedder (no provider or network access):
+# every token maps to a fixed random vector and a text embeds as the sum of its tokens, so
+# chunks sharing words with a query are similar to it and runs are reproducible.
+# Results are printed as a table and written as JSON; with --baseline, the run is compared
+# with a previous JSON file and the script exits with status 1 on a regression.
+# Usage: python scripts/benchmarks/retrieval_suite.py [--chunks N] [--dimensions D] [--queries Q]
+#            [--top-k K] [--backends list,store,...] [--pca-dimensions P] [--output results.json]
+#            [--baseline previous.json] [--tolerance 0.25]
+# Example: python scripts/benchmarks/retrieval_suite.py --chunks 20000 --output retrieval.json
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import lib.core.service.KnowledgeService as knowledge_service_module  # noqa: E402
+from lib.commons.MathUtils import MathUtils  # noqa: E402
+from lib.core.service.EmbeddingProjection import PCAProjection  # noqa: E402
+from lib.core.service.KnowledgeService import KnowledgeService  # noqa: E402
+from lib.core.service.KnowledgeStore import KnowledgeStore  # noqa: E402
+from lib.core.service.ShardedKnowledgeStore import ShardedKnowledgeStore  # noqa: E402
+
+BACKENDS = ("list", "store", "lexical", "hybrid", "batch", "pca", "sharded")
+
+
+class HashingEmbedder:
+    """Deterministic provider stand-in: a text embeds as the sum of fixed per-token vectors."""
+
+    def __init__(self, dimensions, seed=0):
+        self.dimensions = dimensions
+        self.seed = seed
+        self.vectors = {}
+
+    def token_vector(self, token):
+        vector = self.vectors.get(token)
+        if vector is None:
+            digest = hashlib.blake2b(f"{self.seed}:{token}".encode("utf-8"), digest_size=8).digest()
+            vector = np.random.default_rng(int.from_bytes(digest, "little")).standard_normal(self.dimensions)
+            vector = self.vectors[token] = vector.astype(np.float32)
+        return vector
+
+    def embed(self, text):
+        return sum(self.token_vector(token) for token in text.lower().split()).tolist()
+
+    def embed_batch(self, texts):
+        return [self.embed(text) for text in texts]
+
+
+def synthetic_corpus(chunks, queries, seed=0, vocabulary=5000, topics=200, length=40):
+    """Return topical chunks (Zipf background words plus topic words) and queries drawn from them."""
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(vocabulary)]
+    weights = [1.0 / (rank + 1) for rank in range(vocabulary)]
+    topic_words = [rng.sample(words, 30) for _ in range(topics)]
+    corpus = []
+    for i in range(chunks):
+        topic = topic_words[rng.randrange(topics)]
+        tokens = rng.choices(topic, k=length * 3 // 5) + rng.choices(words, weights, k=length * 2 // 5)
+        corpus.append(" ".join(tokens) + f" id{i}")
+    workload = []
+    for _ in range(queries):
+        tokens = corpus[rng.randrange(chunks)].split()[:-1]
+        workload.append(" ".join(rng.sample(tokens, 5)))
+    return corpus, workload
+
+
+def traced(build):
+    """Run ``build`` and return its result and the memory it still holds, in bytes."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        return result, tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def timed(build):
+    """Run ``build`` and return its result and duration in seconds."""
+    start = time.perf_counter()
+    result = build()
+    return result, time.perf_counter() - start
+
+
+def measure(name, search, queries, exact, rows, top_k, build_seconds, memory_bytes, batched=False):
+    """Time the queries and compute the recall@k of the results.
+
+    ``search`` answers one query, or all of them at once when ``batched`` (the latency is then
+    the mean per query).
+    """
+    if batched:
+        start = time.perf_counter()
+        results = search(queries)
+        latencies = [(time.perf_counter() - start) / len(queries)] * len(queries)
+    else:
+        search(queries[0])  # warm up: lazily built matrices, worker processes
+        results, latencies = [], []
+        for query in queries:
+            start = time.perf_counter()
+            results.append(search(query))
+            latencies.append(time.perf_counter() - start)
+    found = []
+    for result, expected in zip(results, exact):
+        found.append(len({rows[chunk] for chunk, _ in result} & expected) / len(expected))
+    latencies_ms = 1000 * np.asarray(latencies)
+    return {
+        "backend": name,
+        "build_seconds": round(build_seconds, 4),
+        "memory_bytes": int(memory_bytes),
+        "latency_ms": {"mean": round(float(latencies_ms.mean()), 4),
+                       **{f"p{p}": round(float(np.percentile(latencies_ms, p)), 4) for p in (50, 95, 99)}},
+        "queries_per_second": round(1000 / float(latencies_ms.mean()), 2),
+        f"recall_at_{top_k}": round(float(np.mean(found)), 4),
+    }
+
+
+def run(args):
+    """Run the selected backends and return the JSON-serializable report."""
+    embedder = HashingEmbedder(args.dimensions, seed=args.seed)
+    knowledge_service_module.current_provider = embedder
+    service = KnowledgeService()
+    corpus, queries = synthetic_corpus(args.chunks, args.queries, seed=args.seed)
+    rows = {chunk: row for row, chunk in enumerate(corpus)}
+
+    # Ground truth: exact cosine top-k over the full-size embeddings.
+    corpus_matrix = MathUtils.normalize_rows(embedder.embed_batch(corpus))
+    exact_indices, _ = MathUtils.top_k(embedder.embed_batch(queries), corpus_matrix, args.top_k)
+    exact = [set(indices) for indices in exact_indices.tolist()]
+    k = args.top_k
+
+    def per_query(knowledge, **options):
+        return lambda query: service.get_most_relevant_chunks(query, knowledge, top_n=k, **options)
+
+    results = []
+    backends = args.backends
+    store = store_seconds = store_memory = None
+    def build_store(projection=None):
+        built = service.build_knowledge(corpus, store=KnowledgeStore(projection=projection), batch_size=256)
+        built.matrix()  # include the unit-norm search matrix in the build time and memory
+        return built
+
+    if set(backends) & {"store", "lexical", "hybrid", "batch", "sharded"}:
+        store, store_seconds = timed(build_store)
+        _, store_memory = traced(build_store)
+    for name in backends:
+        if name == "list":
+            knowledge, seconds = timed(lambda: service.build_knowledge(corpus))
+            _, memory = traced(lambda: service.build_knowledge(corpus))
+            results.append(measure(name, per_query(knowledge), queries, exact, rows, k, seconds, memory))
+        elif name in ("store", "lexical", "hybrid"):
+            mode = "vector" if name == "store" else name
+            results.append(measure(name, per_query(store, mode=mode), queries, exact, rows, k, store_seconds,
+                                   store_memory))
+        elif name == "batch":
+            search = lambda batch: service.get_most_relevant_chunks_batch(batch, store, top_n=k)  # noqa: E731
+            results.append(measure(name, search, queries, exact, rows, k, store_seconds, store_memory,
+                                   batched=True))
+        elif name == "pca":
+            dimensions = args.pca_dimensions or max(1, args.dimensions // 2)
+            reduced, seconds = timed(lambda: build_store(PCAProjection(dimensions)))
+            _, memory = traced(lambda: build_store(PCAProjection(dimensions)))
+            results.append(measure(f"pca-{dimensions}", per_query(reduced), queries, exact, rows, k, seconds,
+                                   memory))
+        elif name == "sharded":
+            sharded, seconds = timed(lambda: ShardedKnowledgeStore.build(store, workers=args.workers))
+            with sharded:
+                memory = sum(os.path.getsize(os.path.join(sharded.directory, file))
+                             for file in os.listdir(sharded.directory))
+                results.append(measure(name, per_query(sharded), queries, exact, rows, k,
+                                       store_seconds + seconds, memory))
+        else:
+            raise SystemExit(f"Unknown backend: {name} (expected one of {', '.join(BACKENDS)})")
+
+    return {
+        "config": {"chunks": args.chunks, "dimensions": args.dimensions, "queries": args.queries,
+                   "top_k": args.top_k, "seed": args.seed},
+        "environment": {"python": platform.python_version(), "numpy": np.__version__,
+                        "machine": platform.machine(), "cpus": os.cpu_count()},
+        "results": results,
+    }
+
+
+def regressions(report, baseline, tolerance):
+    """List the backends slower (p50) or less accurate than in the baseline report."""
+    recall_key = f"recall_at_{report['config']['top_k']}"
+    previous = {result["backend"]: result for result in baseline.get("results", [])}
+    problems = []
+    for result in report["results"]:
+        before = previous.get(result["backend"])
+        if before is None:
+            continue
+        if result["latency_ms"]["p50"] > before["latency_ms"]["p50"] * (1 + tolerance):
+            problems.append(f"{result['backend']}: p50 {before['latency_ms']['p50']:.3f} -> "
+                            f"{result['latency_ms']['p50']:.3f} ms")
+        if recall_key in before and result[recall_key] < before[recall_key] - 0.01:
+            problems.append(f"{result['backend']}: {recall_key} {before[recall_key]:.3f} -> {result[recall_key]:.3f}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every KnowledgeService retrieval backend.")
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="sharded backend worker processes")
+    parser.add_argument("--pca-dimensions", type=int, default=None, help="pca backend size (default: half)")
+    parser.add_argument("--backends", type=lambda value: value.split(","), default=list(BACKENDS))
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 latency increase")
+    args = parser.parse_args()
+
+    report = run(args)
+    recall_key = f"recall_at_{args.top_k}"
+    print(f"chunks: {args.chunks}, dimensions: {args.dimensions}, queries: {args.queries}, k: {args.top_k}")
+    print(f"{'backend':<10} {'build s':>8} {'memory MB':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'recall':>7}")
+    for result in report["results"]:
+        latency = result["latency_ms"]
+        print(f"{result['backend']:<10} {result['build_seconds']:>8.2f} {result['memory_bytes'] / 2 ** 20:>10.1f} "
+              f"{latency['p50']:>8.2f} {latency['p95']:>8.2f} {latency['p99']:>8.2f} {result[recall_key]:>7.3f}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            problems = regressions(report, json.load(file), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# Measure how ShardedKnowledgeStore query throughput scales with the number of shards and
+# worker processes, against a single in-process scan of the same vectors.
+# Usage: python scripts/benchmarks/sharded_search.py [rows] [dimensions] [queries] [max_workers]
+# Example: python scripts/benchmarks/sharded_search.py 1000000 384 64 32
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from lib.core.service.ShardedKnowledgeStore import ShardedKnowledgeStore  # noqa: E402
+
+
+def timed_queries(store, queries, top_k=10):
+    """Return the number of queries per second answered one query at a time."""
+    store.search(queries[0], top_k)  # warm up the workers and the page cache
+    start = time.perf_counter()
+    for query in queries:
+        store.search(query, top_k)
+    return len(queries) / (time.perf_counter() - start)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    dimensions = int(sys.argv[2]) if len(sys.argv) > 2 else 384
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 32
+    max_workers = int(sys.argv[4]) if len(sys.argv) > 4 else (os.cpu_count() or 1)
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((rows, dimensions), dtype=np.float32)
+    queries = rng.standard_normal((count, dimensions), dtype=np.float32)
+    knowledge = ((str(i), vector) for i, vector in enumerate(vectors))
+
+    workers = [1]
+    while workers[-1] * 2 <= max_workers:
+        workers.append(workers[-1] * 2)
+    if workers[-1] != max_workers:
+        workers.append(max_workers)
+
+    print(f"rows: {rows}, dimensions: {dimensions}, queries: {count}, cpus: {os.cpu_count()}")
+    with ShardedKnowledgeStore.build(knowledge, shards=max_workers, workers=0) as store:
+        baseline = timed_queries(store, queries)
+        print(f"{'workers':>7} {'shards':>6} {'queries/s':>10} {'speedup':>8}")
+        print(f"{'inline':>7} {store.shards:>6} {baseline:>10.1f} {1.0:>8.2f}")
+        for count_workers in workers:
+            with ShardedKnowledgeStore(store.directory, workers=count_workers) as parallel:
+                throughput = timed_queries(parallel, queries)
+            print(f"{count_workers:>7} {store.shards:>6} {throughput:>10.1f} {throughput / baseline:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# Summarize the profiles written by lib.commons.Profiler (PROFILE_SAMPLE_RATE > 0): the
+# cProfile files (.prof) of every profile name are merged and their hottest functions listed;
+# the wall-clock files (.collapsed) are merged and reported as self and total time per frame.
+# Usage: python scripts/profiling/profile_summary.py [paths...] [--limit N] [--sort cumulative|tottime|calls]
+# Example: python scripts/profiling/profile_summary.py profiles/ --limit 15 --sort tottime
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from lib.commons.Profiler import summarize  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize aggregated profiles.")
+    parser.add_argument("paths", nargs="*", default=["profiles"], help="profile files or directories")
+    parser.add_argument("--limit", type=int, default=20, help="functions listed per profile")
+    parser.add_argument("--sort", default="cumulative", help="pstats sort key of the cProfile profiles")
+    args = parser.parse_args()
+
+    report = summarize(args.paths, limit=args.limit, sort=args.sort)
+    if not report:
+        sys.exit(f"No profiles found in {', '.join(args.paths)}")
+    print(report, end="")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import pytest
 from unittest.mock import patch, MagicMock
+from lib.commons.Deadline import Deadline, DeadlineExceeded
 from lib.adapters.outbound.LLMExecutor import LLMExecutor
 
 
@@ -51,3 +52,29 @@ class TestLLMExecutor:
         assert kwargs['config'].get_think() == False
         assert kwargs['config'].get_stream() == False
         assert result == "response"
+
+    @patch('lib.adapters.outbound.LLMExecutor.current_provider')
+    @patch('lib.adapters.outbound.LLMExecutor.llm', 'test_model')
+    def test_deadline(self, mock_provider):
+        """Test no call is sent after the deadline, and a stream is closed at its first chunk after it."""
+        closed = []
+
+        def chunks():
+            try:
+                for content in ("a", "b", "c"):
+                    yield MagicMock(content=content, done=False)
+            finally:
+                closed.append(True)
+
+        executor = LLMExecutor.get_instance()
+        with Deadline(timeout=0), pytest.raises(DeadlineExceeded):
+            executor.ask("prompt")
+        mock_provider.chat.assert_not_called()
+        mock_provider.chat.return_value = chunks()
+        with Deadline(timeout=5) as deadline:
+            stream = executor.ask("prompt", chatbot_mode=True)
+        assert next(stream).content == "a"
+        deadline.cancel()
+        with pytest.raises(DeadlineExceeded, match="cancelled"):
+            next(stream)
+        assert closed == [True]
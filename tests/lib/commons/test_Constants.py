@@ -19,3 +19,7 @@ class TestConstants:
         """Test that llm_provider_ollama constant is accessible."""
         instance = Constants.get_instance()
         assert instance.llm_provider_ollama == "ollama"
+
+    def test_llm_provider_fake_constant(self):
+        """Test that llm_provider_fake constant is accessible."""
+        assert Constants.get_instance().llm_provider_fake == "fake"
@@ -0,0 +1,64 @@
+import contextvars
+import threading
+import pytest
+from unittest.mock import patch
+from lib.commons.Deadline import Deadline, DeadlineExceeded, check_deadline, current_deadline, remaining_time
+
+
+class TestDeadline:
+    def test_no_deadline(self):
+        """Test the helpers do nothing without a current deadline."""
+        assert current_deadline() is None and remaining_time() is None
+        check_deadline()
+        assert Deadline().remaining() is None and not Deadline().expired
+
+    def test_expiry(self):
+        """Test the remaining time decreases to zero, after which check raises a TimeoutError."""
+        with patch("lib.commons.Deadline.time") as mock_time:
+            mock_time.monotonic.return_value = 100.0
+            deadline = Deadline(timeout=5)
+            assert deadline.expires_at == 105.0 and deadline.remaining() == 5.0
+            deadline.check()
+            mock_time.monotonic.return_value = 106.0
+            assert deadline.remaining() == 0.0 and deadline.expired and not deadline.cancelled
+            with pytest.raises(TimeoutError, match="Deadline exceeded"):
+                deadline.check()
+
+    def test_nested_deadlines(self):
+        """Test an entered deadline is current, and a nested one never expires after its parent."""
+        with Deadline(timeout=10) as outer:
+            assert current_deadline() is outer and 9 < remaining_time() <= 10
+            with Deadline(timeout=60) as inner:
+                assert current_deadline() is inner and inner.parent is outer
+                assert inner.expires_at == outer.expires_at
+            with Deadline() as unbounded:
+                assert unbounded.expires_at == outer.expires_at
+            assert Deadline(timeout=1).expires_at < outer.expires_at
+            assert current_deadline() is outer
+        assert current_deadline() is None
+
+    def test_cancel(self):
+        """Test cancelling a deadline cancels its children, not its parent."""
+        parent = Deadline()
+        child = Deadline(timeout=60, parent=parent)
+        child.cancel()
+        assert child.expired and not parent.cancelled
+        sibling = Deadline(parent=parent)
+        parent.cancel()
+        assert sibling.cancelled
+        with sibling, pytest.raises(DeadlineExceeded, match="cancelled"):
+            check_deadline()
+
+    def test_deadline_flows_into_copied_contexts(self):
+        """Test a thread running in a copy of the context sees the deadline, and its cancellation."""
+        seen = []
+
+        def record():
+            seen.append(current_deadline())
+
+        with Deadline(timeout=10) as deadline:
+            thread = threading.Thread(target=contextvars.copy_context().run, args=(record,))
+        deadline.cancel()
+        thread.start()
+        thread.join()
+        assert seen == [deadline] and seen[0].expired
@@ -90,3 +90,73 @@ class TestEnvironmentVariables:
         result = env.get_llm_provider("default")
         mock_getenv.assert_called_with("LLM_PROVIDER", "default")
         assert result == "test_provider"
+
+    @patch('lib.commons.EnvironmentVariables.load_dotenv')
+    @patch('os.getenv')
+    def test_get_log_level(self, mock_getenv, mock_load_dotenv):
+        """Test get_log_level method."""
+        mock_getenv.return_value = "DEBUG"
+        env = EnvironmentVariables()
+        result = env.get_log_level("INFO")
+        mock_getenv.assert_called_with("LOG_LEVEL", "INFO")
+        assert result == "DEBUG"
+
+    @patch('lib.commons.EnvironmentVariables.load_dotenv')
+    @patch('os.getenv')
+    def test_get_log_format(self, mock_getenv, mock_load_dotenv):
+        """Test get_log_format method."""
+        mock_getenv.return_value = "json"
+        env = EnvironmentVariables()
+        result = env.get_log_format("text")
+        mock_getenv.assert_called_with("LOG_FORMAT", "text")
+        assert result == "json"
+
+    @patch('lib.commons.EnvironmentVariables.load_dotenv')
+    @patch('os.getenv')
+    def test_get_profile_sample_rate(self, mock_getenv, mock_load_dotenv):
+        """Test get_profile_sample_rate method."""
+        mock_getenv.return_value = "0.01"
+        env = EnvironmentVariables()
+        result = env.get_profile_sample_rate("0")
+        mock_getenv.assert_called_with("PROFILE_SAMPLE_RATE", "0")
+        assert result == "0.01"
+
+    @patch('lib.commons.EnvironmentVariables.load_dotenv')
+    @patch('os.getenv')
+    def test_get_profile_mode(self, mock_getenv, mock_load_dotenv):
+        """Test get_profile_mode method."""
+        mock_getenv.return_value = "wall"
+        env = EnvironmentVariables()
+        result = env.get_profile_mode("cprofile")
+        mock_getenv.assert_called_with("PROFILE_MODE", "cprofile")
+        assert result == "wall"
+
+    @patch('lib.commons.EnvironmentVariables.load_dotenv')
+    @patch('os.getenv')
+    def test_get_profile_directory(self, mock_getenv, mock_load_dotenv):
+        """Test get_profile_directory method."""
+        mock_getenv.return_value = "/tmp/profiles"
+        env = EnvironmentVariables()
+        result = env.get_profile_directory("profiles")
+        mock_getenv.assert_called_with("PROFILE_DIRECTORY", "profiles")
+        assert result == "/tmp/profiles"
+
+    @patch('lib.commons.EnvironmentVariables.load_dotenv')
+    @patch('os.getenv')
+    def test_get_usage_ledger_path(self, mock_getenv, mock_load_dotenv):
+        """Test get_usage_ledger_path method."""
+        mock_getenv.return_value = "usage.db"
+        env = EnvironmentVariables()
+        result = env.get_usage_ledger_path()
+        mock_getenv.assert_called_with("USAGE_LEDGER_PATH", None)
+        assert result == "usage.db"
+
+    @patch('lib.commons.EnvironmentVariables.load_dotenv')
+    @patch('os.getenv')
+    def test_get_usage_flush_interval(self, mock_getenv, mock_load_dotenv):
+        """Test get_usage_flush_interval method."""
+        mock_getenv.return_value = "10"
+        env = EnvironmentVariables()
+        result = env.get_usage_flush_interval("60")
+        mock_getenv.assert_called_with("USAGE_FLUSH_INTERVAL", "60")
+        assert result == "10"
@@ -66,3 +66,101 @@ class TestMathUtils:
         b = [4.0, 5.0, 6.0]
         result = MathUtils.cosine_similarity(a, b)
         assert result == pytest.approx(0.9746318461970762)
+
+    def test_normalize_rows(self):
+        """Test rows are scaled to unit norm and zero rows stay zero."""
+        result = MathUtils.normalize_rows([[3.0, 4.0], [0.0, 0.0]])
+        assert result.dtype.name == "float32"
+        assert result.tolist() == [[pytest.approx(0.6), pytest.approx(0.8)], [0.0, 0.0]]
+
+    def test_cosine_similarity_matrix(self):
+        """Test the similarity matrix matches the pairwise cosine similarity."""
+        a = [[1.0, 2.0, 3.0], [0.0, 1.0, 0.0]]
+        b = [[4.0, 5.0, 6.0], [1.0, 0.0, 0.0], [0.0, 2.0, 0.0]]
+        result = MathUtils.cosine_similarity_matrix(a, b)
+        assert result.shape == (2, 3)
+        for i, row in enumerate(a):
+            for j, column in enumerate(b):
+                assert result[i, j] == pytest.approx(MathUtils.cosine_similarity(row, column), abs=1e-6)
+        assert MathUtils.cosine_similarity_matrix([1.0, 0.0, 0.0], b).shape == (3,)
+
+    def test_top_k_blocked(self):
+        """Test blocked top-k matches a full sort across blocks."""
+        import numpy as np
+        scores = np.array([[0.1, 0.9, 0.3, 0.8, 0.5], [0.7, 0.2, 0.6, 0.0, 1.0]], dtype=np.float32)
+        blocks = [scores[:, :2], scores[:, 2:4], scores[:, 4:]]
+        indices, best = MathUtils.top_k_blocked(blocks, 3)
+        assert indices.tolist() == [[1, 3, 4], [4, 0, 2]]
+        assert best.tolist() == [[pytest.approx(0.9), pytest.approx(0.8), pytest.approx(0.5)],
+                                 [pytest.approx(1.0), pytest.approx(0.7), pytest.approx(0.6)]]
+        indices, _ = MathUtils.top_k_blocked([scores], 10)
+        assert indices.shape == (2, 5)
+
+    def test_top_k_blocked_edge_cases(self):
+        """Test empty input and invalid k."""
+        indices, scores = MathUtils.top_k_blocked([], 3)
+        assert indices.size == 0 and scores.size == 0
+        with pytest.raises(ValueError):
+            MathUtils.top_k_blocked([[[1.0]]], 0)
+
+    def test_as_matrix(self):
+        """Test C-contiguous float32 arrays are passed through and other inputs converted."""
+        import numpy as np
+        matrix = np.ones((2, 3), dtype=np.float32)
+        assert MathUtils.as_matrix(matrix) is matrix
+        assert MathUtils.as_matrix([[1, 2]]).dtype.name == "float32"
+        transposed = MathUtils.as_matrix(matrix.T)
+        assert transposed.flags.c_contiguous and transposed.tolist() == matrix.T.tolist()
+
+    def test_dot_product(self):
+        """Test scalar and pairwise dot products."""
+        assert MathUtils.dot_product([1.0, 2.0], [3.0, 4.0]) == pytest.approx(11.0)
+        result = MathUtils.dot_product_matrix([[1.0, 2.0], [0.0, 1.0]], [[3.0, 4.0], [1.0, 0.0], [2.0, 2.0]])
+        assert result.tolist() == [[11.0, 1.0, 6.0], [4.0, 0.0, 2.0]]
+
+    def test_cosine_similarity_many(self):
+        """Test one-to-many similarity matches the pairwise cosine similarity."""
+        matrix = [[4.0, 5.0, 6.0], [1.0, 0.0, 0.0], [0.0, 0.0, 0.0]]
+        result = MathUtils.cosine_similarity_many([1.0, 2.0, 3.0], matrix)
+        assert result[0] == pytest.approx(0.9746318461970762, abs=1e-6)
+        assert result[1] == pytest.approx(MathUtils.cosine_similarity([1.0, 2.0, 3.0], [1.0, 0.0, 0.0]), abs=1e-6)
+        assert result[2] == 0.0
+        normalized = MathUtils.normalize_rows(matrix)
+        assert MathUtils.cosine_similarity_many([1.0, 2.0, 3.0], normalized, normalized=True) \
+            == pytest.approx(result, abs=1e-6)
+
+    def test_cosine_similarity_matrix_normalized(self):
+        """Test the fast path on unit-norm rows skips normalization."""
+        a = MathUtils.normalize_rows([[1.0, 1.0]])
+        b = MathUtils.normalize_rows([[1.0, 0.0], [0.0, 3.0]])
+        assert MathUtils.cosine_similarity_matrix(a, b, normalized=True) \
+            == pytest.approx(MathUtils.cosine_similarity_matrix([[1.0, 1.0]], [[1.0, 0.0], [0.0, 3.0]]))
+
+    def test_euclidean_distance(self):
+        """Test scalar, one-to-many and pairwise distances."""
+        assert MathUtils.euclidean_distance([0.0, 0.0], [3.0, 4.0]) == pytest.approx(5.0)
+        result = MathUtils.euclidean_distance_matrix([[0.0, 0.0], [1.0, 1.0]], [[3.0, 4.0], [1.0, 1.0]])
+        assert result.tolist() == [[pytest.approx(5.0), pytest.approx(math.sqrt(2))],
+                                   [pytest.approx(math.sqrt(13)), 0.0]]
+        assert MathUtils.euclidean_distance_matrix([0.0, 0.0], [[3.0, 4.0], [0.0, 1.0]]).tolist() == [5.0, 1.0]
+
+    def test_top_k(self):
+        """Test top-k for every metric matches a brute-force ranking."""
+        import numpy as np
+        rng = np.random.default_rng(0)
+        queries = rng.standard_normal((4, 8)).astype(np.float32)
+        corpus = rng.standard_normal((50, 8)).astype(np.float32)
+        expected = {
+            "cosine": np.argsort(-MathUtils.cosine_similarity_matrix(queries, corpus), axis=1)[:, :5],
+            "dot": np.argsort(-MathUtils.dot_product_matrix(queries, corpus), axis=1)[:, :5],
+            "euclidean": np.argsort(MathUtils.euclidean_distance_matrix(queries, corpus), axis=1)[:, :5],
+        }
+        for metric, ranking in expected.items():
+            indices, scores = MathUtils.top_k(queries, corpus, 5, metric=metric, block_size=7)
+            assert indices.tolist() == ranking.tolist()
+            assert scores.shape == (4, 5)
+        indices, _ = MathUtils.top_k(MathUtils.normalize_rows(queries[0]), MathUtils.normalize_rows(corpus), 5,
+                                     normalized=True)
+        assert indices.tolist() == [expected["cosine"][0].tolist()]
+        with pytest.raises(ValueError):
+            MathUtils.top_k(queries, corpus, 5, metric="manhattan")
@@ -0,0 +1,245 @@
+import threading
+import urllib.request
+import pytest
+from unittest.mock import patch
+from lib.adapters.outbound.LLMExecutor import LLMExecutor
+from lib.commons.Metrics import Counter, Histogram, Metrics, _Metric
+from lib.core.providers.FakeProvider import FakeProvider, FakeProviderError
+from lib.core.providers.LLMProvider import Provider
+from lib.core.service.KnowledgeService import KnowledgeService
+from lib.core.service.KnowledgeStore import KnowledgeStore
+from lib.core.service.TokenCounter import TokenCounter
+
+
+@pytest.fixture
+def metrics():
+    """The registry, with every observation dropped before and after the test."""
+    registry = Metrics.get_instance()
+    registry.clear()
+    yield registry
+    registry.clear()
+
+
+@pytest.fixture
+def provider():
+    """The FakeProvider without waits, restored to its defaults afterwards."""
+    instance = FakeProvider.get_instance()
+    instance.configure(sleep=lambda seconds: None, **FakeProvider.DEFAULTS)
+    yield instance
+    instance.configure(**FakeProvider.DEFAULTS)
+
+
+class AbstractMetric(_Metric):
+    """Metric calling the abstract body of _fold."""
+
+    def _fold(self, total, shard):
+        return super()._fold(total, shard)
+
+
+class TestMetrics:
+    def test_singleton_instance(self):
+        """Test that Metrics is a singleton."""
+        assert Metrics.get_instance() is Metrics.get_instance()
+        with pytest.raises(Exception, match="This class is a singleton!"):
+            Metrics()
+
+    def test_registration(self, metrics):
+        """Test metrics are created once and conflicting registrations are rejected."""
+        counter = metrics.counter("test_registration_total", "Help.", ("a",))
+        assert metrics.counter("test_registration_total", "Help.", ("a",)) is counter
+        assert metrics.get("test_registration_total") is counter and metrics.get("missing") is None
+        with pytest.raises(ValueError):
+            metrics.counter("test_registration_total", "Help.", ("b",))
+        with pytest.raises(ValueError):
+            metrics.histogram("test_registration_total", "Help.", ("a",))
+
+    def test_counter(self):
+        """Test counters add per label set, validate labels and never decrease, and the base is abstract."""
+        counter = Counter("c_total", "Help.", ("kind",))
+        counter.inc("a")
+        counter.inc("a", amount=2.5)
+        counter.inc("b")
+        assert counter.collect() == {("a",): 3.5, ("b",): 1.0}
+        assert counter.value("a") == 3.5 and counter.value("missing") == 0.0
+        with pytest.raises(ValueError):
+            counter.inc()
+        with pytest.raises(ValueError):
+            counter.inc("a", amount=-1)
+        counter.clear()
+        assert counter.collect() == {}
+        with pytest.raises(TypeError):
+            _Metric("base", "Help.")
+        assert AbstractMetric("base", "Help.")._fold({}, {("a",): 1.0}) is None
+
+    def test_histogram(self):
+        """Test histograms count observations per bucket, upper bounds included."""
+        histogram = Histogram("h", "Help.", buckets=(1.0, 0.1, float("inf")))
+        assert histogram.buckets == (0.1, 1.0)
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+        assert histogram.collect() == {(): ([2, 3, 4], pytest.approx(3.65))}
+        assert histogram.count() == 4 and histogram.sum() == pytest.approx(3.65)
+        assert Histogram("empty", "Help.", ("a",)).count("x") == 0
+
+    def test_threads_are_aggregated(self):
+        """Test observations of several threads, finished ones included, are merged."""
+        counter = Counter("threads_total", "Help.")
+        histogram = Histogram("threads", "Help.")
+
+        def work():
+            for _ in range(1000):
+                counter.inc()
+                histogram.observe(0.01)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        work()
+        assert counter.value() == 5000 and histogram.count() == 5000
+        assert histogram.sum() == pytest.approx(50.0)
+        assert len(counter._shards) == 1 and len(histogram._shards) == 1
+
+    def test_finished_threads_are_folded(self):
+        """Test the shards of finished threads are released, their observations kept, and cleared."""
+        counter = Counter("folded_total", "Help.", ("kind",))
+        for kind in ("a", "a", "b"):
+            thread = threading.Thread(target=counter.inc, args=(kind,))
+            thread.start()
+            thread.join()
+            counter.collect()
+        assert counter._shards == [] and counter.collect() == {("a",): 2.0, ("b",): 1.0}
+        counter.clear()
+        assert counter.collect() == {}
+
+    def test_shards_stay_bounded_without_collection(self):
+        """Test the shards of finished threads are folded when new threads update the metric."""
+        counter = Counter("short_lived_total", "Help.")
+        for _ in range(200):
+            thread = threading.Thread(target=counter.inc)
+            thread.start()
+            thread.join()
+        assert len(counter._shards) <= 1
+        assert counter.value() == 200.0
+
+    def test_exposition(self, metrics):
+        """Test the Prometheus text format: help, type, escaped labels, cumulative buckets."""
+        metrics.counter("test_exposition_total", "Counted things.", ("path",)).inc('a"b\\c\nd', amount=2)
+        metrics.histogram("test_exposition_seconds", "Durations.", buckets=(0.5,)).observe(0.25)
+        metrics.counter("test_exposition_unused_total", "Never increased.")
+        text = metrics.exposition()
+        assert ("# HELP test_exposition_total Counted things.\n"
+                "# TYPE test_exposition_total counter\n"
+                "test_exposition_total{path=\"a\\\"b\\\\c\\nd\"} 2\n") in text
+        assert ("# TYPE test_exposition_seconds histogram\n"
+                "test_exposition_seconds_bucket{le=\"0.5\"} 1\n"
+                "test_exposition_seconds_bucket{le=\"+Inf\"} 1\n"
+                "test_exposition_seconds_sum 0.25\n"
+                "test_exposition_seconds_count 1\n") in text
+        assert "# TYPE test_exposition_unused_total counter\n" in text
+        assert text.endswith("\n")
+
+    def test_empty_exposition(self):
+        """Test an empty registry renders as an empty string."""
+        with patch.object(Metrics.get_instance(), "_metrics", {}):
+            assert Metrics.get_instance().exposition() == ""
+
+    def test_write(self, metrics, tmp_path):
+        """Test the exposition is written atomically, and temporary files are removed on errors."""
+        metrics.counter("test_write_total", "Help.").inc()
+        path = tmp_path / "metrics.prom"
+        metrics.write(str(path))
+        assert "test_write_total 1" in path.read_text()
+        with patch.object(metrics, "exposition", side_effect=RuntimeError("boom")):
+            with pytest.raises(RuntimeError):
+                metrics.write(str(path))
+        assert [file.name for file in tmp_path.iterdir()] == ["metrics.prom"]
+
+    def test_serve(self, metrics):
+        """Test the exposition is served over HTTP."""
+        metrics.counter("test_serve_total", "Help.").inc()
+        port = metrics.serve(port=0)
+        try:
+            assert metrics.serve(port=0) == port
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+                assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+                assert "test_serve_total 1" in response.read().decode("utf-8")
+        finally:
+            metrics.shutdown()
+        metrics.shutdown()
+
+
+class TestInstrumentation:
+    def test_executor_metrics(self, metrics, provider):
+        """Test executor calls count requests, tokens, TTFT and errors, streams included."""
+        provider.configure(output_tokens=4)
+        with patch("lib.adapters.outbound.LLMExecutor.current_provider", provider), \
+                patch("lib.adapters.outbound.LLMExecutor.llm", "m"):
+            LLMExecutor.get_instance().ask("a b")
+            list(LLMExecutor.get_instance().chat("a b", tools={"lookup": lambda: "found"}))
+            provider.configure(error_rate=1.0)
+            with pytest.raises(FakeProviderError):
+                LLMExecutor.get_instance().ask("a b")
+        assert metrics.get("llm_requests_total").collect() == {("ask", "m"): 2, ("chat", "m"): 1}
+        assert metrics.get("llm_errors_total").collect() == {("ask", "m", "FakeProviderError"): 1}
+        assert metrics.get("llm_tokens_total").value("m", "output") == 8
+        assert metrics.get("llm_tokens_total").value("m", "input") == 2 + 3
+        assert metrics.get("llm_time_to_first_token_seconds").count("m") == 1
+        assert metrics.get("llm_request_seconds").count("ask", "m") == 2
+        assert metrics.get("provider_requests_total").collect() == {("fake", "simple_chat"): 2,
+                                                                     ("fake", "agentic_chat"): 1}
+        assert metrics.get("provider_errors_total").value("fake", "simple_chat", "FakeProviderError") == 1
+        assert metrics.get("tool_calls_total").value("lookup") == 1
+        assert metrics.get("tool_call_seconds").count("lookup") == 1
+
+    def test_failing_stream_is_counted(self, metrics):
+        """Test an error raised while streaming counts as an error of the call."""
+        def chunks():
+            yield "partial"
+            raise FakeProviderError("cut")
+
+        with patch("lib.adapters.outbound.LLMExecutor.current_provider") as mock_provider, \
+                patch("lib.adapters.outbound.LLMExecutor.llm", "m"):
+            mock_provider.chat.return_value = chunks()
+            with pytest.raises(FakeProviderError):
+                list(LLMExecutor.get_instance().ask("q", chatbot_mode=True))
+        assert metrics.get("llm_errors_total").value("ask", "m", "FakeProviderError") == 1
+        assert metrics.get("llm_request_seconds").count("ask", "m") == 1
+
+    def test_tool_errors(self, metrics):
+        """Test a failing tool is counted and its error propagates."""
+        def broken():
+            raise KeyError("missing")
+
+        with pytest.raises(KeyError):
+            Provider.call_tool("broken", broken, {})
+        assert metrics.get("tool_errors_total").value("broken", "KeyError") == 1
+        assert metrics.get("tool_call_seconds").count("broken") == 1
+
+    def test_knowledge_metrics(self, metrics, provider):
+        """Test queries, embedding batch sizes, the embedding cache and errors are recorded."""
+        with patch("lib.core.service.KnowledgeService.current_provider", provider):
+            service = KnowledgeService()
+            store = service.build_knowledge(["red apple", "green pear", "blue sky"], store=KnowledgeStore(),
+                                            batch_size=2)
+            service.get_most_relevant_chunks("apple", store, top_n=1)
+            service.get_most_relevant_chunks_batch(["apple", "pear"], store, top_n=1)
+            service.update_document("doc", ["red apple", "new text", "new text"], store)
+            with pytest.raises(ValueError):
+                service.get_most_relevant_chunks("apple", [], mode="unknown", where={"a": 1})
+        assert metrics.get("knowledge_queries_total").collect() == {("vector",): 1, ("batch",): 2, ("unknown",): 1}
+        assert metrics.get("knowledge_operation_seconds").count("build") == 1
+        assert metrics.get("knowledge_errors_total").value("query", "ValueError") == 1
+        assert metrics.get("embedding_batch_size").collect()[("fake",)][1] == 2 + 1 + 2 + 1
+        assert metrics.get("cache_lookups_total").value("embedding", "hit") == 1
+        assert metrics.get("cache_lookups_total").value("embedding", "miss") == 2
+
+    def test_token_count_cache(self, metrics):
+        """Test token count cache hits and misses are counted."""
+        counter = TokenCounter.get_instance()
+        counter.clear_cache()
+        counter.count("a text measured for the cache metric")
+        counter.count("a text measured for the cache metric")
+        assert metrics.get("cache_lookups_total").value("token_count", "hit") == 1
+        assert metrics.get("cache_lookups_total").value("token_count", "miss") == 1
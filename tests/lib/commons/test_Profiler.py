@@ -0,0 +1,170 @@
+import os
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from lib.commons import Profiler as profiler_module
+from lib.commons.Profiler import Profiler, _WallClockSampler, profiled, summarize
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    """The profiler sampling every call into a temporary directory, disabled afterwards."""
+    instance = Profiler.get_instance()
+    instance.dump()
+    instance.samples.clear()
+    instance.configure(sample_rate=1.0, mode="cprofile", directory=str(tmp_path), interval=0.001, dump_every=0)
+    yield instance
+    instance.configure(sample_rate=0.0, dump_every=100)
+    instance.dump(str(tmp_path))
+
+
+def busy(seconds=0.02):
+    """Spin for a while, so that the wall-clock sampler catches the frame."""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+    return "done"
+
+
+@profiled("test.work")
+def work(fail=False):
+    if fail:
+        raise ValueError("boom")
+    return busy()
+
+
+@profiled("test.stream")
+def stream():
+    for chunk in ("a", "b"):
+        busy(0.01)
+        yield chunk
+
+
+@profiled("test.outer")
+def outer():
+    return work()
+
+
+class TestProfiler:
+    def test_singleton_instance(self):
+        """Test that Profiler is a singleton, disabled by default."""
+        assert Profiler.get_instance() is Profiler.get_instance()
+        assert not Profiler.get_instance().enabled
+        with pytest.raises(Exception, match="This class is a singleton!"):
+            Profiler()
+
+    def test_disabled_profiler_calls_through(self):
+        """Test decorated functions run normally while profiling is disabled."""
+        assert work() == "done"
+        assert Profiler.get_instance().samples["test.work"] == 0
+
+    def test_configure_validates(self):
+        """Test invalid sample rates and modes are rejected."""
+        with pytest.raises(ValueError):
+            Profiler.get_instance().configure(sample_rate=1.5)
+        with pytest.raises(ValueError):
+            Profiler.get_instance().configure(mode="perf")
+
+    def test_cprofile_samples_are_aggregated_and_dumped(self, profiler, tmp_path):
+        """Test sampled calls, failing ones included, are aggregated into one .prof file per name."""
+        assert work() == "done" and work() == "done"
+        with pytest.raises(ValueError):
+            work(fail=True)
+        assert profiler.samples["test.work"] == 3
+        path, = profiler.dump()
+        assert os.path.basename(path).startswith("test.work.") and path.endswith(".prof")
+        assert profiler.dump() == []
+        report = summarize([str(tmp_path)], limit=5)
+        assert "== test.work (cProfile, 1 file(s))" in report and "busy" in report
+
+    def test_sampling_rate(self, profiler):
+        """Test only the calls drawn below the sample rate are profiled."""
+        profiler.configure(sample_rate=0.5)
+        with patch("lib.commons.Profiler.random.random", side_effect=[0.2, 0.7]):
+            work()
+            work()
+        assert profiler.samples["test.work"] == 1
+
+    def test_nested_calls_are_profiled_once(self, profiler):
+        """Test a sampled call inside another sampled call is part of the outer profile."""
+        assert outer() == "done"
+        assert profiler.samples == {"test.outer": 1}
+
+    def test_streams_are_profiled_until_exhausted(self, profiler, tmp_path):
+        """Test a returned stream is profiled while it produces its chunks."""
+        chunks = stream()
+        assert profiler.samples["test.stream"] == 0
+        assert list(chunks) == ["a", "b"]
+        assert profiler.samples["test.stream"] == 1
+        profiler.dump()
+        assert "busy" in summarize([str(tmp_path)])
+
+    def test_concurrent_cprofile_sampling(self, profiler):
+        """Test one thread is profiled at a time, the others calling through without error."""
+        started, release, results = threading.Event(), threading.Event(), []
+
+        @profiled("test.blocking")
+        def blocking():
+            started.set()
+            release.wait(1)
+            return "done"
+
+        thread = threading.Thread(target=lambda: results.append(blocking()))
+        thread.start()
+        assert started.wait(1)
+        assert work() == "done" and list(stream()) == ["a", "b"]
+        release.set()
+        thread.join()
+        assert results == ["done"]
+        assert profiler.samples == {"test.blocking": 1}
+        assert work() == "done" and profiler.samples["test.work"] == 1
+
+    def test_profiler_errors_do_not_reach_the_call(self, profiler):
+        """Test a profile failing to start or to be recorded leaves the call and later samples intact."""
+        with patch("lib.commons.Profiler.cProfile.Profile.enable", side_effect=ValueError("busy")):
+            assert work() == "done" and list(stream()) == ["a", "b"]
+        assert profiler.samples["test.work"] == 0
+        with patch.object(profiler, "_record", side_effect=OSError("disk full")):
+            assert work() == "done"
+        with patch("lib.commons.Profiler.cProfile.Profile.disable", side_effect=ValueError("gone")):
+            assert work() == "done"
+        assert work() == "done" and profiler.samples["test.work"] == 1
+        assert outer() == "done" and profiler.samples["test.outer"] == 1
+
+    def test_wall_clock_profile(self, profiler, tmp_path):
+        """Test the wall-clock sampler records collapsed stacks summarized as self and total time."""
+        profiler.configure(mode="wall")
+        work()
+        list(stream())
+        time.sleep(0.01)
+        paths = profiler.dump()
+        assert sorted(os.path.basename(path).split(".")[1] for path in paths) == ["stream", "work"]
+        with open(next(path for path in paths if ".work." in path), encoding="utf-8") as file:
+            stack, count = file.readline().rsplit(" ", 1)
+        assert int(count) > 0 and "work (test_Profiler.py:" in stack
+        report = summarize(paths)
+        assert "== test.work (wall clock," in report and "busy (test_Profiler.py:" in report
+
+    def test_periodic_dump(self, profiler, tmp_path):
+        """Test profiles are written every dump_every samples."""
+        profiler.configure(dump_every=2)
+        work()
+        assert os.listdir(tmp_path) == []
+        work()
+        assert len(os.listdir(tmp_path)) == 1
+
+    def test_dump_at_exit(self, profiler):
+        """Test the exit hook dumps only when profiling is enabled."""
+        with patch.object(profiler, "dump") as mock_dump:
+            profiler_module._dump_at_exit()
+            profiler.configure(sample_rate=0.0)
+            profiler_module._dump_at_exit()
+        mock_dump.assert_called_once_with()
+
+    def test_sampler_stack_depth_is_bounded(self):
+        """Test rendered stacks keep the innermost frames only up to 128."""
+        def recurse(depth):
+            return recurse(depth - 1) if depth else _WallClockSampler.stack(__import__("sys")._getframe())
+
+        assert len(recurse(200).split(";")) == 128
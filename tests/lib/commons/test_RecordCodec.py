@@ -0,0 +1,77 @@
+import io
+import json
+import uuid
+import pytest
+from lib.commons.RecordCodec import RecordCodec
+from lib.core.providers.model.LLMResponse import LLMResponse
+from lib.use_case.steps.StepResult import StepResult
+
+
+class TestRecordCodec:
+    def test_encode_jsonl_one_line_per_record(self):
+        """Test encode_jsonl produces one compact JSON document per line."""
+        lines = list(RecordCodec.encode_jsonl([LLMResponse(content="a"), LLMResponse(content="b")]))
+        assert len(lines) == 2
+        assert all(line.endswith("\n") for line in lines)
+        assert " " not in lines[0]
+        assert json.loads(lines[1])["content"] == "b"
+
+    def test_jsonl_round_trip_llm_response(self):
+        """Test LLMResponse records survive a JSON-lines round trip."""
+        records = [LLMResponse(content="hi", usage={"total_tokens": 3}), LLMResponse(content="", done=False)]
+        buffer = io.StringIO()
+        assert RecordCodec.write_jsonl(records, buffer) == 2
+        buffer.seek(0)
+        assert list(RecordCodec.read_jsonl(buffer, LLMResponse)) == records
+
+    def test_jsonl_round_trip_step_result(self):
+        """Test StepResult records (with UUID ids) survive a JSON-lines round trip."""
+        record = StepResult(uuid.uuid4(), result={"answer": 42}, message="ok")
+        record.add_error("warn")
+        lines = list(RecordCodec.encode_jsonl([record]))
+        assert list(RecordCodec.decode_jsonl(lines, StepResult)) == [record]
+
+    def test_jsonl_nested_records_and_unknown_values(self):
+        """Test nested records are serialized with to_dict and unknown values as strings."""
+        record = StepResult(uuid.uuid4(), result=LLMResponse(content="nested"), message=None)
+        decoded = json.loads(next(RecordCodec.encode_jsonl([record])))
+        assert decoded["result"]["content"] == "nested"
+
+        record = StepResult(uuid.uuid4(), result={1, 2})
+        decoded = json.loads(next(RecordCodec.encode_jsonl([record])))
+        assert isinstance(decoded["result"], str)
+
+    def test_decode_jsonl_skips_blank_lines(self):
+        """Test blank lines are ignored when decoding."""
+        lines = ["\n", '{"content":"x"}\n', "   \n"]
+        assert list(RecordCodec.decode_jsonl(lines, LLMResponse)) == [LLMResponse(content="x")]
+
+    def test_binary_round_trip(self):
+        """Test binary encode/decode round trip for both record types."""
+        responses = [LLMResponse(content=str(i), done=i % 2 == 0) for i in range(10)]
+        assert RecordCodec.decode_binary(RecordCodec.encode_binary(responses), LLMResponse) == responses
+
+        results = [StepResult(uuid.uuid4(), result=i) for i in range(3)]
+        assert RecordCodec.decode_binary(RecordCodec.encode_binary(results), StepResult) == results
+
+    def test_binary_is_smaller_than_jsonl(self):
+        """Test the binary format is more compact than JSON lines."""
+        records = [LLMResponse(content="token", done=False) for _ in range(100)]
+        binary = RecordCodec.encode_binary(records)
+        jsonl = "".join(RecordCodec.encode_jsonl(records)).encode()
+        assert len(binary) < len(jsonl)
+
+    def test_read_binary_is_lazy(self):
+        """Test read_binary yields records from a file object."""
+        buffer = io.BytesIO()
+        assert RecordCodec.write_binary([LLMResponse(content="a"), LLMResponse(content="b")], buffer) == 2
+        buffer.seek(0)
+        reader = RecordCodec.read_binary(buffer, LLMResponse)
+        assert next(reader).content == "a"
+        assert next(reader).content == "b"
+        with pytest.raises(StopIteration):
+            next(reader)
+
+    def test_decode_binary_empty(self):
+        """Test decoding an empty blob yields no records."""
+        assert RecordCodec.decode_binary(b"", LLMResponse) == []
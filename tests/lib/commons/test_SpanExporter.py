@@ -0,0 +1,106 @@
+import io
+import json
+from lib.commons.SpanExporter import InMemorySpanExporter, JsonLinesSpanExporter, OTLPJsonSpanExporter, SpanExporter
+from lib.commons.Tracer import Tracer
+
+
+def finished_spans():
+    """Two finished spans, a failed child and its parent, exported nowhere."""
+    tracer = Tracer.get_instance()
+    tracer.enable()
+    try:
+        with tracer.span("parent", {"model": "m", "stream": True, "tokens": 3, "ttft": 0.5,
+                                    "tools": ["a", "b"], "other": None}) as parent:
+            child = tracer.start_span("child")
+            child.record_error(ValueError("boom"))
+            child.end()
+    finally:
+        tracer.disable()
+    return parent, child
+
+
+class TestSpanExporter:
+    def test_abstract_export_returns_none(self):
+        """Test that the abstract export body (pass) returns None and shutdown flushes nothing."""
+        class Exporter(SpanExporter):
+            def export(self, span):
+                return super().export(span)
+
+        exporter = Exporter()
+        assert exporter.export(None) is None
+        exporter.shutdown()
+
+
+class TestInMemorySpanExporter:
+    def test_export_get_clear(self):
+        """Test spans are kept, filtered by name and cleared."""
+        parent, child = finished_spans()
+        exporter = InMemorySpanExporter()
+        exporter.export(child)
+        exporter.export(parent)
+        exporter.shutdown()
+        assert exporter.get("child") == [child]
+        exporter.clear()
+        assert exporter.spans == []
+
+
+class TestJsonLinesSpanExporter:
+    def test_writes_one_line_per_span(self, tmp_path):
+        """Test spans are appended as JSON lines to an owned file, closed on shutdown."""
+        parent, child = finished_spans()
+        path = tmp_path / "spans.jsonl"
+        exporter = JsonLinesSpanExporter(str(path))
+        exporter.export(child)
+        exporter.export(parent)
+        exporter.shutdown()
+        exporter.flush()
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [record["name"] for record in records] == ["child", "parent"]
+        assert records[0]["parent_id"] == parent.span_id and records[0]["error"] == "ValueError: boom"
+
+    def test_stream_is_not_closed(self):
+        """Test a caller-provided stream stays open."""
+        buffer = io.StringIO()
+        exporter = JsonLinesSpanExporter(buffer)
+        exporter.export(finished_spans()[0])
+        exporter.shutdown()
+        assert not buffer.closed and json.loads(buffer.getvalue())["name"] == "parent"
+
+
+class TestOTLPJsonSpanExporter:
+    def test_encoding(self):
+        """Test spans are written as an OTLP/JSON ExportTraceServiceRequest on flush."""
+        parent, child = finished_spans()
+        buffer = io.StringIO()
+        exporter = OTLPJsonSpanExporter(buffer, service_name="svc")
+        exporter.export(child)
+        exporter.export(parent)
+        assert buffer.getvalue() == ""
+        exporter.shutdown()
+        request = json.loads(buffer.getvalue())
+        resource_spans = request["resourceSpans"][0]
+        assert resource_spans["resource"]["attributes"] == [{"key": "service.name", "value": {"stringValue": "svc"}}]
+        encoded_child, encoded_parent = resource_spans["scopeSpans"][0]["spans"]
+        assert encoded_child["parentSpanId"] == parent.span_id
+        assert encoded_child["status"] == {"code": 2, "message": "ValueError: boom"}
+        assert "parentSpanId" not in encoded_parent and encoded_parent["status"] == {"code": 0}
+        assert encoded_parent["startTimeUnixNano"] == str(parent.start_time)
+        assert {item["key"]: item["value"] for item in encoded_parent["attributes"]} == {
+            "model": {"stringValue": "m"},
+            "stream": {"boolValue": True},
+            "tokens": {"intValue": "3"},
+            "ttft": {"doubleValue": 0.5},
+            "tools": {"arrayValue": {"values": [{"stringValue": "a"}, {"stringValue": "b"}]}},
+            "other": {"stringValue": "None"},
+        }
+
+    def test_batches(self):
+        """Test full batches are written without waiting for a flush."""
+        buffer = io.StringIO()
+        exporter = OTLPJsonSpanExporter(buffer, batch_size=2)
+        for span in finished_spans():
+            exporter.export(span)
+        assert len(buffer.getvalue().splitlines()) == 1
+        assert '"stringValue": "oaia"' in buffer.getvalue()
+        exporter.flush()
+        assert len(buffer.getvalue().splitlines()) == 1
@@ -0,0 +1,129 @@
+import io
+import json
+import logging
+import sys
+import threading
+import pytest
+from unittest.mock import patch
+from lib.commons import StructuredLogging
+from lib.commons.StructuredLogging import JsonFormatter, KeyValueFormatter, configure, get_logger, shutdown
+
+
+@pytest.fixture
+def output():
+    """A stream receiving the records of the application loggers, restored afterwards."""
+    application = logging.getLogger(StructuredLogging.APPLICATION_LOGGER)
+    level = application.level
+    stream = io.StringIO()
+    yield stream
+    shutdown()
+    application.setLevel(level)
+
+
+def record(message="hello %s", args=("world",), **fields):
+    """A record of the lib.test logger with structured fields."""
+    entry = logging.LogRecord("lib.test", logging.INFO, __file__, 1, message, args, None)
+    entry.__dict__.update(fields)
+    return entry
+
+
+class TestFormatters:
+    def test_json(self):
+        """Test the JSON formatter renders the standard and structured fields."""
+        entry = json.loads(JsonFormatter().format(record(model="m", tokens=3)))
+        assert entry["level"] == "INFO" and entry["logger"] == "lib.test" and entry["message"] == "hello world"
+        assert entry["model"] == "m" and entry["tokens"] == 3
+        assert entry["time"].endswith("+00:00") and "exception" not in entry
+
+    def test_key_value(self):
+        """Test the text formatter appends the fields, quoting values with spaces or quotes."""
+        line = KeyValueFormatter().format(record(model="m", text="a b", empty=""))
+        assert line.endswith(" INFO lib.test: hello world model=m text=\"a b\" empty=\"\"")
+
+    def test_exceptions(self):
+        """Test both formatters render exceptions, raw or already rendered."""
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            entry = logging.LogRecord("lib.test", logging.ERROR, __file__, 1, "failed", (), sys.exc_info())
+        assert "ValueError: boom" in json.loads(JsonFormatter().format(entry))["exception"]
+        assert KeyValueFormatter().format(entry).splitlines()[-1] == "ValueError: boom"
+        rendered = record(exc_text="Traceback: rendered")
+        assert json.loads(JsonFormatter().format(rendered))["exception"] == "Traceback: rendered"
+        assert KeyValueFormatter().format(rendered).endswith("\nTraceback: rendered")
+
+
+class TestConfigure:
+    def test_records_are_written_by_the_listener(self, output):
+        """Test records are written off the calling thread, as JSON lines, with their fields."""
+        assert configure(level="debug", fmt="json", stream=output, force=True)
+        threads = []
+        with patch.object(StructuredLogging._listener.handlers[0], "emit",
+                          side_effect=lambda entry: threads.append(threading.current_thread())):
+            get_logger("lib.test").debug("value %d", 4, extra={"model": "m"})
+            shutdown()
+        assert len(threads) == 1 and threads[0] is not threading.current_thread()
+
+        configure(fmt="json", stream=output, force=True)
+        try:
+            raise KeyError("k")
+        except KeyError:
+            get_logger("lib.test").exception("failed %s", "call", extra={"attempt": 2})
+        get_logger("lib.test").debug("filtered out at INFO")
+        shutdown()
+        entry, = [json.loads(line) for line in output.getvalue().splitlines()]
+        assert entry["message"] == "failed call" and entry["attempt"] == 2 and "KeyError" in entry["exception"]
+        assert entry["level"] == "ERROR"
+
+    def test_text_format_from_environment(self, output):
+        """Test the level and format default to LOG_LEVEL and LOG_FORMAT."""
+        with patch.object(StructuredLogging.env, "get_log_level", return_value="WARNING"), \
+                patch.object(StructuredLogging.env, "get_log_format", return_value="TEXT"):
+            configure(stream=output, force=True)
+        logger = get_logger("lib.test")
+        logger.info("hidden")
+        logger.warning("shown", extra={"tool": "lookup"})
+        shutdown()
+        assert output.getvalue().strip().endswith("WARNING lib.test: shown tool=lookup")
+
+    def test_existing_handlers_are_kept(self, output):
+        """Test configure leaves the handlers already attached to the application logger."""
+        handler = logging.NullHandler()
+        application = logging.getLogger(StructuredLogging.APPLICATION_LOGGER)
+        application.addHandler(handler)
+        try:
+            assert not configure(level=logging.ERROR, stream=output)
+            assert application.level == logging.ERROR and application.handlers == [handler]
+        finally:
+            application.removeHandler(handler)
+
+    def test_root_logger_is_left_alone(self, output):
+        """Test the handler goes on the application logger: root handlers see no duplicate, other loggers no change."""
+        handler = logging.NullHandler()
+        root = logging.getLogger()
+        root.addHandler(handler)
+        try:
+            assert configure(stream=output, force=True)
+            assert handler in root.handlers and StructuredLogging._handler not in root.handlers
+            assert not logging.getLogger(StructuredLogging.APPLICATION_LOGGER).propagate
+            with patch.object(handler, "handle") as mock_handle:
+                get_logger("lib.test").warning("application")
+                logging.getLogger("thirdparty").warning("other")
+            assert [call.args[0].name for call in mock_handle.call_args_list] == ["thirdparty"]
+            shutdown()
+            assert logging.getLogger(StructuredLogging.APPLICATION_LOGGER).propagate
+        finally:
+            root.removeHandler(handler)
+        assert output.getvalue().count("WARNING") == 1 and "application" in output.getvalue()
+
+    def test_unknown_format(self):
+        """Test unknown formats are rejected."""
+        with pytest.raises(ValueError):
+            configure(fmt="xml")
+
+    def test_get_logger_does_not_configure(self):
+        """Test get_logger only returns the logger, installing no handler."""
+        with patch.object(StructuredLogging, "configure") as mock_configure:
+            assert get_logger("lib.test") is logging.getLogger("lib.test")
+        mock_configure.assert_not_called()
+        assert StructuredLogging._handler is None
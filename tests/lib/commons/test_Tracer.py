@@ -0,0 +1,175 @@
+import pytest
+from unittest.mock import patch
+from lib.adapters.outbound.LLMExecutor import LLMExecutor
+from lib.commons.SpanExporter import InMemorySpanExporter
+from lib.commons.Tracer import NOOP_SPAN, Tracer, traced
+from lib.core.providers.FakeProvider import FakeProvider, FakeProviderError
+from lib.core.providers.model.LLMResponse import LLMResponse
+from lib.core.service.KnowledgeService import KnowledgeService
+from lib.core.service.KnowledgeStore import KnowledgeStore
+
+
+@pytest.fixture
+def exporter():
+    """Tracing enabled with an in-memory exporter, disabled afterwards."""
+    exporter = InMemorySpanExporter()
+    Tracer.get_instance().enable(exporter)
+    yield exporter
+    Tracer.get_instance().disable()
+
+
+@pytest.fixture
+def provider():
+    """The FakeProvider without waits, restored to its defaults afterwards."""
+    instance = FakeProvider.get_instance()
+    instance.configure(sleep=lambda seconds: None, **FakeProvider.DEFAULTS)
+    yield instance
+    instance.configure(**FakeProvider.DEFAULTS)
+
+
+@traced("work", "size", "label")
+def work(size, label="default"):
+    return size * 2
+
+
+class TestTracer:
+    def test_singleton_instance(self):
+        """Test that Tracer is a singleton, disabled by default."""
+        assert Tracer.get_instance() is Tracer.get_instance()
+        assert not Tracer.get_instance().enabled
+        with pytest.raises(Exception, match="This class is a singleton!"):
+            Tracer()
+
+    def test_disabled_tracing_is_a_no_op(self):
+        """Test spans are the shared no-op span while tracing is disabled."""
+        tracer = Tracer.get_instance()
+        with tracer.span("ignored", {"a": 1}) as span:
+            assert span is NOOP_SPAN
+            assert span.set_attribute("b", 2).set_attributes({}).record_error(ValueError()) is NOOP_SPAN
+            span.end()
+        assert tracer.start_span("ignored") is NOOP_SPAN
+        assert tracer.current_span() is NOOP_SPAN
+        assert tracer.trace_response(NOOP_SPAN, "response") == "response"
+        assert work(2) == 4
+
+    def test_nested_spans(self, exporter):
+        """Test spans opened in an active span are its children and share its trace id."""
+        tracer = Tracer.get_instance()
+        with tracer.span("parent", {"a": 1}) as parent:
+            assert tracer.current_span() is parent
+            with tracer.span("child") as child:
+                child.set_attributes({"b": 2})
+            detached = tracer.start_span("detached")
+        detached.end()
+        detached.end()
+        assert tracer.current_span() is NOOP_SPAN
+        assert [span.name for span in exporter.spans] == ["child", "parent", "detached"]
+        assert parent.parent_id is None and len(parent.trace_id) == 32 and len(parent.span_id) == 16
+        assert child.parent_id == parent.span_id and child.trace_id == parent.trace_id
+        assert detached.parent_id == parent.span_id
+        assert parent.attributes == {"a": 1} and child.attributes == {"b": 2}
+        assert parent.duration >= child.duration >= 0
+        assert parent.to_dict()["name"] == "parent" and "parent" in repr(parent)
+
+    def test_error_is_recorded(self, exporter):
+        """Test an error raised in a span ends it with the error and propagates."""
+        with pytest.raises(ValueError):
+            with Tracer.get_instance().span("failing"):
+                raise ValueError("boom")
+        assert exporter.get("failing")[0].error == "ValueError: boom"
+
+    def test_exporter_errors_are_ignored(self, exporter):
+        """Test a failing exporter does not break the traced code."""
+        class Broken(InMemorySpanExporter):
+            def export(self, span):
+                raise RuntimeError("down")
+
+        Tracer.get_instance().enable(Broken())
+        with Tracer.get_instance().span("ok"):
+            pass
+        assert len(exporter.get("ok")) == 1
+
+    def test_traced_records_arguments(self, exporter):
+        """Test the decorator records the named arguments, defaults included."""
+        assert work(3) == 6
+        assert exporter.get("work")[0].attributes == {"size": 3, "label": "default"}
+
+    def test_trace_response(self, exporter):
+        """Test responses end the span immediately with their usage."""
+        tracer = Tracer.get_instance()
+        span = tracer.start_span("call")
+        response = LLMResponse(content="x", finish_reason="stop", usage={"prompt_tokens": 3, "completion_tokens": 1})
+        assert tracer.trace_response(span, response) is response
+        assert span.end_time is not None
+        assert span.attributes == {"tokens.prompt": 3, "tokens.completion": 1, "finish_reason": "stop"}
+
+    def test_trace_stream(self, exporter):
+        """Test a stream ends its span when exhausted, with the usage and timings of its final chunk."""
+        tracer = Tracer.get_instance()
+        span = tracer.start_span("call")
+        chunks = iter([LLMResponse(content="a", done=False),
+                       LLMResponse(content="", done=True, usage={"completion_tokens": 1},
+                                   timings={"time_to_first_token": 0.1})])
+        stream = tracer.trace_response(span, chunks)
+        assert span.end_time is None
+        assert [chunk.content for chunk in stream] == ["a", ""]
+        assert span.attributes == {"tokens.completion": 1, "time_to_first_token": 0.1, "chunks": 2}
+
+    def test_trace_failing_stream(self, exporter):
+        """Test a stream failing midway ends its span with the error."""
+        def chunks():
+            yield LLMResponse(content="a", done=False)
+            raise FakeProviderError("cut")
+
+        tracer = Tracer.get_instance()
+        span = tracer.start_span("call")
+        with pytest.raises(FakeProviderError):
+            list(tracer.trace_response(span, chunks()))
+        assert span.error == "FakeProviderError: cut" and span.attributes["chunks"] == 1
+
+    def test_executor_and_provider_spans(self, exporter, provider):
+        """Test an agentic chat traces the executor call, the provider method and the tool calls."""
+        provider.configure(output_tokens=4)
+        with patch("lib.adapters.outbound.LLMExecutor.current_provider", provider):
+            stream = LLMExecutor.get_instance().chat("q", tools={"lookup": lambda: "found"})
+            assert exporter.get("llm.chat") == []
+            list(stream)
+        chat = exporter.get("llm.chat")[0]
+        assert chat.attributes["tools"] == ["lookup"] and chat.attributes["stream"] is True
+        assert chat.attributes["tokens.completion"] == 4 and chat.attributes["chunks"] == 5
+        agentic = exporter.get("fake.agentic_chat")[0]
+        tool = exporter.get("tool.call")[0]
+        assert agentic.parent_id == chat.span_id and tool.parent_id == agentic.span_id
+        assert tool.attributes == {"tool": "lookup"}
+        # The provider span covers the consumption of its stream, tool calls included.
+        assert agentic.attributes["chunks"] == 5 and agentic.end_time >= tool.end_time
+
+    def test_executor_ask_span(self, exporter, provider):
+        """Test a non-streamed ask is traced with its token usage, errors included."""
+        with patch("lib.adapters.outbound.LLMExecutor.current_provider", provider):
+            LLMExecutor.get_instance().ask("q")
+            provider.configure(error_rate=1.0)
+            with pytest.raises(FakeProviderError):
+                LLMExecutor.get_instance().ask("q")
+        succeeded, failed = exporter.get("llm.ask")
+        assert succeeded.attributes["tokens.completion"] == provider.output_tokens and succeeded.error is None
+        assert failed.error.startswith("FakeProviderError")
+
+    def test_knowledge_spans(self, exporter, provider):
+        """Test knowledge base builds, queries and embedding batches are traced."""
+        with patch("lib.core.service.KnowledgeService.current_provider", provider):
+            service = KnowledgeService()
+            store = service.build_knowledge(["red apple", "green pear", "blue sky"], store=KnowledgeStore(),
+                                            batch_size=2)
+            service.get_most_relevant_chunks("apple", store, top_n=1)
+        build = exporter.get("knowledge.build")[0]
+        assert build.attributes == {"batch_size": 2, "concurrency": 1}
+        assert [span.attributes["batch_size"] for span in exporter.get("fake.embed_batch")] == [2, 1]
+        assert exporter.get("knowledge.query")[0].attributes == {"top_n": 1, "mode": "vector"}
+
+    def test_concurrent_embedding_spans(self, exporter, provider):
+        """Test embedding batches sent from the pool are children of the build span."""
+        with patch("lib.core.service.KnowledgeService.current_provider", provider):
+            KnowledgeService().build_knowledge(["a", "b", "c"], store=KnowledgeStore(), batch_size=1, concurrency=2)
+        build = exporter.get("knowledge.build")[0]
+        assert [span.parent_id for span in exporter.get("fake.embed_batch")] == [build.span_id] * 3
@@ -12,6 +12,7 @@ class TestLLMResponse:
         assert response.usage is None
         assert response.thinking is None
         assert response.done is True
+        assert response.timings is None
 
     def test_all_fields(self):
         """Test LLMResponse with all fields provided."""
@@ -70,3 +71,61 @@ class TestLLMResponse:
         """Test that empty content string is valid."""
         response = LLMResponse(content="")
         assert response.content == ""
+
+    def test_has_no_instance_dict(self):
+        """Test that LLMResponse is slotted and rejects unknown attributes."""
+        response = LLMResponse(content="Hi")
+        assert not hasattr(response, "__dict__")
+        with pytest.raises(AttributeError):
+            response.unknown = 1
+
+    def test_from_dict_round_trip(self):
+        """Test from_dict restores a response serialized with to_dict."""
+        usage = {"prompt_tokens": 1, "completion_tokens": 2, "total_tokens": 3}
+        response = LLMResponse(content="Hi", finish_reason="stop", usage=usage, thinking="hmm", done=False)
+        assert LLMResponse.from_dict(response.to_dict()) == response
+
+    def test_from_dict_defaults(self):
+        """Test from_dict fills missing keys with defaults."""
+        assert LLMResponse.from_dict({}) == LLMResponse(content="")
+
+    def test_hashable(self):
+        """Test equal responses hash alike, usage included, and can be used in sets."""
+        usage = {"prompt_tokens": 1}
+        first, second = LLMResponse("Hi", usage=usage), LLMResponse("Hi", usage=dict(usage))
+        assert first == second and hash(first) == hash(second)
+        assert len({first, second, LLMResponse("Hi", done=False)}) == 2
+
+    def test_tuple_round_trip(self):
+        """Test to_tuple/from_tuple round trip."""
+        response = LLMResponse(content="Hi", finish_reason="length", done=True)
+        assert response.to_tuple() == ("Hi", "assistant", "length", None, None, True, None)
+        assert LLMResponse.from_tuple(response.to_tuple()) == response
+
+    def test_from_tuple_without_timings(self):
+        """Test from_tuple accepts tuples written before the timings field existed."""
+        response = LLMResponse.from_tuple(("Hi", "assistant", "stop", None, None, True))
+        assert response.content == "Hi"
+        assert response.timings is None
+
+    def test_timings(self):
+        """Test timings are stored and serialized."""
+        timings = {"time_to_first_token": 0.1, "chunks": 3}
+        response = LLMResponse(content="", timings=timings)
+        assert response.timings == timings
+        assert response.to_dict()["timings"] == timings
+        assert LLMResponse.from_dict(response.to_dict()).timings == timings
+
+    def test_pickle_round_trip(self):
+        """Test that slotted instances survive pickling."""
+        import pickle
+        response = LLMResponse(content="Hi", usage={"total_tokens": 3})
+        assert pickle.loads(pickle.dumps(response)) == response
+
+    def test_equality_with_other_types(self):
+        """Test that comparing with a non-LLMResponse is not equal."""
+        assert LLMResponse(content="Hi") != "Hi"
+
+    def test_repr(self):
+        """Test repr contains the content."""
+        assert "content='Hi'" in repr(LLMResponse(content="Hi"))
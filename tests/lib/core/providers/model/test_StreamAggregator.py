@@ -0,0 +1,78 @@
+import pytest
+from lib.core.providers.model.LLMResponse import LLMResponse
+from lib.core.providers.model.StreamAggregator import StreamAggregator
+
+
+class FakeClock:
+    def __init__(self, *values):
+        self.values = list(values)
+
+    def __call__(self):
+        return self.values.pop(0)
+
+
+class TestStreamAggregator:
+    def test_timings(self):
+        """Test TTFT, inter-token latency and throughput from observed chunks."""
+        # start=0, chunks at 1.0, 1.5, 2.5, timings() called at 3.0
+        aggregator = StreamAggregator(clock=FakeClock(0.0, 1.0, 1.5, 2.5, 3.0))
+        for content in ["a", "b", "c"]:
+            aggregator.observe(content)
+        timings = aggregator.timings()
+        assert timings["time_to_first_token"] == pytest.approx(1.0)
+        assert timings["inter_token_latency"] == pytest.approx(0.75)
+        assert timings["total_time"] == pytest.approx(3.0)
+        assert timings["chunks"] == 3
+        assert timings["tokens_per_second"] == pytest.approx(2 / 1.5)
+
+    def test_timings_uses_reported_completion_tokens(self):
+        """Test tokens_per_second prefers the token count reported by the backend."""
+        aggregator = StreamAggregator(started_at=0.0, clock=FakeClock(1.0, 2.0, 2.0))
+        aggregator.observe("ab")
+        aggregator.observe("cd")
+        assert aggregator.timings(completion_tokens=5)["tokens_per_second"] == pytest.approx(4.0)
+
+    def test_empty_chunks_are_ignored(self):
+        """Test empty content does not count as a token."""
+        aggregator = StreamAggregator(started_at=0.0, clock=FakeClock(1.0))
+        aggregator.observe("")
+        aggregator.observe(None)
+        timings = aggregator.timings()
+        assert timings["chunks"] == 0
+        assert timings["time_to_first_token"] is None
+        assert timings["inter_token_latency"] is None
+        assert timings["tokens_per_second"] is None
+
+    def test_default_start_uses_clock(self):
+        """Test the clock starts at construction when started_at is omitted."""
+        aggregator = StreamAggregator(clock=FakeClock(10.0, 10.5, 11.0))
+        aggregator.observe("x")
+        timings = aggregator.timings()
+        assert timings["time_to_first_token"] == pytest.approx(0.5)
+        assert timings["total_time"] == pytest.approx(1.0)
+
+    def test_collect(self):
+        """Test collect merges a stream into a single response."""
+        usage = {"prompt_tokens": 1, "completion_tokens": 2, "total_tokens": 3}
+        stream = [
+            LLMResponse(content="Hel", thinking="hm", done=False),
+            LLMResponse(content="lo", done=True, finish_reason="stop", usage=usage, timings={"chunks": 2}),
+        ]
+        result = StreamAggregator.collect(iter(stream))
+        assert result.content == "Hello"
+        assert result.thinking == "hm"
+        assert result.finish_reason == "stop"
+        assert result.usage == usage
+        assert result.timings == {"chunks": 2}
+        assert result.done is True
+
+    def test_collect_without_thinking(self):
+        """Test collect leaves thinking unset when no chunk has any."""
+        result = StreamAggregator.collect([LLMResponse(content="a", done=False), LLMResponse(content="b")])
+        assert result.thinking is None
+
+    def test_collect_empty(self):
+        """Test collect of an empty stream returns an empty response."""
+        result = StreamAggregator.collect([])
+        assert result.content == ""
+        assert result.done is True
@@ -0,0 +1,126 @@
+import math
+import random
+import pytest
+from lib.commons.Deadline import Deadline, DeadlineExceeded
+from lib.core.providers.FakeProvider import FakeProvider, FakeProviderError
+from lib.core.providers.model.LLMProviderConfiguration import ProviderConfiguration
+
+
+@pytest.fixture
+def provider():
+    """The FakeProvider with a recording sleep, restored to its defaults afterwards."""
+    instance = FakeProvider.get_instance()
+    sleeps = []
+    instance.configure(sleep=sleeps.append, **FakeProvider.DEFAULTS)
+    instance.sleeps = sleeps
+    yield instance
+    instance.configure(**FakeProvider.DEFAULTS)
+
+
+class TestFakeProvider:
+    def test_singleton_instance(self):
+        """Test that FakeProvider is a singleton."""
+        assert FakeProvider.get_instance() is FakeProvider.get_instance()
+        with pytest.raises(Exception, match="This class is a singleton!"):
+            FakeProvider()
+
+    def test_configure_rejects_unknown_settings(self, provider):
+        """Test unknown settings and distributions are rejected."""
+        with pytest.raises(ValueError):
+            provider.configure(speed=1)
+        with pytest.raises(ValueError):
+            provider.configure(distribution="pareto")
+
+    def test_simple_chat(self, provider):
+        """Test a non-streamed answer waits for the first token and the generation time."""
+        provider.configure(distribution="constant", latency=0.5, tokens_per_second=10, output_tokens=5)
+        result = provider.simple_chat("a b c", "model", system_prompt="sys")
+        assert len(result.content.split()) == 5
+        assert result.usage == {"prompt_tokens": 4, "completion_tokens": 5, "total_tokens": 9}
+        assert result.finish_reason == "stop" and result.done
+        assert provider.sleeps == [0.5, pytest.approx(0.4)]
+
+    def test_responses_are_deterministic(self, provider):
+        """Test the same seed and call order give the same answers."""
+        first = [provider.simple_chat("q", "m").content for _ in range(3)]
+        provider.configure(seed=0)
+        assert [provider.simple_chat("q", "m").content for _ in range(3)] == first
+        assert len(set(first)) == 3
+
+    def test_stream(self, provider):
+        """Test a streamed answer yields one chunk per token then usage and timings."""
+        provider.configure(distribution="constant", latency=0.1, tokens_per_second=4, output_tokens=3)
+        chunks = list(provider.chat("q", "model", config=ProviderConfiguration(stream=True, think=False)))
+        assert [chunk.done for chunk in chunks] == [False, False, False, True]
+        assert chunks[-1].usage["completion_tokens"] == 3
+        assert chunks[-1].timings["chunks"] == 3
+        assert provider.sleeps == [0.1, 0.25, 0.25]
+
+    def test_waits_are_bounded_by_the_deadline(self, provider):
+        """Test a simulated wait ending after the deadline is cut short and raises, streams included."""
+        provider.configure(distribution="constant", latency=10, tokens_per_second=1, output_tokens=3)
+        with Deadline(timeout=5), pytest.raises(DeadlineExceeded):
+            provider.simple_chat("q", "model")
+        assert len(provider.sleeps) == 1 and 4 < provider.sleeps[0] <= 5
+        provider.configure(latency=0.1)
+        with Deadline(timeout=0.5):
+            stream = provider.simple_chat("q", "model", config=ProviderConfiguration(stream=True, think=False))
+        with pytest.raises(DeadlineExceeded):
+            list(stream)
+        provider.configure(embed_latency=1)
+        with Deadline(timeout=0), pytest.raises(DeadlineExceeded):
+            provider.embed("text")
+
+    def test_latency_distributions(self, provider):
+        """Test every distribution draws around the configured latency."""
+        for distribution in ("constant", "uniform", "lognormal", "exponential"):
+            provider.configure(distribution=distribution, latency=0.2)
+            rng = random.Random(1)
+            samples = [provider.sample_latency(rng) for _ in range(2000)]
+            center = sorted(samples)[1000] if distribution == "lognormal" else sum(samples) / len(samples)
+            assert center == pytest.approx(0.2, rel=0.1)
+            assert min(samples) >= 0
+        provider.configure(latency=0)
+        assert provider.sample_latency(random.Random(1)) == 0.0
+
+    def test_errors(self, provider):
+        """Test errors are raised with the configured probability."""
+        provider.configure(error_rate=1.0)
+        with pytest.raises(FakeProviderError):
+            provider.simple_chat("q", "m")
+        provider.configure(error_rate=0.3, output_tokens=1)
+        failures = 0
+        for _ in range(500):
+            try:
+                provider.simple_chat("q", "m")
+            except FakeProviderError:
+                failures += 1
+        assert 100 < failures < 200
+
+    def test_agentic_chat_calls_tools(self, provider):
+        """Test tools are invoked with the configured arguments after a simulated round trip."""
+        calls = []
+        tools = {"add": lambda a=0, b=0: calls.append(("add", a + b)) or a + b,
+                 "ping": lambda: calls.append(("ping", None)) or "pong"}
+        provider.configure(distribution="constant", latency=0.2, tool_latency=0.3, tokens_per_second=0,
+                           tool_arguments={"add": {"a": 1, "b": 2}})
+        result = provider.chat("q", "model", system_prompt="s", tools=tools)
+        assert calls == [("add", 3), ("ping", None)]
+        assert result.usage["prompt_tokens"] == 4
+        assert provider.sleeps == [0.3, 0.2]
+        provider.configure(tool_call_rate=0.0)
+        provider.agentic_chat("q", "model", None, None, tools)
+        assert len(calls) == 2
+
+    def test_embeddings(self, provider):
+        """Test embeddings are normalized, deterministic and similar for texts sharing words."""
+        provider.configure(embedding_dimensions=16, embed_latency=0.01)
+        a = provider.embed("invoice refund policy")
+        assert len(a) == 16 and math.isclose(sum(x * x for x in a), 1.0, rel_tol=1e-9)
+        batch = provider.embed_batch(["invoice refund policy", "invoice refund", "kitchen menu"])
+        assert batch[0] == a
+        similarity = [sum(x * y for x, y in zip(a, b)) for b in batch[1:]]
+        assert similarity[0] > similarity[1]
+        assert provider.sleeps == [0.01, 0.01]
+        assert provider.embed_batch([]) == []
+        assert provider.embed("") == [0.0] * 16
@@ -1,5 +1,6 @@
 import pytest
 from unittest.mock import MagicMock
+from lib.commons.Deadline import Deadline, DeadlineExceeded
 from lib.core.providers.LLMProvider import Provider
 from lib.core.providers.model.LLMProviderConfiguration import ProviderConfiguration
 
@@ -67,3 +68,27 @@ class TestLLMProvider:
         provider = ConcreteProvider()
         result = provider.embed("text", "embed_model")
         assert result is None
+
+    def test_embed_batch_default_calls_embed_per_text(self):
+        """Test the default embed_batch embeds texts one by one, in order."""
+        provider = ConcreteProvider()
+        provider.embed = MagicMock(side_effect=lambda text, **kwargs: [float(len(text))])
+        assert provider.embed_batch(["a", "bbb"]) == [[1.0], [3.0]]
+        provider.embed.assert_called_with(text="bbb")
+
+    def test_embed_batch_default_forwards_model(self):
+        """Test the default embed_batch forwards the embedding model."""
+        provider = ConcreteProvider()
+        provider.embed = MagicMock(return_value=[0.0])
+        provider.embed_batch(["a"], embedding_model="m")
+        provider.embed.assert_called_once_with(text="a", embedding_model="m")
+
+    def test_call_tool_honors_the_deadline(self):
+        """Test a tool is called with its arguments, and not called once the deadline expired."""
+        tool = MagicMock(return_value="result")
+        with Deadline(timeout=5):
+            assert Provider.call_tool("lookup", tool, {"key": "k"}) == "result"
+        tool.assert_called_once_with(key="k")
+        with Deadline(timeout=0), pytest.raises(DeadlineExceeded):
+            Provider.call_tool("lookup", tool, {})
+        assert tool.call_count == 1
@@ -24,6 +24,13 @@ class TestLLMProviderFactory:
         result = LLMProviderFactory.get_instance()
         assert result == mock_provider
 
+    @patch('lib.core.providers.LLMProviderFactory.fake_provider')
+    @patch('lib.core.providers.LLMProviderFactory.LLM_PROVIDER', 'fake')
+    def test_get_instance_fake(self, mock_provider):
+        """Test get_instance returns FakeProvider when provider is fake."""
+        result = LLMProviderFactory.get_instance()
+        assert result == mock_provider
+
     @patch('lib.core.providers.LLMProviderFactory.LLM_PROVIDER', 'unknown')
     def test_get_instance_unknown(self):
         """Test get_instance returns None for unknown provider."""
@@ -1,8 +1,10 @@
 import json
+import logging
 import types
 import pytest
 from unittest.mock import patch, MagicMock
 
+from lib.commons.Deadline import Deadline, DeadlineExceeded
 from lib.core.providers.LiteLLMProvider import LiteLLMProvider
 from lib.core.providers.model.LLMProviderConfiguration import ProviderConfiguration
 from lib.core.providers.model.LLMResponse import LLMResponse
@@ -101,6 +103,19 @@ class TestLiteLLMProvider:
         assert chunks[1].done is True
         assert chunks[1].finish_reason == "stop"
 
+    @patch('lib.core.providers.LiteLLMProvider.litellm.get_supported_openai_params')
+    @patch('lib.core.providers.LiteLLMProvider.litellm.completion')
+    def test_stream_usage_only_where_supported(self, mock_completion, mock_supported):
+        """Test stream_options is only sent to models whose supported parameters list it."""
+        provider = LiteLLMProvider.get_instance()
+        config = ProviderConfiguration(stream=True, think=False)
+        for supported, expected in ((["stream", "stream_options"], True), (["stream"], False), (None, False)):
+            mock_supported.return_value = supported
+            mock_completion.return_value = iter([])
+            list(provider.simple_chat(prompt="Hello", model="openai/local-model", config=config))
+            assert ("stream_options" in mock_completion.call_args.kwargs) is expected
+        mock_supported.assert_called_with(model="openai/local-model")
+
     @patch('lib.core.providers.LiteLLMProvider.litellm.completion')
     def test_simple_chat_no_system_prompt(self, mock_completion):
         """Test simple_chat omits system message when system_prompt is None."""
@@ -135,6 +150,64 @@ class TestLiteLLMProvider:
         call_kwargs = mock_completion.call_args[1]
         assert call_kwargs["api_base"] == "http://localhost:11434"
 
+    @patch('lib.core.providers.LiteLLMProvider.litellm.completion')
+    def test_simple_chat_streaming_usage_in_trailing_chunk(self, mock_completion):
+        """Test usage reported in a trailing choice-less chunk is attached to the final LLMResponse."""
+        chunk1 = MagicMock()
+        chunk1.usage = None
+        chunk1.choices[0].delta.content = "Hel"
+        chunk1.choices[0].delta.role = "assistant"
+        chunk1.choices[0].finish_reason = None
+
+        chunk2 = MagicMock()
+        chunk2.usage = None
+        chunk2.choices[0].delta.content = "lo!"
+        chunk2.choices[0].delta.role = "assistant"
+        chunk2.choices[0].finish_reason = "stop"
+
+        usage_chunk = MagicMock()
+        usage_chunk.choices = []
+        usage_chunk.usage.prompt_tokens = 4
+        usage_chunk.usage.completion_tokens = 2
+        usage_chunk.usage.total_tokens = 6
+
+        mock_completion.return_value = iter([chunk1, chunk2, usage_chunk])
+
+        config = ProviderConfiguration(stream=True, think=False)
+        provider = LiteLLMProvider.get_instance()
+        chunks = list(provider.simple_chat(prompt="Hello", model="openai/gpt-4o", config=config))
+
+        assert [c.content for c in chunks] == ["Hel", "lo!"]
+        assert chunks[0].usage is None
+        assert chunks[0].timings is None
+        final = chunks[-1]
+        assert final.done is True
+        assert final.finish_reason == "stop"
+        assert final.usage == {"prompt_tokens": 4, "completion_tokens": 2, "total_tokens": 6}
+        assert final.timings["chunks"] == 2
+        assert final.timings["time_to_first_token"] >= 0
+        assert final.timings["inter_token_latency"] >= 0
+
+    def test_normalize_stream_usage_without_finish_reason(self):
+        """Test a final LLMResponse is emitted when the backend only reports usage."""
+        usage_chunk = MagicMock()
+        usage_chunk.choices = []
+        usage_chunk.usage.prompt_tokens = 1
+        usage_chunk.usage.completion_tokens = 0
+        usage_chunk.usage.total_tokens = 1
+
+        chunks = list(LiteLLMProvider._normalize_stream(iter([usage_chunk])))
+
+        assert len(chunks) == 1
+        assert chunks[0].done is True
+        assert chunks[0].content == ""
+        assert chunks[0].usage["total_tokens"] == 1
+        assert chunks[0].timings["time_to_first_token"] is None
+
+    def test_normalize_stream_empty(self):
+        """Test an empty stream yields nothing."""
+        assert list(LiteLLMProvider._normalize_stream(iter([]))) == []
+
     # ------------------------------------------------------------------
     # agentic_chat
     # ------------------------------------------------------------------
@@ -210,8 +283,8 @@ class TestLiteLLMProvider:
         assert tool_message["tool_call_id"] == "call_abc"
 
     @patch('lib.core.providers.LiteLLMProvider.litellm.completion')
-    def test_agentic_chat_unknown_tool(self, mock_completion, capsys):
-        """Test agentic_chat prints a warning for unknown tool names."""
+    def test_agentic_chat_unknown_tool(self, mock_completion, caplog):
+        """Test agentic_chat logs a warning for unknown tool names."""
         mock_tc = MagicMock()
         mock_tc.function.name = "unknown_tool"
         mock_tc.function.arguments = "{}"
@@ -228,17 +301,19 @@ class TestLiteLLMProvider:
 
         config = ProviderConfiguration(stream=False, think=False)
         provider = LiteLLMProvider.get_instance()
-        provider.agentic_chat(
-            prompt="Do something",
-            model="openai/gpt-4o",
-            system_prompt=None,
-            assistant_prompt=None,
-            tools={},
-            config=config,
-        )
-
-        captured = capsys.readouterr()
-        assert "unknown_tool" in captured.out
+        with caplog.at_level(logging.WARNING, logger="lib.core.providers.LiteLLMProvider"):
+            provider.agentic_chat(
+                prompt="Do something",
+                model="openai/gpt-4o",
+                system_prompt=None,
+                assistant_prompt=None,
+                tools={},
+                config=config,
+            )
+
+        record, = caplog.records
+        assert record.levelno == logging.WARNING and "unknown_tool" in record.getMessage()
+        assert record.tool == "unknown_tool" and record.model == "openai/gpt-4o"
 
     @patch('lib.core.providers.LiteLLMProvider.litellm.completion')
     def test_agentic_chat_streaming(self, mock_completion):
@@ -262,6 +337,7 @@ class TestLiteLLMProvider:
         # The final (second) call should have stream=True
         final_call_kwargs = mock_completion.call_args_list[1][1]
         assert final_call_kwargs["stream"] is True
+        assert final_call_kwargs["stream_options"] == {"include_usage": True}
         assert isinstance(result, types.GeneratorType)
 
     # ------------------------------------------------------------------
@@ -286,6 +362,46 @@ class TestLiteLLMProvider:
         )
         assert result == [0.1, 0.2, 0.3]
 
+    @patch('lib.core.providers.LiteLLMProvider.litellm.embedding')
+    def test_embed_batch(self, mock_embedding):
+        """Test embed_batch embeds all texts with a single request."""
+        mock_embedding.return_value = MagicMock(
+            data=[{"embedding": [0.1], "index": 0}, {"embedding": [0.2], "index": 1}]
+        )
+        provider = LiteLLMProvider.get_instance()
+        result = provider.embed_batch(["a", "b"], embedding_model="openai/text-embedding-3-small")
+
+        mock_embedding.assert_called_once_with(model="openai/text-embedding-3-small", input=["a", "b"])
+        assert result == [[0.1], [0.2]]
+
+    @patch.dict('os.environ', {"LITELLM_API_BASE": "http://localhost:11434", "EMBEDDING_MODEL": "ollama/nomic"})
+    @patch('lib.core.providers.LiteLLMProvider.litellm.embedding')
+    def test_embed_batch_defaults(self, mock_embedding):
+        """Test embed_batch uses EMBEDDING_MODEL and LITELLM_API_BASE."""
+        mock_embedding.return_value = MagicMock(data=[{"embedding": [0.1]}])
+        LiteLLMProvider.get_instance().embed_batch(["a"])
+        call_kwargs = mock_embedding.call_args[1]
+        assert call_kwargs["model"] == "ollama/nomic"
+        assert call_kwargs["api_base"] == "http://localhost:11434"
+
+    @patch('lib.core.providers.LiteLLMProvider.litellm.embedding')
+    def test_embed_batch_empty(self, mock_embedding):
+        """Test embed_batch with no texts does not call LiteLLM."""
+        assert LiteLLMProvider.get_instance().embed_batch([]) == []
+        mock_embedding.assert_not_called()
+
+    @patch('lib.core.providers.LiteLLMProvider.litellm.embedding')
+    def test_requests_time_out_with_the_deadline(self, mock_embedding):
+        """Test requests made under a deadline time out when it expires, and are not sent after it."""
+        mock_embedding.return_value = MagicMock(data=[{"embedding": [0.1]}])
+        provider = LiteLLMProvider.get_instance()
+        with Deadline(timeout=5):
+            provider.embed_batch(["a"], embedding_model="openai/text-embedding-3-small")
+        assert 4 < mock_embedding.call_args[1]["timeout"] <= 5
+        with Deadline(timeout=0), pytest.raises(DeadlineExceeded):
+            provider.embed("a", embedding_model="openai/text-embedding-3-small")
+        assert mock_embedding.call_count == 1
+
     # ------------------------------------------------------------------
     # error handling
     # ------------------------------------------------------------------
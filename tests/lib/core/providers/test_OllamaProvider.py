@@ -1,7 +1,11 @@
+import logging
 import types
+import httpx
+import ollama
 import pytest
 from unittest.mock import patch, MagicMock
-from lib.core.providers.OllamaProvider import OllamaProvider
+from lib.commons.Deadline import Deadline, DeadlineExceeded
+from lib.core.providers.OllamaProvider import OllamaProvider, _apply_deadline, client
 from lib.core.providers.model.LLMProviderConfiguration import ProviderConfiguration
 from lib.core.providers.model.LLMResponse import LLMResponse
 
@@ -19,7 +23,7 @@ class TestOllamaProvider:
         with pytest.raises(Exception, match="This class is a singleton!"):
             OllamaProvider()
 
-    @patch('lib.core.providers.OllamaProvider.OllamaClient.chat')
+    @patch('lib.core.providers.OllamaProvider.client.chat')
     def test_simple_chat(self, mock_chat):
         """Test simple_chat returns a normalized LLMResponse."""
         mock_raw = MagicMock()
@@ -52,7 +56,7 @@ class TestOllamaProvider:
         assert result.thinking is None
         assert result.done is True
 
-    @patch('lib.core.providers.OllamaProvider.OllamaClient.chat')
+    @patch('lib.core.providers.OllamaProvider.client.chat')
     def test_simple_chat_streaming(self, mock_chat):
         """Test simple_chat with stream=True returns a generator of LLMResponse chunks."""
         chunk1 = MagicMock()
@@ -82,7 +86,36 @@ class TestOllamaProvider:
         assert chunks[1].done is True
         assert chunks[1].finish_reason == "stop"
 
-    @patch('lib.core.providers.OllamaProvider.OllamaClient.chat')
+    @patch('lib.core.providers.OllamaProvider.client.chat')
+    def test_simple_chat_streaming_usage(self, mock_chat):
+        """Test the final streamed chunk carries eval counters as usage and timings."""
+        chunk1 = MagicMock()
+        chunk1.message.content = "Hel"
+        chunk1.message.role = "assistant"
+        chunk1.done = False
+
+        chunk2 = MagicMock()
+        chunk2.message.content = ""
+        chunk2.message.role = "assistant"
+        chunk2.done = True
+        chunk2.done_reason = "stop"
+        chunk2.prompt_eval_count = 7
+        chunk2.eval_count = 3
+
+        mock_chat.return_value = iter([chunk1, chunk2])
+
+        config = ProviderConfiguration(think=False, stream=True)
+        provider = OllamaProvider.get_instance()
+        chunks = list(provider.simple_chat("prompt", "model", config=config))
+
+        assert chunks[0].usage is None
+        assert chunks[0].timings is None
+        assert chunks[1].usage == {"prompt_tokens": 7, "completion_tokens": 3, "total_tokens": 10}
+        assert chunks[1].timings["chunks"] == 1
+        assert chunks[1].timings["time_to_first_token"] >= 0
+        assert chunks[1].timings["inter_token_latency"] is None
+
+    @patch('lib.core.providers.OllamaProvider.client.chat')
     def test_agentic_chat_no_tools(self, mock_chat):
         """Test agentic_chat without tools returns a streaming generator when stream=True."""
         mock_first = MagicMock()
@@ -99,7 +132,7 @@ class TestOllamaProvider:
         assert mock_chat.call_count == 2
         assert isinstance(result, types.GeneratorType)
 
-    @patch('lib.core.providers.OllamaProvider.OllamaClient.chat')
+    @patch('lib.core.providers.OllamaProvider.client.chat')
     def test_agentic_chat_with_tools(self, mock_chat):
         """Test agentic_chat with tools returns a normalized LLMResponse."""
         mock_response = MagicMock()
@@ -128,7 +161,7 @@ class TestOllamaProvider:
         assert result.content == "Tool result processed"
         assert result.finish_reason == "stop"
 
-    @patch('lib.core.providers.OllamaProvider.OllamaClient.embed')
+    @patch('lib.core.providers.OllamaProvider.client.embed')
     def test_embed(self, mock_embed):
         """Test embed method."""
         mock_embed.return_value = {'embeddings': [['vec']]}
@@ -137,9 +170,9 @@ class TestOllamaProvider:
         mock_embed.assert_called_once_with(model="embed_model", input="text")
         assert result == ['vec']
 
-    @patch('lib.core.providers.OllamaProvider.OllamaClient.chat')
-    def test_agentic_chat_unknown_tool(self, mock_chat, capsys):
-        """Test agentic_chat prints a warning for unknown tool names."""
+    @patch('lib.core.providers.OllamaProvider.client.chat')
+    def test_agentic_chat_unknown_tool(self, mock_chat, caplog):
+        """Test agentic_chat logs a warning for unknown tool names."""
         mock_response = MagicMock()
         mock_tool_call = MagicMock()
         mock_tool_call.function.name = "unknown_tool"
@@ -158,7 +191,42 @@ class TestOllamaProvider:
         mock_chat.side_effect = [mock_response, mock_final_raw]
         config = ProviderConfiguration(think=False, stream=False)
         provider = OllamaProvider.get_instance()
-        provider.agentic_chat("prompt", "model", "system", "assistant", {}, config)
+        with caplog.at_level(logging.WARNING, logger="lib.core.providers.OllamaProvider"):
+            provider.agentic_chat("prompt", "model", "system", "assistant", {}, config)
 
-        captured = capsys.readouterr()
-        assert "unknown_tool" in captured.out
+        record, = caplog.records
+        assert record.levelno == logging.WARNING and "unknown_tool" in record.getMessage()
+        assert record.tool == "unknown_tool"
+
+    @patch('lib.core.providers.OllamaProvider.client.embed')
+    def test_embed_batch(self, mock_embed):
+        """Test embed_batch embeds all texts with a single request."""
+        mock_embed.return_value = {'embeddings': [[1.0], [2.0]]}
+        provider = OllamaProvider.get_instance()
+        result = provider.embed_batch(["a", "b"], "embed_model")
+        mock_embed.assert_called_once_with(model="embed_model", input=["a", "b"])
+        assert result == [[1.0], [2.0]]
+
+    @patch('lib.core.providers.OllamaProvider.client.embed')
+    def test_embed_batch_empty(self, mock_embed):
+        """Test embed_batch with no texts does not call Ollama."""
+        assert OllamaProvider.get_instance().embed_batch([]) == []
+        mock_embed.assert_not_called()
+
+    def test_requests_time_out_with_the_deadline(self):
+        """Test the shared client times each request out with the deadline of its caller."""
+        timeouts = []
+
+        def handler(request):
+            timeouts.append(request.extensions["timeout"]["read"])
+            return httpx.Response(200, json={"embeddings": [[1.0]]})
+
+        assert _apply_deadline in client._client.event_hooks["request"]
+        local = ollama.Client(event_hooks={"request": [_apply_deadline]}, transport=httpx.MockTransport(handler))
+        local.embed(model="m", input="text")
+        with Deadline(timeout=5):
+            local.embed(model="m", input="text")
+        assert timeouts[0] is None and 4 < timeouts[1] <= 5
+        with Deadline(timeout=0), pytest.raises(DeadlineExceeded):
+            local.embed(model="m", input="text")
+        assert len(timeouts) == 2
@@ -0,0 +1,41 @@
+import pytest
+from lib.core.service.model.IngestionStats import IngestionStats
+
+
+class FakeClock:
+    def __init__(self, *values):
+        self.values = list(values)
+
+    def __call__(self):
+        return self.values.pop(0)
+
+
+class TestIngestionStats:
+    def test_defaults(self):
+        """Test a new IngestionStats starts with zero counters."""
+        stats = IngestionStats()
+        assert (stats.documents, stats.bytes_read, stats.chunks, stats.batches, stats.retries) == (0, 0, 0, 0, 0)
+        assert stats.finished_at is None
+        assert stats.elapsed >= 0
+
+    def test_throughput(self):
+        """Test chunks_per_second uses the elapsed time until finish."""
+        stats = IngestionStats(clock=FakeClock(10.0, 14.0))
+        stats.chunks = 100
+        assert stats.finish() is stats
+        assert stats.elapsed == pytest.approx(4.0)
+        assert stats.chunks_per_second == pytest.approx(25.0)
+
+    def test_throughput_zero_elapsed(self):
+        """Test chunks_per_second is zero when no time elapsed."""
+        stats = IngestionStats(clock=FakeClock(1.0, 1.0))
+        stats.finish()
+        assert stats.chunks_per_second == 0.0
+
+    def test_to_dict(self):
+        """Test to_dict exposes counters and throughput."""
+        stats = IngestionStats(clock=FakeClock(0.0, 2.0))
+        stats.documents, stats.bytes_read, stats.chunks, stats.batches = 1, 10, 4, 2
+        stats.finish()
+        assert stats.to_dict() == {"documents": 1, "bytes_read": 10, "chunks": 4, "batches": 2, "retries": 0,
+                                   "elapsed": 2.0, "chunks_per_second": 2.0}
@@ -0,0 +1,13 @@
+from lib.core.service.model.RefreshReport import RefreshReport
+
+
+class TestRefreshReport:
+    def test_defaults_and_to_dict(self):
+        """Test all counters start at zero and are serialized."""
+        report = RefreshReport()
+        report.chunks_embedded = 3
+        d = report.to_dict()
+        assert d["chunks_embedded"] == 3
+        assert set(d) == {"documents_unchanged", "documents_updated", "documents_deleted", "chunks_unchanged",
+                          "chunks_reused", "chunks_embedded", "chunks_deleted", "rows_compacted"}
+        assert sum(d.values()) == 3
@@ -0,0 +1,11 @@
+from lib.core.service.model.UsageRecord import UsageRecord
+
+
+class TestUsageRecord:
+    def test_totals(self):
+        """Test usage is added and merged, and serialized with the tenant and model."""
+        record = UsageRecord("acme", "m").add(1, 10, 5, 0.5)
+        assert record.merge(UsageRecord("acme", "m").add(2, 1, 1, 0.25)) is record
+        assert record.total_tokens == 17
+        assert record.to_dict() == {"tenant": "acme", "model": "m", "requests": 3, "prompt_tokens": 11,
+                                    "completion_tokens": 6, "cost": 0.75}
@@ -0,0 +1,59 @@
+import pytest
+from lib.core.service.BM25Index import BM25Index, tokenize
+
+
+class TestBM25Index:
+    def test_tokenize(self):
+        """Test tokenize lowercases words and indexes identifiers whole and by parts."""
+        assert tokenize("Hello, World!") == ["hello", "world"]
+        assert tokenize("Error ERR-404 in foo_bar") == ["error", "err-404", "err", "404", "in", "foo_bar", "foo", "bar"]
+        assert tokenize("") == []
+
+    def test_search_ranks_rare_terms_higher(self):
+        """Test rows matching rare query terms and more terms score higher."""
+        index = BM25Index()
+        index.add(0, "the cat sat on the mat")
+        index.add(1, "the dog sat on the log")
+        index.add(2, "order SKU-1234 shipped")
+        assert len(index) == 3
+        assert index.search("sku-1234")[0][0] == 2
+        results = index.search("cat sat")
+        assert [row for row, _ in results] == [0, 1]
+        assert results[0][1] > results[1][1] > 0
+        assert index.search("unknown words") == []
+        assert index.search("sat", top_k=1)[0][0] in (0, 1)
+
+    def test_add_requires_consecutive_rows(self):
+        """Test rows must be added in order."""
+        index = BM25Index()
+        with pytest.raises(ValueError):
+            index.add(1, "text")
+
+    def test_remove(self):
+        """Test removed rows are no longer returned and statistics are updated."""
+        index = BM25Index()
+        index.add(0, "alpha beta")
+        index.add(1, "alpha")
+        index.remove(0, "alpha beta")
+        index.remove(0, "alpha beta")
+        index.remove(5, "missing")
+        assert len(index) == 1
+        assert index.average_length == 1.0
+        assert index.search("beta") == []
+        assert [row for row, _ in index.search("alpha")] == [1]
+
+    def test_empty_and_rebuild(self):
+        """Test an empty index returns nothing and rebuild renumbers rows."""
+        index = BM25Index()
+        assert index.average_length == 0.0
+        assert index.search("alpha") == []
+        index.rebuild(["beta", "alpha"])
+        assert index.search("alpha")[0][0] == 1
+        assert index.idf("missing") > index.idf("alpha") > 0
+
+    def test_search_allowed_rows(self):
+        """Test search can be restricted to a set of rows."""
+        index = BM25Index()
+        index.add(0, "alpha")
+        index.add(1, "alpha beta")
+        assert [row for row, _ in index.search("alpha", allowed={1})] == [1]
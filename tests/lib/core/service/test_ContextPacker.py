@@ -0,0 +1,69 @@
+from unittest.mock import patch
+from lib.core.service.ContextPacker import ContextPacker
+
+
+def words(n, prefix="w"):
+    return " ".join(f"{prefix}{i}" for i in range(n))
+
+
+class TestContextPacker:
+    def test_budget(self):
+        """Test the budget subtracts reserved tokens and prompt overhead."""
+        packer = ContextPacker(context_window=100, reserved_tokens=20)
+        assert packer.budget() == 80
+        assert packer.budget(prompt_overhead=30) == 50
+        assert packer.budget(prompt_overhead=500) == 0
+
+    @patch('lib.core.service.ContextPacker.TokenCounter.get_context_window', return_value=2048)
+    def test_default_context_window_from_model(self, mock_window):
+        """Test the context window defaults to the size known for the model."""
+        packer = ContextPacker(model="openai/gpt-4o")
+        assert packer.context_window == 2048
+        mock_window.assert_called_once_with("openai/gpt-4o")
+
+    def test_pack_by_score_within_budget(self):
+        """Test chunks are taken by score and skipped when they do not fit."""
+        packer = ContextPacker(context_window=11, reserved_tokens=0, separator=" ")
+        chunks = [(words(5, "a"), 0.2), (words(10, "b"), 0.9), (words(2, "c"), 0.5)]
+        result = packer.pack(chunks)
+        # 10 tokens for b, then neither c (2) nor a (5) fits in the remaining token
+        assert [score for _, score in result] == [0.9]
+        result = packer.pack(chunks, max_tokens=20)
+        assert [score for _, score in result] == [0.9, 0.5, 0.2]
+
+    def test_pack_skips_larger_chunk_but_takes_smaller(self):
+        """Test greedy packing continues past a chunk that does not fit."""
+        packer = ContextPacker(context_window=8, reserved_tokens=0, separator=" ")
+        chunks = [(words(5, "a"), 0.9), (words(5, "b"), 0.8), (words(2, "c"), 0.7)]
+        assert [score for _, score in packer.pack(chunks)] == [0.9, 0.7]
+
+    def test_pack_skips_duplicates_and_overlaps(self):
+        """Test exact and near-duplicate chunks are not packed twice."""
+        packer = ContextPacker(context_window=1000, reserved_tokens=0)
+        base = words(20)
+        overlapping = " ".join(base.split()[2:]) + " extra"
+        distinct = words(20, "z")
+        chunks = [(base, 0.9), (base, 0.8), (overlapping, 0.7), (distinct, 0.6), ("", 0.5)]
+        assert [score for _, score in packer.pack(chunks)] == [0.9, 0.6]
+
+    def test_pack_short_chunks(self):
+        """Test chunks shorter than a shingle are deduplicated by exact content."""
+        packer = ContextPacker(context_window=1000, reserved_tokens=0)
+        result = packer.pack([("Hello there", 0.9), ("hello  there", 0.8), ("bye", 0.1)])
+        assert [chunk for chunk, _ in result] == ["Hello there", "bye"]
+
+    def test_pack_stops_when_budget_exhausted(self):
+        """Test packing stops as soon as no budget remains."""
+        packer = ContextPacker(context_window=3, reserved_tokens=0)
+        assert packer.pack([("a b c", 0.9), ("d", 0.1)]) == [("a b c", 0.9)]
+
+    def test_pack_text(self):
+        """Test pack_text joins packed chunks with the separator."""
+        packer = ContextPacker(context_window=100, reserved_tokens=0, separator="\n--\n")
+        text = packer.pack_text([("first chunk", 0.4), ("second chunk", 0.6)])
+        assert text == "second chunk\n--\nfirst chunk"
+
+    def test_pack_respects_prompt_overhead(self):
+        """Test prompt overhead reduces the budget when no explicit max is given."""
+        packer = ContextPacker(context_window=10, reserved_tokens=0)
+        assert packer.pack([("a b c d e", 1.0)], prompt_overhead=6) == []
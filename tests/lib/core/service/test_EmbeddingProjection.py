@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from lib.core.service.EmbeddingProjection import EmbeddingProjection, MatryoshkaProjection, PCAProjection
+
+
+class TestMatryoshkaProjection:
+    def test_transform_keeps_prefix(self):
+        """Test vectors and matrices are truncated to their leading components."""
+        projection = MatryoshkaProjection(2)
+        assert projection.fitted
+        assert projection.fit([[1.0, 2.0, 3.0]]) is projection
+        assert projection.transform([1.0, 2.0, 3.0]).tolist() == [1.0, 2.0]
+        result = projection.transform([[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])
+        assert result.dtype.name == "float32" and result.flags.c_contiguous
+        assert result.tolist() == [[1.0, 2.0], [4.0, 5.0]]
+
+    def test_invalid_dimensions(self):
+        """Test invalid sizes are rejected."""
+        with pytest.raises(ValueError):
+            MatryoshkaProjection(0)
+        with pytest.raises(ValueError):
+            MatryoshkaProjection(4).transform([1.0, 2.0])
+
+
+class TestPCAProjection:
+    def test_fit_and_transform(self):
+        """Test the projection keeps the directions of largest variance."""
+        rng = np.random.default_rng(0)
+        data = np.zeros((200, 3), dtype=np.float32)
+        data[:, 1] = rng.standard_normal(200) * 10
+        data[:, 2] = rng.standard_normal(200) * 0.1
+        data += [5.0, 5.0, 5.0]
+        projection = PCAProjection(1)
+        assert not projection.fitted
+        assert projection.fit(data) is projection
+        assert projection.explained_variance_ratio > 0.99
+        assert abs(projection.components[0, 1]) == pytest.approx(1.0, abs=1e-3)
+        projected = projection.transform(data)
+        assert projected.shape == (200, 1)
+        assert np.abs(projected[:, 0]) == pytest.approx(np.abs(data[:, 1] - data[:, 1].mean()), abs=0.1)
+        assert projection.transform(data[0]).shape == (1,)
+
+    def test_fit_samples_the_corpus(self):
+        """Test the fit uses at most sample_size embeddings and constant data is handled."""
+        projection = PCAProjection(1, sample_size=5).fit(np.ones((50, 2)))
+        assert projection.fitted
+        assert projection.explained_variance_ratio == 1.0
+
+    def test_errors(self):
+        """Test invalid sizes and transforming before fitting are rejected."""
+        with pytest.raises(ValueError):
+            PCAProjection(0)
+        with pytest.raises(ValueError):
+            PCAProjection(3).fit([[1.0, 2.0], [3.0, 4.0], [5.0, 7.0]])
+        with pytest.raises(ValueError):
+            PCAProjection(1).transform([1.0, 2.0])
+
+
+class TestEmbeddingProjection:
+    def test_base_class_defaults(self):
+        """Test a projection without parameters is always fitted."""
+        class Negate(EmbeddingProjection):
+            dimensions = 2
+
+            def transform(self, embeddings):
+                super().transform(embeddings)
+                return -np.asarray(embeddings, dtype=np.float32)
+
+        projection = Negate()
+        assert projection.fitted
+        assert projection.fit([[1.0, 2.0]]) is projection
+        assert projection.transform([1.0, 2.0]).tolist() == [-1.0, -2.0]
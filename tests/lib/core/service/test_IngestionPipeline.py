@@ -0,0 +1,145 @@
+import pytest
+from unittest.mock import patch
+from lib.core.service.IngestionPipeline import IngestionPipeline
+from lib.core.service.KnowledgeStore import KnowledgeStore
+from lib.core.service.TextChunker import TextChunker
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.txt").write_text("First paragraph line one\nline two.\n\nSecond paragraph.\n")
+    (tmp_path / "sub" / "b.md").write_text("# Title\n\nSome *markdown* text.\n")
+    (tmp_path / "sub" / "c.html").write_text(
+        "<html><head><script>alert('x')</script></head><body><h1>Heading &amp; more</h1>"
+        "<p>Para <b>one</b><br>next line</p><div>Block</div></body></html>")
+    (tmp_path / "ignored.bin").write_bytes(b"\x00\x01")
+    return tmp_path
+
+
+class TestIngestionPipeline:
+    def test_iter_files(self, corpus):
+        """Test directories are walked recursively in sorted order, unsupported files skipped."""
+        pipeline = IngestionPipeline()
+        files = list(pipeline.iter_files(str(corpus)))
+        assert [f[len(str(corpus)) + 1:] for f in files] == ["a.txt", "sub/b.md", "sub/c.html"]
+        assert list(pipeline.iter_files(str(corpus / "a.txt"))) == [str(corpus / "a.txt")]
+        assert list(pipeline.iter_files([str(corpus / "ignored.bin")])) == []
+
+    def test_html_to_text(self):
+        """Test HTML is sanitized into one line per block, without scripts or markup."""
+        text = IngestionPipeline().html_to_text(
+            "<script>evil()</script><h1>A &amp; B</h1><p>x <i>y</i><br/>z</p>")
+        lines = [line for line in text.splitlines() if line]
+        assert lines == ["A & B", "x y", "z"]
+
+    def test_read_blocks_text(self, corpus):
+        """Test text files are read as paragraphs."""
+        blocks = list(IngestionPipeline().read_blocks(str(corpus / "a.txt")))
+        assert blocks == ["First paragraph line one line two.", "Second paragraph."]
+
+    def test_read_blocks_html(self, corpus):
+        """Test HTML files are sanitized before being split into blocks."""
+        blocks = list(IngestionPipeline().read_blocks(str(corpus / "sub" / "c.html")))
+        assert "alert" not in " ".join(blocks)
+        assert blocks[0].startswith("Heading & more")
+
+    def test_read_blocks_bounded(self, tmp_path):
+        """Test long paragraphs are cut at max_block_chars."""
+        path = tmp_path / "long.txt"
+        path.write_text("\n".join(["x" * 10] * 5))
+        blocks = list(IngestionPipeline(max_block_chars=25).read_blocks(str(path)))
+        assert len(blocks) == 3
+        assert all(len(block) <= 25 for block in blocks)
+
+    def test_read_blocks_cuts_long_lines(self, tmp_path):
+        """Test lines longer than max_block_chars are cut, in text and HTML files."""
+        (tmp_path / "long.txt").write_text("a" * 25 + "b\nshort\n")
+        (tmp_path / "long.html").write_text("<p>" + "a" * 25 + "</p><p>short</p>")
+        pipeline = IngestionPipeline(max_block_chars=10)
+        assert list(pipeline.read_blocks(str(tmp_path / "long.txt"))) == ["a" * 10, "a" * 10, "aaaaab", "short"]
+        assert list(pipeline.read_blocks(str(tmp_path / "long.html"))) == ["a" * 10, "a" * 10, "aaaaa", "short"]
+
+    def test_read_blocks_cuts_long_lines_between_words(self, tmp_path):
+        """Test long lines are cut at whitespace, a word straddling a read being kept whole."""
+        (tmp_path / "words.txt").write_text("alpha bravo charlie delta echo\nfoxtrot golf\n\nhotel")
+        (tmp_path / "words.html").write_text("<p>alpha bravo charlie delta echo</p>")
+        pipeline = IngestionPipeline(max_block_chars=10)
+        assert list(pipeline.read_blocks(str(tmp_path / "words.txt"))) == \
+            ["alpha", "bravo", "charlie", "delta echo", "foxtrot", "golf", "hotel"]
+        assert list(pipeline.read_blocks(str(tmp_path / "words.html"))) == ["alpha", "bravo", "charlie", "delta echo"]
+
+    def test_line_of_block_size(self, tmp_path):
+        """Test a line of exactly max_block_chars, read as two pieces, is not followed by a blank line."""
+        pipeline = IngestionPipeline(max_block_chars=10)
+        assert list(pipeline._lines(["abcd efghi", "\n", "jk\n", "\n", "lm"])) == ["abcd efghi", "jk", "", "lm"]
+        (tmp_path / "exact.txt").write_text("abcd efghi\njk\nlm\n\nno")
+        assert list(pipeline.read_blocks(str(tmp_path / "exact.txt"))) == ["abcd efghi", "jk lm", "no"]
+
+    def test_iter_chunks_updates_stats(self, corpus):
+        """Test chunking counts documents and bytes."""
+        from lib.core.service.model.IngestionStats import IngestionStats
+        stats = IngestionStats()
+        chunks = list(IngestionPipeline().iter_chunks(str(corpus), stats))
+        assert len(chunks) == 3
+        assert stats.documents == 3
+        assert stats.bytes_read > 0
+
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_run(self, mock_provider, corpus):
+        """Test run embeds chunks in batches into the store and reports progress."""
+        mock_provider.embed_batch.side_effect = lambda texts: [[1.0, float(len(t))] for t in texts]
+        reports = []
+        pipeline = IngestionPipeline(chunker=TextChunker(chunk_tokens=4, overlap_tokens=0), batch_size=2)
+        store = KnowledgeStore()
+        stats = pipeline.run(str(corpus), store, progress=lambda s: reports.append(s.chunks))
+
+        assert len(store) == stats.chunks
+        assert stats.documents == 3
+        assert stats.batches == mock_provider.embed_batch.call_count
+        assert reports[-1] == stats.chunks
+        assert len(reports) == stats.batches
+        assert all(len(call.args[0]) <= 2 for call in mock_provider.embed_batch.call_args_list)
+        assert stats.finished_at is not None
+
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_run_concurrent(self, mock_provider, corpus):
+        """Test run embeds with several requests in flight when configured."""
+        mock_provider.embed_batch.side_effect = lambda texts: [[1.0, float(len(t))] for t in texts]
+        pipeline = IngestionPipeline(chunker=TextChunker(chunk_tokens=4, overlap_tokens=0), batch_size=1,
+                                     concurrency=4, retries=1)
+        store = KnowledgeStore()
+        stats = pipeline.run(str(corpus), store)
+        assert len(store) == stats.chunks == stats.batches
+        assert stats.documents == 3
+
+    def test_file_hash(self, corpus):
+        """Test file_hash is stable and changes with the content."""
+        path = corpus / "a.txt"
+        first = IngestionPipeline.file_hash(str(path), block_size=4)
+        assert first == IngestionPipeline.file_hash(str(path))
+        path.write_text("changed")
+        assert IngestionPipeline.file_hash(str(path)) != first
+
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_refresh(self, mock_provider, corpus):
+        """Test refresh only re-embeds changed files and tombstones deleted ones."""
+        mock_provider.embed_batch.side_effect = lambda texts: [[1.0, float(len(t))] for t in texts]
+        pipeline = IngestionPipeline()
+        store = KnowledgeStore()
+
+        first = pipeline.refresh(str(corpus), store)
+        assert first.documents_updated == 3
+        assert len(store) == 3
+
+        (corpus / "a.txt").write_text("Brand new content.\n")
+        (corpus / "sub" / "b.md").unlink()
+        mock_provider.embed_batch.reset_mock()
+        with patch.object(IngestionPipeline, "read_blocks", wraps=pipeline.read_blocks) as read_blocks:
+            second = pipeline.refresh(str(corpus), store, compact_threshold=1.0)
+            assert [call.args[0] for call in read_blocks.call_args_list] == [str(corpus / "a.txt")]
+        assert second.documents_unchanged == 1
+        assert second.documents_updated == 1
+        assert second.documents_deleted == 1
+        mock_provider.embed_batch.assert_called_once_with(["Brand new content."])
+        assert len(store) == 2
@@ -52,3 +52,373 @@ class TestKnowledgeService:
         service = KnowledgeService()
         result = service.get_best_matching_chunk("query", [])
         assert result is None
+
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_get_packed_context(self, mock_provider):
+        """Test get_packed_context packs the most relevant chunks within the budget."""
+        from lib.core.service.ContextPacker import ContextPacker
+        mock_provider.embed.return_value = [1.0, 0.0]
+        knowledge = [("best chunk", [1.0, 0.0]), ("other chunk text here", [0.5, 0.5]), ("far", [0.0, 1.0])]
+        packer = ContextPacker(context_window=6, reserved_tokens=0)
+        service = KnowledgeService()
+        result = service.get_packed_context("query", knowledge, packer, candidate_pool=2, prompt_overhead=1)
+        assert [chunk for chunk, _ in result] == ["best chunk"]
+
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_build_knowledge_into_store(self, mock_provider):
+        """Test build_knowledge streams a generator into a store in batches."""
+        from lib.core.service.KnowledgeStore import KnowledgeStore
+        mock_provider.embed_batch.side_effect = lambda texts: [[float(len(t))] for t in texts]
+        progress = MagicMock()
+        store = KnowledgeStore()
+        service = KnowledgeService()
+        result = service.build_knowledge((c for c in ["a", "bb", "ccc"]), store=store, batch_size=2,
+                                         progress=progress)
+        assert result is store
+        assert [(chunk, list(vector)) for chunk, vector in store] == [("a", [1.0]), ("bb", [2.0]), ("ccc", [3.0])]
+        assert mock_provider.embed_batch.call_count == 2
+        assert [c.args[0] for c in progress.call_args_list] == [2, 1]
+        mock_provider.embed.assert_not_called()
+
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_update_document_embeds_only_new_chunks(self, mock_provider):
+        """Test update_document keeps unchanged rows, reuses identical chunks and tombstones removed ones."""
+        from lib.core.service.KnowledgeStore import KnowledgeStore
+        mock_provider.embed_batch.side_effect = lambda texts: [[float(len(t))] for t in texts]
+        store = KnowledgeStore()
+        store.add_batch(["keep", "drop"], [[1.0], [2.0]], doc_id="doc")
+        store.add("shared", [9.0], doc_id="other")
+        service = KnowledgeService()
+
+        report = service.update_document("doc", ["keep", "shared", "new", "new"], store, batch_size=1)
+
+        assert report.chunks_unchanged == 1
+        assert report.chunks_reused == 1
+        assert report.chunks_embedded == 1
+        assert report.chunks_deleted == 1
+        mock_provider.embed_batch.assert_called_once_with(["new"])
+        chunks = sorted((store.get(row)[0], list(store.get(row)[1])) for row in store.document_rows("doc"))
+        assert chunks == [("keep", [1.0]), ("new", [3.0]), ("new", [3.0]), ("shared", [9.0])]
+
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_refresh_knowledge(self, mock_provider):
+        """Test refresh_knowledge skips unchanged documents, updates changed ones and deletes missing ones."""
+        from lib.core.service.KnowledgeStore import KnowledgeStore
+        mock_provider.embed_batch.side_effect = lambda texts: [[float(len(t))] for t in texts]
+        store = KnowledgeStore()
+        service = KnowledgeService()
+
+        first = service.refresh_knowledge({"a": ["a1", "a2"], "b": ["b1"], "c": ["c1"]}, store)
+        assert first.documents_updated == 3
+        assert first.chunks_embedded == 4
+        assert len(store) == 4
+
+        mock_provider.embed_batch.reset_mock()
+        second = service.refresh_knowledge([("a", ["a1", "a2"]), ("b", ["b1", "b2"])], store,
+                                           compact_threshold=0.9)
+        assert second.documents_unchanged == 1
+        assert second.documents_updated == 1
+        assert second.documents_deleted == 1
+        assert second.chunks_unchanged == 1
+        assert second.chunks_embedded == 1
+        assert second.chunks_deleted == 1
+        assert second.rows_compacted == 0
+        mock_provider.embed_batch.assert_called_once_with(["b2"])
+        assert sorted(chunk for chunk, _ in store) == ["a1", "a2", "b1", "b2"]
+
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_refresh_knowledge_with_digest_and_compaction(self, mock_provider):
+        """Test provided digests skip documents without consuming their chunks, and compaction runs."""
+        from lib.core.service.KnowledgeStore import KnowledgeStore
+        mock_provider.embed_batch.side_effect = lambda texts: [[1.0] for _ in texts]
+        store = KnowledgeStore()
+        service = KnowledgeService()
+        service.refresh_knowledge([("a", ["x", "y"], b"v1"), ("b", ["z"], b"v1")], store)
+
+        untouched = MagicMock()
+        untouched.__iter__.side_effect = AssertionError("chunks of an unchanged document were read")
+        report = service.refresh_knowledge([("a", untouched, b"v1")], store, compact_threshold=0.2)
+        assert report.documents_unchanged == 1
+        assert report.documents_deleted == 1
+        assert report.rows_compacted == 1
+        assert store.tombstone_ratio == 0.0
+
+        report = service.refresh_knowledge([("a", ["x"], b"v1")], store, delete_missing=False)
+        assert report.documents_unchanged == 1
+
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_get_most_relevant_chunks_lexical(self, mock_provider):
+        """Test lexical mode ranks by BM25 without embedding the query."""
+        from lib.core.service.KnowledgeStore import KnowledgeStore
+        store = KnowledgeStore()
+        store.add_batch(["restart after ERR-42", "login works", "ERR-7 on save"], [[1.0], [1.0], [1.0]])
+        result = KnowledgeService().get_most_relevant_chunks("what is err-42", store, top_n=2, mode="lexical")
+        assert result[0][0] == "restart after ERR-42"
+        assert len(result) == 2
+        mock_provider.embed.assert_not_called()
+
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_get_most_relevant_chunks_hybrid_prefilters(self, mock_provider):
+        """Test hybrid mode only scores lexical candidates and fuses both rankings."""
+        from lib.core.service.KnowledgeStore import KnowledgeStore
+        mock_provider.embed.return_value = [1.0, 0.0]
+        store = KnowledgeStore()
+        store.add_batch(["sku A-1 red", "sku A-1", "sku B-2", "no match"],
+                        [[1.0, 0.1], [0.1, 1.0], [1.0, 0.5], [1.0, 0.0]])
+        result = KnowledgeService().get_most_relevant_chunks("sku a-1", store, top_n=3, mode="hybrid",
+                                                             candidate_pool=3)
+        # "no match" is the closest vector but not a lexical candidate, so it is never scored.
+        assert [chunk for chunk, _ in result] == ["sku A-1 red", "sku A-1", "sku B-2"]
+        assert result[0][1] == pytest.approx(1 / 62 + 1 / 61)
+
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_get_most_relevant_chunks_hybrid_falls_back_to_full_scan(self, mock_provider):
+        """Test hybrid mode compares every row when too few rows match lexically."""
+        from lib.core.service.KnowledgeStore import KnowledgeStore
+        mock_provider.embed.return_value = [1.0, 0.0]
+        store = KnowledgeStore()
+        store.add_batch(["alpha", "beta", "gamma"], [[0.0, 1.0], [1.0, 0.0], [1.0, 1.0]])
+        result = KnowledgeService().get_most_relevant_chunks("alpha", store, top_n=2, mode="hybrid")
+        assert [chunk for chunk, _ in result] == ["alpha", "beta"]
+
+    def test_get_most_relevant_chunks_invalid_mode(self):
+        """Test unknown modes and lists without a lexical index are rejected."""
+        from lib.core.service.KnowledgeStore import KnowledgeStore
+        service = KnowledgeService()
+        with pytest.raises(ValueError):
+            service.get_most_relevant_chunks("q", KnowledgeStore(), mode="fuzzy")
+        with pytest.raises(ValueError):
+            service.get_most_relevant_chunks("q", [("a", [1.0])], mode="hybrid")
+
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_get_most_relevant_chunks_with_filter(self, mock_provider):
+        """Test a filter restricts every mode to the matching rows."""
+        from lib.core.service.KnowledgeStore import KnowledgeStore
+        mock_provider.embed.return_value = [1.0, 0.0]
+        mock_provider.embed_batch.side_effect = lambda texts: [[1.0, 0.0] if "acme" in t else [0.9, 0.1]
+                                                               for t in texts]
+        service = KnowledgeService()
+        store = service.build_knowledge(["acme invoice", "acme refund"], store=KnowledgeStore(),
+                                        metadata={"tenant": "acme"})
+        service.build_knowledge(["globex invoice"], store=store, metadata={"tenant": "globex"})
+
+        where = {"tenant": "globex"}
+        assert [c for c, _ in service.get_most_relevant_chunks("invoice", store, top_n=3, where=where)] == \
+               ["globex invoice"]
+        assert [c for c, _ in service.get_most_relevant_chunks("invoice", store, mode="lexical", where=where)] == \
+               ["globex invoice"]
+        assert [c for c, _ in service.get_most_relevant_chunks("invoice", store, top_n=1, mode="hybrid",
+                                                               where={"tenant": "acme"})] == ["acme invoice"]
+        assert [c for c, _ in service.get_most_relevant_chunks("refund", store, top_n=2, mode="hybrid",
+                                                               where={"tenant": "acme"})] == \
+               ["acme refund", "acme invoice"]
+        with pytest.raises(ValueError):
+            service.get_most_relevant_chunks("invoice", [("a", [1.0, 0.0])], where=where)
+
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_get_most_relevant_chunks_with_post_retrieval(self, mock_provider):
+        """Test a post-retrieval stage receives a larger candidate pool and diversifies it."""
+        from lib.core.service.KnowledgeStore import KnowledgeStore
+        from lib.core.service.PostRetrievalStage import PostRetrievalStage
+        mock_provider.embed.return_value = [1.0, 0.3]
+        knowledge = [("a", [1.0, 0.0]), ("a copy", [1.0, -0.01]), ("b", [0.6, 0.8]), ("c", [0.0, 1.0])]
+        stage = PostRetrievalStage(candidate_pool=3)
+        service = KnowledgeService()
+        result = service.get_most_relevant_chunks("q", knowledge, top_n=2, post_retrieval=stage)
+        assert [chunk for chunk, _ in result] == ["a", "b"]
+
+        store = KnowledgeStore()
+        store.add_batch(["a word", "a word too", "b word"], [[1.0, 0.0], [1.0, -0.01], [0.6, 0.8]])
+        result = service.get_most_relevant_chunks("word", store, top_n=2, mode="lexical", post_retrieval=stage)
+        assert [chunk for chunk, _ in result][0] in ("a word", "b word")
+        assert len(result) == 2
+        packed = service.get_packed_context("q", knowledge, MagicMock(pack=lambda c, prompt_overhead: c),
+                                            candidate_pool=2, post_retrieval=stage)
+        assert [chunk for chunk, _ in packed] == ["a", "b"]
+
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_post_retrieval_deadline_defaults_to_the_current_deadline(self, mock_provider):
+        """Test the post-retrieval stage receives the expiry of the current deadline unless one is given."""
+        from lib.commons.Deadline import Deadline
+        mock_provider.embed.return_value = [1.0, 0.0]
+        stage = MagicMock(candidate_pool=10)
+        service = KnowledgeService()
+        with Deadline(timeout=5) as deadline:
+            service.get_most_relevant_chunks("q", [("a", [1.0, 0.0])], post_retrieval=stage)
+            assert stage.apply.call_args[1]["deadline"] == deadline.expires_at
+            service.get_most_relevant_chunks("q", [("a", [1.0, 0.0])], post_retrieval=stage, deadline=1.0)
+            assert stage.apply.call_args[1]["deadline"] == 1.0
+        service.get_most_relevant_chunks("q", [("a", [1.0, 0.0])], post_retrieval=stage)
+        assert stage.apply.call_args[1]["deadline"] is None
+
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_get_most_relevant_chunks_sharded(self, mock_provider):
+        """Test a sharded store is searched through its shards."""
+        from lib.commons.MathUtils import MathUtils
+        from lib.core.service.ShardedKnowledgeStore import ShardedKnowledgeStore
+        mock_provider.embed.return_value = [1.0, 0.1]
+        knowledge = [("a", [1.0, 0.0]), ("b", [0.0, 1.0]), ("c", [0.7, 0.7])]
+        with ShardedKnowledgeStore.build(knowledge, shards=2, workers=0) as store:
+            result = KnowledgeService().get_most_relevant_chunks("q", store, top_n=2)
+        assert [chunk for chunk, _ in result] == ["a", "c"]
+        assert result[0][1] == pytest.approx(MathUtils.cosine_similarity([1.0, 0.1], [1.0, 0.0]), abs=1e-6)
+
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_build_knowledge_concurrent_keeps_order(self, mock_provider):
+        """Test concurrent batches are written in dataset order and counted."""
+        import threading
+        import time
+        from lib.core.service.KnowledgeStore import KnowledgeStore
+        from lib.core.service.model.IngestionStats import IngestionStats
+        threads = set()
+
+        def embed_batch(texts):
+            threads.add(threading.current_thread().name)
+            time.sleep(0.01 * (5 - int(texts[0])))  # earlier batches finish last
+            return [[float(t)] for t in texts]
+
+        mock_provider.embed_batch.side_effect = embed_batch
+        stats = IngestionStats()
+        progress = []
+        store = KnowledgeService().build_knowledge((str(i) for i in range(5)), store=KnowledgeStore(), batch_size=1,
+                                                   concurrency=3, stats=stats, progress=progress.append)
+        assert [chunk for chunk, _ in store] == ["0", "1", "2", "3", "4"]
+        assert [list(vector) for _, vector in store] == [[0.0], [1.0], [2.0], [3.0], [4.0]]
+        assert (stats.chunks, stats.batches, stats.retries) == (5, 5, 0)
+        assert stats.finished_at is not None
+        assert progress == [1] * 5
+        assert all(name.startswith("embed") for name in threads)
+
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_build_knowledge_concurrent_list(self, mock_provider):
+        """Test concurrent mode without a store returns the (chunk, embedding) list."""
+        mock_provider.embed_batch.side_effect = lambda texts: [[1.0] for _ in texts]
+        knowledge = KnowledgeService().build_knowledge(["a", "b", "c"], batch_size=2, concurrency=2)
+        assert knowledge == [("a", [1.0]), ("b", [1.0]), ("c", [1.0])]
+        mock_provider.embed.assert_not_called()
+
+    @patch('lib.core.service.KnowledgeService.time.sleep')
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_build_knowledge_retries_failed_batches(self, mock_provider, mock_sleep):
+        """Test a failed or incomplete batch is retried with exponential backoff."""
+        from lib.core.service.KnowledgeStore import KnowledgeStore
+        from lib.core.service.model.IngestionStats import IngestionStats
+        mock_provider.embed_batch.side_effect = [ConnectionError("busy"), [[1.0]], [[1.0], [2.0]], [[3.0]]]
+        stats = IngestionStats()
+        store = KnowledgeService().build_knowledge(["a", "b", "c"], store=KnowledgeStore(), batch_size=2,
+                                                   retries=2, retry_delay=0.5, stats=stats)
+        assert [chunk for chunk, _ in store] == ["a", "b", "c"]
+        assert stats.retries == 2
+        assert [call.args[0] for call in mock_sleep.call_args_list] == [0.5, 1.0]
+
+    @patch('lib.core.service.KnowledgeService.time.sleep')
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_build_knowledge_raises_after_retries(self, mock_provider, mock_sleep):
+        """Test the error of a batch is raised once its retries are exhausted."""
+        mock_provider.embed_batch.side_effect = ConnectionError("down")
+        with pytest.raises(ConnectionError):
+            KnowledgeService().build_knowledge(["a", "b"], batch_size=1, concurrency=2, retries=1, retry_delay=0)
+        assert mock_provider.embed_batch.call_count >= 2
+
+    @patch('lib.core.service.KnowledgeService.time.sleep')
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_build_knowledge_retries_only_transient_errors(self, mock_provider, mock_sleep):
+        """Test timeouts, 429 and 5xx responses are retried, and other errors raised at once."""
+        import httpx
+        from lib.commons.Deadline import DeadlineExceeded
+        from lib.core.service.KnowledgeService import _is_transient
+        request = httpx.Request("POST", "http://localhost/api/embed")
+
+        def status(code):
+            return httpx.HTTPStatusError("error", request=request, response=httpx.Response(code, request=request))
+
+        for error in (TimeoutError(), httpx.ReadTimeout("slow", request=request), status(429), status(503)):
+            assert _is_transient(error)
+        for error in (DeadlineExceeded(), status(400), ValueError("bad input"), KeyError("embeddings")):
+            assert not _is_transient(error)
+        mock_provider.embed_batch.side_effect = status(400)
+        with pytest.raises(httpx.HTTPStatusError):
+            KnowledgeService().build_knowledge(["a"], batch_size=1, concurrency=2, retries=3)
+        assert mock_provider.embed_batch.call_count == 1 and not mock_sleep.called
+
+    @patch('lib.core.service.KnowledgeService.time.sleep')
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_build_knowledge_retries_within_the_deadline(self, mock_provider, mock_sleep):
+        """Test no retry sleeps past the current deadline, nor after it was cancelled."""
+        from lib.commons.Deadline import Deadline
+        from lib.core.service.KnowledgeStore import KnowledgeStore
+        mock_provider.embed_batch.side_effect = ConnectionError("busy")
+        with Deadline(timeout=1.5), pytest.raises(ConnectionError):
+            KnowledgeService().build_knowledge(["a"], store=KnowledgeStore(), retries=5, retry_delay=0.5)
+        assert [call.args[0] for call in mock_sleep.call_args_list] == [0.5, 1.0]
+        with Deadline() as deadline, pytest.raises(ConnectionError):
+            deadline.cancel()
+            KnowledgeService().build_knowledge(["a"], store=KnowledgeStore(), retries=5, retry_delay=0)
+        assert mock_sleep.call_count == 2
+
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_get_most_relevant_chunks_batch(self, mock_provider):
+        """Test batch retrieval embeds once and matches single-query retrieval block by block."""
+        vectors = {"east": [1.0, 0.1], "north": [0.1, 1.0]}
+        mock_provider.embed_batch.side_effect = lambda texts: [vectors[t] for t in texts]
+        mock_provider.embed.side_effect = lambda text: vectors[text]
+        knowledge = [("a", [1.0, 0.0]), ("b", [0.0, 1.0]), ("c", [0.7, 0.7]), ("d", [-1.0, 0.0]), ("e", [0.2, 0.9])]
+        service = KnowledgeService()
+        results = service.get_most_relevant_chunks_batch(["east", "north"], knowledge, top_n=2, block_size=2)
+        mock_provider.embed_batch.assert_called_once_with(["east", "north"])
+        for query, result in zip(["east", "north"], results):
+            expected = service.get_most_relevant_chunks(query, knowledge, top_n=2)
+            assert [chunk for chunk, _ in result] == [chunk for chunk, _ in expected]
+            assert [score for _, score in result] == pytest.approx([score for _, score in expected], abs=1e-6)
+
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_get_most_relevant_chunks_batch_stores(self, mock_provider):
+        """Test batch retrieval on filtered and sharded stores, and edge cases."""
+        from lib.core.service.KnowledgeStore import KnowledgeStore
+        from lib.core.service.ShardedKnowledgeStore import ShardedKnowledgeStore
+        mock_provider.embed_batch.side_effect = lambda texts: [[1.0, 0.0] for _ in texts]
+        store = KnowledgeStore()
+        store.add_batch(["a", "b"], [[1.0, 0.0], [0.9, 0.1]], metadata=[{"t": 1}, {"t": 2}])
+        service = KnowledgeService()
+        assert [[c for c, _ in r] for r in service.get_most_relevant_chunks_batch(["q"], store, where={"t": 2})] == \
+               [["b"]]
+        assert service.get_most_relevant_chunks_batch(["q", "r"], store, where={"t": 3}) == [[], []]
+        assert service.get_most_relevant_chunks_batch(["q"], store, top_n=0) == [[]]
+        assert service.get_most_relevant_chunks_batch([], store) == []
+        assert service.get_most_relevant_chunks_batch(["q"], []) == [[]]
+        mock_provider.embed.return_value = [1.0, 0.0]
+        assert service.get_most_relevant_chunks("q", store, where={"t": 3}) == []
+        store.delete(0)
+        assert [[c for c, _ in r] for r in service.get_most_relevant_chunks_batch(["q"], store)] == [["b"]]
+        store.add("c", [0.0, 1.0])
+        with ShardedKnowledgeStore.build(store, shards=2, workers=0) as sharded:
+            assert [[c for c, _ in r] for r in service.get_most_relevant_chunks_batch(["q"], sharded)] == [["b", "c"]]
+        with pytest.raises(ValueError):
+            service.get_most_relevant_chunks_batch(["q"], [("a", [1.0, 0.0])], where={"t": 1})
+
+    @patch('lib.core.service.KnowledgeService.current_provider')
+    def test_projected_store(self, mock_provider):
+        """Test store and query embeddings are projected, and PCA is fitted on the built corpus."""
+        from lib.core.service.EmbeddingProjection import MatryoshkaProjection, PCAProjection
+        from lib.core.service.KnowledgeStore import KnowledgeStore
+        from lib.core.service.ShardedKnowledgeStore import ShardedKnowledgeStore
+        vectors = {"east": [1.0, 0.1, 7.0], "north": [0.1, 1.0, -7.0], "northeast": [0.8, 0.9, 0.0]}
+        mock_provider.embed.side_effect = lambda text: vectors[text]
+        mock_provider.embed_batch.side_effect = lambda texts: [vectors[t] for t in texts]
+        service = KnowledgeService()
+
+        store = service.build_knowledge(["east", "north"], store=KnowledgeStore(projection=MatryoshkaProjection(2)))
+        assert store.dimensions == 2
+        assert service.get_most_relevant_chunks("northeast", store, top_n=1)[0][0] == "north"
+        assert [[c for c, _ in r] for r in service.get_most_relevant_chunks_batch(["east"], store, top_n=1)] == \
+               [["east"]]
+        assert service.get_most_relevant_chunks("east", store, top_n=1, mode="hybrid")[0][0] == "east"
+        with ShardedKnowledgeStore.build(store, shards=1, workers=0) as sharded:
+            assert sharded.projection is store.projection
+            assert service.get_most_relevant_chunks("east", sharded, top_n=1)[0][0] == "east"
+
+        store = service.build_knowledge(["east", "north"], store=KnowledgeStore(projection=PCAProjection(1)))
+        assert store.projection.fitted and store.dimensions == 1
+        service.update_document("doc", ["northeast"], store)
+        assert len(store.get(2)[1]) == 1
+        assert service.get_most_relevant_chunks("east", store, top_n=1)[0][0] == "east"
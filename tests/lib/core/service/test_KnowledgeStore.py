@@ -0,0 +1,287 @@
+import threading
+import time
+import numpy as np
+import pytest
+from array import array
+from unittest.mock import patch
+from lib.commons.MathUtils import MathUtils
+from lib.core.service.KnowledgeStore import KnowledgeStore
+
+
+class TestKnowledgeStore:
+    def test_empty(self):
+        """Test a new store is empty."""
+        store = KnowledgeStore()
+        assert len(store) == 0
+        assert list(store) == []
+        assert store.dimensions == 0
+
+    def test_add_and_get(self):
+        """Test add stores float32 embeddings and returns row ids."""
+        store = KnowledgeStore()
+        assert store.add("first", [1.0, 2.0]) == 0
+        assert store.add("second", [3.0, 4.0]) == 1
+        chunk, embedding = store.get(1)
+        assert chunk == "second"
+        assert isinstance(embedding, array)
+        assert embedding.typecode == "f"
+        assert list(embedding) == [3.0, 4.0]
+        assert store.dimensions == 2
+
+    def test_iterates_as_tuples(self):
+        """Test the store iterates as (chunk, embedding) tuples like a knowledge list."""
+        store = KnowledgeStore()
+        store.add_batch(["a", "b"], [[1.0], [2.0]])
+        assert [(chunk, list(vector)) for chunk, vector in store] == [("a", [1.0]), ("b", [2.0])]
+        assert len(store) == 2
+
+    def test_add_rejects_wrong_dimensions(self):
+        """Test embeddings must all have the same size."""
+        store = KnowledgeStore()
+        store.add("a", [1.0, 2.0])
+        with pytest.raises(ValueError, match="size 2"):
+            store.add("b", [1.0])
+
+    def test_add_batch_rejects_mismatched_lengths(self):
+        """Test add_batch requires one embedding per chunk."""
+        with pytest.raises(ValueError):
+            KnowledgeStore().add_batch(["a", "b"], [[1.0]])
+
+    def test_content_hash(self):
+        """Test content_hash is a stable 16-byte digest."""
+        from lib.core.service.KnowledgeStore import content_hash
+        assert content_hash("a") == content_hash("a")
+        assert content_hash("a") != content_hash("b")
+        assert len(content_hash("a")) == 16
+
+    def test_documents_and_hashes(self):
+        """Test rows are tracked per document and by content hash."""
+        from lib.core.service.KnowledgeStore import content_hash
+        store = KnowledgeStore()
+        store.add_batch(["a", "b"], [[1.0], [2.0]], doc_id="doc")
+        store.add("c", [3.0])
+        assert store.document_rows("doc") == [0, 1]
+        assert store.document_rows("missing") == []
+        assert store.row_hash(1) == content_hash("b")
+        assert list(store.find_embedding(content_hash("c"))) == [3.0]
+        assert store.find_embedding(content_hash("zzz")) is None
+        assert store.document_ids() == ["doc"]
+
+    def test_document_hash(self):
+        """Test document hashes are recorded and listed."""
+        store = KnowledgeStore()
+        assert store.get_document_hash("doc") is None
+        store.set_document_hash("doc", b"h")
+        assert store.get_document_hash("doc") == b"h"
+        assert store.document_ids() == ["doc"]
+
+    def test_delete_tombstones_rows(self):
+        """Test deleted rows are skipped by iteration and len."""
+        from lib.core.service.KnowledgeStore import content_hash
+        store = KnowledgeStore()
+        store.add_batch(["a", "b", "c"], [[1.0], [2.0], [3.0]], doc_id="doc")
+        store.delete(1)
+        store.delete(1)
+        assert len(store) == 2
+        assert [chunk for chunk, _ in store] == ["a", "c"]
+        assert list(store.rows()) == [0, 2]
+        assert store.is_deleted(1)
+        assert not store.is_deleted(0)
+        assert store.find_embedding(content_hash("b")) is None
+        assert store.document_rows("doc") == [0, 2]
+        assert store.tombstone_ratio == pytest.approx(1 / 3)
+
+    def test_duplicate_content_survives_deletion(self):
+        """Test find_embedding still returns a live duplicate once the first row with the content is deleted."""
+        from lib.core.service.KnowledgeStore import content_hash
+        store = KnowledgeStore()
+        store.add("same", [1.0], doc_id="first")
+        store.add("same", [2.0], doc_id="second")
+        store.delete_document("first")
+        assert list(store.find_embedding(content_hash("same"))) == [2.0]
+        store.delete(1)
+        assert store.find_embedding(content_hash("same")) is None
+
+    def test_delete_document(self):
+        """Test delete_document tombstones all rows and forgets the document."""
+        store = KnowledgeStore()
+        store.add_batch(["a", "b"], [[1.0], [2.0]], doc_id="doc")
+        store.add("c", [3.0])
+        store.set_document_hash("doc", b"h")
+        assert store.delete_document("doc") == 2
+        assert store.document_ids() == []
+        assert store.get_document_hash("doc") is None
+        assert [chunk for chunk, _ in store] == ["c"]
+
+    def test_compact(self):
+        """Test compact removes tombstones and renumbers rows."""
+        from lib.core.service.KnowledgeStore import content_hash
+        store = KnowledgeStore()
+        assert store.compact() == 0
+        store.add_batch(["a", "b", "c"], [[1.0], [2.0], [3.0]], doc_id="doc")
+        store.add("d", [4.0], doc_id="other")
+        store.delete(0)
+        store.delete(2)
+        assert store.compact() == 2
+        assert store.tombstone_ratio == 0.0
+        assert [chunk for chunk, _ in store] == ["b", "d"]
+        assert store.document_rows("doc") == [0]
+        assert store.document_rows("other") == [1]
+        assert list(store.find_embedding(content_hash("d"))) == [4.0]
+        assert store.get(1)[0] == "d"
+
+    def test_lexical_index_follows_store(self):
+        """Test the BM25 index is updated on add, delete and compact."""
+        store = KnowledgeStore()
+        store.add_batch(["error E-1", "error E-2", "unrelated"], [[1.0], [2.0], [3.0]])
+        assert store.lexical_index.search("e-2")[0][0] == 1
+        store.delete(0)
+        assert [row for row, _ in store.lexical_index.search("error")] == [1]
+        store.compact()
+        assert [row for row, _ in store.lexical_index.search("error")] == [0]
+        assert store.get(0)[0] == "error E-2"
+
+    def test_lexical_index_can_be_disabled(self):
+        """Test no lexical index is kept when disabled."""
+        store = KnowledgeStore(lexical=False)
+        store.add("a", [1.0])
+        store.delete(0)
+        store.compact()
+        assert store.lexical_index is None
+
+    def _tenant_store(self):
+        store = KnowledgeStore()
+        store.add("a", [1.0], metadata={"tenant": "acme", "type": "faq", "tags": ["billing", "vat"]})
+        store.add("b", [1.0], metadata={"tenant": "acme", "type": "manual"})
+        store.add("c", [1.0], metadata={"tenant": "globex", "type": "faq", "tags": ["billing"]})
+        store.add("d", [1.0])
+        return store
+
+    def test_metadata(self):
+        """Test metadata is stored per row and values are indexed per field."""
+        store = self._tenant_store()
+        assert store.get_metadata(0)["tenant"] == "acme"
+        assert store.get_metadata(3) is None
+        assert sorted(store.metadata_values("tenant")) == ["acme", "globex"]
+        assert store.metadata_values("missing") == []
+
+    def test_filter_rows(self):
+        """Test filter expressions are resolved from the metadata bitmaps."""
+        store = self._tenant_store()
+        assert store.filter_rows(None) == [0, 1, 2, 3]
+        assert store.filter_rows({"tenant": "acme"}) == [0, 1]
+        assert store.filter_rows({"tenant": "acme", "type": "faq"}) == [0]
+        assert store.filter_rows({"tags": "billing"}) == [0, 2]
+        assert store.filter_rows({"type": {"$in": ["manual", "other"]}}) == [1]
+        assert store.filter_rows({"tenant": {"$ne": "acme"}}) == [2, 3]
+        assert store.filter_rows({"tenant": {"$nin": ["acme", "globex"]}}) == [3]
+        assert store.filter_rows({"tags": {"$exists": True}}) == [0, 2]
+        assert store.filter_rows({"tags": {"$exists": False}}) == [1, 3]
+        assert store.filter_rows({"tenant": {"$eq": "globex"}}) == [2]
+        assert store.filter_rows({"$or": [{"type": "manual"}, {"tenant": "globex"}]}) == [1, 2]
+        assert store.filter_rows({"$and": [{"tags": "billing"}, {"tags": "vat"}]}) == [0]
+        assert store.filter_rows({"$not": {"tenant": "acme"}}) == [2, 3]
+        assert store.filter_rows({"tenant": "initech"}) == []
+
+    def test_filter_unknown_operator(self):
+        """Test unknown operators are rejected."""
+        store = self._tenant_store()
+        with pytest.raises(ValueError):
+            store.filter_rows({"$xor": []})
+        with pytest.raises(ValueError):
+            store.filter_rows({"tenant": {"$like": "a%"}})
+
+    def test_filter_skips_deleted_rows_and_survives_compaction(self):
+        """Test deleted rows never match and bitmaps are rebuilt by compact."""
+        store = self._tenant_store()
+        store.delete(0)
+        assert store.filter_rows({"tenant": "acme"}) == [1]
+        store.compact()
+        assert store.filter_rows({"tenant": "acme"}) == [0]
+        assert store.filter_rows({"tags": "billing"}) == [1]
+        assert store.filter_rows(None) == [0, 1, 2]
+
+    def test_filter_masks_grow_with_the_store(self):
+        """Test filters match rows added after the live mask grew, and deletions among them."""
+        store = KnowledgeStore()
+        store.add_batch([f"c{i}" for i in range(100)], [[1.0]] * 100,
+                        metadata=[{"parity": i % 2} for i in range(100)])
+        store.delete(99)
+        assert store.filter_rows({"parity": 1}) == list(range(1, 99, 2))
+        assert len(store.filter_rows(None)) == 99 and store.filter_mask(None).dtype == bool
+
+    def test_add_batch_metadata(self):
+        """Test add_batch accepts shared or per-chunk metadata."""
+        store = KnowledgeStore()
+        store.add_batch(["a", "b"], [[1.0], [2.0]], metadata={"tenant": "acme"})
+        store.add_batch(["c", "d"], [[1.0], [2.0]], metadata=[{"tenant": "x"}, None])
+        assert store.filter_rows({"tenant": "acme"}) == [0, 1]
+        assert store.filter_rows({"tenant": "x"}) == [2]
+        with pytest.raises(ValueError):
+            store.add_batch(["e"], [[1.0]], metadata=[{}, {}])
+
+    def test_matrix(self):
+        """Test the unit-norm matrix grows with the store and follows compaction."""
+        store = KnowledgeStore()
+        assert store.matrix().shape == (0, 0)
+        store.add_batch(["a", "b"], [[3.0, 4.0], [0.0, 0.0]])
+        assert store.matrix().tolist() == [[pytest.approx(0.6), pytest.approx(0.8)], [0.0, 0.0]]
+        for i in range(20):
+            store.add(f"c{i}", [0.0, 2.0])
+        assert store.matrix().shape == (22, 2)
+        store.delete(0)
+        store.compact()
+        store.add("d", [5.0, 0.0])
+        matrix = store.matrix()
+        assert matrix.shape == (22, 2)
+        assert matrix[0].tolist() == [0.0, 0.0] and matrix[-1].tolist() == [1.0, 0.0]
+
+    def test_concurrent_matrix(self):
+        """Test concurrent queries update the matrix one at a time while rows are added."""
+        store = KnowledgeStore(lexical=False)
+        normalize = MathUtils.normalize_rows
+        active, peak, norms = [0], [0], []
+        added = threading.Event()
+
+        def slow_normalize(rows):
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            time.sleep(0.002)
+            active[0] -= 1
+            return normalize(rows)
+
+        def query():
+            while not added.is_set():
+                norms.extend(np.linalg.norm(store.matrix(), axis=1).tolist())
+
+        with patch("lib.core.service.KnowledgeStore.MathUtils.normalize_rows", side_effect=slow_normalize):
+            threads = [threading.Thread(target=query) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for i in range(100):
+                store.add(f"c{i}", [float(i + 1), 1.0])
+                time.sleep(0.0005)
+            added.set()
+            for thread in threads:
+                thread.join()
+        assert peak[0] == 1 and norms == [pytest.approx(1.0, abs=1e-5)] * len(norms)
+        assert store.matrix().shape == (100, 2)
+
+    def test_reduce(self):
+        """Test reduce fits the projection on the live rows and projects every row."""
+        from lib.core.service.EmbeddingProjection import MatryoshkaProjection, PCAProjection
+        store = KnowledgeStore(projection=PCAProjection(1))
+        store.add_batch(["a", "b", "c", "d"], [[0.0, 1.0, 0.0], [0.0, 3.0, 0.1], [0.0, 5.0, 0.0], [9.0, 0.0, 9.0]])
+        store.matrix()
+        store.delete(3)
+        store.reduce()
+        assert store.projection.fitted and store.dimensions == 1
+        assert store.get(0)[1].typecode == "f" and len(store.get(0)[1]) == 1
+        assert store.matrix().shape == (4, 1)
+        with pytest.raises(ValueError):
+            store.reduce()
+        with pytest.raises(ValueError):
+            KnowledgeStore().reduce()
+        empty = KnowledgeStore()
+        empty.reduce(MatryoshkaProjection(2))
+        assert empty.projection.dimensions == 2 and empty.dimensions == 0
@@ -0,0 +1,97 @@
+import pytest
+from unittest.mock import MagicMock
+from lib.core.service.PostRetrievalStage import PostRetrievalStage, maximal_marginal_relevance
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+QUERY = [1.0, 0.3, 0.0]
+CANDIDATES = [
+    ("alpha", 0.99, [1.0, 0.05, 0.0]),
+    ("alpha again", 0.98, [1.0, 0.0, 0.0]),
+    ("beta", 0.7, [0.7, 0.7, 0.0]),
+    ("gamma", 0.5, [0.5, 0.0, 0.8]),
+]
+
+
+class TestMaximalMarginalRelevance:
+    def test_skips_near_duplicates(self):
+        """Test MMR prefers a diverse candidate over a near-duplicate of a selected one."""
+        embeddings = [embedding for _, _, embedding in CANDIDATES]
+        assert maximal_marginal_relevance(QUERY, embeddings, 2, 0.5) == [0, 2]
+        assert maximal_marginal_relevance(QUERY, embeddings, 2, 1.0) == [0, 1]
+
+    def test_relevance_and_bounds(self):
+        """Test explicit relevance is used and top_n is bounded by the candidates."""
+        embeddings = [[1.0, 0.0], [0.0, 1.0]]
+        assert maximal_marginal_relevance([1.0, 0.0], embeddings, 5, relevance=[0.0, 1.0]) == [1, 0]
+        assert maximal_marginal_relevance([1.0, 0.0], embeddings, 0) == []
+
+
+class TestPostRetrievalStage:
+    def test_diversifies_without_reranker(self):
+        """Test the stage applies MMR to the candidates."""
+        stage = PostRetrievalStage()
+        assert stage.apply("q", QUERY, CANDIDATES, 2) == [("alpha", 0.99), ("beta", 0.7)]
+        assert stage.apply("q", QUERY, [], 2) == []
+
+    def test_no_diversification(self):
+        """Test the retrieval order is kept when diversification is disabled or unneeded."""
+        stage = PostRetrievalStage(diversify=False)
+        assert stage.apply("q", QUERY, CANDIDATES, 2) == [("alpha", 0.99), ("alpha again", 0.98)]
+        assert PostRetrievalStage().apply("q", QUERY, CANDIDATES[:1], 2) == [("alpha", 0.99)]
+
+    def test_rerank_then_diversify(self):
+        """Test rerank scores reorder the candidates before MMR."""
+        reranker = MagicMock()
+        reranker.score.return_value = [1.0, 2.0, 9.0, 8.0]
+        stage = PostRetrievalStage(reranker=reranker, diversify=False)
+        assert stage.apply("q", QUERY, CANDIDATES, 2) == [("beta", 9.0), ("gamma", 8.0)]
+        reranker.score.assert_called_once_with("q", ["alpha", "alpha again", "beta", "gamma"])
+        assert stage.reranked == 1
+
+        reranker.score.return_value = [1.0, 1.0, 1.0, 1.0]
+        stage.diversify = True
+        assert len(stage.apply("q", QUERY, CANDIDATES, 2)) == 2
+
+    def test_rerank_skipped_near_deadline(self):
+        """Test reranking is skipped when the expected duration exceeds the time left."""
+        clock = FakeClock()
+        reranker = MagicMock()
+
+        def slow_score(query, chunks):
+            clock.now += 2.0
+            return [0.0] * len(chunks)
+
+        reranker.score.side_effect = slow_score
+        stage = PostRetrievalStage(reranker=reranker, diversify=False, rerank_budget=1.0, smoothing=0.5, clock=clock)
+        assert stage.should_rerank(None)
+        stage.apply("q", QUERY, CANDIDATES, 2, deadline=clock.now + 1.5)
+        assert stage.reranked == 1
+        assert stage.rerank_latency == pytest.approx(1.5)
+
+        result = stage.apply("q", QUERY, CANDIDATES, 2, deadline=clock.now + 1.0)
+        assert result == [("alpha", 0.99), ("alpha again", 0.98)]
+        assert stage.rerank_skipped == 1
+        assert reranker.score.call_count == 1
+
+    def test_failing_reranker_keeps_retrieval_order(self):
+        """Test a reranker error falls back to the retrieval order."""
+        reranker = MagicMock()
+        reranker.score.side_effect = RuntimeError("down")
+        stage = PostRetrievalStage(reranker=reranker, diversify=False)
+        assert stage.apply("q", QUERY, CANDIDATES, 1) == [("alpha", 0.99)]
+        assert stage.rerank_failed == 1
+
+    def test_without_reranker(self):
+        """Test no reranking is attempted or counted without a reranker."""
+        stage = PostRetrievalStage()
+        assert not stage.should_rerank(0.0)
+        assert stage.rerank(["q"], ["a"], deadline=0.0) is None
+        assert stage.rerank_skipped == 0
@@ -0,0 +1,65 @@
+import sys
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from lib.core.service.Reranker import CrossEncoderReranker, LLMReranker, Reranker
+
+
+class TestReranker:
+    def test_is_abstract(self):
+        """Test Reranker cannot be instantiated."""
+        with pytest.raises(TypeError):
+            Reranker()
+
+        class Passthrough(Reranker):
+            def score(self, query, chunks):
+                return super().score(query, chunks)
+
+        assert Passthrough().score("q", ["a"]) is None
+
+    def test_llm_reranker_batches_requests(self):
+        """Test the LLM reranker grades candidates one batch per request."""
+        provider = MagicMock()
+        provider.chat.side_effect = [SimpleNamespace(content="Sure: [9, 1]"), SimpleNamespace(content="[5]")]
+        reranker = LLMReranker(model="m", provider=provider, batch_size=2, max_chars=5)
+        assert reranker.score("q", ["first  chunk", "second", "third"]) == [9.0, 1.0, 5.0]
+        assert provider.chat.call_count == 2
+        kwargs = provider.chat.call_args_list[0].kwargs
+        assert kwargs["model"] == "m"
+        assert "[1] first" in kwargs["prompt"] and "[2] secon" in kwargs["prompt"]
+        assert "Query: q" in kwargs["prompt"]
+
+    @patch('lib.core.service.Reranker.LLMProviderFactory')
+    @patch('lib.core.service.Reranker.EnvironmentVariables')
+    def test_llm_reranker_defaults(self, mock_env, mock_factory):
+        """Test the configured model and provider are used by default."""
+        mock_env.return_value.get_language_model.return_value = "llm"
+        reranker = LLMReranker()
+        assert reranker.model == "llm"
+        assert reranker.provider is mock_factory.get_instance.return_value
+
+    def test_parse_scores(self):
+        """Test grades are read from the first JSON array of the right size."""
+        assert LLMReranker.parse_scores("[1] no, [2, 3.5]", 2) == [2.0, 3.5]
+        assert LLMReranker.parse_scores('["x"] [4]', 1) == [4.0]
+        with pytest.raises(ValueError):
+            LLMReranker.parse_scores("[1, 2]", 3)
+        with pytest.raises(ValueError):
+            LLMReranker.parse_scores(None, 1)
+
+    def test_cross_encoder_reranker(self):
+        """Test the cross-encoder scores (query, chunk) pairs in batch."""
+        model = MagicMock()
+        model.predict.return_value = [0.5, -1.0]
+        reranker = CrossEncoderReranker(model, batch_size=8)
+        assert reranker.score("q", ["a", "b"]) == [0.5, -1.0]
+        model.predict.assert_called_once_with([("q", "a"), ("q", "b")], batch_size=8)
+        assert reranker.score("q", []) == []
+
+    def test_cross_encoder_loads_model_by_name(self):
+        """Test a model name is loaded with sentence_transformers."""
+        module = MagicMock()
+        with patch.dict(sys.modules, {"sentence_transformers": module}):
+            reranker = CrossEncoderReranker("some/model")
+        module.CrossEncoder.assert_called_once_with("some/model")
+        assert reranker.model is module.CrossEncoder.return_value
@@ -0,0 +1,95 @@
+import gc
+import os
+import pytest
+from lib.commons.MathUtils import MathUtils
+from lib.core.service.ShardedKnowledgeStore import ShardedKnowledgeStore
+
+KNOWLEDGE = [
+    ("east", [1.0, 0.0]),
+    ("north", [0.0, 1.0]),
+    ("north-east", [1.0, 1.0]),
+    ("west", [-1.0, 0.0]),
+    ("south", [0.0, -2.0]),
+]
+
+
+def brute_force(query, top_k):
+    scored = [(MathUtils.cosine_similarity(query, embedding), chunk) for chunk, embedding in KNOWLEDGE]
+    return [chunk for _, chunk in sorted(scored, reverse=True)[:top_k]]
+
+
+class TestShardedKnowledgeStore:
+    def test_search_matches_brute_force(self):
+        """Test sharded search returns the exact top-k of a full scan."""
+        with ShardedKnowledgeStore.build(KNOWLEDGE, shards=3, workers=0) as store:
+            assert store.shards == 3
+            assert len(store) == 5
+            assert store.dimensions == 2
+            for query in ([1.0, 0.2], [-0.3, 1.0], [0.0, -1.0]):
+                for top_k in (1, 2, 5, 10):
+                    rows = store.search(query, top_k)
+                    assert [store.get(row)[0] for row, _ in rows] == brute_force(query, top_k)
+            row, score = store.search([2.0, 2.0], 1)[0]
+            assert store.get(row)[0] == "north-east"
+            assert score == pytest.approx(1.0)
+            assert store.search([1.0, 0.0], 0) == []
+
+    def test_search_batch(self):
+        """Test several queries are answered in one fan-out."""
+        with ShardedKnowledgeStore.build(KNOWLEDGE, shards=2, workers=0) as store:
+            results = store.search_batch([[1.0, 0.0], [0.0, 1.0]], top_k=1)
+            assert [[store.get(row)[0] for row, _ in hits] for hits in results] == [["east"], ["north"]]
+
+    def test_iterates_as_tuples(self):
+        """Test the store iterates as (chunk, unit-norm embedding) tuples."""
+        with ShardedKnowledgeStore.build(KNOWLEDGE, shards=2, workers=0) as store:
+            entries = list(store)
+            assert [chunk for chunk, _ in entries] == [chunk for chunk, _ in KNOWLEDGE]
+            assert entries[4][1].tolist() == [0.0, -1.0]
+
+    def test_build_into_directory_and_reopen(self, tmp_path):
+        """Test a store written to a directory can be reopened and is kept on close."""
+        directory = str(tmp_path / "shards")
+        ShardedKnowledgeStore.build(KNOWLEDGE, directory=directory, shards=10, workers=0).close()
+        assert os.path.exists(os.path.join(directory, "manifest.json"))
+        with ShardedKnowledgeStore(directory, workers=0) as store:
+            assert store.shards == 5
+            assert store.get(3)[0] == "west"
+
+    def test_temporary_directory_removed_on_close(self):
+        """Test the temporary directory of a built store is deleted on close."""
+        store = ShardedKnowledgeStore.build(KNOWLEDGE, workers=0)
+        store.close()
+        store.close()
+        assert not os.path.exists(store.directory)
+
+    def test_unclosed_store_is_released(self):
+        """Test the workers and temporary directory of a store garbage collected without close are released."""
+        store = ShardedKnowledgeStore.build(KNOWLEDGE, shards=2, workers=1)
+        processes, directory = list(store._pool._pool), store.directory
+        assert store.search([1.0, 0.0], 1)[0][0] == 0
+        del store
+        gc.collect()
+        for process in processes:
+            process.join(5)
+            assert not process.is_alive()
+        assert not os.path.exists(directory)
+
+    def test_build_empty(self):
+        """Test an empty knowledge base is rejected."""
+        with pytest.raises(ValueError):
+            ShardedKnowledgeStore.build([])
+
+    def test_worker_processes(self):
+        """Test the shards are searched by worker processes with single-threaded BLAS."""
+        openblas = os.environ.get("OPENBLAS_NUM_THREADS")
+        os.environ["OMP_NUM_THREADS"] = "4"
+        try:
+            with ShardedKnowledgeStore.build(KNOWLEDGE, shards=2, workers=2) as store:
+                assert os.environ["OMP_NUM_THREADS"] == "4"
+                assert store.workers == 2
+                rows = store.search([1.0, 0.2], 3)
+                assert [store.get(row)[0] for row, _ in rows] == brute_force([1.0, 0.2], 3)
+        finally:
+            del os.environ["OMP_NUM_THREADS"]
+        assert os.environ.get("OPENBLAS_NUM_THREADS") == openblas
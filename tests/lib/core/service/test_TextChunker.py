@@ -0,0 +1,56 @@
+import pytest
+from lib.core.service.TextChunker import TextChunker
+
+
+def sentence(i, words=4):
+    return " ".join(f"s{i}w{j}" for j in range(words)) + "."
+
+
+class TestTextChunker:
+    def test_invalid_sizes(self):
+        """Test invalid chunk and overlap sizes are rejected."""
+        with pytest.raises(ValueError):
+            TextChunker(chunk_tokens=0)
+        with pytest.raises(ValueError):
+            TextChunker(chunk_tokens=10, overlap_tokens=10)
+        with pytest.raises(ValueError):
+            TextChunker(chunk_tokens=10, overlap_tokens=-1)
+
+    def test_short_document_single_chunk(self):
+        """Test a document smaller than a chunk yields a single chunk."""
+        chunker = TextChunker(chunk_tokens=100, overlap_tokens=10)
+        assert list(chunker.split(["Hello world.", "Second paragraph."])) == ["Hello world. Second paragraph."]
+
+    def test_empty_document(self):
+        """Test empty blocks yield no chunks."""
+        assert list(TextChunker().split(["", "   "])) == []
+
+    def test_chunks_respect_size_and_overlap(self):
+        """Test chunks stay within the token budget and overlap by whole sentences."""
+        chunker = TextChunker(chunk_tokens=12, overlap_tokens=6)
+        # each sentence is 4 words of 1 token plus a period = 5 tokens
+        text = " ".join(sentence(i) for i in range(6))
+        chunks = list(chunker.split([text]))
+        assert chunks[0] == f"{sentence(0)} {sentence(1)}"
+        assert chunks[1] == f"{sentence(1)} {sentence(2)}"
+        assert chunks[-1].endswith(sentence(5))
+        for chunk in chunks:
+            assert chunker.token_counter.count(chunk) <= 12
+
+    def test_no_overlap(self):
+        """Test overlap_tokens=0 yields disjoint chunks."""
+        chunker = TextChunker(chunk_tokens=10, overlap_tokens=0)
+        chunks = list(chunker.split([" ".join(sentence(i) for i in range(4))]))
+        assert chunks == [f"{sentence(0)} {sentence(1)}", f"{sentence(2)} {sentence(3)}"]
+
+    def test_long_sentence_split_by_words(self):
+        """Test sentences longer than a chunk are split by words."""
+        chunker = TextChunker(chunk_tokens=5, overlap_tokens=0)
+        chunks = list(chunker.split([" ".join(f"w{i}" for i in range(12))]))
+        assert chunks == ["w0 w1 w2 w3 w4", "w5 w6 w7 w8 w9", "w10 w11"]
+
+    def test_overlap_only_tail_is_not_emitted_twice(self):
+        """Test the final overlap window is not emitted as an extra chunk."""
+        chunker = TextChunker(chunk_tokens=10, overlap_tokens=5)
+        chunks = list(chunker.split([f"{sentence(0)} {sentence(1)} {sentence(2)}"]))
+        assert chunks == [f"{sentence(0)} {sentence(1)}", f"{sentence(1)} {sentence(2)}"]
@@ -0,0 +1,118 @@
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+from lib.core.service.TokenCounter import TokenCounter, estimate_tokens
+
+
+class TestTokenCounter:
+    def setup_method(self):
+        TokenCounter.get_instance().clear_cache()
+
+    def test_singleton_instance(self):
+        """Test that TokenCounter is a singleton."""
+        assert TokenCounter.get_instance() is TokenCounter.get_instance()
+
+    def test_singleton_init_raises_exception_on_second_call(self):
+        """Test that initializing TokenCounter twice raises an exception."""
+        TokenCounter.get_instance()
+        with pytest.raises(Exception, match="This class is a singleton!"):
+            TokenCounter()
+
+    def test_estimate_tokens(self):
+        """Test the estimator counts word groups of four characters and punctuation."""
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("the cat") == 2
+        assert estimate_tokens("internationalization!") == 6
+        assert estimate_tokens("a, b.") == 4
+
+    def test_count_empty(self):
+        """Test empty text has no tokens."""
+        assert TokenCounter.get_instance().count("") == 0
+
+    def test_count_without_model_uses_estimator(self):
+        """Test counting without a model uses the estimator."""
+        assert TokenCounter.get_instance().count("hello world") == estimate_tokens("hello world")
+
+    @patch('lib.core.service.TokenCounter.tiktoken')
+    def test_count_with_known_model_uses_tiktoken(self, mock_tiktoken):
+        """Test known models use their tiktoken encoding, resolved once per model."""
+        encoding = MagicMock()
+        encoding.encode.side_effect = lambda text, disallowed_special: text.split()
+        mock_tiktoken.encoding_for_model.return_value = encoding
+        counter = TokenCounter.get_instance()
+        assert counter.count("a b c", model="openai/gpt-4o") == 3
+        assert counter.count("a b", model="openai/gpt-4o") == 2
+        mock_tiktoken.encoding_for_model.assert_called_once_with("gpt-4o")
+
+    @patch('lib.core.service.TokenCounter.tiktoken')
+    def test_count_unknown_model_falls_back(self, mock_tiktoken):
+        """Test unknown models (or unavailable encodings) fall back to the estimator."""
+        mock_tiktoken.encoding_for_model.side_effect = KeyError("unknown")
+        counter = TokenCounter.get_instance()
+        assert counter.count("hello world", model="ollama/qwen3") == estimate_tokens("hello world")
+        counter.count("hello again", model="ollama/qwen3")
+        mock_tiktoken.encoding_for_model.assert_called_once()
+
+    def test_count_is_cached(self):
+        """Test repeated counts of the same text are served from the cache."""
+        counter = TokenCounter.get_instance()
+        encoder = MagicMock(return_value=7)
+        counter._encoders["m"] = encoder
+        assert counter.count("text", model="m") == 7
+        assert counter.count("text", model="m") == 7
+        encoder.assert_called_once_with("text")
+
+    def test_count_cache_is_bounded(self):
+        """Test the count cache evicts least recently used entries."""
+        counter = TokenCounter.get_instance()
+        previous = counter.cache_size
+        counter.cache_size = 2
+        try:
+            counter.count("one")
+            counter.count("two")
+            counter.count("one")
+            counter.count("three")
+            assert list(counter._counts) == [(None, "one"), (None, "three")]
+        finally:
+            counter.cache_size = previous
+
+    def test_count_cache_is_thread_safe(self):
+        """Test concurrent counts keep the cache bounded and consistent."""
+        counter = TokenCounter.get_instance()
+        previous = counter.cache_size
+        counter.cache_size = 8
+        errors = []
+
+        def work(offset):
+            try:
+                for i in range(2000):
+                    assert counter.count(f"word {(i + offset) % 20}") == 2
+            except Exception as error:
+                errors.append(error)
+
+        try:
+            threads = [threading.Thread(target=work, args=(offset,)) for offset in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert errors == [] and len(counter._counts) == 8
+        finally:
+            counter.cache_size = previous
+
+    @patch('lib.core.service.TokenCounter.litellm.get_model_info')
+    def test_get_context_window(self, mock_info):
+        """Test the context window is read from the LiteLLM model map."""
+        mock_info.return_value = {"max_input_tokens": 128000, "max_tokens": 16384}
+        assert TokenCounter.get_context_window("openai/gpt-4o") == 128000
+
+    @patch('lib.core.service.TokenCounter.litellm.get_model_info')
+    def test_get_context_window_fallbacks(self, mock_info):
+        """Test unknown sizes fall back to max_tokens or the default."""
+        mock_info.return_value = {"max_input_tokens": None, "max_tokens": 8192}
+        assert TokenCounter.get_context_window("x") == 8192
+        mock_info.return_value = {"max_input_tokens": None, "max_tokens": None}
+        assert TokenCounter.get_context_window("x", default=1000) == 1000
+        mock_info.side_effect = Exception("unknown model")
+        assert TokenCounter.get_context_window("x") == 4096
+        assert TokenCounter.get_context_window(None, default=10) == 10
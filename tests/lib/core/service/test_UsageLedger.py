@@ -0,0 +1,213 @@
+import json
+import logging
+import sqlite3
+import time
+import pytest
+from unittest.mock import patch
+from lib.adapters.outbound.LLMExecutor import LLMExecutor
+from lib.commons.Metrics import Metrics
+from lib.core.providers.FakeProvider import FakeProvider
+from lib.core.service import UsageLedger as ledger_module
+from lib.core.service.TokenCounter import estimate_tokens
+from lib.core.service.UsageLedger import BudgetExceededError, UsageLedger
+
+
+@pytest.fixture
+def ledger():
+    """The ledger, emptied and kept in memory, restored afterwards."""
+    instance = UsageLedger.get_instance()
+    instance.clear()
+    instance.configure(path="", flush_interval=60.0, throughput_window=60.0)
+    yield instance
+    instance.clear()
+    instance.configure(path="")
+    instance.prices.clear()
+
+
+@pytest.fixture
+def clock():
+    """A controllable monotonic clock of the ledger module."""
+    with patch("lib.core.service.UsageLedger.time") as mock_time:
+        mock_time.monotonic.return_value = 1000.0
+        mock_time.time.return_value = 1_700_000_000.0
+        yield mock_time
+
+
+@pytest.fixture
+def provider():
+    """The FakeProvider without waits, restored to its defaults afterwards."""
+    instance = FakeProvider.get_instance()
+    instance.configure(sleep=lambda seconds: None, **FakeProvider.DEFAULTS)
+    yield instance
+    instance.configure(**FakeProvider.DEFAULTS)
+
+
+def usage(prompt_tokens, completion_tokens):
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+
+
+class TestUsageLedger:
+    def test_singleton_instance(self):
+        """Test that UsageLedger is a singleton."""
+        assert UsageLedger.get_instance() is UsageLedger.get_instance()
+        with pytest.raises(Exception, match="This class is a singleton!"):
+            UsageLedger()
+
+    def test_aggregation(self, ledger):
+        """Test usage is aggregated per tenant and model, with the cost from the model prices."""
+        ledger.configure(prices={"big": (2.0, 10.0)})
+        ledger.record("acme", "big", usage(1000, 100))
+        ledger.record("acme", "big", usage(1000, 100))
+        ledger.record("acme", "small", usage(10, 1))
+        ledger.record(None, "big", None)
+        assert [(r.tenant, r.model, r.requests) for r in ledger.records()] == [
+            ("acme", "big", 2), ("acme", "small", 1), ("default", "big", 1)]
+        acme = ledger.usage(tenant="acme")
+        assert (acme.requests, acme.prompt_tokens, acme.completion_tokens) == (3, 2010, 201)
+        assert acme.cost == pytest.approx(2 * (1000 * 2.0 + 100 * 10.0) / 1_000_000)
+        assert ledger.usage(model="big").requests == 3 and ledger.usage().total_tokens == 2211
+
+    def test_throughput(self, ledger, clock):
+        """Test the token rate of each model covers the calls of the last window only."""
+        ledger.configure(throughput_window=10.0)
+        ledger.record("a", "m", usage(100, 50))
+        clock.monotonic.return_value = 1008.0
+        ledger.record("a", "m", usage(100, 50))
+        ledger.record("a", "n", usage(0, 20))
+        assert ledger.throughput() == {"m": {"input": 20.0, "output": 10.0}, "n": {"input": 0.0, "output": 2.0}}
+        clock.monotonic.return_value = 1015.0
+        assert ledger.throughput() == {"m": {"input": 10.0, "output": 5.0}, "n": {"input": 0.0, "output": 2.0}}
+        ledger.record("a", "n", usage(0, 0))
+        assert len(ledger._recent) == 3
+
+    def test_budget_rejects(self, ledger):
+        """Test a tenant over its token budget without fallback is rejected, other tenants are not."""
+        metrics = Metrics.get_instance()
+        metrics.clear()
+        ledger.set_budget("acme", max_tokens=100)
+        assert ledger.admit("acme", "m") == "m"
+        ledger.record("acme", "m", usage(60, 40))
+        with pytest.raises(BudgetExceededError):
+            ledger.admit("acme", "m")
+        assert ledger.admit("other", "m") == "m" and ledger.admit(None, "m") == "m"
+        assert metrics.get("llm_budget_decisions_total").value("acme", "rejected") == 1
+        ledger.remove_budget("acme")
+        assert ledger.admit("acme", "m") == "m"
+
+    def test_budget_downgrades_and_renews(self, ledger, clock):
+        """Test a tenant over its cost budget gets the fallback model until the period is over."""
+        ledger.configure(prices={"big": (0.0, 1_000_000.0)})
+        budget = ledger.set_budget("acme", max_cost=1.0, fallback_model="small", period=60.0)
+        ledger.record("acme", "big", usage(0, 1))
+        assert budget.exceeded and ledger.admit("acme", "big") == "small"
+        clock.monotonic.return_value = 1060.0
+        assert ledger.admit("acme", "big") == "big"
+        assert (budget.tokens, budget.cost, budget.started) == (0, 0.0, 1060.0)
+
+    def test_jsonl_flush(self, ledger, clock, tmp_path):
+        """Test the usage since the previous flush is appended as JSON lines, not by record."""
+        path = tmp_path / "ledger" / "usage.jsonl"
+        ledger.configure(path=str(path), flush_interval=30.0)
+        ledger.record("acme", "m", usage(1, 2))
+        # Short of the flush interval, so that the flush thread stays asleep.
+        clock.monotonic.return_value = 1029.0
+        ledger.record("acme", "m", usage(1, 2))
+        assert not path.exists()
+        assert ledger.flush() == 1
+        assert ledger.flush() == 0
+        rows = [json.loads(line) for line in path.read_text().splitlines()]
+        assert rows == [{"time": 1_700_000_000.0, "tenant": "acme", "model": "m", "requests": 2,
+                         "prompt_tokens": 2, "completion_tokens": 4, "cost": 0.0}]
+
+    def test_background_flush(self, ledger, tmp_path):
+        """Test the flush thread writes the usage every flush interval and stops without destination."""
+        path = tmp_path / "usage.jsonl"
+        ledger.configure(path=str(path), flush_interval=0.01)
+        flusher = ledger._flusher
+        ledger.record("acme", "m", usage(1, 2))
+        deadline = time.monotonic() + 5
+        while not path.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert json.loads(path.read_text())["requests"] == 1
+        ledger.configure(path="")
+        flusher.join(5)
+        assert not flusher.is_alive() and ledger._flusher is None
+
+    def test_sqlite_flush(self, ledger, tmp_path):
+        """Test a .db destination is a SQLite database with a usage table."""
+        path = tmp_path / "usage.db"
+        ledger.configure(path=str(path))
+        ledger.record("acme", "m", usage(1, 2))
+        ledger.record("beta", "m", usage(3, 4))
+        assert ledger.flush() == 2
+        ledger.record("acme", "m", usage(1, 2))
+        assert ledger.flush() == 1
+        with sqlite3.connect(path) as connection:
+            rows = connection.execute("SELECT tenant, SUM(requests), SUM(completion_tokens) FROM usage "
+                                      "GROUP BY tenant ORDER BY tenant").fetchall()
+        assert rows == [("acme", 2, 4), ("beta", 1, 4)]
+
+    def test_failed_flush_keeps_rows(self, ledger, tmp_path, caplog):
+        """Test rows that could not be written are kept for the next flush."""
+        ledger.record("acme", "m", usage(1, 2))
+        ledger.configure(path=str(tmp_path))
+        with caplog.at_level(logging.WARNING, logger="lib.core.service.UsageLedger"):
+            assert ledger.flush() == 0
+        assert "Usage ledger flush failed" in caplog.text
+        ledger.configure(path=str(tmp_path / "usage.jsonl"))
+        assert ledger.flush() == 1
+        assert json.loads((tmp_path / "usage.jsonl").read_text())["requests"] == 1
+
+    def test_memory_only_flush_drops_rows(self, ledger):
+        """Test flushing a ledger without destination drops the pending rows but keeps the totals."""
+        ledger.record("acme", "m", usage(1, 2))
+        assert ledger.flush() == 0 and ledger._pending == {}
+        assert ledger.usage().requests == 1
+
+    def test_flush_at_exit(self, ledger):
+        """Test the exit hook flushes the ledger."""
+        with patch.object(ledger, "flush") as mock_flush:
+            ledger_module._flush_at_exit()
+        mock_flush.assert_called_once_with()
+
+
+class TestExecutorAccounting:
+    def test_responses_and_streams_are_recorded(self, ledger, provider):
+        """Test the executor records every response, streams once exhausted, per tenant."""
+        provider.configure(output_tokens=4)
+        with patch("lib.adapters.outbound.LLMExecutor.current_provider", provider), \
+                patch("lib.adapters.outbound.LLMExecutor.llm", "m"):
+            LLMExecutor.get_instance().ask("a b", tenant="acme")
+            chunks = LLMExecutor.get_instance().chat("a b", tenant="acme")
+            assert ledger.usage().requests == 1
+            list(chunks)
+            LLMExecutor.get_instance().ask("a b")
+        acme = ledger.usage(tenant="acme", model="m")
+        assert (acme.requests, acme.prompt_tokens, acme.completion_tokens) == (2, 4, 8)
+        assert ledger.usage(tenant="default").requests == 1
+
+    def test_closed_streams_are_recorded(self, ledger, provider):
+        """Test a stream closed before its final chunk is recorded with its estimated usage."""
+        provider.configure(output_tokens=8)
+        with patch("lib.adapters.outbound.LLMExecutor.current_provider", provider), \
+                patch("lib.adapters.outbound.LLMExecutor.llm", "m"):
+            chunks = LLMExecutor.get_instance().chat("a b c", system_prompt="d", tenant="acme")
+            first = next(chunks)
+            chunks.close()
+        record = ledger.usage(tenant="acme")
+        assert record.requests == 1 and record.prompt_tokens == 4
+        assert record.completion_tokens == estimate_tokens(first.content) > 0
+
+    def test_budget_applies_to_calls(self, ledger):
+        """Test the executor calls the fallback model of a tenant over budget, or raises."""
+        with patch("lib.adapters.outbound.LLMExecutor.current_provider") as mock_provider, \
+                patch("lib.adapters.outbound.LLMExecutor.llm", "big"):
+            mock_provider.chat.return_value = "answer"
+            ledger.set_budget("acme", max_tokens=0, fallback_model="small")
+            LLMExecutor.get_instance().chat("q", tenant="acme", chatbot_mode=False)
+            assert mock_provider.chat.call_args.kwargs["model"] == "small"
+            ledger.set_budget("acme", max_tokens=0)
+            with pytest.raises(BudgetExceededError):
+                LLMExecutor.get_instance().ask("q", tenant="acme")
+        assert mock_provider.chat.call_count == 1
+        assert ledger.usage(tenant="acme", model="small").requests == 1
@@ -45,3 +45,24 @@ class TestFilePromptManager:
         manager.user_prompt_template = "User {action}"
         result = manager.get_user_prompt(action="login")
         assert result == "User login"
+
+    def test_get_packed_user_prompt(self):
+        """Test get_packed_user_prompt fills the context placeholder within budget."""
+        from lib.core.service.ContextPacker import ContextPacker
+        manager = FilePromptManager.__new__(FilePromptManager)
+        manager.user_prompt_template = "Context:\n{context}\nQuestion: {question}"
+        packer = ContextPacker(context_window=40, reserved_tokens=10)
+        chunks = [("alpha beta gamma delta", 0.9), ("one two three four five six seven eight nine ten", 0.5)]
+        result = manager.get_packed_user_prompt(chunks, packer, question="what?")
+        assert result.startswith("Context:\nalpha beta gamma delta")
+        assert "Question: what?" in result
+
+    def test_get_packed_user_prompt_counts_system_prompt(self):
+        """Test the system prompt is charged against the budget."""
+        from lib.core.service.ContextPacker import ContextPacker
+        manager = FilePromptManager.__new__(FilePromptManager)
+        manager.user_prompt_template = "{context}"
+        packer = ContextPacker(context_window=10, reserved_tokens=0)
+        chunks = [("a b c d e", 0.9)]
+        assert manager.get_packed_user_prompt(chunks, packer) == "a b c d e"
+        assert manager.get_packed_user_prompt(chunks, packer, system_prompt="x y z w v u") == ""
@@ -0,0 +1,86 @@
+import uuid
+import pytest
+from unittest.mock import patch
+from lib.use_case.runner.CheckpointStore import CheckpointStore, InMemoryCheckpointStore, SqliteCheckpointStore
+from lib.use_case.steps.StepResult import StepResult
+
+
+class SuperStore(CheckpointStore):
+    """Store calling the abstract bodies."""
+
+    def get(self, key):
+        return super().get(key)
+
+    def put(self, key, result):
+        return super().put(key, result)
+
+    def clear(self):
+        return super().clear()
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    """A factory of stores of each kind."""
+    def make(**policy):
+        if request.param == "memory":
+            return InMemoryCheckpointStore(**policy)
+        return SqliteCheckpointStore(str(tmp_path / "checkpoints.db"), **policy)
+    return make
+
+
+def result(value):
+    return StepResult(uuid.UUID(int=1), result=value, message="ok")
+
+
+class TestCheckpointStore:
+    def test_abstract_bodies(self):
+        """Test the abstract bodies return None."""
+        store = SuperStore()
+        assert store.get("k") is None and store.put("k", result(1)) is None and store.clear() is None
+        assert (store.max_entries, store.ttl) == (None, None)
+
+    def test_get_put_clear(self, make_store):
+        """Test results are stored and read back, and removed by clear."""
+        store = make_store()
+        assert store.get("k") is None
+        store.put("k", result({"a": [1, 2]}))
+        store.put("k", result("replaced"))
+        assert store.get("k") == result("replaced") and len(store) == 1
+        store.clear()
+        assert store.get("k") is None and len(store) == 0
+
+    def test_least_recently_used_are_evicted(self, make_store):
+        """Test entries beyond max_entries are evicted, least recently read or written first."""
+        store = make_store(max_entries=2)
+        with patch("lib.use_case.runner.CheckpointStore.time") as mock_time:
+            mock_time.time.return_value = 1.0
+            store.put("a", result(1))
+            mock_time.time.return_value = 2.0
+            store.put("b", result(2))
+            mock_time.time.return_value = 3.0
+            store.get("a")
+            mock_time.time.return_value = 4.0
+            store.put("c", result(3))
+        assert len(store) == 2 and store.get("b") is None
+        assert store.get("a").result == 1 and store.get("c").result == 3
+
+    def test_expired_entries(self, make_store):
+        """Test entries older than the ttl are not returned."""
+        store = make_store(ttl=10)
+        with patch("lib.use_case.runner.CheckpointStore.time") as mock_time:
+            mock_time.time.return_value = 100.0
+            store.put("old", result(1))
+            store.put("recent", result(2))
+            mock_time.time.return_value = 105.0
+            assert store.get("old").result == 1
+            store.put("new", result(3))
+            mock_time.time.return_value = 110.0
+            assert store.get("old") is None
+            store.put("newer", result(4))
+            assert len(store) == 2 and store.get("new").result == 3
+
+    def test_sqlite_store_survives_reopening(self, tmp_path):
+        """Test a SQLite store reads the results written by another instance."""
+        path = str(tmp_path / "checkpoints.db")
+        SqliteCheckpointStore(path).put("k", result(42))
+        assert SqliteCheckpointStore(path).get("k") == result(42)
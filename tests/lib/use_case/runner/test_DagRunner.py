@@ -0,0 +1,380 @@
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import pytest
+from lib.commons.Deadline import Deadline, check_deadline, current_deadline, remaining_time
+from lib.commons.Metrics import Metrics
+from lib.commons.SpanExporter import InMemorySpanExporter
+from lib.commons.Tracer import Tracer
+from lib.use_case.runner.CheckpointStore import InMemoryCheckpointStore, SqliteCheckpointStore
+from lib.use_case.runner.DagRunner import DagRunner, input_hash
+from lib.use_case.steps.AbstractStep import AbstractStep
+from lib.use_case.steps.StepResult import StepResult
+
+
+class FunctionStep(AbstractStep):
+    """Step running a function of the results of its dependencies (or of the run inputs)."""
+
+    def __init__(self, function, delay=0.0):
+        self.step_id = uuid.uuid4()
+        self.function = function
+        self.delay = delay
+        self.thread = None
+
+    def execute(self, *args) -> StepResult:
+        self.thread = threading.current_thread()
+        time.sleep(self.delay)
+        return StepResult(self.step_id, result=self.function(*args))
+
+
+class AsyncStep(AbstractStep):
+    """Coroutine step waiting, then returning a plain value or raising."""
+
+    def __init__(self, value=None, delay=0.0, error=None):
+        self.step_id = None
+        self.value = value
+        self.delay = delay
+        self.error = error
+        self.cancelled = False
+
+    async def execute(self, *args):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return self.value
+
+
+class TestDagRunner:
+    def test_results_are_propagated(self):
+        """Test each step receives the inputs or the results of its dependencies, in declared order."""
+        runner = DagRunner()
+        source = runner.add_step(FunctionStep(lambda text: text.upper()))
+        length = runner.add_step(FunctionStep(lambda upper: len(upper.result)), depends_on=[source])
+        words = runner.add_step(FunctionStep(lambda upper: upper.result.split()), depends_on=[source.step_id])
+        joined = runner.add_step(FunctionStep(lambda n, w: f"{n.result}:{'-'.join(w.result)}"),
+                                 depends_on=[length, words])
+        results = runner.run("a b")
+        assert list(results) == [step.step_id for step in runner.steps]
+        assert results[joined.step_id].result == "3:A-B" and all(r.is_success() for r in results.values())
+        assert source.thread is not threading.current_thread()
+
+    def test_independent_steps_run_in_parallel(self):
+        """Test independent blocking and coroutine steps overlap."""
+        runner = DagRunner(max_workers=4)
+        first = [runner.add_step(FunctionStep(lambda: 1, delay=0.2)) for _ in range(3)]
+        runner.add_step(AsyncStep(value=2, delay=0.2))
+        runner.add_step(FunctionStep(lambda *results: sum(r.result for r in results)), depends_on=first)
+        started = time.perf_counter()
+        results = runner.run()
+        assert time.perf_counter() - started < 0.5
+        assert [result.result for result in results.values()] == [1, 1, 1, 2, 3]
+
+    def test_fail_fast(self):
+        """Test a failed step cancels the running coroutine steps and skips the others."""
+        runner = DagRunner()
+        broken = runner.add_step(AsyncStep(error=KeyError("missing")))
+        slow = runner.add_step(AsyncStep(value=1, delay=5))
+        blocking = runner.add_step(FunctionStep(lambda: 1, delay=0.1))
+        after = runner.add_step(FunctionStep(lambda result: result), depends_on=[blocking])
+        results = runner.run()
+        assert results[broken.step_id].errors == ["KeyError: 'missing'"]
+        assert slow.cancelled and results[slow.step_id].errors == [f"Cancelled: step {broken.step_id} failed"]
+        assert results[blocking.step_id].errors == [f"Cancelled: step {broken.step_id} failed"]
+        assert results[after.step_id].errors == [f"Skipped: step {broken.step_id} failed"]
+
+    def test_failure_without_fail_fast(self):
+        """Test only the dependents of a failed step are skipped when fail_fast is off."""
+        runner = DagRunner(fail_fast=False)
+        failed = runner.add_step(FunctionStep(lambda: None))
+        failed.execute = lambda: StepResult(failed.step_id, errors=["invalid"])
+        dependent = runner.add_step(FunctionStep(lambda result: result), depends_on=[failed])
+        transitive = runner.add_step(FunctionStep(lambda result: result), depends_on=[dependent])
+        other = runner.add_step(AsyncStep(value="done", delay=0.05))
+        results = runner.run()
+        assert results[failed.step_id].errors == ["invalid"]
+        assert results[dependent.step_id].errors == [f"Skipped: step {failed.step_id} failed"]
+        assert results[transitive.step_id].errors == [f"Skipped: step {dependent.step_id} failed"]
+        assert results[other.step_id].result == "done"
+
+    def test_graph_validation(self):
+        """Test steps get an id, are added once, and after their dependencies."""
+        runner = DagRunner()
+        step = runner.add_step(AsyncStep())
+        assert isinstance(step.step_id, uuid.UUID)
+        with pytest.raises(ValueError):
+            runner.add_step(step)
+        with pytest.raises(ValueError):
+            runner.add_step(AsyncStep(), depends_on=[uuid.uuid4()])
+        assert runner.steps == [step]
+
+    def test_run_async_inside_a_loop(self):
+        """Test run_async runs in an existing event loop; an empty graph has no results."""
+        async def main():
+            assert await DagRunner().run_async() == {}
+            runner = DagRunner()
+            step = runner.add_step(AsyncStep(value=1))
+            return await runner.run_async()
+
+        assert [result.result for result in asyncio.run(main()).values()] == [1]
+
+    def test_outer_cancellation_cancels_the_steps(self):
+        """Test cancelling the run cancels the running steps."""
+        runner = DagRunner()
+        step = runner.add_step(AsyncStep(delay=5))
+
+        async def main():
+            task = asyncio.ensure_future(runner.run_async())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(main())
+        assert step.cancelled
+
+    def test_spans(self):
+        """Test the run and each step are traced, step spans being children of the run span."""
+        exporter = InMemorySpanExporter()
+        tracer = Tracer.get_instance()
+        tracer.enable(exporter)
+        try:
+            runner = DagRunner(fail_fast=False)
+            runner.add_step(FunctionStep(lambda: 1))
+            runner.add_step(AsyncStep(error=ValueError("bad")))
+            runner.run()
+        finally:
+            tracer.disable()
+        run, = exporter.get("workflow.run")
+        steps = exporter.get("workflow.step")
+        assert {span.attributes["step"] for span in steps} == {"FunctionStep", "AsyncStep"}
+        assert all(span.parent_id == run.span_id for span in steps)
+        assert sorted(span.attributes["success"] for span in steps) == [False, True]
+
+
+class CountingStep(FunctionStep):
+    """Step counting its executions, failing while ``failures`` is positive."""
+
+    def __init__(self, function, step_id, deterministic=False, failures=0):
+        super().__init__(function)
+        self.step_id = step_id
+        self.deterministic = deterministic
+        self.failures = failures
+        self.calls = 0
+
+    def execute(self, *args) -> StepResult:
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("transient")
+        return super().execute(*args)
+
+
+def ids(*names):
+    return [uuid.uuid5(uuid.NAMESPACE_URL, name) for name in names]
+
+
+class TestCheckpoints:
+    def test_resume_skips_completed_steps(self, tmp_path):
+        """Test a failed workflow run again with its id only executes the steps that did not succeed."""
+        store = SqliteCheckpointStore(str(tmp_path / "checkpoints.db"))
+        first, second, third = ids("first", "second", "third")
+
+        def build(failures):
+            runner = DagRunner(checkpoints=store)
+            steps = [runner.add_step(CountingStep(lambda text: text + "1", first))]
+            steps.append(runner.add_step(CountingStep(lambda r: r.result + "2", second, failures=failures),
+                                         depends_on=steps))
+            steps.append(runner.add_step(CountingStep(lambda r: r.result + "3", third), depends_on=steps[1:]))
+            return runner, steps
+
+        runner, steps = build(failures=1)
+        assert not runner.run("x", workflow_id="wf-1")[third].is_success()
+        runner, steps = build(failures=0)
+        results = runner.run("x", workflow_id="wf-1")
+        assert results[third].result == "x123"
+        assert [step.calls for step in steps] == [0, 1, 1]
+        runner, steps = build(failures=0)
+        runner.run("y", workflow_id="wf-1")
+        runner.run("x", workflow_id="wf-2")
+        runner.run("x")
+        assert [step.calls for step in steps] == [3, 3, 3]
+
+    def test_memoization_of_deterministic_steps(self):
+        """Test deterministic steps are memoized across runs, the others executed every time."""
+        metrics = Metrics.get_instance()
+        metrics.clear()
+        memo = InMemoryCheckpointStore(max_entries=10)
+        deterministic, other = ids("deterministic", "other")
+        runner = DagRunner(memo=memo)
+        cached = runner.add_step(CountingStep(str.upper, deterministic, deterministic=True))
+        uncached = runner.add_step(CountingStep(str.lower, other))
+        for _ in range(3):
+            results = runner.run("Text")
+        assert results[deterministic].result == "TEXT" and results[other].result == "text"
+        assert (cached.calls, uncached.calls) == (1, 3)
+        assert metrics.get("cache_lookups_total").value("memo", "hit") == 2
+        runner.run(lambda: "unpicklable")
+        assert cached.calls == 1 + 1 and len(memo) == 1
+
+    def test_failed_results_are_not_stored(self):
+        """Test failed results are executed again."""
+        memo = InMemoryCheckpointStore()
+        step_id, = ids("failing")
+        runner = DagRunner(memo=memo)
+        step = runner.add_step(CountingStep(str.upper, step_id, deterministic=True, failures=1))
+        assert not runner.run("a")[step_id].is_success()
+        assert runner.run("a")[step_id].result == "A" and step.calls == 2
+
+    def test_cache_hits_are_traced(self):
+        """Test a step answered from a store is traced with the store name."""
+        exporter = InMemorySpanExporter()
+        tracer = Tracer.get_instance()
+        runner = DagRunner(memo=InMemoryCheckpointStore())
+        runner.add_step(CountingStep(str.upper, *ids("traced"), deterministic=True))
+        runner.run("a")
+        tracer.enable(exporter)
+        try:
+            runner.run("a", workflow_id="wf")
+        finally:
+            tracer.disable()
+        assert exporter.get("workflow.run")[0].attributes["workflow_id"] == "wf"
+        assert exporter.get("workflow.step")[0].attributes["cache"] == "memo"
+
+
+class PollingStep(AbstractStep):
+    """Blocking step working until its deadline expires or is cancelled."""
+
+    def __init__(self, timeout=None):
+        self.step_id = uuid.uuid4()
+        self.timeout = timeout
+        self.deadline = None
+        self.stopped = threading.Event()
+
+    def execute(self, *args):
+        self.deadline = current_deadline()
+        try:
+            for _ in range(1000):
+                check_deadline()
+                time.sleep(0.005)
+        finally:
+            self.stopped.set()
+
+
+class TestDeadlines:
+    def test_coroutine_step_timeout(self):
+        """Test a coroutine step running past its timeout is cancelled and gets a timeout error."""
+        metrics = Metrics.get_instance()
+        metrics.clear()
+        exporter = InMemorySpanExporter()
+        tracer = Tracer.get_instance()
+        runner = DagRunner(fail_fast=False)
+        slow = runner.add_step(AsyncStep(value=1, delay=5))
+        slow.timeout = 0.05
+        fast = runner.add_step(AsyncStep(value=2, delay=0.01))
+        fast.timeout = 1
+        tracer.enable(exporter)
+        try:
+            results = runner.run()
+        finally:
+            tracer.disable()
+        assert results[slow.step_id].errors == ["DeadlineExceeded: Step AsyncStep exceeded its deadline"]
+        assert slow.cancelled and results[fast.step_id].result == 2
+        assert metrics.get("workflow_step_timeouts_total").value("AsyncStep") == 1
+        assert [span.attributes.get("timed_out") for span in exporter.get("workflow.step")] == [None, True]
+
+    def test_synchronous_step_stops_at_its_deadline(self):
+        """Test a blocking step running past its timeout is abandoned, and stops at its next deadline check."""
+        runner = DagRunner()
+        step = runner.add_step(PollingStep(timeout=0.05))
+        started = time.perf_counter()
+        result = runner.run()[step.step_id]
+        assert time.perf_counter() - started < 1 and result.errors[0].startswith("DeadlineExceeded")
+        assert step.stopped.wait(1) and step.deadline.cancelled
+
+    def test_run_timeout(self):
+        """Test the run timeout bounds the deadline of every step."""
+        runner = DagRunner(timeout=0.1)
+        budget = runner.add_step(FunctionStep(lambda: remaining_time()))
+        slow = runner.add_step(AsyncStep(delay=5), depends_on=[budget])
+        after = runner.add_step(FunctionStep(lambda result: 1), depends_on=[slow])
+        results = runner.run()
+        assert 0 < results[budget.step_id].result <= 0.1
+        assert results[slow.step_id].errors[0].startswith("DeadlineExceeded")
+        assert results[after.step_id].errors == [f"Skipped: step {slow.step_id} failed"]
+
+    def test_caller_deadline(self):
+        """Test the steps are not started once the deadline of the caller expired."""
+        runner = DagRunner()
+        step = runner.add_step(FunctionStep(lambda: 1))
+        with Deadline(timeout=0):
+            result = runner.run()[step.step_id]
+        assert result.errors == ["DeadlineExceeded: Deadline exceeded"] and step.thread is None
+
+    def test_fail_fast_cancels_the_deadline_of_synchronous_steps(self):
+        """Test a blocking step still running when the run short-circuits is stopped through its deadline."""
+        runner = DagRunner()
+        runner.add_step(AsyncStep(delay=0.02, error=KeyError("missing")))
+        step = runner.add_step(PollingStep())
+        results = runner.run()
+        assert results[step.step_id].errors[0].startswith("Cancelled")
+        assert step.stopped.wait(1) and step.deadline.cancelled
+
+
+def test_input_hash():
+    """Test equal arguments hash equally, with a pickle fallback, and unpicklable ones are not hashed."""
+    assert input_hash(["a", StepResult(uuid.UUID(int=1), result=1)]) == \
+        input_hash(("a", StepResult(uuid.UUID(int=1), result=1)))
+    assert input_hash(["a"]) != input_hash(["b"])
+    assert input_hash([{"b": 1, "a": {2, 1}}]) == input_hash([{"a": {1, 2}, "b": 1}])
+    assert input_hash([b"a"]) != input_hash(["a"]) and input_hash([{1}]) != input_hash([[1]])
+    assert input_hash([range(3)]) == input_hash([range(3)]) is not None
+    assert input_hash([lambda: None]) is None
+
+
+RESUME_SCRIPT = """
+import sys, uuid
+from lib.use_case.runner.CheckpointStore import SqliteCheckpointStore
+from lib.use_case.runner.DagRunner import DagRunner
+from lib.use_case.steps.AbstractStep import AbstractStep
+from lib.use_case.steps.StepResult import StepResult
+
+
+class Step(AbstractStep):
+    def __init__(self, name, fail=False):
+        self.name, self.fail = name, fail
+        self.step_id = uuid.uuid5(uuid.NAMESPACE_URL, name)
+
+    def execute(self, *args):
+        print(self.name)
+        if self.fail:
+            raise RuntimeError("failed")
+        return StepResult(self.step_id, result=len(args))
+
+
+runner = DagRunner(checkpoints=SqliteCheckpointStore(sys.argv[1]))
+first = runner.add_step(Step("first"))
+runner.add_step(Step("second", fail=sys.argv[2] == "fail"), depends_on=[first])
+runner.run({"tags": {"alpha", "beta", "gamma", "delta", "epsilon"}, "id": uuid.UUID(int=7)}, workflow_id="wf")
+"""
+
+
+def test_resume_in_another_process(tmp_path):
+    """Test a workflow failed in one process resumes in another one, with another hash seed."""
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))))
+    path = str(tmp_path / "checkpoints.db")
+
+    def run(seed, mode):
+        environment = dict(os.environ, PYTHONHASHSEED=seed)
+        return subprocess.run([sys.executable, "-c", RESUME_SCRIPT, path, mode], cwd=root, env=environment,
+                              capture_output=True, text=True, check=True).stdout.split()
+
+    assert run("1", "fail") == ["first", "second"]
+    assert run("2", "succeed") == ["second"]
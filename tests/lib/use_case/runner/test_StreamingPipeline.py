@@ -0,0 +1,144 @@
+import asyncio
+import time
+import pytest
+from lib.commons.SpanExporter import InMemorySpanExporter
+from lib.commons.Tracer import Tracer
+from lib.use_case.runner.StreamingPipeline import StreamingPipeline
+from lib.use_case.steps.StreamingStep import StreamingStep
+
+
+class Map(StreamingStep):
+    """Apply a function to each item, optionally waiting before each one and logging the events."""
+
+    def __init__(self, function, delay=0.0, events=None, name="map"):
+        self.step_id = None
+        self.function = function
+        self.delay = delay
+        self.events = events if events is not None else []
+        self.name = name
+        self.cancelled = False
+
+    async def process(self, items):
+        try:
+            async for item in items:
+                await asyncio.sleep(self.delay)
+                self.events.append((self.name, item))
+                yield self.function(item)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+def fail_on(value):
+    def function(item):
+        if item == value:
+            raise ValueError(f"bad item {item}")
+        return item
+    return function
+
+
+class TestStreamingPipeline:
+    def test_steps_are_chained(self):
+        """Test every item goes through the steps in order."""
+        pipeline = StreamingPipeline([Map(lambda x: x + 1)], buffer_size=2)
+        pipeline.add_step(Map(lambda x: x * 10))
+        result = pipeline.run(range(5))
+        assert result.is_success() and result.result == [10, 20, 30, 40, 50]
+        assert result.step_id == pipeline.steps[-1].step_id and pipeline.steps[0].step_id is not None
+
+    def test_steps_overlap(self):
+        """Test the first output is produced before the source is exhausted."""
+        events = []
+
+        async def source():
+            for item in range(4):
+                events.append(("source", item))
+                yield item
+                await asyncio.sleep(0.01)
+
+        async def first_output():
+            pipeline = StreamingPipeline([Map(str, events=events, name="parse"), Map(str.upper, events=events)])
+            async for item in pipeline.stream(source()):
+                events.append(("output", item))
+            return events
+
+        events = asyncio.run(first_output())
+        assert events.index(("output", "0")) < events.index(("source", 3))
+        assert [event for event in events if event[0] == "output"] == [("output", str(i)) for i in range(4)]
+
+    def test_backpressure(self):
+        """Test a fast step runs at most buffer_size items ahead of a slow consumer."""
+        produced = []
+
+        def record(item):
+            produced.append(item)
+            return item
+
+        async def consume():
+            pipeline = StreamingPipeline([Map(record)], buffer_size=2)
+            ahead = []
+            async for item in pipeline.stream(range(20)):
+                await asyncio.sleep(0.005)
+                ahead.append(len(produced) - item)
+            return ahead
+
+        assert max(asyncio.run(consume())) <= 2 + 2
+
+    def test_failure_cancels_the_other_steps(self):
+        """Test an error stops the pipeline and is reported after the items already produced."""
+        slow = Map(lambda x: x, delay=0.01, name="slow")
+        pipeline = StreamingPipeline([Map(fail_on(3)), slow, Map(lambda x: x)])
+        result = pipeline.run(range(100))
+        assert result.errors == ["ValueError: bad item 3"]
+        assert result.result == [0, 1, 2][:len(result.result)]
+
+        pipeline = StreamingPipeline([slow, Map(fail_on(1))])
+        with pytest.raises(ValueError):
+            asyncio.run(self._consume(pipeline.stream(range(100))))
+        assert slow.cancelled
+
+    @staticmethod
+    async def _consume(stream):
+        return [item async for item in stream]
+
+    def test_closing_the_stream_cancels_the_steps(self):
+        """Test a consumer stopping early cancels the running steps."""
+        step = Map(lambda x: x, delay=0.01)
+
+        async def first():
+            stream = StreamingPipeline([step], buffer_size=1).stream(range(100))
+            async for item in stream:
+                await stream.aclose()
+                return item
+
+        assert asyncio.run(first()) == 0
+        assert step.cancelled
+
+    def test_blocking_source(self):
+        """Test a blocking source is read off the event loop, as the first step consumes it."""
+        def blocking():
+            for item in range(3):
+                time.sleep(0.01)
+                yield item
+
+        assert StreamingPipeline([Map(lambda x: -x)]).run(blocking()).result == [0, -1, -2]
+
+    def test_empty_pipeline_and_validation(self):
+        """Test a pipeline without steps yields its source, and the buffer size is validated."""
+        result = StreamingPipeline().run([1, 2])
+        assert result.result == [1, 2] and result.step_id is None
+        with pytest.raises(ValueError):
+            StreamingPipeline(buffer_size=0)
+
+    def test_stages_are_traced(self):
+        """Test each step is traced with the number of items it produced."""
+        exporter = InMemorySpanExporter()
+        tracer = Tracer.get_instance()
+        tracer.enable(exporter)
+        try:
+            StreamingPipeline([Map(lambda x: x), Map(fail_on(2))]).run(range(4))
+        finally:
+            tracer.disable()
+        stages = sorted(exporter.get("workflow.stage"), key=lambda span: span.attributes["index"])
+        assert [span.attributes["step"] for span in stages] == ["Map", "Map"]
+        assert stages[1].attributes["items"] == 2 and stages[1].error is not None
@@ -0,0 +1,20 @@
+from lib.use_case.steps.MapReduceProgress import MapReduceProgress
+
+
+class TestMapReduceProgress:
+    def test_counters(self):
+        """Test the completed fraction, elapsed time and serialization follow the counters and the clock."""
+        now = [10.0]
+        progress = MapReduceProgress(4, clock=lambda: now[0])
+        progress.mapped, progress.failed = 2, 1
+        now[0] = 12.5
+        assert progress.completed == 0.75 and progress.elapsed == 2.5
+        progress.phase, progress.level, progress.reductions = "reduce", 1, 1
+        assert progress.finish() is progress
+        now[0] = 20.0
+        assert progress.to_dict() == {"phase": "done", "pieces": 4, "mapped": 2, "failed": 1, "level": 1,
+                                      "reductions": 1, "completed": 0.75, "elapsed": 2.5}
+
+    def test_without_pieces(self):
+        """Test an execution without pieces is complete."""
+        assert MapReduceProgress().completed == 1.0
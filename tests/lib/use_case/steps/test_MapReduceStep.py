@@ -0,0 +1,164 @@
+import threading
+import time
+import uuid
+import pytest
+from lib.commons.Deadline import check_deadline, remaining_time
+from lib.commons.SpanExporter import InMemorySpanExporter
+from lib.commons.Tracer import Tracer
+from lib.use_case.runner.DagRunner import DagRunner
+from lib.use_case.steps.MapReduceStep import MapReduceStep
+from lib.use_case.steps.StepResult import StepResult
+
+
+def fail_on(*values):
+    def function(piece):
+        if piece in values:
+            raise ValueError(f"bad piece {piece}")
+        return piece
+    return function
+
+
+class Parenthesize(MapReduceStep):
+    """Step overriding map and reduce: the result shows the reduce tree."""
+
+    def map(self, piece):
+        return str(piece)
+
+    def reduce(self, values):
+        return "(" + ",".join(values) + ")"
+
+
+class TestMapReduceStep:
+    def test_map_reduce(self):
+        """Test every piece is mapped and the values reduced level by level, with progress reports."""
+        reports = []
+        step = MapReduceStep(lambda x: x * x, sum, fan_in=3,
+                             progress=lambda progress: reports.append((progress.phase, progress.completed)))
+        result = step.execute(range(20))
+        assert result.is_success() and result.step_id == step.step_id
+        assert result.result == sum(x * x for x in range(20)) and result.message is None
+        assert [phase for phase, _ in reports].count("map") == 20 and reports[19] == ("map", 1.0)
+        assert [phase for phase, _ in reports].count("reduce") == 7 + 3 + 1 and reports[-1] == ("done", 1.0)
+
+    def test_reduce_tree(self):
+        """Test the reducer receives the values in input order, then its own outputs."""
+        assert Parenthesize(fan_in=2).execute(range(4)).result == "((0,1),(2,3))"
+        assert Parenthesize(fan_in=3).execute(range(4)).result == "((0,1,2),(3))"
+        assert Parenthesize().execute(["a"]).result == "(a)"
+
+    def test_input(self):
+        """Test the input is split by the splitter, and may be a StepResult or nothing."""
+        step = MapReduceStep(len, sum, splitter=str.split)
+        assert step.execute("a bb ccc").result == 6
+        assert step.execute(StepResult(uuid.uuid4(), result="dddd e")).result == 5
+        assert MapReduceStep(len, sum).execute().result == 0
+
+    def test_bounded_parallelism(self):
+        """Test at most max_workers pieces are mapped at the same time."""
+        lock = threading.Lock()
+        active, peak = [0], [0]
+
+        def mapper(piece):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.01)
+            with lock:
+                active[0] -= 1
+            return piece
+
+        assert MapReduceStep(mapper, sum, max_workers=3).execute(range(12)).result == 66
+        assert 1 < peak[0] <= 3
+
+    def test_tolerated_failures(self):
+        """Test failed pieces within max_failure_rate are reported in the message and left out."""
+        result = MapReduceStep(fail_on(3, 5), sum, max_failure_rate=0.25).execute(range(8))
+        assert result.is_success() and result.result == 28 - 3 - 5
+        assert result.message == "2 of 8 pieces failed: Piece 3: ValueError: bad piece 3; " \
+                                 "Piece 5: ValueError: bad piece 5"
+
+    def test_failure_rate_boundary(self):
+        """Test exactly max_failure_rate of the pieces may fail, whatever the float rounding."""
+        for rate in (0.29, 0.57, 0.58):
+            failures = round(rate * 100)
+            result = MapReduceStep(fail_on(*range(failures)), sum, max_failure_rate=rate).execute(range(100))
+            assert result.is_success() and result.message.startswith(f"{failures} of 100 pieces failed")
+            result = MapReduceStep(fail_on(*range(failures + 1)), sum, max_failure_rate=rate).execute(range(100))
+            assert not result.is_success()
+
+    def test_too_many_failures(self):
+        """Test the step fails once too many pieces failed, without mapping the remaining pieces."""
+        mapped = []
+
+        def mapper(piece):
+            mapped.append(piece)
+            time.sleep(0.005)
+            return fail_on(0)(piece)
+
+        result = MapReduceStep(mapper, sum, max_workers=1, max_failure_rate=0.05).execute(range(10))
+        assert result.errors == ["Piece 0: ValueError: bad piece 0"] and result.result is None
+        time.sleep(0.02)
+        assert len(mapped) < 10
+
+    def test_failure_cancels_the_running_pieces(self):
+        """Test the pieces still running when the step fails are stopped through their deadline."""
+        stopped = threading.Event()
+
+        def mapper(piece):
+            if piece == 0:
+                time.sleep(0.01)
+                raise ValueError("bad piece 0")
+            try:
+                for _ in range(1000):
+                    check_deadline()
+                    time.sleep(0.005)
+            finally:
+                stopped.set()
+
+        assert not MapReduceStep(mapper, sum, max_workers=2).execute(range(2)).is_success()
+        assert stopped.wait(1)
+
+    def test_reduce_failure(self):
+        """Test an error of the reducer fails the step."""
+        result = MapReduceStep(lambda x: x, lambda values: 1 / 0).execute([1])
+        assert result.errors == ["Reduce: ZeroDivisionError: division by zero"]
+
+    def test_missing_functions_and_validation(self):
+        """Test a step without mapper or reducer is rejected, and the parameters are validated."""
+        with pytest.raises(TypeError, match="mapper"):
+            MapReduceStep(reducer=sum)
+        with pytest.raises(TypeError, match="reducer"):
+            MapReduceStep(mapper=str)
+        for arguments in ({"max_workers": 0}, {"fan_in": 1}, {"max_failure_rate": 1.5}):
+            with pytest.raises(ValueError):
+                MapReduceStep(str, sum, **arguments)
+
+    def test_step_id(self):
+        """Test the step id may be given, e.g. a stable one for checkpoints, and is random otherwise."""
+        step_id = uuid.uuid5(uuid.NAMESPACE_URL, "summarize")
+        assert Parenthesize(step_id=step_id).execute(["a"]).step_id == step_id
+        assert Parenthesize().step_id != Parenthesize().step_id
+
+    def test_step_in_a_dag(self):
+        """Test the step runs in a DagRunner, its calls running under the deadline of the step."""
+        runner = DagRunner()
+        words = runner.add_step(Parenthesize())
+        words.split = lambda source: source.split()
+        budgets = runner.add_step(MapReduceStep(lambda piece: remaining_time(), max), depends_on=[words])
+        budgets.timeout = 5
+        budgets.split = lambda source: [source]
+        results = runner.run("x y z")
+        assert results[words.step_id].result == "(x,y,z)"
+        assert 0 < results[budgets.step_id].result <= 5
+
+    def test_span(self):
+        """Test the execution is traced with the number of pieces, failures and reduce levels."""
+        exporter = InMemorySpanExporter()
+        tracer = Tracer.get_instance()
+        tracer.enable(exporter)
+        try:
+            MapReduceStep(fail_on(1), sum, fan_in=2, max_failure_rate=0.5).execute(range(5))
+        finally:
+            tracer.disable()
+        span, = exporter.get("workflow.map_reduce")
+        assert span.attributes == {"step": "MapReduceStep", "pieces": 5, "failed": 1, "levels": 2}
@@ -41,3 +41,74 @@ class TestStepResult:
         assert d["result"] == "data"
         assert d["errors"] == ["error"]
         assert d["success"] == False
+
+    def test_errors_not_shared_between_instances(self):
+        """Test that each StepResult owns its own errors list."""
+        first = StepResult(uuid.uuid4())
+        second = StepResult(uuid.uuid4())
+        first.add_error("boom")
+        assert second.errors == []
+
+    def test_init_with_errors(self):
+        """Test initialization with an explicit errors list copies it."""
+        errors = ["e1"]
+        result = StepResult(uuid.uuid4(), errors=errors)
+        result.add_error("e2")
+        assert result.errors == ["e1", "e2"]
+        assert errors == ["e1"]
+        assert result.is_success() == False
+
+    def test_has_no_instance_dict(self):
+        """Test that StepResult is slotted."""
+        result = StepResult(uuid.uuid4())
+        assert not hasattr(result, "__dict__")
+
+    def test_from_dict_round_trip(self):
+        """Test from_dict restores a result serialized with to_dict."""
+        result = StepResult(uuid.uuid4(), result={"k": 1}, message="msg")
+        result.add_error("error")
+        assert StepResult.from_dict(result.to_dict()) == result
+
+    def test_from_dict_with_string_step_id(self):
+        """Test from_dict accepts the string form of the step id."""
+        step_id = uuid.uuid4()
+        result = StepResult.from_dict({"step_id": str(step_id), "result": 1})
+        assert result.step_id == step_id
+        assert result.result == 1
+        assert result.errors == []
+
+    def test_from_dict_with_non_uuid_step_id(self):
+        """Test from_dict keeps string step ids that are not UUIDs."""
+        assert StepResult.from_dict({"step_id": "step-1"}).step_id == "step-1"
+
+    def test_hashable(self):
+        """Test equal step results hash alike and can be used in sets."""
+        step_id = uuid.uuid4()
+        first, second = StepResult(step_id, result=[1]), StepResult(step_id, result=[1])
+        assert first == second and hash(first) == hash(second)
+        assert len({first, second, StepResult(uuid.uuid4())}) == 2
+
+    def test_tuple_round_trip(self):
+        """Test to_tuple stores the uuid as bytes and from_tuple restores it."""
+        step_id = uuid.uuid4()
+        result = StepResult(step_id, result="data")
+        values = result.to_tuple()
+        assert values[0] == step_id.bytes
+        assert StepResult.from_tuple(values) == result
+
+    def test_tuple_round_trip_non_uuid_step_id(self):
+        """Test to_tuple keeps non-uuid step ids as they are."""
+        result = StepResult("step-1", result="data")
+        assert StepResult.from_tuple(result.to_tuple()).step_id == "step-1"
+
+    def test_pickle_round_trip(self):
+        """Test that slotted instances survive pickling."""
+        import pickle
+        result = StepResult(uuid.uuid4(), result=[1, 2], message="msg")
+        assert pickle.loads(pickle.dumps(result)) == result
+
+    def test_equality_and_repr(self):
+        """Test equality with other types and repr."""
+        result = StepResult(uuid.uuid4())
+        assert result != "other"
+        assert "success=True" in repr(result)
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import uuid
+from lib.use_case.runner.DagRunner import DagRunner
+from lib.use_case.steps.StepResult import StepResult
+from lib.use_case.steps.StreamingStep import StreamingStep, iterate
+
+
+class Words(StreamingStep):
+    """Split each text into words."""
+
+    def __init__(self):
+        self.step_id = uuid.uuid4()
+
+    async def process(self, items):
+        async for text in items:
+            for word in text.split():
+                yield word
+
+
+async def collect(source):
+    return [item async for item in iterate(source)]
+
+
+class TestIterate:
+    def test_sources(self):
+        """Test lists, asynchronous iterators and blocking iterators are iterated from the loop."""
+        threads = []
+
+        def blocking():
+            for item in (1, 2):
+                threads.append(threading.current_thread())
+                yield item
+
+        async def asynchronous():
+            yield "a"
+
+        assert asyncio.run(collect([1, 2])) == [1, 2]
+        assert asyncio.run(collect(asynchronous())) == ["a"]
+        assert asyncio.run(collect(blocking())) == [1, 2]
+        assert threads and threading.current_thread() not in threads
+
+
+    def test_blocking_source_is_closed(self):
+        """Test a blocking source is closed when the consumer stops early, or while an item is fetched."""
+        closed, started, release = [], threading.Event(), threading.Event()
+
+        def source(block=False):
+            try:
+                yield 1
+                if block:
+                    started.set()
+                    release.wait(5)
+                yield 2
+            finally:
+                closed.append(threading.current_thread())
+
+        async def first_item():
+            items = iterate(source())
+            assert await items.__anext__() == 1
+            await items.aclose()
+
+        async def cancelled_fetch():
+            items = iterate(source(block=True))
+            assert await items.__anext__() == 1
+            task = asyncio.ensure_future(items.__anext__())
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await items.aclose()
+            release.set()
+
+        asyncio.run(first_item())
+        assert len(closed) == 1 and closed[0] is not threading.current_thread()
+        asyncio.run(cancelled_fetch())  # waits for the executor, hence for the close
+        assert len(closed) == 2
+
+
+class TestStreamingStep:
+    def test_default_process_passes_items_through(self):
+        """Test the base step yields its input unchanged."""
+        step = StreamingStep()
+        step.step_id = uuid.uuid4()
+        result = asyncio.run(step.execute((1, 2)))
+        assert result.step_id == step.step_id and result.result == [1, 2]
+
+    def test_execute_collects_the_output(self):
+        """Test execute accepts an iterable, a StepResult or nothing."""
+        step = Words()
+        assert asyncio.run(step.execute(["a b", "c"])).result == ["a", "b", "c"]
+        assert asyncio.run(step.execute(StepResult(uuid.uuid4(), result=iter(["d e"])))).result == ["d", "e"]
+        assert asyncio.run(step.execute()).result == []
+
+    def test_step_in_a_dag(self):
+        """Test a streaming step runs as a regular step of a DagRunner."""
+        runner = DagRunner()
+        words = runner.add_step(Words())
+        results = runner.run(["x y"])
+        assert results[words.step_id].result == ["x", "y"]